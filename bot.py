@@ -6,7 +6,6 @@ import aiohttp
 import json
 import os
 import sys
-import time
 from datetime import datetime
 import subprocess
 from typing import TYPE_CHECKING
@@ -52,59 +51,35 @@ def print_sky_blue_art():
     
     print(art)
 
-# 检查Python版本和自动安装缺失的库
+# 检查Python版本和依赖是否满足
+# 只读取已安装分发包的元数据，不导入任何第三方库；默认不会自动安装，
+# 需要通过 --install_deps 参数显式允许
+_allow_install_deps = '--install_deps' in sys.argv
+
 def check_and_install_dependencies():
-    # 检查Python版本 (需要至少3.8)
-    if sys.version_info < (3, 8):
-        print(f"错误: Python版本过低 ({sys.version_info.major}.{sys.version_info.minor})，需要至少Python 3.8")
+    from core.dependency_checker import verify_dependencies, install_missing
+
+    report = verify_dependencies()
+    if not report.python_ok:
+        print(f"错误: Python版本过低 ({report.python_version})，需要至少Python 3.8")
+        sys.exit(1)
+
+    if report.ok:
+        return report
+
+    print("依赖校验未通过:")
+    print(report.format())
+
+    if not _allow_install_deps:
+        print("已禁止运行时自动安装依赖，请手动安装上述依赖，或使用 --install_deps 参数允许自动安装")
         sys.exit(1)
-    
-    # 需要检查的第三方库列表
-    required_packages = [
-        'aiohttp',
-        'aiosqlite',
-        'PyYAML',
-        'Pillow',
-        'playwright',
-        'mcstatus',
-        'requests'
-    ]
-    
-    missing_packages = []
-    
-    # 检查每个包是否已安装
-    for package in required_packages:
-        try:
-            # 特殊处理一些包名和导入名不一致的情况
-            if package == 'PyYAML':
-                import yaml
-            elif package == 'Pillow':
-                from PIL import Image
-            elif package == 'playwright':
-                import playwright
-            else:
-                __import__(package)
-        except ImportError:
-            missing_packages.append(package)
-    
-    # 如果有缺失的包，尝试自动安装
-    if missing_packages:
-        print(f"检测到缺失的依赖包: {', '.join(missing_packages)}")
-        print("正在尝试自动安装...")
-        
-        import subprocess
-        for package in missing_packages:
-            try:
-                # 使用阿里云镜像安装
-                subprocess.check_call([
-                    sys.executable, '-m', 'pip', 'install', package, 
-                    '-i', 'https://mirrors.aliyun.com/pypi/simple/'
-                ])
-                print(f"成功安装 {package}")
-            except subprocess.CalledProcessError:
-                print(f"安装 {package} 失败，请手动安装")
-                sys.exit(1)
-        print("所有依赖包安装完成")
+
+    print("正在尝试自动安装...")
+    if not install_missing(report):
+        print("自动安装失败，请手动安装")
+        sys.exit(1)
+    print("所有依赖包安装完成")
+    return report
 
 # 在程序开始时检查依赖
 check_and_install_dependencies()
@@ -117,11 +92,31 @@ logger = get_logger("QQBot")
 # ---------------------- 核心上下文管理 ----------------------
 import asyncio
 from core.bot_context import BotContext
-from core.config_manager import load_config
+from core.config_manager import load_config, config_store
 from core.config_watcher import config_watcher
+from core.file_watcher import file_watcher
+from core.json_store import json_store
+from core.message_store import message_store
+from core.moderation_journal import moderation_journal
+from core.shard_coordinator import shard_coordinator
+from core.shutdown import shutdown_manager, notify_handover_ready, write_restart_flag
+from core.http_server import start_metrics_server
+from core.metrics import QUEUE_DEPTH
+from core.tracing import tracer
+from core.loop_monitor import loop_monitor
+from core.heartbeat_scheduler import heartbeat_scheduler
+from core.profile_cache import profile_cache
+from core.spam_detector import spam_detector
+from core.join_request_processor import join_request_processor
+from core.express_tracker import express_tracker
 from core.multi_websocket_manager import MultiWebSocketManager
 from core.message_router import MessageRouter
 
+# 多进程分片：start.py --shards N 会以 --shard i/N 参数启动各个工作进程
+shard_coordinator.configure_from_argv(sys.argv)
+# 各分片进程共用 data/ 下的JSON文件，修改时需要跨进程加锁
+json_store.process_lock = shard_coordinator.enabled
+
 
 # ---------------------- 命令系统 ----------------------
 from commands.command_dispatcher import initialize_command_mappings
@@ -129,7 +124,7 @@ from commands.command_loader import load_command_handlers
 
 
 # ---------------------- 后台任务 ----------------------
-from utils.task_utils import start_background_tasks
+from utils.task_utils import start_background_tasks, get_background_tasks, get_drain_tasks, get_timer_tasks
 
 
 
@@ -139,13 +134,9 @@ from core.browser_manager import ensure_browser_initialized, cleanup_browser
 # ---------------------- 控制台处理器 ----------------------
 from handlers.console_handler import ConsoleHandler
 
-# 用于快速退出的全局标志
-_fast_exit = False
-
 # ---------------------- 主函数 ----------------------
 async def main():
     """主函数，协调整个程序的启动和运行。"""
-    global _fast_exit
     # 使用导入的get_logger函数
     from logger_config import get_logger
     logger = get_logger("Main")
@@ -160,11 +151,54 @@ async def main():
     # 2. 创建核心上下文
     context = BotContext(config)
 
+    # 2.1 启动本地消息历史存储和管理事件日志
+    message_store.configure(config.get("message_history"))
+    await message_store.start()
+    moderation_journal.configure(config.get("moderation_journal"))
+    await moderation_journal.start()
+
+    # 2.2 分片模式下注册到分片协调数据库
+    await shard_coordinator.start()
+
     # 3. 初始化中文命令映射
     initialize_command_mappings(config)
     load_command_handlers(config)
     
-    # 4. 启动配置文件监控
+    # 4. 订阅配置快照变更并启动配置文件监控
+    loop = asyncio.get_running_loop()
+
+    # 4.1 退出协调：SIGTERM 与重启命令一样走排空流程，而不是直接终止进程
+    shutdown_manager.configure(config.get("shutdown"))
+    shutdown_manager.bind(loop)
+    if sys.platform != 'win32':
+        import signal
+        loop.add_signal_handler(signal.SIGTERM, shutdown_manager.request)
+
+    # 4.2 事件追踪与事件循环延迟监控
+    tracer.configure(config.get("tracing"))
+    loop_monitor.configure(config.get("loop_monitor"))
+    loop_monitor.start()
+
+    # 4.3 用户资料与群成员缓存
+    profile_cache.configure(config.get("profile_cache"))
+
+    # 4.4 群刷屏检测
+    spam_detector.configure(config.get("spam_detection"))
+
+    # 4.5 加群申请审核队列
+    join_request_processor.configure(config.get("join_requests"))
+    await join_request_processor.start()
+
+    # 4.6 快递提醒跟踪（启动时恢复提醒文件中的单号；分片模式下只由主分片查询和提醒，避免重复提醒）
+    express_tracker.configure(config.get("express_tracking"))
+    if shard_coordinator.is_primary:
+        await express_tracker.start(context)
+
+    def on_config_snapshot(old_snapshot, new_snapshot, changed_keys):
+        # 订阅回调可能来自监控线程，统一切回事件循环线程应用新配置
+        loop.call_soon_threadsafe(apply_config_snapshot, context, new_snapshot, changed_keys)
+
+    config_store.subscribe(on_config_snapshot)
     config_watcher.add_callback(on_config_change)
     config_watcher.start()
 
@@ -172,6 +206,13 @@ async def main():
     multi_websocket_manager: 'MultiWebSocketManager' = MultiWebSocketManager(context)
     # 将多连接管理器添加到上下文中（通过自定义属性）
     setattr(context, 'multi_ws_manager', multi_websocket_manager)
+    shard_coordinator.set_status_provider(multi_websocket_manager.get_shard_status)
+
+    if '--handover' in sys.argv:
+        # 交接重启启动的新进程：第一次连接成功后通知旧进程停止接收事件
+        async def on_handover_connected():
+            notify_handover_ready()
+        multi_websocket_manager.set_connection_success_callback(on_handover_connected)
     
 
 
@@ -208,17 +249,37 @@ async def main():
     
     # 9. 启动后台任务
     start_background_tasks()
+
+    # 指标服务（Prometheus 文本格式），分片模式下各分片使用 port + 分片编号
+    metrics_runner = None
+    metrics_config = config.get("metrics") or {}
+    QUEUE_DEPTH.labels('in_flight_events').set_function(lambda: shutdown_manager.in_flight)
+    QUEUE_DEPTH.labels('background_tasks').set_function(lambda: len(get_background_tasks()))
+    QUEUE_DEPTH.labels('message_store_pending').set_function(lambda: message_store.pending_writes)
+    QUEUE_DEPTH.labels('moderation_journal_pending').set_function(lambda: moderation_journal.pending_writes)
+    QUEUE_DEPTH.labels('api_callbacks').set_function(lambda: len(message_router.api_callbacks))
+    QUEUE_DEPTH.labels('heartbeat_deadlines').set_function(lambda: len(heartbeat_scheduler))
+    QUEUE_DEPTH.labels('join_requests').set_function(lambda: join_request_processor.pending)
+    QUEUE_DEPTH.labels('express_tracked').set_function(lambda: express_tracker.tracked)
+    if metrics_config.get("enabled", False):
+        try:
+            metrics_runner = await start_metrics_server(
+                metrics_config.get("host", "127.0.0.1"),
+                metrics_config.get("port", 9464) + shard_coordinator.shard_index
+            )
+        except OSError as e:
+            logger.error(f"指标服务启动失败: {e}")
     
     # 9.1 初始化SiliconFlow功能
 
 
 
-    # 10. 创建并启动控制台处理器
-    console_handler = ConsoleHandler(context)
-    console_task = asyncio.create_task(console_handler.handle_console_input())
-    
-    # 存储所有需要管理的任务
-    background_tasks = [console_task]
+    # 10. 创建并启动控制台处理器（分片模式下只有主分片读取控制台输入）
+    background_tasks = []
+    if shard_coordinator.is_primary:
+        console_handler = ConsoleHandler(context)
+        console_task = asyncio.create_task(console_handler.handle_console_input())
+        background_tasks.append(console_task)
     
     try:
         # 11. 启动多WebSocket主循环
@@ -226,26 +287,28 @@ async def main():
         logger.debug(f"多WebSocket管理器: {multi_websocket_manager}")
         logger.debug(f"消息路由器: {message_router}")
         
-        # 创建快速重启检测任务
-        async def check_fast_exit():
-            global _fast_exit
-            while not _fast_exit:
-                await asyncio.sleep(0.1)
-            return True
-        
-        exit_check_task = asyncio.create_task(check_fast_exit())
+        # 等待退出/重启请求
+        shutdown_task = asyncio.create_task(shutdown_manager.wait_requested())
         
         # 将主循环也创建为任务
         main_loop_task = asyncio.create_task(
             multi_websocket_manager.start_main_loop(message_router.handle_websocket_message)
         )
         
-        # 等待WebSocket主循环或快速退出信号
+        # 等待WebSocket主循环结束或退出请求
         done, pending = await asyncio.wait(
-            [main_loop_task, exit_check_task],
+            [main_loop_task, shutdown_task],
             return_when=asyncio.FIRST_COMPLETED
         )
         
+        if shutdown_task in done:
+            # 交接重启：新进程连接成功之前继续处理事件
+            if shutdown_manager.restart and shutdown_manager.settings['handover'] and not shard_coordinator.enabled:
+                await shutdown_manager.wait_for_handover()
+            # 停止接收新事件，在连接仍然可用时等待处理中的事件和自动撤回等后台任务完成，取消定时器任务
+            await shutdown_manager.drain(get_drain_tasks, get_timer_tasks)
+            multi_websocket_manager.stop()
+        
         # 取消未完成的任务
         for task in pending:
             task.cancel()
@@ -257,7 +320,8 @@ async def main():
                 logger.error(f"取消任务时发生错误: {e}", exc_info=True)
         
         logger.info("多WebSocket主循环正常退出")
-        return _fast_exit  # 返回是否需要快速重启
+        # 返回是否需要由start.py重启（交接重启时新进程已经启动）
+        return shutdown_manager.restart and not shutdown_manager.handover_started
         
     except KeyboardInterrupt:
         logger.info("程序被用户中断")
@@ -280,26 +344,80 @@ async def main():
         
 
         
-        # 停止配置监控
+        # 停止配置监控和文件监控服务
         config_watcher.stop()
+        file_watcher.stop()
+
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await loop_monitor.stop()
+        
+        # 处理完队列中的加群申请（审核结果写入管理事件日志）
+        await join_request_processor.close()
+        # 停止快递跟踪并关闭查询接口的连接
+        await express_tracker.close()
         
-        # 如果不是快速退出，则清理浏览器资源
-        if not _fast_exit:
-            await cleanup_browser()
+        # 写入尚未落盘的数据文件和消息历史，并关闭数据库
+        await json_store.flush_all()
+        await message_store.close()
+        await moderation_journal.close()
+        await shard_coordinator.close()
+        
+        # 渲染任务已经排空，清理浏览器资源
+        await cleanup_browser()
         
         logger.info("主程序结束")
 
 
 def on_config_change(changed_files):
     """配置文件变化回调函数"""
-    logger.info(f"配置文件 {', '.join(changed_files)} 已更新并生效")
-    
-    # 重新加载配置
-    config = load_config()
+    logger.info(f"配置文件 {', '.join(changed_files)} 已更新")
+
+
+def _changed(changed_keys, prefix: str) -> bool:
+    """变化项中是否包含 prefix 节本身或其下的键"""
+    return any(key == prefix or key.startswith(prefix + '.') for key in changed_keys)
+
+
+def apply_config_snapshot(context: BotContext, snapshot, changed_keys):
+    """把新的配置快照推送到BotContext，并按变化项刷新依赖配置的模块"""
+    context.apply_config(snapshot.data)
+
+    if _changed(changed_keys, 'message_history'):
+        message_store.configure(snapshot.data.get("message_history"))
+
+    if _changed(changed_keys, 'moderation_journal'):
+        moderation_journal.configure(snapshot.data.get("moderation_journal"))
+
+    if _changed(changed_keys, 'shutdown'):
+        shutdown_manager.configure(snapshot.data.get("shutdown"))
+
+    if _changed(changed_keys, 'tracing'):
+        tracer.configure(snapshot.data.get("tracing"))
+
+    if _changed(changed_keys, 'loop_monitor'):
+        loop_monitor.configure(snapshot.data.get("loop_monitor"))
+
+    if _changed(changed_keys, 'profile_cache'):
+        profile_cache.configure(snapshot.data.get("profile_cache"))
+
+    if _changed(changed_keys, 'spam_detection'):
+        spam_detector.configure(snapshot.data.get("spam_detection"))
+
+    if _changed(changed_keys, 'join_requests'):
+        join_request_processor.configure(snapshot.data.get("join_requests"))
+
+    if _changed(changed_keys, 'express_tracking'):
+        express_tracker.configure(snapshot.data.get("express_tracking"))
+
+    if _changed(changed_keys, 'commands'):
+        initialize_command_mappings(snapshot.data)
+        load_command_handlers(snapshot.data)
+
+    logger.info(f"配置版本 {snapshot.version} 已生效")
 
 
 async def run_qqbot():
-    global _fast_exit
     logger = get_logger("RunQQBot")  # 初始化logger变量
     print("=====================================")
     print_sky_blue_art()
@@ -316,12 +434,9 @@ async def run_qqbot():
         # 如果需要重启，创建重启标志文件
         if should_restart:
             logger.info("创建重启标志，等待start.py重启机器人...")
-            # 创建重启标志文件
-            restart_flag = os.path.join(os.path.dirname(__file__), '.restart_flag')
-            with open(restart_flag, 'w') as f:
-                f.write(str(time.time()))
+            write_restart_flag()
                 
-            # 快速退出，不执行清理操作
+            # 清理已在 main() 中完成，直接退出
             os._exit(0)
     except KeyboardInterrupt:
         logger.info("程序被用户中断")
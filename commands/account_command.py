@@ -69,9 +69,16 @@ async def _handle_list_command(context: BotContext, group_id: str, user_id: str)
                 conn = ws_manager.connections.get(account_id)
                 if conn:
                     if conn.is_connected:
-                        if conn.is_healthy:
+                        state = getattr(conn, 'state', None)
+                        if state == 'recovering':
+                            status_emoji = "🟢"
+                            status_text = "恢复中"
+                        elif conn.is_healthy:
                             status_emoji = "🟢"
                             status_text = "正常"
+                        elif state == 'degraded':
+                            status_emoji = "🟡"
+                            status_text = "降级"
                         else:
                             status_emoji = "🟡"
                             status_text = "心跳超时"
@@ -139,7 +146,7 @@ async def _handle_mode_query(context: BotContext, group_id: str, user_id: str) -
     elif current_mode == 'parallel-pro':
         lines.append("📖 并行专业模式说明:")
         lines.append("• 所有账号同时保持WebSocket连接")
-        lines.append("• 定时获取群列表，分析哪些群有多个账号")
+        lines.append("• 根据进退群通知实时维护群列表，并定期全量校对")
         lines.append("• 群消息只由该群中优先级最高的活跃账号处理")
         lines.append("• 避免在同一群中重复回复")
         lines.append("• 适用于多账号在同一群中的场景")
@@ -245,12 +252,8 @@ async def _handle_groups_list_command(context: BotContext, group_id: str, user_i
                 lines.append(f"  {', '.join(account_info)}")
                 
                 # 显示最高优先级的活跃账号
-                active_accounts = [
-                    acc_id for acc_id in accounts
-                    if (conn := ws_manager.connections.get(acc_id)) and conn.is_connected and conn.is_healthy
-                ]
-                if active_accounts:
-                    highest_priority_account = min(active_accounts, key=lambda x: ws_manager.connections[x].priority)
+                highest_priority_account = ws_manager.get_responsible_account(gid)
+                if highest_priority_account is not None:
                     lines.append(f"  → 当前处理账号: 账号{highest_priority_account}")
                 lines.append("")
         else:
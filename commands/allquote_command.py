@@ -1,9 +1,8 @@
 # commands/allquote_command.py
 # 处理 /allquote 命令 - 句句名言功能
 
-import json
-import os
 from logger_config import get_logger
+from core.json_store import json_store
 from core.bot_context import BotContext
 from utils.message_utils import parse_at_or_qq
 
@@ -13,33 +12,10 @@ def get_allquote_file_path(group_id: str) -> str:
     """获取句句名言配置文件路径"""
     return f"data/allquote/{group_id}.json"
 
-def load_allquote_data(group_id: str) -> dict:
-    """加载句句名言数据"""
-    allquote_file = get_allquote_file_path(group_id)
-    try:
-        if os.path.exists(allquote_file):
-            with open(allquote_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception as e:
-        logger.error(f"加载句句名言数据失败: {e}")
-    return {"quoted_users": {}}
-
-def save_allquote_data(group_id: str, data: dict):
-    """保存句句名言数据"""
-    allquote_file = get_allquote_file_path(group_id)
-    try:
-        directory = os.path.dirname(allquote_file)
-        os.makedirs(directory, exist_ok=True)
-        with open(allquote_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        logger.info(f"句句名言数据已保存至: {allquote_file}")
-    except Exception as e:
-        logger.error(f"保存句句名言数据失败: {e}")
-        raise
-
 def is_user_allquoted(group_id: str, user_id: str) -> bool:
     """检查用户是否在句句名言名单中"""
-    data = load_allquote_data(group_id)
+    # 每条群消息都会调用，直接读取缓存，不复制
+    data = json_store.get(get_allquote_file_path(group_id), default={"quoted_users": {}})
     return str(user_id) in data.get("quoted_users", {})
 
 async def handle_allquote_command(context: BotContext, args: list, user_id: str, group_id: str, command: str, sender_role: str = None, **kwargs) -> str:
@@ -61,23 +37,25 @@ async def handle_allquote_command(context: BotContext, args: list, user_id: str,
     
 
     
-    data = load_allquote_data(group_id)
-    quoted_users = data.get("quoted_users", {})
+    target_key = str(target_user_id)
     
-    if str(target_user_id) in quoted_users:
-        del quoted_users[str(target_user_id)]
-        data["quoted_users"] = quoted_users
-        save_allquote_data(group_id, data)
-        
-        logger.info(f"用户 {user_id} 在群 {group_id} 解除了用户 {target_user_id} 的句句名言")
-        return f"✅ 已将用户 {target_user_id} 从句句名言名单移除"
-    else:
-        quoted_users[str(target_user_id)] = {
+    def toggle_allquote(data):
+        quoted_users = data.setdefault("quoted_users", {})
+        if target_key in quoted_users:
+            del quoted_users[target_key]
+            return False
+        quoted_users[target_key] = {
             "operator": str(user_id),
             "timestamp": int(__import__('time').time())
         }
-        data["quoted_users"] = quoted_users
-        save_allquote_data(group_id, data)
-        
+        return True
+    
+    # 在文件锁内读取、更新并原子写回，避免并发的管理命令互相覆盖
+    added = await json_store.update(get_allquote_file_path(group_id), toggle_allquote, default={"quoted_users": {}}, indent=4)
+    
+    if not added:
+        logger.info(f"用户 {user_id} 在群 {group_id} 解除了用户 {target_user_id} 的句句名言")
+        return f"✅ 已将用户 {target_user_id} 从句句名言名单移除"
+    else:
         logger.info(f"用户 {user_id} 在群 {group_id} 为用户 {target_user_id} 添加了句句名言")
         return f"✅ 已将用户 {target_user_id} 添加到句句名言名单"
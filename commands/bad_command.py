@@ -2,17 +2,41 @@
 # 重构后的敏感词管理命令，从主文件中独立出来
 
 import os
+import time
 from datetime import datetime
 from logger_config import get_logger
 from core.bot_context import BotContext
 # 从独立的管理器导入，解决循环导入
-from core.sensitive_word_manager import sensitive_words, sensitive_trigger_log, MAX_LOG_ENTRIES, add_sensitive_word, remove_sensitive_word, clear_sensitive_trigger_log
+from core.sensitive_word_manager import sensitive_words, add_sensitive_word, remove_sensitive_word, clear_sensitive_trigger_log
+from core.moderation_journal import moderation_journal
 # 导入权限检查
 from commands.permission_manager import check_permission
 from utils.message_sender import MessageBuilder, CommandResponse
 
 logger = get_logger("BadCommand")
 
+LOG_DISPLAY_LIMIT = 20
+TOP_DEFAULT_DAYS = 7
+LOG_FILTER_KEYS = {'group': 'group_id', 'user': 'user_id', 'word': 'word'}
+
+def _parse_log_args(args: str):
+    """解析 /bad log 的过滤参数: [group <群号>] [user <QQ号>] [word <词>] [天数]，格式错误时返回 None"""
+    filters = {}
+    days = None
+    tokens = args.split()
+    i = 0
+    while i < len(tokens):
+        token = tokens[i].lower()
+        if token in LOG_FILTER_KEYS and i + 1 < len(tokens):
+            filters[LOG_FILTER_KEYS[token]] = tokens[i + 1]
+            i += 2
+        elif token.isdigit() and days is None:
+            days = int(token)
+            i += 1
+        else:
+            return None
+    return filters, days
+
 async def handle_bad_command(message: str, user_id: str, context: BotContext = None) -> CommandResponse:
     """处理Root用户的私聊 /bad 命令，用于管理全局敏感词和查看日志。"""
     # 创建响应构建器
@@ -30,7 +54,7 @@ async def handle_bad_command(message: str, user_id: str, context: BotContext = N
             return CommandResponse.builder(builder)
     msg_parts = message.strip().split(maxsplit=2)
     if len(msg_parts) < 2:
-        builder.add_text("❌ 参数错误。支持: /bad add <词>, /bad rm <词>, /bad log, /bad clear")
+        builder.add_text("❌ 参数错误。支持: /bad add <词>, /bad rm <词>, /bad log [group <群号>] [user <QQ号>] [word <词>] [天数], /bad top [天数], /bad clear")
         return CommandResponse.builder(builder)
 
     command = msg_parts[0].lower()
@@ -74,11 +98,22 @@ async def handle_bad_command(message: str, user_id: str, context: BotContext = N
             return CommandResponse.builder(builder)
 
         elif sub_command == 'log':
-            if not sensitive_trigger_log:
-                builder.add_text("✅ 敏感词触发日志为空。")
+            parsed = _parse_log_args(msg_parts[2] if len(msg_parts) > 2 else "")
+            if parsed is None:
+                builder.add_text("❌ 参数错误。格式: /bad log [group <群号>] [user <QQ号>] [word <词>] [天数]")
+                return CommandResponse.builder(builder)
+            filters, days = parsed
+            if days is None:
+                # 未指定天数时只查看内存中的最近记录
+                entries = moderation_journal.recent(LOG_DISPLAY_LIMIT, kind="sensitive", **filters)
+            else:
+                entries = await moderation_journal.query(kind="sensitive", since=time.time() - days * 86400,
+                                                         limit=LOG_DISPLAY_LIMIT, **filters)
+            if not entries:
+                builder.add_text("✅ 没有符合条件的敏感词触发记录。" if filters or days else "✅ 敏感词触发日志为空。")
                 return CommandResponse.builder(builder)
             log_messages = ["📋 **最近的敏感词触发记录**:"]
-            for i, entry in enumerate(sensitive_trigger_log, 1):
+            for i, entry in enumerate(entries, 1):
                 dt = datetime.fromtimestamp(entry['timestamp'])
                 time_str = dt.strftime('%Y-%m-%d %H:%M:%S')
                 log_messages.append(
@@ -88,15 +123,34 @@ async def handle_bad_command(message: str, user_id: str, context: BotContext = N
             builder.add_text("\n".join(log_messages))
             return CommandResponse.builder(builder)
 
+        elif sub_command == 'top':
+            days_arg = msg_parts[2].strip() if len(msg_parts) > 2 else ""
+            if days_arg and not days_arg.isdigit():
+                builder.add_text("❌ 参数错误。格式: /bad top [天数]")
+                return CommandResponse.builder(builder)
+            days = int(days_arg) if days_arg else TOP_DEFAULT_DAYS
+            since = time.time() - days * 86400
+            top_words, top_offenders = await moderation_journal.top(10, kind="sensitive", since=since)
+            if not top_words:
+                builder.add_text(f"✅ 最近{days}天没有敏感词触发记录。")
+                return CommandResponse.builder(builder)
+            lines = [f"📊 **最近{days}天敏感词统计**", "触发最多的敏感词:"]
+            lines.extend(f"{i}. `{word}` × {count}" for i, (word, count) in enumerate(top_words, 1))
+            lines.append("触发最多的用户:")
+            lines.extend(f"{i}. 群{group_id} | 用户{user_id} × {count}"
+                         for i, ((group_id, user_id), count) in enumerate(top_offenders, 1))
+            builder.add_text("\n".join(lines))
+            return CommandResponse.builder(builder)
+
         elif sub_command == 'clear':
             # 使用管理器函数
             clear_sensitive_trigger_log()
             logger.info(f"Root用户 {user_id} 已清空敏感词触发日志")
-            builder.add_text("✅ 已清空敏感词触发日志。")
+            builder.add_text("✅ 已清空最近的敏感词触发日志（历史记录文件保留）。")
             return CommandResponse.builder(builder)
 
         else:
-            builder.add_text("❌ 无效子命令。支持: add, rm, log, clear")
+            builder.add_text("❌ 无效子命令。支持: add, rm, log, top, clear")
             return CommandResponse.builder(builder)
 
     except Exception as e:
@@ -4,7 +4,7 @@ import json
 from logger_config import get_logger, log_exception
 from core.bot_context import BotContext
 from utils.message_sender import CommandResponse, MessageBuilder
-from commands.permission_manager import load_permissions, save_permissions
+from commands.permission_manager import load_permissions, update_permissions
 
 logger = get_logger("BanCommand")
 
@@ -36,26 +36,30 @@ async def handle_bancommand_command(context: BotContext, **kwargs) -> CommandRes
     
     command_name = args[1].lower().lstrip('/')
     
-    try:
-        # 加载群组权限配置
-        permissions = load_permissions(context, group_id)
-        
+    def apply_ban(permissions):
         # 确保blacklisted_commands字段存在
-        if 'blacklisted_commands' not in permissions:
-            permissions['blacklisted_commands'] = []
+        blacklisted = permissions.setdefault('blacklisted_commands', [])
+        if action == 'add':
+            if command_name in blacklisted:
+                return False
+            blacklisted.append(command_name)
+            return True
+        if command_name not in blacklisted:
+            return False
+        blacklisted.remove(command_name)
+        return True
+    
+    try:
+        # 在文件锁内读取、更新并原子写回群组权限配置，避免并发的管理命令互相覆盖
+        changed = await update_permissions(context, group_id, apply_ban)
         
-        # 添加或移除命令
         if action == 'add':
-            if command_name not in permissions['blacklisted_commands']:
-                permissions['blacklisted_commands'].append(command_name)
-                save_permissions(context, permissions, group_id)
+            if changed:
                 return CommandResponse.text(f"✅ 已将命令 '{command_name}' 添加到禁用列表")
             else:
                 return CommandResponse.text(f"⚠️ 命令 '{command_name}' 已经在禁用列表中")
         else:  # rm
-            if command_name in permissions['blacklisted_commands']:
-                permissions['blacklisted_commands'].remove(command_name)
-                save_permissions(context, permissions, group_id)
+            if changed:
                 return CommandResponse.text(f"✅ 已将命令 '{command_name}' 从禁用列表中移除")
             else:
                 return CommandResponse.text(f"⚠️ 命令 '{command_name}' 不在禁用列表中")
@@ -5,7 +5,10 @@ import asyncio
 import re
 import os
 import json
+import time
 from logger_config import get_logger
+from core.metrics import COMMAND_SECONDS
+from core.tracing import tracer
 from core.bot_context import BotContext
 from utils.user_utils import get_user_nickname
 from utils.message_sender import process_command_response, CommandResponse, MessageBuilder
@@ -19,6 +22,7 @@ async def execute_command(context: BotContext, message: str, user_id: str, group
         int: 0 表示消息处理流程正常完成，1 表示消息处理过程中出现错误
     """
     logger.debug(f"开始处理命令，消息: {message}，用户: {user_id}，群: {group_id}，昵称: {nickname}")
+    parse_started = time.perf_counter()
     
     # 获取账号ID（parallel模式下使用）
     account_id = kwargs.get('account_id')
@@ -85,11 +89,14 @@ async def execute_command(context: BotContext, message: str, user_id: str, group
         "usage": ""
     })
     
+    tracer.record('parse', parse_started, command=actual_command)
+    
     # 检查权限
     from commands.command_dispatcher.command_authorizer import check_permission
     perm_mapping = {"User": 0, "Admin": 1, "Root": 2}
     required_level = perm_mapping.get(cmd_config["permission"].capitalize(), 0)
-    user_level = await check_permission(context, user_id, group_id, sender_role or "member")
+    async with tracer.span('permission'):
+        user_level = await check_permission(context, user_id, group_id, sender_role or "member")
     
     if user_level < required_level:
         # 移除权限不足提示，不返回任何内容
@@ -97,6 +104,8 @@ async def execute_command(context: BotContext, message: str, user_id: str, group
     
     handler = COMMAND_HANDLERS.get(actual_command)
     if handler:
+        started = time.perf_counter()
+        status = 'error'
         try:
             handler_kwargs = {
                 'context': context,
@@ -122,22 +131,29 @@ async def execute_command(context: BotContext, message: str, user_id: str, group
             handler_kwargs['cmd_config'] = cmd_config
             
             # 调用命令处理函数，现在命令处理函数应该返回int值
-            result = await handler(**handler_kwargs)
+            async with tracer.span(f'command.{actual_command}'):
+                result = await handler(**handler_kwargs)
             
             # 如果命令返回None，表示它自己处理了消息发送，这是旧的处理方式
             if result is None:
+                status = 'ok'
                 return 0
             # 如果结果不是int类型，且不是None，则需要处理这个结果
             elif not isinstance(result, int):
-                await process_command_response(context, result, group_id, user_id)
+                async with tracer.span('send'):
+                    await process_command_response(context, result, group_id, user_id)
+                status = 'ok'
                 return 0
             # 如果结果是int类型，则直接返回这个结果
             else:
+                status = 'ok' if result == 0 else 'error'
                 return result
         except Exception as e:
             logger.error(f"处理命令 /{actual_command} 时发生异常", exc_info=True)
             # 移除异常提示，不返回任何内容
             return 1
+        finally:
+            COMMAND_SECONDS.labels(actual_command, status).observe(time.perf_counter() - started)
     
     # 尝试调用插件命令
     if hasattr(context, 'plugin_manager'):
@@ -162,7 +178,8 @@ async def execute_command(context: BotContext, message: str, user_id: str, group
                                 'args': args,
                                 **kwargs
                             }
-                            await handler(**handler_kwargs)
+                            async with tracer.span(f'plugin.{plugin_info.id}.{actual_command}'):
+                                await handler(**handler_kwargs)
                             return 0
         except Exception as e:
             logger.error(f"处理插件命令 /{actual_command} 时发生异常", exc_info=True)
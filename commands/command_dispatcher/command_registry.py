@@ -1,10 +1,9 @@
 # commands/command_dispatcher/command_registry.py
 # 负责命令注册和映射
 
-import os
-import json
 from logger_config import get_logger
 from core.bot_context import BotContext
+from core.json_store import json_store
 
 logger = get_logger("CommandRegistry")
 
@@ -73,15 +72,10 @@ async def _is_user_blacklisted(context: BotContext, group_id: str, user_id: str)
     # 获取群组配置文件路径
     group_config_path = f"data/group_config/{group_id}.json"
     
-    # 读取现有配置
-    group_config = {}
-    if os.path.exists(group_config_path):
-        try:
-            with open(group_config_path, 'r', encoding='utf-8') as f:
-                group_config = json.load(f)
-        except Exception as e:
-            logger.error(f"读取群组配置文件失败: {e}")
-            return False
+    # 读取现有配置（由json_store缓存，文件变化时自动失效）
+    group_config = json_store.get(group_config_path, default={})
+    if not isinstance(group_config, dict):
+        return False
     
     # 检查是否存在blacklist以及用户是否在其中
     if "blacklist" in group_config and user_id in group_config["blacklist"]:
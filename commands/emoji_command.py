@@ -4,6 +4,7 @@ from logger_config import get_logger
 from core.bot_context import BotContext
 from utils.api_utils import call_onebot_api
 from utils.message_sender import MessageBuilder, CommandResponse
+from utils.message_codec import reply_id
 from utils.task_utils import create_monitored_task
 from .permission_manager import check_permission
 import asyncio
@@ -26,12 +27,7 @@ async def handle_emoji_command(context: BotContext, args: list, user_id: str, gr
         raw_message = kwargs.get('raw_message', [])
         
         # 尝试从引用消息中获取消息 ID
-        message_id = None
-        if isinstance(raw_message, list):
-            for segment in raw_message:
-                if segment.get('type') == 'reply':
-                    message_id = segment.get('data', {}).get('id')
-                    break
+        message_id = reply_id(raw_message)
         
         # 如果没有引用消息，检查参数
         if not message_id:
@@ -6,6 +6,7 @@ from logger_config import get_logger
 from core.bot_context import BotContext
 from utils.api_utils import call_onebot_api
 from utils.message_sender import MessageBuilder, CommandResponse
+from utils.message_codec import reply_id
 
 logger = get_logger("EssenceCommand")
 
@@ -28,12 +29,7 @@ async def handle_essence_command(context: BotContext, args: list, user_id: str,
     raw_message = kwargs.get('raw_message', [])
     
     # 尝试从引用消息中获取消息ID
-    message_id = None
-    if isinstance(raw_message, list):
-        for segment in raw_message:
-            if segment.get('type') == 'reply':
-                message_id = segment.get('data', {}).get('id')
-                break
+    message_id = reply_id(raw_message)
     
     # 如果没有引用消息
     if not message_id:
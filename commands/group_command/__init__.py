@@ -17,7 +17,7 @@ async def handle_group_command(context, args, user_id, group_id, user_level, sen
         return CommandResponse.text("❌ 权限不足，需要管理员权限")
     
     if len(args) < 1:
-        return CommandResponse.text("用法: /group join set [level/answer] [값]\n或: /group join list\n或: /group join rm [编号]\n或: /group join welcome [消息内容]\n或: /group blacklist add/rm [QQ号或@用户]\n或: /group blacklist list")
+        return CommandResponse.text("用法: /group join set [level/age/answer] [값]\n或: /group join deny [level/age/keyword] [值]\n或: /group join list\n或: /group join rm [编号]\n或: /group join undeny [编号]\n或: /group join welcome [消息内容]\n或: /group blacklist add/rm [QQ号或@用户]\n或: /group blacklist list")
     
     subcommand = args[0].lower()
     
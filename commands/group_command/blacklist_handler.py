@@ -1,11 +1,10 @@
 # commands/group_command/blacklist_handler.py
 # 黑名单处理功能
 
-import json
-import os
-import re
 from utils.message_sender import CommandResponse
+from utils.message_codec import AT_PATTERN
 from logger_config import get_logger
+from core.json_store import json_store
 
 logger = get_logger("GroupCommandBlacklist")
 
@@ -40,14 +39,7 @@ async def list_blacklist(context, group_id):
     group_config_path = f"data/group_config/{group_id}.json"
     
     # 读取现有配置
-    group_config = {}
-    if os.path.exists(group_config_path):
-        try:
-            with open(group_config_path, 'r', encoding='utf-8') as f:
-                group_config = json.load(f)
-        except Exception as e:
-            logger.error(f"读取群组配置文件失败: {e}")
-            return CommandResponse.text("❌ 读取群组配置文件失败")
+    group_config = json_store.get(group_config_path, default={})
     
     # 检查是否存在blacklist
     if "blacklist" not in group_config or not group_config["blacklist"]:
@@ -71,38 +63,25 @@ async def add_to_blacklist(context, target_user, user_id, group_id):
     # 获取群组配置文件路径
     group_config_path = f"data/group_config/{group_id}.json"
     
-    # 读取现有配置
-    group_config = {}
-    if os.path.exists(group_config_path):
-        try:
-            with open(group_config_path, 'r', encoding='utf-8') as f:
-                group_config = json.load(f)
-        except Exception as e:
-            logger.error(f"读取群组配置文件失败: {e}")
-            return CommandResponse.text("❌ 读取群组配置文件失败")
-    
-    # 确保 blacklist 字段存在
-    if "blacklist" not in group_config:
-        group_config["blacklist"] = []
-    
-    # 检查用户是否已在黑名单中
-    if target_user_id in group_config["blacklist"]:
-        return CommandResponse.text(f"❌ 用户 {target_user_id} 已在黑名单中")
-    
-    # 添加到黑名单列表
-    group_config["blacklist"].append(target_user_id)
+    def add_user(group_config):
+        # 确保 blacklist 字段存在
+        blacklist = group_config.setdefault("blacklist", [])
+        # 检查用户是否已在黑名单中
+        if target_user_id in blacklist:
+            return False
+        blacklist.append(target_user_id)
+        return True
     
-    # 保存配置
+    # 在文件锁内读取、更新并原子写回配置
     try:
-        # 确保目录存在
-        os.makedirs(os.path.dirname(group_config_path), exist_ok=True)
-        
-        with open(group_config_path, 'w', encoding='utf-8') as f:
-            json.dump(group_config, f, ensure_ascii=False, indent=2)
+        added = await json_store.update(group_config_path, add_user, default={})
     except Exception as e:
         logger.error(f"保存群组配置文件失败: {e}")
         return CommandResponse.text("❌ 保存群组配置文件失败")
     
+    if not added:
+        return CommandResponse.text(f"❌ 用户 {target_user_id} 已在黑名单中")
+    
     return CommandResponse.text(f"✅ 已将用户 {target_user_id} 添加到黑名单")
 
 async def remove_from_blacklist(context, target_user, user_id, group_id):
@@ -115,45 +94,35 @@ async def remove_from_blacklist(context, target_user, user_id, group_id):
     # 获取群组配置文件路径
     group_config_path = f"data/group_config/{group_id}.json"
     
-    # 读取现有配置
-    group_config = {}
-    if os.path.exists(group_config_path):
-        try:
-            with open(group_config_path, 'r', encoding='utf-8') as f:
-                group_config = json.load(f)
-        except Exception as e:
-            logger.error(f"读取群组配置文件失败: {e}")
-            return CommandResponse.text("❌ 读取群组配置文件失败")
-    
-    # 检查是否存在blacklist
-    if "blacklist" not in group_config or not group_config["blacklist"]:
-        return CommandResponse.text("❌ 当前黑名单为空")
-    
-    # 检查用户是否在黑名单中
-    if target_user_id not in group_config["blacklist"]:
-        return CommandResponse.text(f"❌ 用户 {target_user_id} 不在黑名单中")
-    
-    # 从黑名单中移除
-    group_config["blacklist"].remove(target_user_id)
-    
-    # 保存配置
+    def remove_user(group_config):
+        blacklist = group_config.get("blacklist")
+        # 检查是否存在blacklist
+        if not blacklist:
+            return "empty"
+        # 检查用户是否在黑名单中
+        if target_user_id not in blacklist:
+            return "not_found"
+        blacklist.remove(target_user_id)
+        return "removed"
+    
+    # 在文件锁内读取、更新并原子写回配置
     try:
-        # 确保目录存在
-        os.makedirs(os.path.dirname(group_config_path), exist_ok=True)
-        
-        with open(group_config_path, 'w', encoding='utf-8') as f:
-            json.dump(group_config, f, ensure_ascii=False, indent=2)
+        result = await json_store.update(group_config_path, remove_user, default={})
     except Exception as e:
         logger.error(f"保存群组配置文件失败: {e}")
         return CommandResponse.text("❌ 保存群组配置文件失败")
     
+    if result == "empty":
+        return CommandResponse.text("❌ 当前黑名单为空")
+    if result == "not_found":
+        return CommandResponse.text(f"❌ 用户 {target_user_id} 不在黑名单中")
+    
     return CommandResponse.text(f"✅ 已将用户 {target_user_id} 从黑名单中移除")
 
 def _parse_user_id(user_input):
     """解析用户输入，提取QQ号"""
     # 处理@用户格式
-    at_pattern = r'\[CQ:at,qq=(\d+)\]'
-    match = re.search(at_pattern, user_input)
+    match = AT_PATTERN.search(user_input)
     if match:
         return match.group(1)
     
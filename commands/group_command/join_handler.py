@@ -1,14 +1,17 @@
 # commands/group_command/join_handler.py
 # 加群处理功能
 
-import json
-import os
 from core.trust_manager import trust_manager
+from core.json_store import json_store
 from utils.message_sender import CommandResponse
 from logger_config import get_logger
 
 logger = get_logger("GroupCommandJoin")
 
+# 审批/拒绝条件类型的显示名称
+APPROVAL_TYPE_NAMES = {"level": "等级", "age": "年龄", "answer": "关键词"}
+REJECTION_TYPE_NAMES = {"level": "等级低于", "age": "年龄低于", "keyword": "验证信息包含"}
+
 # 全局变量：未信任群组的统一提示信息
 UNTRUSTED_GROUP_MESSAGE = "当前群未被信任，无法使用该功能。请联系ROOT用户了解如何信任本群。Root用户QQ：2711631445"
 
@@ -20,7 +23,7 @@ async def handle_join_command(context, args, user_id, group_id, user_level, send
         return CommandResponse.text("❌ 权限不足，需要管理员权限")
     
     if len(args) < 1:
-        return CommandResponse.text("用法: /group join set [level/answer] [值]\n或: /group join list\n或: /group join rm [编号]\n或: /group join welcome [消息内容]")
+        return CommandResponse.text("用法: /group join set [level/age/answer] [值]\n或: /group join deny [level/age/keyword] [值]\n或: /group join list\n或: /group join rm [编号]\n或: /group join undeny [编号]\n或: /group join welcome [消息内容]")
     
     event_action = args[0].lower()
     
@@ -28,18 +31,26 @@ async def handle_join_command(context, args, user_id, group_id, user_level, send
         return await list_event_approvals(context, group_id)
     elif event_action == "set":
         if len(args) < 3:
-            return CommandResponse.text("用法: /group join set [level/answer] [值]")
+            return CommandResponse.text("用法: /group join set [level/age/answer] [值]")
         return await set_event_approval(context, args[1:], user_id, group_id)
+    elif event_action == "deny":
+        if len(args) < 3:
+            return CommandResponse.text("用法: /group join deny [level/age/keyword] [值]")
+        return await set_event_rejection(context, args[1:], group_id)
     elif event_action == "rm":
         if len(args) < 2:
             return CommandResponse.text("用法: /group join rm [编号]")
         return await remove_event_approval(context, args[1], user_id, group_id)
+    elif event_action == "undeny":
+        if len(args) < 2:
+            return CommandResponse.text("用法: /group join undeny [编号]")
+        return await remove_event_rejection(context, args[1], group_id)
     elif event_action == "welcome":
         if len(args) < 2:
             return CommandResponse.text("用法: /group join welcome [消息内容]")
         return await set_welcome_message(context, args[1:], group_id)
     else:
-        return CommandResponse.text("❌ 无效的操作，支持的操作: set, list, rm, welcome")
+        return CommandResponse.text("❌ 无效的操作，支持的操作: set, deny, list, rm, undeny, welcome")
 
 async def list_event_approvals(context, group_id):
     """列出所有事件审批条件"""
@@ -47,27 +58,26 @@ async def list_event_approvals(context, group_id):
     group_config_path = f"data/group_config/{group_id}.json"
     
     # 读取现有配置
-    group_config = {}
-    if os.path.exists(group_config_path):
-        try:
-            with open(group_config_path, 'r', encoding='utf-8') as f:
-                group_config = json.load(f)
-        except Exception as e:
-            logger.error(f"读取群组配置文件失败: {e}")
-            return CommandResponse.text("❌ 读取群组配置文件失败")
-    
-    # 检查是否存在event_approvals
-    if "event_approvals" not in group_config or not group_config["event_approvals"]:
+    group_config = json_store.get(group_config_path, default={})
+    
+    # 检查是否存在event_approvals或event_rejections
+    approvals = group_config.get("event_approvals") or []
+    rejections = group_config.get("event_rejections") or []
+    if not approvals and not rejections:
         return CommandResponse.text("📋 当前没有设置任何事件审批条件")
     
     # 构建审批条件列表
-    approvals = group_config["event_approvals"]
     approval_list = ["📋 事件审批条件列表:"]
     for i, approval in enumerate(approvals):
-        if approval["type"] == "level":
-            approval_list.append(f"{i+1}. 等级条件: {approval['value']}")
-        elif approval["type"] == "answer":
-            approval_list.append(f"{i+1}. 关键词条件: {approval['value']}")
+        type_text = APPROVAL_TYPE_NAMES.get(approval["type"])
+        if type_text:
+            approval_list.append(f"{i+1}. {type_text}条件: {approval['value']}")
+    
+    # 构建拒绝条件列表
+    if rejections:
+        approval_list.append("\n🚫 自动拒绝条件列表:")
+        for i, rejection in enumerate(rejections):
+            approval_list.append(f"{i+1}. {REJECTION_TYPE_NAMES.get(rejection['type'], rejection['type'])}: {rejection['value']}")
     
     # 显示欢迎消息
     if "welcome_message" in group_config:
@@ -82,55 +92,106 @@ async def set_event_approval(context, args, user_id, group_id):
     event_type = args[0].lower()
     value = args[1]
     
-    if event_type not in ["level", "answer"]:
-        return CommandResponse.text("❌ 无效的类型，仅支持 level 或 answer")
+    if event_type not in APPROVAL_TYPE_NAMES:
+        return CommandResponse.text("❌ 无效的类型，仅支持 level、age 或 answer")
+    if event_type in ("level", "age") and not value.isdigit():
+        return CommandResponse.text("❌ 等级和年龄必须是数字")
     
     # 获取群组配置文件路径
     group_config_path = f"data/group_config/{group_id}.json"
     
-    # 读取现有配置
-    group_config = {}
-    if os.path.exists(group_config_path):
-        try:
-            with open(group_config_path, 'r', encoding='utf-8') as f:
-                group_config = json.load(f)
-        except Exception as e:
-            logger.error(f"读取群组配置文件失败: {e}")
-            return CommandResponse.text("❌ 读取群组配置文件失败")
-    
-    # 确保 event_approvals 字段存在
-    if "event_approvals" not in group_config:
-        group_config["event_approvals"] = []
-    
-    # 对于level类型，检查是否已存在相同类型的条件
-    if event_type == "level":
-        for approval in group_config["event_approvals"]:
-            if approval["type"] == "level":
-                return CommandResponse.text("❌ 已存在等级条件，每种类型只能设置一个")
-    
     # 创建新的审批条件
     new_approval = {
         "type": event_type,
         "value": value
     }
     
-    # 添加到审批条件列表
-    group_config["event_approvals"].append(new_approval)
-    
-    # 保存配置
+    def add_approval(group_config):
+        # 确保 event_approvals 字段存在
+        approvals = group_config.setdefault("event_approvals", [])
+        # 对于level/age类型，检查是否已存在相同类型的条件
+        if event_type in ("level", "age"):
+            for approval in approvals:
+                if approval["type"] == event_type:
+                    return False
+        # 添加到审批条件列表
+        approvals.append(new_approval)
+        return True
+    
+    # 在文件锁内读取、更新并原子写回配置
     try:
-        # 确保目录存在
-        os.makedirs(os.path.dirname(group_config_path), exist_ok=True)
-        
-        with open(group_config_path, 'w', encoding='utf-8') as f:
-            json.dump(group_config, f, ensure_ascii=False, indent=2)
+        added = await json_store.update(group_config_path, add_approval, default={})
     except Exception as e:
         logger.error(f"保存群组配置文件失败: {e}")
         return CommandResponse.text("❌ 保存群组配置文件失败")
     
-    type_text = "等级" if event_type == "level" else "关键词"
+    type_text = APPROVAL_TYPE_NAMES[event_type]
+    if not added:
+        return CommandResponse.text(f"❌ 已存在{type_text}条件，每种类型只能设置一个")
+    
     return CommandResponse.text(f"✅ 已添加自动审批条件: 当{type_text}为 '{value}' 时自动通过")
 
+async def set_event_rejection(context, args, group_id):
+    """设置自动拒绝条件"""
+    event_type = args[0].lower()
+    value = " ".join(args[1:])
+    
+    if event_type not in REJECTION_TYPE_NAMES:
+        return CommandResponse.text("❌ 无效的类型，仅支持 level、age 或 keyword")
+    if event_type in ("level", "age") and not value.isdigit():
+        return CommandResponse.text("❌ 等级和年龄必须是数字")
+    
+    # 获取群组配置文件路径
+    group_config_path = f"data/group_config/{group_id}.json"
+    
+    def add_rejection(group_config):
+        rejections = group_config.setdefault("event_rejections", [])
+        # level/age类型只保留一个，新值覆盖旧值
+        if event_type in ("level", "age"):
+            rejections[:] = [rejection for rejection in rejections if rejection["type"] != event_type]
+        rejections.append({"type": event_type, "value": value})
+    
+    # 在文件锁内读取、更新并原子写回配置
+    try:
+        await json_store.update(group_config_path, add_rejection, default={})
+    except Exception as e:
+        logger.error(f"保存群组配置文件失败: {e}")
+        return CommandResponse.text("❌ 保存群组配置文件失败")
+    
+    return CommandResponse.text(f"✅ 已添加自动拒绝条件: {REJECTION_TYPE_NAMES[event_type]} '{value}' 时自动拒绝")
+
+async def remove_event_rejection(context, index_str, group_id):
+    """删除自动拒绝条件"""
+    try:
+        index = int(index_str) - 1  # 转换为0基索引
+    except ValueError:
+        return CommandResponse.text("❌ 编号必须是数字")
+    
+    # 获取群组配置文件路径
+    group_config_path = f"data/group_config/{group_id}.json"
+    
+    def remove_rejection(group_config):
+        rejections = group_config.get("event_rejections")
+        if not rejections:
+            return "empty"
+        if index < 0 or index >= len(rejections):
+            return "out_of_range"
+        return rejections.pop(index)
+    
+    # 在文件锁内读取、更新并原子写回配置
+    try:
+        removed = await json_store.update(group_config_path, remove_rejection, default={})
+    except Exception as e:
+        logger.error(f"保存群组配置文件失败: {e}")
+        return CommandResponse.text("❌ 保存群组配置文件失败")
+    
+    if removed == "empty":
+        return CommandResponse.text("❌ 当前没有设置任何自动拒绝条件")
+    if removed == "out_of_range":
+        return CommandResponse.text("❌ 编号超出范围")
+    
+    return CommandResponse.text(f"✅ 已删除自动拒绝条件: {REJECTION_TYPE_NAMES.get(removed['type'], removed['type'])} {removed['value']}")
+
 async def set_welcome_message(context, args, group_id):
     """设置欢迎消息"""
     # 重写的信任检查逻辑 - 确保group_id为字符串类型
@@ -151,26 +212,12 @@ async def set_welcome_message(context, args, group_id):
     # 获取群组配置文件路径
     group_config_path = f"data/group_config/{group_id}.json"
     
-    # 读取现有配置
-    group_config = {}
-    if os.path.exists(group_config_path):
-        try:
-            with open(group_config_path, 'r', encoding='utf-8') as f:
-                group_config = json.load(f)
-        except Exception as e:
-            logger.error(f"读取群组配置文件失败: {e}")
-            return CommandResponse.text("❌ 读取群组配置文件失败")
-    
-    # 设置欢迎消息
-    group_config["welcome_message"] = welcome_message
-    
-    # 保存配置
+    def set_welcome(group_config):
+        group_config["welcome_message"] = welcome_message
+    
+    # 在文件锁内读取、更新并原子写回配置
     try:
-        # 确保目录存在
-        os.makedirs(os.path.dirname(group_config_path), exist_ok=True)
-        
-        with open(group_config_path, 'w', encoding='utf-8') as f:
-            json.dump(group_config, f, ensure_ascii=False, indent=2)
+        await json_store.update(group_config_path, set_welcome, default={})
     except Exception as e:
         logger.error(f"保存群组配置文件失败: {e}")
         return CommandResponse.text("❌ 保存群组配置文件失败")
@@ -187,38 +234,28 @@ async def remove_event_approval(context, index_str, user_id, group_id):
     # 获取群组配置文件路径
     group_config_path = f"data/group_config/{group_id}.json"
     
-    # 读取现有配置
-    group_config = {}
-    if os.path.exists(group_config_path):
-        try:
-            with open(group_config_path, 'r', encoding='utf-8') as f:
-                group_config = json.load(f)
-        except Exception as e:
-            logger.error(f"读取群组配置文件失败: {e}")
-            return CommandResponse.text("❌ 读取群组配置文件失败")
-    
-    # 检查是否存在event_approvals
-    if "event_approvals" not in group_config or not group_config["event_approvals"]:
-        return CommandResponse.text("❌ 当前没有设置任何事件审批条件")
-    
-    # 检查索引是否有效
-    approvals = group_config["event_approvals"]
-    if index < 0 or index >= len(approvals):
-        return CommandResponse.text("❌ 编号超出范围")
-    
-    # 删除指定的审批条件
-    removed_approval = approvals.pop(index)
-    
-    # 保存配置
+    def remove_approval(group_config):
+        approvals = group_config.get("event_approvals")
+        # 检查是否存在event_approvals
+        if not approvals:
+            return "empty"
+        # 检查索引是否有效
+        if index < 0 or index >= len(approvals):
+            return "out_of_range"
+        # 删除指定的审批条件
+        return approvals.pop(index)
+    
+    # 在文件锁内读取、更新并原子写回配置
     try:
-        # 确保目录存在
-        os.makedirs(os.path.dirname(group_config_path), exist_ok=True)
-        
-        with open(group_config_path, 'w', encoding='utf-8') as f:
-            json.dump(group_config, f, ensure_ascii=False, indent=2)
+        removed_approval = await json_store.update(group_config_path, remove_approval, default={})
     except Exception as e:
         logger.error(f"保存群组配置文件失败: {e}")
         return CommandResponse.text("❌ 保存群组配置文件失败")
     
-    type_text = "等级" if removed_approval["type"] == "level" else "关键词"
+    if removed_approval == "empty":
+        return CommandResponse.text("❌ 当前没有设置任何事件审批条件")
+    if removed_approval == "out_of_range":
+        return CommandResponse.text("❌ 编号超出范围")
+    
+    type_text = APPROVAL_TYPE_NAMES.get(removed_approval["type"], "关键词")
     return CommandResponse.text(f"✅ 已删除{type_text}条件: {removed_approval['value']}")
\ No newline at end of file
@@ -5,7 +5,7 @@ from core.bot_context import BotContext
 from utils.message_sender import CommandResponse, MessageBuilder
 from utils.api_utils import call_onebot_api
 from utils.task_utils import create_monitored_task
-import asyncio
+from core.shutdown import shutdown_manager
 
 logger = get_logger("MutemeCommand")
 
@@ -43,9 +43,9 @@ async def handle_muteme_command(context: BotContext, **kwargs) -> CommandRespons
             builder.add_text(" 已为您禁言11天4小时5分钟捏")
             await builder.send()
 
-            # 创建一个后台任务，在10秒后自动解禁
+            # 创建一个后台任务，在10秒后自动解禁；禁言时长远超10秒且没有其他记录，退出时不能取消，改为立即解禁
             async def auto_unmute_task():
-                await asyncio.sleep(10)
+                await shutdown_manager.sleep(10)
                 try:
                     unmute_result = await call_onebot_api(
                         context, 'set_group_ban',
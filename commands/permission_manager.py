@@ -1,66 +1,64 @@
 # commands/permission_manager.py
 # 重构后的权限管理模块
 
-import json
-import os
+import asyncio
+import copy
+from typing import Any, Callable
 from logger_config import get_logger, log_exception
 from core.bot_context import BotContext
+from core.json_store import json_store
+from utils.task_utils import create_monitored_task
 
 logger = get_logger("PermissionManager")
 
-# 权限配置缓存，格式：{group_id: (permissions_dict, last_modified_time)}
-_permission_cache = {}
+# 正在后台创建默认配置的权限文件
+_creating_defaults: set = set()
 
-# 缓存过期时间（秒）
-_CACHE_EXPIRY = 300
+def _permission_file(group_id) -> str:
+    return f"data/group_config/{group_id}.json"
 
-def load_permissions(context: BotContext, group_id: str) -> dict:
-    """加载指定群组的权限配置，带缓存机制"""
-    group_id_str = str(group_id)
-    permission_file = f"data/group_config/{group_id_str}.json"
-    
-    # 检查缓存是否存在且未过期
-    current_time = os.path.getmtime(permission_file) if os.path.exists(permission_file) else 0
-    if group_id_str in _permission_cache:
-        cached_perms, cached_mtime = _permission_cache[group_id_str]
-        if cached_mtime == current_time:
-            logger.debug(f"从缓存加载群组 {group_id} 的权限配置")
-            return cached_perms
-    
-    logger.debug(f"从文件加载群组 {group_id} 的权限配置: {permission_file}")
-    
+def _default_permissions(context: BotContext) -> dict:
+    return {"Root": [context.get_config_value("Root_user")], "Admin": []}
+
+def _get_permissions(context: BotContext, group_id: str) -> dict:
+    """返回缓存中的群组配置（共享对象，只读），文件不存在时返回默认配置并在后台创建文件"""
+    permission_file = _permission_file(str(group_id))
+    data = json_store.get(permission_file)
+    if not isinstance(data, dict):
+        data = _default_permissions(context)
+        if permission_file not in _creating_defaults:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return data
+            logger.warning(f"权限文件 {permission_file} 不存在或无效，将创建默认文件")
+            _creating_defaults.add(permission_file)
+            create_monitored_task(_create_default_permissions(permission_file, data),
+                                  name=f"create_permissions_{group_id}")
+    return data
+
+async def _create_default_permissions(permission_file: str, default: dict):
+    """通过 json_store.update 写入默认配置（文件锁内进行，期间其他命令的修改不会被覆盖）"""
     try:
-        with open(permission_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            logger.debug(f"已从 {permission_file} 加载权限数据")
-            # 更新缓存
-            _permission_cache[group_id_str] = (data, current_time)
-            return data
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        logger.warning(f"权限文件 {permission_file} 异常 ({type(e).__name__})，将创建默认文件")
-        default = {"Root": [context.get_config_value("Root_user")], "Admin": []}
-        save_permissions(context, default, group_id)
-        # 更新缓存
-        _permission_cache[group_id_str] = (default, current_time)
-        return default
+        # 丢弃缓存中的无效内容，按 default 重新加载
+        json_store.invalidate(permission_file)
+        await json_store.update(permission_file, lambda data: None, default=default, indent=4)
+        logger.info(f"已创建默认权限文件: {permission_file}")
+    except (IOError, OSError) as e:
+        log_exception(logger, f"创建权限文件 {permission_file} 失败", e)
+    finally:
+        _creating_defaults.discard(permission_file)
 
-def save_permissions(context: BotContext, data: dict, group_id: str):
-    """保存指定群组的权限配置，并更新缓存"""
-    group_id_str = str(group_id)
-    permission_file = f"data/group_config/{group_id_str}.json"
-    logger.debug(f"为群组 {group_id} 使用默认权限文件用于保存: {permission_file}")
+def load_permissions(context: BotContext, group_id: str) -> dict:
+    """加载指定群组的权限配置（返回副本，缓存由json_store维护）"""
+    return copy.deepcopy(_get_permissions(context, group_id))
 
+async def update_permissions(context: BotContext, group_id: str, mutator: Callable[[dict], Any]) -> Any:
+    """在文件锁内修改指定群组的权限配置并原子写回，返回 mutator 的返回值"""
+    permission_file = _permission_file(group_id)
     try:
-        directory = os.path.dirname(permission_file)
-        os.makedirs(directory, exist_ok=True)
-        with open(permission_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        logger.info(f"权限文件已成功保存至: {permission_file}")
-        
-        # 更新缓存
-        current_time = os.path.getmtime(permission_file)
-        _permission_cache[group_id_str] = (data, current_time)
-    except IOError as e:
+        return await json_store.update(permission_file, mutator, default=_default_permissions(context), indent=4)
+    except (IOError, OSError) as e:
         log_exception(logger, f"保存权限文件 {permission_file} 失败", e)
         raise
 
@@ -75,7 +73,7 @@ def check_permission(context: BotContext, user_id: str, group_id: str, sender_ro
         return 1
     
     # 检查配置文件中的权限设置
-    permissions = load_permissions(context, group_id)
+    permissions = _get_permissions(context, group_id)
     if str(user_id) in permissions.get('Root', []):
         return 2
     if str(user_id) in permissions.get('Admin', []):
@@ -85,10 +83,8 @@ def check_permission(context: BotContext, user_id: str, group_id: str, sender_ro
 def clear_permission_cache(group_id: str = None):
     """清除权限缓存，可以指定群组ID"""
     if group_id:
-        group_id_str = str(group_id)
-        if group_id_str in _permission_cache:
-            del _permission_cache[group_id_str]
-            logger.debug(f"已清除群组 {group_id} 的权限缓存")
+        json_store.invalidate(_permission_file(group_id))
+        logger.debug(f"已清除群组 {group_id} 的权限缓存")
     else:
-        _permission_cache.clear()
+        json_store.invalidate()
         logger.debug("已清除所有权限缓存")
\ No newline at end of file
@@ -19,19 +19,17 @@ async def handle_pms_command(context: BotContext, args: list, user_id: str, grou
     if action not in ["add", "remove", "list"]:
         return "❌ 无效操作，支持 add/remove/list"
     
-    from commands.permission_manager import load_permissions, save_permissions
-    permissions = load_permissions(context, group_id)
+    from commands.permission_manager import load_permissions, update_permissions
     
     if action == "list":
-        if not permissions['Admin']:
+        permissions = load_permissions(context, group_id)
+        if not permissions.get('Admin'):
             return "ℹ️ 当前没有设置管理员"
         
-        # 获取用户昵称
-        admin_list = []
-        for admin_id in permissions['Admin']:
-            from utils.user_utils import get_user_nickname
-            nickname = await get_user_nickname(context, admin_id, account_id=account_id)
-            admin_list.append(f"{nickname}({admin_id})" if nickname else admin_id)
+        # 批量获取用户昵称（经资料缓存，并发请求数受 batch_concurrency 限制）
+        from utils.user_utils import get_user_nicknames
+        nicknames = await get_user_nicknames(context, permissions['Admin'], account_id=account_id)
+        admin_list = [f"{nicknames[str(admin_id)]}({admin_id})" for admin_id in permissions['Admin']]
         
         return f"🔑 当前管理员列表:\n" + "\n".join([f"  {i+1}. {admin}" for i, admin in enumerate(admin_list)])
     
@@ -43,18 +41,27 @@ async def handle_pms_command(context: BotContext, args: list, user_id: str, grou
     if not target:
         target = args[1]
 
+    # 在文件锁内读取、更新并原子写回，避免并发的管理命令互相覆盖
     if action == "add":
-        if target in permissions['Admin']:
+        def add_admin(permissions):
+            admins = permissions.setdefault('Admin', [])
+            if target in admins:
+                return False
+            admins.append(target)
+            return True
+        if not await update_permissions(context, group_id, add_admin):
             return "⚠️ 该用户已是管理员"
-        permissions['Admin'].append(target)
-        save_permissions(context, permissions, group_id)
         return f"✅ 已添加管理员: {target}"
 
     elif action == "remove":
-        if target not in permissions['Admin']:
+        def remove_admin(permissions):
+            admins = permissions.setdefault('Admin', [])
+            if target not in admins:
+                return False
+            admins.remove(target)
+            return True
+        if not await update_permissions(context, group_id, remove_admin):
             return "⚠️ 该用户不是管理员"
-        permissions['Admin'].remove(target)
-        save_permissions(context, permissions, group_id)
         return f"✅ 已移除管理员: {target}"
 
     else:
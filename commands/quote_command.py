@@ -9,7 +9,9 @@ from logger_config import get_logger
 from core.bot_context import BotContext
 from utils.api_utils import call_onebot_api
 from utils.message_sender import MessageBuilder
+from utils.message_codec import reply_id
 from utils.task_utils import create_monitored_task
+from core.message_store import fetch_message
 # 添加敏感词检测导入
 from core.sensitive_word_manager import is_sensitive
 # 添加信任管理器导入
@@ -153,12 +155,7 @@ async def handle_quote_internal(context: BotContext, user_id: str, group_id: str
         await builder.send()
         return True
 
-    replied_message_id = None
-    if isinstance(raw_message, list):
-        for segment in raw_message:
-            if segment.get('type') == 'reply':
-                replied_message_id = segment.get('data', {}).get('id')
-                break
+    replied_message_id = reply_id(raw_message)
 
     if not replied_message_id:
         builder = MessageBuilder(context)
@@ -169,44 +166,24 @@ async def handle_quote_internal(context: BotContext, user_id: str, group_id: str
         await builder.send()
         return True
 
-    msg_data = await call_onebot_api(
-        context, 'get_msg',
-        {'message_id': replied_message_id},
-        account_id=account_id
-    )
-    if not msg_data or not msg_data.get("success"):
-        # 无法获取消息，直接返回错误信息
-        error_msg = msg_data.get("error", "未知错误") if msg_data else "API调用失败"
+    # 优先从本地消息历史获取被引用的消息，未命中时才调用get_msg
+    actual_msg_data = await fetch_message(context, replied_message_id, account_id=account_id)
+    if not actual_msg_data:
         builder = MessageBuilder(context)
         builder.set_group_id(group_id)
         builder.set_user_id(user_id)
         builder.add_at()
-        builder.add_text(f" ❌ 无法获取被引用的消息内容: {error_msg}")
+        builder.add_text(" ❌ 无法获取被引用的消息内容")
         await builder.send()
         return True
 
-    # 根据反撤回功能的解析方式，正确处理onebot API响应的嵌套数据结构
-    if msg_data and msg_data.get("success") and msg_data["data"].get('status') == 'ok':
-        # 获取实际的消息数据（三层嵌套结构）
-        actual_msg_data = msg_data["data"]['data']
-        
-        # 确保获取到完整的消息内容
-        msg_content = actual_msg_data.get('message', [])
-        msg_sender = str(actual_msg_data.get('sender', {}).get('user_id', ''))
-        msg_sender_nickname = actual_msg_data.get('sender', {}).get('card', '') or actual_msg_data.get('sender', {}).get('nickname', '未知用户')
+    # 确保获取到完整的消息内容
+    msg_content = actual_msg_data.get('message', [])
+    msg_sender = str(actual_msg_data.get('sender', {}).get('user_id', ''))
+    msg_sender_nickname = actual_msg_data.get('sender', {}).get('card', '') or actual_msg_data.get('sender', {}).get('nickname', '未知用户')
 
-        # 深度日志记录，帮助调试
-        logger.debug(f"获取到的被引用消息数据: {json.dumps(actual_msg_data, ensure_ascii=False)}")
-    else:
-        # 如果数据结构不符合预期，输出错误并返回
-        logger.error(f"API返回的数据结构不符合预期: {json.dumps(msg_data, ensure_ascii=False)}")
-        builder = MessageBuilder(context)
-        builder.set_group_id(group_id)
-        builder.set_user_id(user_id)
-        builder.add_at()
-        builder.add_text(" ❌ 处理被引用消息失败：数据结构异常")
-        await builder.send()
-        return True
+    # 深度日志记录，帮助调试
+    logger.debug(f"获取到的被引用消息数据: {json.dumps(actual_msg_data, ensure_ascii=False)}")
 
     if isinstance(msg_content, list):
         # 检查是否包含图片
@@ -5,6 +5,7 @@ import random
 from logger_config import get_logger
 from core.bot_context import BotContext
 from utils.api_utils import call_onebot_api
+from core.profile_cache import profile_cache
 from commands.permission_manager import check_permission
 
 logger = get_logger("RandomCommand")
@@ -34,22 +35,14 @@ async def _handle_random_mute(context: BotContext, user_id: str, group_id: str)
     root_user = str(context.get_config_value("Root_user", ""))
     
     try:
-        response = await call_onebot_api(context, "get_group_member_list", {"group_id": int(group_id)})
+        # 成员列表经资料缓存获取，大群频繁拉取完整列表既慢又容易触发风控
+        members = await profile_cache.get_member_list(context, group_id)
         
-        if not response or not response.get('success'):
-            error_msg = response.get('error', '未知错误') if response else '无响应'
-            logger.error(f"获取群成员列表失败，群: {group_id}，原因: {error_msg}")
-            return f"🛑 获取群成员列表失败: {error_msg}"
+        if members is None:
+            logger.error(f"获取群成员列表失败，群: {group_id}")
+            return "🛑 获取群成员列表失败"
         
-        api_data = response.get('data', {})
-        logger.info(f"收到群成员列表，群: {group_id}，API响应: {api_data}")
-        
-        members = api_data.get('data', [])
-        logger.info(f"提取成员列表，群: {group_id}，成员数: {len(members) if isinstance(members, list) else 'N/A'}，数据类型: {type(members)}")
-        
-        if not isinstance(members, list):
-            logger.error(f"群成员数据格式错误，群: {group_id}，数据类型: {type(members)}")
-            return f"🛑 群成员数据格式错误"
+        logger.info(f"获取到群成员列表，群: {group_id}，成员数: {len(members)}")
         
         if not members:
             return "❌ 群成员列表为空"
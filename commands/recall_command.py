@@ -8,6 +8,8 @@ from logger_config import get_logger
 from core.bot_context import BotContext
 from utils.api_utils import call_onebot_api
 from utils.message_sender import MessageBuilder
+from utils.message_codec import reply_id
+from core.message_store import fetch_message
 
 logger = get_logger("RecallCommand")
 
@@ -43,12 +45,7 @@ async def handle_recall(context: BotContext, args: list, user_id: str, group_id:
     if not features_config.get("enabled", False):
         return None
 
-    replied_message_id = None
-    if isinstance(raw_message, list):
-        for segment in raw_message:
-            if segment.get('type') == 'reply':
-                replied_message_id = segment.get('data', {}).get('id')
-                break
+    replied_message_id = reply_id(raw_message)
 
     if not replied_message_id:
         return None
@@ -68,11 +65,9 @@ async def handle_recall(context: BotContext, args: list, user_id: str, group_id:
         await builder.send()
         return None
 
-    msg_data = await call_onebot_api(
-        context, 'get_msg', 
-        {'message_id': replied_message_id}
-    )
-    if not msg_data or not msg_data.get("success") or msg_data["data"].get('status') != 'ok':
+    # 优先从本地消息历史获取被引用的消息，未命中时才调用get_msg
+    msg_detail = await fetch_message(context, replied_message_id, account_id=kwargs.get('account_id'))
+    if not msg_detail:
         builder = MessageBuilder(context)
         builder.set_group_id(group_id)
         builder.set_user_id(user_id)
@@ -81,7 +76,7 @@ async def handle_recall(context: BotContext, args: list, user_id: str, group_id:
         await builder.send()
         return None
 
-    msg_time = msg_data["data"]['data'].get('time', 0)
+    msg_time = msg_detail.get('time', 0)
     current_time = int(time.time())
     time_limit = features_config.get("time_limit", 0) # 默认值也设为0，确保完全移除时间限制
     if time_limit > 0 and (current_time - msg_time > time_limit):
@@ -93,7 +88,7 @@ async def handle_recall(context: BotContext, args: list, user_id: str, group_id:
         await builder.send()
         return None
 
-    msg_sender = str(msg_data["data"]['data'].get('sender', {}).get('user_id', ''))
+    msg_sender = str(msg_detail.get('sender', {}).get('user_id', ''))
     if msg_sender != str(user_id):
         # 只有Admin和Root权限的用户可以撤回任何消息
         # 对于普通用户，仍然限制只能撤回自己的消息
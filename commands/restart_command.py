@@ -1,13 +1,12 @@
 # commands/restart_command.py
 # 处理 /restart 命令
 
-import os
 import sys
-import time
 import asyncio
 from logger_config import get_logger
 from core.bot_context import BotContext
 from utils.message_sender.message_builder import MessageBuilder
+from core.shutdown import shutdown_manager
 
 logger = get_logger("RestartCommand")
 
@@ -38,14 +37,8 @@ async def handle_restart_command(context: BotContext, args: list, user_id: str,
         builder.add_text("🔄 机器人正在重启...")
         await builder.send()
         
-        # 设置重启标志
-        restart_flag = os.path.join(os.path.dirname(__file__), '..', '.restart_flag')
-        with open(restart_flag, 'w') as f:
-            f.write(str(time.time()))
-        
-        # 快速触发重启，不等待正常清理
-        import bot
-        bot._fast_exit = True
+        # 请求重启：停止接收新事件，排空处理中的任务并写盘后再由start.py重启
+        shutdown_manager.request(restart=True, reason=f"用户 {user_id} 执行重启命令")
         
         # 返回0表示消息处理成功
         return 0
@@ -1,9 +1,8 @@
 # commands/softmute_command.py
 # 处理 /softmute mute/unmute 命令 - 软禁言功能
 
-import json
-import os
 from logger_config import get_logger
+from core.json_store import json_store
 from core.bot_context import BotContext
 from utils.message_utils import parse_at_or_qq
 
@@ -14,32 +13,13 @@ def get_softmute_file_path(group_id: str) -> str:
     return f"data/softmute/{group_id}.json"
 
 def load_softmute_data(group_id: str) -> dict:
-    """加载软禁言数据"""
-    softmute_file = get_softmute_file_path(group_id)
-    try:
-        if os.path.exists(softmute_file):
-            with open(softmute_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception as e:
-        logger.error(f"加载软禁言数据失败: {e}")
-    return {"muted_users": {}}
-
-def save_softmute_data(group_id: str, data: dict):
-    """保存软禁言数据"""
-    softmute_file = get_softmute_file_path(group_id)
-    try:
-        directory = os.path.dirname(softmute_file)
-        os.makedirs(directory, exist_ok=True)
-        with open(softmute_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        logger.info(f"软禁言数据已保存至: {softmute_file}")
-    except Exception as e:
-        logger.error(f"保存软禁言数据失败: {e}")
-        raise
+    """加载软禁言数据（返回副本，可自由修改）"""
+    return json_store.load(get_softmute_file_path(group_id), default={"muted_users": {}})
 
 def is_user_softmuted(group_id: str, user_id: str) -> bool:
     """检查用户是否被软禁言"""
-    data = load_softmute_data(group_id)
+    # 每条群消息都会调用，直接读取缓存，不复制
+    data = json_store.get(get_softmute_file_path(group_id), default={"muted_users": {}})
     return str(user_id) in data.get("muted_users", {})
 
 async def handle_softmute_command(context: BotContext, args: list, user_id: str, group_id: str, command: str, sender_role: str = None, **kwargs) -> str:
@@ -87,31 +67,35 @@ async def handle_softmute_command(context: BotContext, args: list, user_id: str,
     if target_user_id == str(context.get_config_value("Root_user", "")):
         return "⚠️ 你不能软禁言Root用户"
     
-    data = load_softmute_data(group_id)
-    muted_users = data.get("muted_users", {})
+    target_key = str(target_user_id)
+    
+    def apply_softmute(data):
+        muted_users = data.setdefault("muted_users", {})
+        if action == "mute":
+            if target_key in muted_users:
+                return False
+            muted_users[target_key] = {
+                "operator": str(user_id),
+                "timestamp": int(__import__('time').time())
+            }
+            return True
+        if target_key not in muted_users:
+            return False
+        del muted_users[target_key]
+        return True
+    
+    # 在文件锁内读取、更新并原子写回，避免并发的管理命令互相覆盖
+    changed = await json_store.update(get_softmute_file_path(group_id), apply_softmute, default={"muted_users": {}}, indent=4)
     
     if action == "mute":
-        if str(target_user_id) in muted_users:
+        if not changed:
             return f"⚠️ 用户 {target_user_id} 已经在软禁言列表中"
-        
-        muted_users[str(target_user_id)] = {
-            "operator": str(user_id),
-            "timestamp": int(__import__('time').time())
-        }
-        data["muted_users"] = muted_users
-        save_softmute_data(group_id, data)
-        
         logger.info(f"用户 {user_id} 在群 {group_id} 软禁言了用户 {target_user_id}")
         return f"✅ 已将用户 {target_user_id} 添加到软禁言列表"
     
     elif action == "unmute":
-        if str(target_user_id) not in muted_users:
+        if not changed:
             return f"⚠️ 用户 {target_user_id} 不在软禁言列表中"
-        
-        del muted_users[str(target_user_id)]
-        data["muted_users"] = muted_users
-        save_softmute_data(group_id, data)
-        
         logger.info(f"用户 {user_id} 在群 {group_id} 解除了用户 {target_user_id} 的软禁言")
         return f"✅ 已将用户 {target_user_id} 从软禁言列表移除"
     
@@ -1,7 +1,6 @@
-import json
-import os
 from utils.message_sender import CommandResponse
 from logger_config import get_logger
+from core.json_store import json_store
 
 logger = get_logger("ToggleCommand")
 
@@ -23,6 +22,12 @@ AVAILABLE_FEATURES = {
         "description": "识别到腿照时自动设为精华消息",
         "default": False,
         "alias": "leg"  # 添加别名
+    },
+    "spam_detection": {
+        "name": "刷屏检测",
+        "description": "检测刷屏、重复消息和大量@，按配置撤回、警告或禁言",
+        "default": False,
+        "alias": "spam"
     }
     # 移除了 mc_push 功能，将其交给插件处理
 }
@@ -78,30 +83,16 @@ async def handle_toggle_command(context, args, user_id, group_id, user_level, se
         # 获取群组配置文件路径
         group_config_path = f"data/group_config/{group_id}.json"
         
-        # 读取现有配置
-        group_config = {}
-        if os.path.exists(group_config_path):
-            try:
-                with open(group_config_path, 'r', encoding='utf-8') as f:
-                    group_config = json.load(f)
-            except Exception as e:
-                logger.error(f"读取群组配置文件失败: {e}")
-                return CommandResponse.text("❌ 读取群组配置文件失败")
-        
         # 设置功能开关
         feature_key = f"{found_feature_key}_enabled"
         enabled = action == "enable"
         
-        # 更新配置
-        group_config[feature_key] = enabled
+        def apply_toggle(group_config):
+            group_config[feature_key] = enabled
         
-        # 保存配置
+        # 在文件锁内读取、更新并原子写回配置
         try:
-            # 确保目录存在
-            os.makedirs(os.path.dirname(group_config_path), exist_ok=True)
-            
-            with open(group_config_path, 'w', encoding='utf-8') as f:
-                json.dump(group_config, f, ensure_ascii=False, indent=2)
+            await json_store.update(group_config_path, apply_toggle, default={})
         except Exception as e:
             logger.error(f"保存群组配置文件失败: {e}")
             return CommandResponse.text("❌ 保存群组配置文件失败")
@@ -22,6 +22,11 @@ class BotContext:
     def config(self) -> Dict[str, Any]:
         return self._config_manager.get_config()
 
+    def apply_config(self, config: Dict[str, Any]):
+        """应用新的配置快照（由配置热重载触发）"""
+        self._account_manager.apply_config(config)
+        self._config_manager.set_config(config)
+
     @property
     def websocket(self):
         return self._message_sender.websocket
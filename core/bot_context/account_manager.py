@@ -10,11 +10,17 @@ class AccountManager:
     """管理机器人账号相关的逻辑"""
     
     def __init__(self, config: Dict[str, Any]):
-        self.config = config
-        self.accounts = {acc['id']: acc for acc in config.get('accounts', []) if 'id' in acc}
         self.active_account: Optional[Dict[str, Any]] = None
+        self.apply_config(config)
         logger.debug(f"AccountManager 初始化完成，加载了 {len(self.accounts)} 个账号")
     
+    def apply_config(self, config: Dict[str, Any]):
+        """应用新的配置快照，预先计算运行模式和账号索引"""
+        self.config = config
+        self.accounts = {acc['id']: acc for acc in config.get('accounts', []) if 'id' in acc}
+        self._accounts_by_qq = {str(acc.get('bot_qq')): acc for acc in self.accounts.values()}
+        self.mode = config.get('mode', 'fallback')
+    
     def get_config_value(self, key: str, default=None) -> Any:
         """获取配置值"""
         return self.config.get(key, default)
@@ -29,10 +35,7 @@ class AccountManager:
     
     def get_account_by_qq(self, bot_qq: str) -> Optional[Dict[str, Any]]:
         """根据 QQ 号获取账号配置"""
-        for account in self.accounts.values():
-            if str(account.get('bot_qq')) == str(bot_qq):
-                return account
-        return None
+        return self._accounts_by_qq.get(str(bot_qq))
     
     def get_active_account(self) -> Optional[Dict[str, Any]]:
         """获取当前活跃账号"""
@@ -45,11 +48,11 @@ class AccountManager:
     
     def is_parallel_mode(self) -> bool:
         """检查是否为并行模式"""
-        return self.get_config_value('mode', 'fallback') == 'parallel'
+        return self.mode == 'parallel'
     
     def is_parallel_pro_mode(self) -> bool:
         """检查是否为并行专业模式"""
-        return self.get_config_value('mode', 'fallback') == 'parallel-pro'
+        return self.mode == 'parallel-pro'
     
     def should_handle_message(self, event: dict, account_id: int = None, context=None) -> bool:
         """检查是否应该处理该消息
@@ -63,17 +66,8 @@ class AccountManager:
         post_type = event.get('post_type')
         
         # request 类型（加群请求、邀请请求等）应该总是处理，不受优先级影响
-        if post_type == 'request':
-            logger.info(f"处理 request 类型事件：{event.get('request_type', 'unknown')}")
-            return True
-        
-        # notice 类型也总是处理
-        if post_type == 'notice':
-            logger.info(f"处理 notice 类型事件：{event.get('notice_type', 'unknown')}")
-            return True
-        
-        # 对于 meta_event 等其他类型，也总是处理
-        if post_type not in ['message']:
+        # notice 类型、meta_event 等其他类型也总是处理（跨账号重复由路由器的事件去重过滤）
+        if post_type != 'message':
             return True
         
         # Parallel Pro 模式下，群消息需要检查优先级
@@ -98,13 +92,8 @@ class AccountManager:
                 if group_id and context and hasattr(context, 'multi_ws_manager'):
                     ws_manager = context.multi_ws_manager
                     if hasattr(ws_manager, 'is_highest_priority_in_group'):
-                        # 检查群列表是否已缓存
-                        accounts_in_group = ws_manager.get_accounts_in_group(str(group_id))
-                        if not accounts_in_group:
-                            # 群列表未缓存或该群不在缓存中，允许处理并记录警告
-                            logger.warning(f"Parallel Pro 模式：群 {group_id} 的群列表未缓存，允许账号 {account_id} 处理消息")
-                            return True
-                        
+                        # 负责账号已预先计算，这里是O(1)查询；
+                        # 群列表未缓存时会以收到消息的账号补记成员关系，而不是放行所有账号
                         is_highest = ws_manager.is_highest_priority_in_group(account_id, str(group_id))
                         if not is_highest:
                             logger.debug(f"Parallel Pro 模式：账号 {account_id} 在群 {group_id} 中有更高优先级的活跃账号，忽略消息")
@@ -18,6 +18,10 @@ class ConfigManager:
         """获取配置"""
         return self._config
 
+    def set_config(self, config: Dict[str, Any]):
+        """替换为新的配置快照"""
+        self._config = config
+
     def get_server_config(self, server_name: str) -> Optional[Dict[str, Any]]:
         """获取指定服务器的配置。"""
         return self._config.get("servers", {}).get(server_name)
@@ -6,6 +6,7 @@ import uuid
 from typing import Optional, Dict, Any, Callable, List
 from logger_config import get_logger, log_exception
 from utils.api_utils import call_onebot_api
+from core.message_store import message_store, self_id_of
 
 logger = get_logger("BotContextMessageSender")
 
@@ -89,6 +90,8 @@ class MessageSender:
                     if isinstance(data, dict):
                         if data.get('status') == 'ok' and 'data' in data:
                             message_id = data['data'].get('message_id')
+                            if message_id:
+                                self._record_outgoing(action, api_params, message_id, account_id)
                             if message_id and callback:
                                 try:
                                     await callback(message_id)
@@ -141,6 +144,10 @@ class MessageSender:
     
 
     
+    def _record_outgoing(self, action: str, api_params: dict, message_id, account_id: int = None):
+        """把发送成功的消息记入本地消息历史"""
+        message_store.record_outgoing(action, api_params, message_id, self_id=self_id_of(self._context, account_id))
+
     async def _send_group_message_single(self, group_id: str, message: list, callback: Optional[Callable] = None, account_id: int = None) -> Optional[str]:
         """单WebSocket模式下发送群消息"""
         return await self._send_message_with_retry('send_group_msg', {'group_id': group_id, 'message': message}, callback, account_id)
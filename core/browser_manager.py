@@ -1,11 +1,13 @@
 import asyncio
 import os
 import platform
+import time
 from typing import Optional
 from playwright.async_api import async_playwright, Browser, Page
 
 # 导入浏览器配置
 from browser_config import get_browser_manager_config
+from core.metrics import RENDER_SECONDS
 
 
 class BrowserManager:
@@ -18,7 +20,7 @@ class BrowserManager:
         self._browser: Optional[Browser] = None
         self._playwright = None
         self._lock = asyncio.Lock()
-        self._pages = set()  # 跟踪所有创建的页面
+        self._pages = {}  # 跟踪所有创建的页面 -> 获取时间，用于统计渲染耗时
         
         # 从配置文件加载设置
         config = get_browser_manager_config()
@@ -182,7 +184,7 @@ class BrowserManager:
         """
         await self.init_browser()
         page = await self._browser.new_page()
-        self._pages.add(page)
+        self._pages[page] = time.perf_counter()
         return page
     
     async def close_page(self, page: Page):
@@ -191,7 +193,7 @@ class BrowserManager:
         """
         if page in self._pages:
             await page.close()
-            self._pages.remove(page)
+            RENDER_SECONDS.observe(time.perf_counter() - self._pages.pop(page))
     
     async def close_all_pages(self):
         """
@@ -2,12 +2,11 @@
 # 负责加载和（未来可能的）保存配置
 
 import os
+import threading
+import time
 import yaml
 from logger_config import get_logger, log_exception
-from typing import Dict, Any
-
-# 缓存已加载的配置
-_cached_config = None
+from typing import Callable, Dict, Any, List, Optional
 
 logger = get_logger("ConfigManager")
 
@@ -18,21 +17,169 @@ except ImportError:
     logger.error("PyYAML库未安装，无法加载YAML配置文件。请运行 'pip install pyyaml' 安装。")
     YAML_AVAILABLE = False
 
+# diff 递归的最大深度，例如 servers.main.groups
+_DIFF_MAX_DEPTH = 3
+_MISSING = object()
+
+
+class ConfigSnapshot:
+    """不可变的配置快照
+
+    每次成功加载都会生成一个新版本的快照，重载时整体替换引用而不是原地修改。
+    data 保持为普通 dict 以兼容现有的读取方式，使用方应将其视为只读。
+    """
+
+    __slots__ = ('version', 'data', 'created_at')
+
+    def __init__(self, version: int, data: Dict[str, Any]):
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'data', data)
+        object.__setattr__(self, 'created_at', time.time())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot 不可修改")
+
+    def get(self, key: str, default=None):
+        return self.data.get(key, default)
+
+    def __repr__(self):
+        return f"<ConfigSnapshot v{self.version}>"
+
+
+def diff_config(old: Dict[str, Any], new: Dict[str, Any], prefix: str = '', depth: int = _DIFF_MAX_DEPTH) -> List[str]:
+    """比较两份配置，返回发生变化的键路径列表（如 'mode'、'commands.music'）"""
+    changed = []
+    for key in sorted(set(old) | set(new), key=str):
+        old_value = old.get(key, _MISSING)
+        new_value = new.get(key, _MISSING)
+        if old_value == new_value:
+            continue
+        path = f"{prefix}{key}"
+        if depth > 1 and isinstance(old_value, dict) and isinstance(new_value, dict):
+            changed.extend(diff_config(old_value, new_value, f"{path}.", depth - 1))
+        else:
+            changed.append(path)
+    return changed
+
+
+class ConfigStore:
+    """持有当前配置快照，负责原子替换和变更通知
+
+    订阅者签名为 callback(old_snapshot, new_snapshot, changed_keys)，
+    可能在配置监控线程中被调用，应只做轻量的引用替换。
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[Optional[ConfigSnapshot], ConfigSnapshot, List[str]], None]] = []
+
+    @property
+    def snapshot(self) -> Optional[ConfigSnapshot]:
+        """当前生效的快照（可能为None，表示尚未成功加载过）"""
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version if self._snapshot else 0
+
+    def subscribe(self, callback: Callable[[Optional[ConfigSnapshot], ConfigSnapshot, List[str]], None]):
+        """订阅配置变更"""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """取消订阅配置变更"""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def load(self, force: bool = False) -> Optional[ConfigSnapshot]:
+        """加载配置
+
+        Args:
+            force: 为False时若已有快照则直接返回，不重新解析YAML
+
+        Returns:
+            当前生效的快照；新配置验证失败时保留上一份有效快照
+        """
+        if not force and self._snapshot is not None:
+            return self._snapshot
+
+        new_config = _read_config_files()
+        if not _validate_config(new_config):
+            if self._snapshot is not None:
+                logger.warning(f"新配置文件验证失败，继续使用版本 {self._snapshot.version} 的配置")
+            else:
+                logger.error("配置文件验证失败")
+            return self._snapshot
+
+        with self._lock:
+            old = self._snapshot
+            if old is not None:
+                _carry_over_runtime_entries(old.data, new_config)
+                changed_keys = diff_config(old.data, new_config)
+                if not changed_keys:
+                    logger.debug("配置内容未变化，保留当前快照")
+                    return old
+            else:
+                changed_keys = sorted(new_config.keys(), key=str)
+            new = ConfigSnapshot(self.version + 1, new_config)
+            self._snapshot = new
+
+        if old is not None:
+            logger.info(f"配置已更新到版本 {new.version}，变化项: {', '.join(changed_keys)}")
+        self._notify(old, new, changed_keys)
+        return new
+
+    def _notify(self, old: Optional[ConfigSnapshot], new: ConfigSnapshot, changed_keys: List[str]):
+        for callback in list(self._subscribers):
+            try:
+                callback(old, new, changed_keys)
+            except Exception as e:
+                log_exception(logger, "执行配置变更订阅回调时出错", e)
+
+
+# 全局配置存储实例
+config_store = ConfigStore()
+
+
 def load_config() -> Dict[str, Any]:
-    """从config.yml和commands.yml加载配置"""
-    global _cached_config
-    
+    """获取当前配置，首次调用时从config.yml和commands.yml加载，之后直接返回缓存的快照"""
+    if not YAML_AVAILABLE:
+        logger.error("YAML库不可用，无法加载配置文件。")
+        return {}
+
+    snapshot = config_store.load()
+    return snapshot.data if snapshot else {}
+
+
+def reload_config() -> Dict[str, Any]:
+    """重新解析配置文件，验证通过后原子替换当前快照并通知订阅者"""
+    logger.info("开始重新加载配置文件")
     if not YAML_AVAILABLE:
         logger.error("YAML库不可用，无法加载配置文件。")
         return {}
 
+    snapshot = config_store.load(force=True)
+    return snapshot.data if snapshot else {}
+
+
+def get_config_snapshot() -> Optional[ConfigSnapshot]:
+    """获取当前生效的配置快照"""
+    return config_store.snapshot
+
+
+def _read_config_files() -> Dict[str, Any]:
+    """解析配置文件并填充默认值，生成一份全新的配置字典"""
     config = {}
     _load_config_file("config.yml", config)
     _load_config_file("commands.yml", config)
 
     # 标准化服务器配置
-    if "servers" in config:
+    if isinstance(config.get("servers"), dict):
         for server_name, server in config["servers"].items():
+            if not isinstance(server, dict):
+                continue
             if "groups" in server:
                 server["groups"] = {str(k): v for k, v in server["groups"].items()}
             if "zones" not in server:
@@ -45,35 +192,18 @@ def load_config() -> Dict[str, Any]:
     config.setdefault("features", {})
     config.setdefault("command_categories", {})
     config.setdefault("error_messages", {})
+    return config
 
-    # 验证配置是否有效
-    if _validate_config(config):
-        # 更新缓存
-        _cached_config = config
-        return config
-    else:
-        logger.error("配置文件验证失败")
-        return {}
-        
 
-def reload_config() -> Dict[str, Any]:
-    """重新加载配置文件"""
-    global _cached_config
-    logger.info("开始重新加载配置文件")
-    
-    # 不需要清除缓存的日志级别，因为我们已经移除了缓存机制
-    
-    # 重新加载配置
-    new_config = load_config()
-    
-    # 验证配置是否有效
-    if _validate_config(new_config):
-        _cached_config = new_config
-        logger.info("配置文件重新加载完成并已生效")
-        return new_config
-    else:
-        logger.warning("新配置文件验证失败，使用原有配置")
-        return _cached_config if _cached_config else {}
+def _carry_over_runtime_entries(old: Dict[str, Any], new: Dict[str, Any]):
+    """把运行时注册到配置中的条目（插件命令）带到新快照中，避免重载后丢失"""
+    old_commands = old.get("commands")
+    new_commands = new.get("commands")
+    if not isinstance(old_commands, dict) or not isinstance(new_commands, dict):
+        return
+    for cmd_name, cmd_config in old_commands.items():
+        if isinstance(cmd_config, dict) and cmd_config.get("plugin_id") and cmd_name not in new_commands:
+            new_commands[cmd_name] = cmd_config
 
 def _validate_config(config: Dict[str, Any]) -> bool:
     """验证配置是否有效"""
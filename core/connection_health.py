@@ -0,0 +1,182 @@
+# core/connection_health.py
+# 连接健康状态机：根据连接建立/断开、心跳截止时间和API错误率驱动状态变化，带滞回避免频繁切换
+
+import time
+from collections import deque
+from typing import Callable, Optional
+from logger_config import get_logger
+from core.heartbeat_scheduler import heartbeat_scheduler
+
+logger = get_logger("ConnectionHealth")
+
+
+class ConnectionState:
+    """连接健康状态"""
+    HEALTHY = "healthy"  # 连接正常，心跳按时到达
+    DEGRADED = "degraded"  # 仍然连接，但错过心跳或API错误率过高
+    DOWN = "down"  # 连接断开或长时间没有心跳，不可用
+    RECOVERING = "recovering"  # 刚建立连接或刚从异常中恢复，尚未稳定
+
+    # 可以处理消息的状态
+    USABLE = (HEALTHY, RECOVERING)
+
+    # 选择连接时的排序权重，数字越小越优先
+    RANK = {HEALTHY: 0, RECOVERING: 1, DEGRADED: 2, DOWN: 3}
+
+
+class HealthTracker:
+    """单个连接的健康状态机
+
+    状态转换：
+    - 连接建立 -> RECOVERING；连续收到 recover_threshold 次正常心跳 -> HEALTHY
+    - 错过一次心跳截止时间、收到异常心跳或API错误率（只统计超时和网络错误）超过阈值 -> DEGRADED
+    - 连续错过 down_threshold 次心跳截止时间或连接断开 -> DOWN
+    - DEGRADED 同样需要连续 recover_threshold 次正常心跳才能回到 HEALTHY（滞回）
+
+    状态变化时调用 on_change(tracker, old_state, new_state)。
+    """
+
+    def __init__(self, name, heartbeat_interval: float = 30, on_change: Optional[Callable] = None,
+                 deadline_factor: float = 2.0, deadline_grace: float = 2.0,
+                 recover_threshold: int = 2, down_threshold: int = 3,
+                 error_window: int = 20, error_min_samples: int = 5, error_rate_threshold: float = 0.5):
+        self.name = name
+        self.heartbeat_interval = heartbeat_interval
+        self.on_change = on_change
+        self.deadline_factor = deadline_factor
+        self.deadline_grace = deadline_grace
+        self.recover_threshold = recover_threshold
+        self.down_threshold = down_threshold
+        self.error_min_samples = error_min_samples
+        self.error_rate_threshold = error_rate_threshold
+
+        self.state = ConnectionState.DOWN
+        self.connected = False
+        self.state_since = time.time()
+        self.last_heartbeat_time = time.time()
+        self.missed_deadlines = 0
+        self.consecutive_good = 0
+        self._api_results = deque(maxlen=error_window)
+
+    # ---------------------- 状态查询 ----------------------
+
+    @property
+    def is_usable(self) -> bool:
+        return self.state in ConnectionState.USABLE
+
+    @property
+    def rank(self) -> int:
+        return ConnectionState.RANK[self.state]
+
+    @property
+    def api_error_rate(self) -> float:
+        if not self._api_results:
+            return 0.0
+        return self._api_results.count(False) / len(self._api_results)
+
+    def _transition(self, new_state: str, reason: str):
+        if new_state == self.state:
+            return
+        old_state = self.state
+        self.state = new_state
+        self.state_since = time.time()
+        if new_state == ConnectionState.HEALTHY:
+            logger.info(f"账号 {self.name} 状态: {old_state} -> {new_state} ({reason})")
+        else:
+            logger.warning(f"账号 {self.name} 状态: {old_state} -> {new_state} ({reason})")
+        if self.on_change:
+            try:
+                self.on_change(self, old_state, new_state)
+            except Exception as e:
+                logger.error(f"处理账号 {self.name} 状态变化时出错: {e}")
+
+    # ---------------------- 事件输入 ----------------------
+
+    def on_connected(self):
+        """WebSocket连接建立"""
+        self.connected = True
+        self.missed_deadlines = 0
+        self.consecutive_good = 0
+        self._api_results.clear()
+        self.last_heartbeat_time = time.time()
+        if self.heartbeat_interval and self.heartbeat_interval > 0:
+            self._transition(ConnectionState.RECOVERING, "连接已建立，等待心跳确认")
+            self._arm_deadline()
+        else:
+            # 未启用心跳时无法确认稳定性，直接视为健康
+            self._transition(ConnectionState.HEALTHY, "连接已建立")
+
+    def on_disconnected(self, reason: str = "连接断开"):
+        """WebSocket连接关闭"""
+        self.connected = False
+        self._cancel_deadline()
+        self.consecutive_good = 0
+        self._transition(ConnectionState.DOWN, reason)
+
+    def on_heartbeat(self, good: bool, interval: Optional[float] = None):
+        """收到心跳事件"""
+        if not self.connected:
+            # 连接已关闭后才到达的心跳，忽略
+            return
+        self.last_heartbeat_time = time.time()
+        if interval:
+            if interval != self.heartbeat_interval:
+                logger.info(f"账号 {self.name} 心跳间隔更新: {self.heartbeat_interval:.1f} -> {interval:.1f}秒")
+            self.heartbeat_interval = interval
+        self.missed_deadlines = 0
+        self._arm_deadline()
+
+        if not good:
+            self.consecutive_good = 0
+            self._transition(ConnectionState.DEGRADED, "心跳状态异常")
+            return
+
+        self.consecutive_good += 1
+        if self.state == ConnectionState.DOWN:
+            self._transition(ConnectionState.RECOVERING, "心跳恢复")
+        elif self.state in (ConnectionState.RECOVERING, ConnectionState.DEGRADED):
+            if self.consecutive_good >= self.recover_threshold and not self._error_rate_exceeded():
+                self._transition(ConnectionState.HEALTHY, f"连续 {self.consecutive_good} 次心跳正常")
+
+    def on_api_result(self, ok: bool):
+        """记录一次API调用结果（ok 为 False 表示超时或网络错误，业务错误不算失败），错误率过高时降级"""
+        self._api_results.append(ok)
+        if not ok and self.state == ConnectionState.HEALTHY and self._error_rate_exceeded():
+            self.consecutive_good = 0
+            self._transition(ConnectionState.DEGRADED, f"API错误率 {self.api_error_rate:.0%}")
+
+    def _error_rate_exceeded(self) -> bool:
+        return len(self._api_results) >= self.error_min_samples and self.api_error_rate >= self.error_rate_threshold
+
+    # ---------------------- 心跳截止时间 ----------------------
+
+    def _deadline(self) -> float:
+        return self.heartbeat_interval * self.deadline_factor + self.deadline_grace
+
+    def _arm_deadline(self):
+        """设置/刷新心跳截止时间（由全局心跳调度器统一计时）"""
+        if not self.heartbeat_interval or self.heartbeat_interval <= 0:
+            self._cancel_deadline()
+            return
+        try:
+            heartbeat_scheduler.schedule(self, self._deadline(), self._on_deadline_missed)
+        except RuntimeError:
+            # 不在事件循环中（如同步初始化阶段），等连接建立后再计时
+            return
+
+    def _cancel_deadline(self):
+        heartbeat_scheduler.cancel(self)
+
+    def _on_deadline_missed(self):
+        self.missed_deadlines += 1
+        self.consecutive_good = 0
+        elapsed = time.time() - self.last_heartbeat_time
+        if self.missed_deadlines >= self.down_threshold:
+            self._transition(ConnectionState.DOWN, f"{elapsed:.1f}秒未收到心跳")
+        else:
+            self._transition(ConnectionState.DEGRADED, f"心跳超时({elapsed:.1f}秒)")
+        # 继续计时，直到收到心跳或连接关闭
+        self._arm_deadline()
+
+    def stop(self):
+        self._cancel_deadline()
@@ -0,0 +1,249 @@
+# core/dependency_checker.py
+# 负责依赖校验：基于已安装分发包的元数据对照requirements.txt，不导入任何第三方库
+
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:  # Python < 3.8
+    importlib_metadata = None
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REQUIREMENTS_FILE = os.path.join(PROJECT_ROOT, 'requirements.txt')
+DEFAULT_INDEX_URL = 'https://mirrors.aliyun.com/pypi/simple/'
+MIN_PYTHON = (3, 8)
+
+# 需求行格式: name[extra1,extra2] <specifier> ; <marker>
+_REQUIREMENT_PATTERN = re.compile(
+    r'^\s*(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)\s*'
+    r'(?:\[(?P<extras>[^\]]*)\])?\s*'
+    r'(?P<specifier>[^;]*?)\s*'
+    r'(?:;\s*(?P<marker>.*))?$'
+)
+# 行尾注释以 "optional" 开头的依赖为可选依赖：仍会被安装，但缺失时不阻止启动
+_OPTIONAL_PATTERN = re.compile(r'^optional\b', re.IGNORECASE)
+
+
+def normalize_name(name: str) -> str:
+    """按PEP 503规范化分发包名称（PyYAML -> pyyaml, Foo_Bar -> foo-bar）"""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+@dataclass
+class Requirement:
+    """requirements.txt中的单条需求"""
+    name: str  # 原始名称
+    specifier: str = ''  # 版本约束，如 ">=3.8"
+    marker: str = ''  # 环境标记，如 "sys_platform == 'win32'"
+    line: str = ''  # 原始行
+    optional: bool = False  # 可选依赖，缺失时不视为错误
+
+    @property
+    def key(self) -> str:
+        return normalize_name(self.name)
+
+
+@dataclass
+class DependencyStatus:
+    """单个依赖的校验结果"""
+    name: str
+    specifier: str
+    installed_version: Optional[str]
+    status: str  # ok, missing, version_mismatch, skipped
+    detail: str = ''
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ('ok', 'skipped')
+
+
+@dataclass
+class DependencyReport:
+    """依赖校验报告"""
+    python_version: str
+    python_ok: bool
+    requirements_file: str
+    statuses: List[DependencyStatus] = field(default_factory=list)
+
+    @property
+    def missing(self) -> List[DependencyStatus]:
+        return [s for s in self.statuses if s.status == 'missing']
+
+    @property
+    def mismatched(self) -> List[DependencyStatus]:
+        return [s for s in self.statuses if s.status == 'version_mismatch']
+
+    @property
+    def ok(self) -> bool:
+        return self.python_ok and all(s.ok for s in self.statuses)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可序列化的字典"""
+        return {
+            'ok': self.ok,
+            'python_version': self.python_version,
+            'python_ok': self.python_ok,
+            'requirements_file': self.requirements_file,
+            'dependencies': [
+                {
+                    'name': s.name,
+                    'specifier': s.specifier,
+                    'installed_version': s.installed_version,
+                    'status': s.status,
+                    'detail': s.detail,
+                }
+                for s in self.statuses
+            ],
+        }
+
+    def format(self) -> str:
+        """生成适合控制台输出的文本摘要"""
+        lines = [f"Python {self.python_version} ({'满足' if self.python_ok else '版本过低'})"]
+        for s in self.statuses:
+            if s.status == 'ok':
+                continue
+            required = f"{s.name}{s.specifier}"
+            if s.status == 'missing':
+                lines.append(f"  缺失: {required}")
+            elif s.status == 'version_mismatch':
+                lines.append(f"  版本不符: {required} (已安装 {s.installed_version})")
+            elif s.status == 'skipped' and s.detail:
+                lines.append(f"  跳过: {required} ({s.detail})")
+        if self.ok:
+            lines.append(f"全部 {len(self.statuses)} 个依赖均已满足")
+        return '\n'.join(lines)
+
+
+def parse_requirements(path: str = REQUIREMENTS_FILE) -> List[Requirement]:
+    """解析requirements.txt，忽略注释、空行和pip选项（-r、-e、--index-url等）"""
+    requirements = []
+    if not os.path.exists(path):
+        return requirements
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for raw_line in f:
+            line, _, comment = raw_line.partition('#')
+            line = line.strip()
+            if not line or line.startswith('-'):
+                continue
+            match = _REQUIREMENT_PATTERN.match(line)
+            if not match:
+                continue
+            requirements.append(Requirement(
+                name=match.group('name'),
+                specifier=(match.group('specifier') or '').replace(' ', ''),
+                marker=(match.group('marker') or '').strip(),
+                line=line,
+                optional=bool(_OPTIONAL_PATTERN.match(comment.strip())),
+            ))
+    return requirements
+
+
+def get_installed_distributions() -> Dict[str, str]:
+    """一次性读取所有已安装分发包的元数据，返回 规范化名称 -> 版本"""
+    installed = {}
+    if importlib_metadata is None:
+        return installed
+    for dist in importlib_metadata.distributions():
+        try:
+            name = dist.metadata['Name']
+        except Exception:
+            continue
+        if name:
+            installed.setdefault(normalize_name(name), dist.version)
+    return installed
+
+
+def _marker_applies(marker: str) -> Optional[bool]:
+    """判断环境标记是否适用于当前环境；无法判断时返回None"""
+    if not marker:
+        return True
+    try:
+        from packaging.markers import Marker
+    except ImportError:
+        return None
+    try:
+        return Marker(marker).evaluate()
+    except Exception:
+        return None
+
+
+def _version_satisfies(version: str, specifier: str) -> Optional[bool]:
+    """判断版本是否满足约束；packaging不可用时返回None"""
+    if not specifier:
+        return True
+    try:
+        from packaging.specifiers import SpecifierSet
+    except ImportError:
+        return None
+    try:
+        return SpecifierSet(specifier).contains(version, prereleases=True)
+    except Exception:
+        return None
+
+
+def verify_dependencies(requirements_file: str = REQUIREMENTS_FILE) -> DependencyReport:
+    """对照requirements.txt校验已安装依赖，只读取元数据，不导入任何包"""
+    report = DependencyReport(
+        python_version='.'.join(str(v) for v in sys.version_info[:3]),
+        python_ok=sys.version_info >= MIN_PYTHON,
+        requirements_file=requirements_file,
+    )
+    installed = get_installed_distributions()
+
+    for req in parse_requirements(requirements_file):
+        applies = _marker_applies(req.marker)
+        if applies is False:
+            report.statuses.append(DependencyStatus(req.name, req.specifier, None, 'skipped', '环境标记不适用'))
+            continue
+
+        version = installed.get(req.key)
+        if version is None and req.optional:
+            report.statuses.append(DependencyStatus(req.name, req.specifier, None, 'skipped', '可选依赖，未安装'))
+            continue
+        if version is None:
+            report.statuses.append(DependencyStatus(req.name, req.specifier, None, 'missing'))
+            continue
+
+        satisfied = _version_satisfies(version, req.specifier)
+        if satisfied is False:
+            report.statuses.append(DependencyStatus(req.name, req.specifier, version, 'version_mismatch'))
+        elif satisfied is None:
+            report.statuses.append(DependencyStatus(req.name, req.specifier, version, 'ok', '未安装packaging，未校验版本约束'))
+        else:
+            report.statuses.append(DependencyStatus(req.name, req.specifier, version, 'ok'))
+
+    return report
+
+
+def install_missing(report: DependencyReport, index_url: Optional[str] = DEFAULT_INDEX_URL, timeout: int = 300) -> bool:
+    """通过pip安装报告中缺失或版本不符的依赖，仅应在显式允许时调用
+
+    Returns:
+        bool: 是否全部安装成功
+    """
+    targets = [f"{s.name}{s.specifier}" for s in report.missing + report.mismatched]
+    if not targets:
+        return True
+
+    cmd = [sys.executable, '-m', 'pip', 'install'] + targets
+    if index_url:
+        cmd += ['-i', index_url]
+    try:
+        subprocess.run(cmd, check=True, timeout=timeout)
+        return True
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        print(f"安装依赖失败: {e}")
+        return False
+
+
+if __name__ == '__main__':
+    import json
+    result = verify_dependencies()
+    print(json.dumps(result.to_dict(), ensure_ascii=False, indent=2))
+    sys.exit(0 if result.ok else 1)
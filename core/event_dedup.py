@@ -0,0 +1,83 @@
+# core/event_dedup.py
+# 跨账号事件去重：parallel 模式下同一个群事件会从多个账号的WebSocket到达，按事件指纹只放行第一份
+
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+from logger_config import get_logger
+
+logger = get_logger("EventDedup")
+
+
+def event_fingerprint(event: dict) -> Optional[Tuple]:
+    """计算事件指纹，不需要去重的事件返回 None
+
+    各账号的 message_id 由各自的OneBot实现分配，互不相同，
+    因此群消息使用 群号+发送者+时间+原始内容；通知和请求使用 类型+群号+用户+时间。
+    私聊消息、好友请求等只属于单个账号，指纹中包含 self_id，不会跨账号去重。
+    指纹需要在多个分片进程间保持一致，因此不使用随进程变化的 hash()。
+    """
+    post_type = event.get('post_type')
+    group_id = event.get('group_id')
+
+    if post_type == 'message':
+        if event.get('message_type') == 'group' and group_id:
+            return ('message', group_id, event.get('user_id'), event.get('time'),
+                    zlib.crc32((event.get('raw_message') or '').encode('utf-8')))
+        return ('message', event.get('self_id'), event.get('message_id'))
+
+    if post_type in ('notice', 'request'):
+        sub_type = event.get('notice_type') or event.get('request_type')
+        owner = group_id if group_id else ('self', event.get('self_id'))
+        return (post_type, sub_type, event.get('sub_type'), owner,
+                event.get('user_id'), event.get('operator_id'), event.get('time'))
+
+    # meta_event（心跳、生命周期）等按账号独立处理
+    return None
+
+
+class EventDeduplicator:
+    """带TTL的有界指纹集合
+
+    Args:
+        ttl: 指纹保留时间（秒），覆盖各账号之间的投递延迟即可
+        max_size: 最多保留的指纹数量，超出时淘汰最早的
+    """
+
+    def __init__(self, ttl: float = 60, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._seen: "OrderedDict[Tuple, float]" = OrderedDict()
+        self.dropped = 0
+
+    def _expire(self, now: float):
+        seen = self._seen
+        while seen:
+            expires_at = next(iter(seen.values()))
+            if expires_at > now and len(seen) < self.max_size:
+                break
+            seen.popitem(last=False)
+
+    def is_duplicate(self, event: dict) -> bool:
+        """判断事件是否已由其他账号处理过；首次出现时登记指纹并返回 False"""
+        fingerprint = event_fingerprint(event)
+        if fingerprint is None:
+            return False
+
+        now = time.monotonic()
+        self._expire(now)
+        if fingerprint in self._seen:
+            self.dropped += 1
+            logger.debug(f"丢弃重复事件: {fingerprint[:2]} (来自 {event.get('self_id')})")
+            return True
+
+        self._seen[fingerprint] = now + self.ttl
+        return False
+
+    def clear(self):
+        self._seen.clear()
+
+
+# 全局事件去重实例
+event_deduplicator = EventDeduplicator()
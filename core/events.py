@@ -0,0 +1,186 @@
+# core/events.py
+# OneBot 事件模型：WebSocket 帧的快速解码，以及按需解析字段的事件对象
+#
+# 帧解码优先使用 orjson（未安装时回退到标准库 json）。API响应和心跳只需要原始字典，不构建事件对象；
+# 其余事件按 post_type 包装为带 __slots__ 的事件对象：顶层字段在构建时一次取出，
+# 消息段（utils.message_codec）、发送者等嵌套字段在第一次访问时才解析。原始字典保留在 raw 中，供插件和处理函数使用
+
+import json
+from typing import Any, Dict, List, Optional
+from utils.message_codec import ParsedMessage
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+def loads(data) -> Any:
+    """解码JSON文本（str 或 bytes）"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj) -> str:
+    """编码为JSON文本，可作为 aiohttp send_json 的 dumps 参数"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, ensure_ascii=False)
+
+def is_api_response(frame: dict) -> bool:
+    """API调用的响应帧（包含status和data字段）"""
+    return 'status' in frame and 'data' in frame
+
+def is_heartbeat(frame: dict) -> bool:
+    """心跳元事件"""
+    return frame.get('meta_event_type') == 'heartbeat'
+
+class Sender:
+    """消息发送者信息"""
+
+    __slots__ = ('user_id', 'nickname', 'card', 'role', 'title')
+
+    def __init__(self, raw: Optional[dict]):
+        raw = raw or {}
+        self.user_id = str(raw.get('user_id', ''))
+        self.nickname = raw.get('nickname') or ''
+        self.card = raw.get('card') or ''
+        self.role = raw.get('role')
+        self.title = raw.get('title') or ''
+
+    @property
+    def display_name(self) -> str:
+        """显示名称，优先使用群名片"""
+        return self.card or self.nickname
+
+    def __repr__(self) -> str:
+        return f"Sender(user_id={self.user_id}, name={self.display_name!r}, role={self.role})"
+
+class Event:
+    """OneBot 事件基类"""
+
+    __slots__ = ('raw', 'account_id', 'post_type', 'time', 'self_id')
+
+    def __init__(self, raw: dict, account_id: Optional[int] = None):
+        self.raw = raw
+        self.account_id = account_id if account_id is not None else raw.get('_account_id')
+        self.post_type = raw.get('post_type', '')
+        self.time = raw.get('time')
+        self.self_id = raw.get('self_id')
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """读取原始字典中的字段"""
+        return self.raw.get(key, default)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(post_type={self.post_type}, account={self.account_id})"
+
+class MessageEvent(Event):
+    """群聊/私聊消息事件，消息段和发送者在第一次访问时解析"""
+
+    __slots__ = ('message_type', 'sub_type', 'message_id', 'user_id', 'group_id', 'message',
+                 '_parsed', '_sender')
+
+    def __init__(self, raw: dict, account_id: Optional[int] = None):
+        super().__init__(raw, account_id)
+        self.message_type = raw.get('message_type', '')
+        self.sub_type = raw.get('sub_type', '')
+        self.message_id = raw.get('message_id')
+        self.user_id = str(raw.get('user_id', ''))
+        self.group_id = raw.get('group_id')
+        self.message = raw.get('message', '')
+        self._parsed = None
+        self._sender = None
+
+    @property
+    def raw_message(self) -> str:
+        return self.raw.get('raw_message', '')
+
+    @property
+    def parsed(self) -> ParsedMessage:
+        """消息解析结果（纯文本、@、回复、图片等），整个处理流程共用"""
+        if self._parsed is None:
+            self._parsed = ParsedMessage(self.message)
+        return self._parsed
+
+    @property
+    def segments(self) -> List[dict]:
+        """消息段数组（CQ码字符串消息会被解析为消息段）"""
+        return self.parsed.segments
+
+    @property
+    def sender(self) -> Sender:
+        if self._sender is None:
+            self._sender = Sender(self.raw.get('sender'))
+        return self._sender
+
+    @property
+    def image_urls(self) -> List[str]:
+        return self.parsed.image_urls
+
+    def is_group(self) -> bool:
+        return self.message_type == 'group'
+
+    def is_private(self) -> bool:
+        return self.message_type == 'private'
+
+    def __repr__(self) -> str:
+        return (f"MessageEvent(type={self.message_type}, id={self.message_id}, user={self.user_id}, "
+                f"group={self.group_id}, account={self.account_id})")
+
+class NoticeEvent(Event):
+    """通知事件（成员变动、撤回、群名片变更等）"""
+
+    __slots__ = ('notice_type', 'sub_type', 'group_id', 'user_id', 'operator_id')
+
+    def __init__(self, raw: dict, account_id: Optional[int] = None):
+        super().__init__(raw, account_id)
+        self.notice_type = raw.get('notice_type', '')
+        self.sub_type = raw.get('sub_type', '')
+        self.group_id = raw.get('group_id')
+        self.user_id = raw.get('user_id')
+        self.operator_id = raw.get('operator_id')
+
+class RequestEvent(Event):
+    """请求事件（加好友、加群、邀请入群）"""
+
+    __slots__ = ('request_type', 'sub_type', 'group_id', 'user_id', 'comment', 'flag')
+
+    def __init__(self, raw: dict, account_id: Optional[int] = None):
+        super().__init__(raw, account_id)
+        self.request_type = raw.get('request_type', '')
+        self.sub_type = raw.get('sub_type', '')
+        self.group_id = raw.get('group_id')
+        self.user_id = raw.get('user_id')
+        self.comment = raw.get('comment') or ''
+        self.flag = raw.get('flag', '')
+
+class MetaEvent(Event):
+    """元事件（生命周期、心跳）"""
+
+    __slots__ = ('meta_event_type', 'sub_type')
+
+    def __init__(self, raw: dict, account_id: Optional[int] = None):
+        super().__init__(raw, account_id)
+        self.meta_event_type = raw.get('meta_event_type', '')
+        self.sub_type = raw.get('sub_type', '')
+
+    @property
+    def status(self) -> dict:
+        return self.raw.get('status') or {}
+
+    @property
+    def interval(self) -> Optional[int]:
+        return self.raw.get('interval')
+
+EVENT_CLASSES: Dict[str, type] = {
+    'message': MessageEvent,
+    'notice': NoticeEvent,
+    'request': RequestEvent,
+    'meta_event': MetaEvent,
+}
+
+def wrap_event(raw: dict, account_id: Optional[int] = None) -> Event:
+    """按 post_type 把原始事件字典包装为事件对象"""
+    return EVENT_CLASSES.get(raw.get('post_type'), Event)(raw, account_id)
@@ -0,0 +1,406 @@
+# core/express_tracker.py
+# 快递跟踪：查询接口（可替换的 provider，默认使用 vivo 快递助手接口，共用一个 httpx 客户端）
+# 和提醒单号的轮询调度器
+#
+# 每个单号有自己的下次查询时间，放在一个最小堆中，调度器只在最早的单号到期时醒来；
+# 同一时刻到期的单号并发查询（数量受 concurrency 限制）。查询间隔按物流状态调整：派送中的快递查得勤，
+# 运输中按常规间隔，待取件或多次查询都没有变化的查得少。只有状态变化、签收或提醒失败的单号才写回提醒文件
+#
+# 分片模式下只有主分片运行调度器（否则每个分片都会查询全部单号、重复提醒）；其他分片的 /expr mind 只写入提醒文件，
+# 主分片每 sync_interval 秒检查一次提醒文件，把还没有安排查询的单号加入调度
+
+import asyncio
+import heapq
+import itertools
+import httpx
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from logger_config import get_logger
+from core.json_store import json_store
+
+logger = get_logger("ExpressTracker")
+
+# 快递提醒文件路径
+EXPRESS_REMIND_FILE = "data/express_command.json"
+
+# 默认配置，可在 config.yml 的 express_tracking 节中覆盖
+DEFAULT_SETTINGS = {
+    'provider': 'vivo',
+    'timeout': 10.0,  # 单次查询超时（秒）
+    'concurrency': 5,  # 同时进行的查询数
+    'delivering_interval': 300,  # 派送中的查询间隔（秒）
+    'transit_interval': 1200,  # 运输中的查询间隔（秒）
+    'idle_interval': 3600,  # 待取件或长时间没有变化时的查询间隔（秒）
+    'idle_after_polls': 6,  # 连续多少次查询没有变化后改用 idle_interval
+    'retry_interval': 600,  # 查询失败后的重试间隔（秒）
+    'sync_interval': 60,  # 检查提醒文件中新单号的间隔（秒）
+}
+
+# 物流状态分类（按状态描述中的关键词匹配）
+DELIVERED_KEYWORDS = ('已签收',)
+DELIVERING_KEYWORDS = ('派送', '派件')
+IDLE_KEYWORDS = ('待取件', '待揽收', '已入柜', '驿站')
+
+
+class ExpressQueryError(Exception):
+    """快递查询失败（网络错误、接口返回错误或没有查询到信息），message 为给用户看的原因"""
+
+
+class TrackingResult:
+    """一次快递查询的结果"""
+
+    __slots__ = ('mail_no', 'cp_code', 'status', 'traces')
+
+    def __init__(self, mail_no: str, cp_code: str, status: str, traces: List[dict]):
+        self.mail_no = mail_no
+        self.cp_code = cp_code
+        self.status = status
+        self.traces = traces  # 物流轨迹，最新的在前：[{time, desc, city}]
+
+    @property
+    def latest_time(self) -> str:
+        return self.traces[0].get("time", "") if self.traces else ""
+
+    @property
+    def latest_desc(self) -> str:
+        return self.traces[0].get("desc", "") if self.traces else ""
+
+    @property
+    def delivered(self) -> bool:
+        return any(keyword in self.status for keyword in DELIVERED_KEYWORDS)
+
+    @property
+    def delivering(self) -> bool:
+        return any(keyword in self.status for keyword in DELIVERING_KEYWORDS)
+
+    @property
+    def idle(self) -> bool:
+        return any(keyword in self.status for keyword in IDLE_KEYWORDS)
+
+
+class ExpressProvider(ABC):
+    """快递查询接口，子类实现 query()；测试中可以换成返回固定数据的本地实现"""
+
+    @abstractmethod
+    async def query(self, mail_no: str) -> TrackingResult:
+        """查询单号
+
+        Raises:
+            ExpressQueryError: 查询失败，异常信息会直接回复给用户
+        """
+        pass
+
+    async def close(self):
+        pass
+
+
+class VivoExpressProvider(ExpressProvider):
+    """vivo 快递助手接口，所有查询共用一个 httpx 客户端（连接复用）"""
+
+    API_URL = "http://assistant-express.vivo.com.cn/pkginfobymn"
+
+    def __init__(self, timeout: float = DEFAULT_SETTINGS['timeout']):
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def query(self, mail_no: str) -> TrackingResult:
+        try:
+            response = await self._get_client().get(self.API_URL, params={"mailNo": mail_no, "imei": "1"})
+            response.raise_for_status()
+            data = response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"快递查询API请求失败: {mail_no}, {e}")
+            raise ExpressQueryError("网络请求失败，请稍后重试") from e
+
+        # 解析API返回结果
+        if not data or not isinstance(data, list):
+            raise ExpressQueryError("API返回数据格式错误")
+        result = data[0]
+        if result.get("retcode") != 0:
+            raise ExpressQueryError(result.get("message", "查询失败"))
+        express_data = result.get("data", {})
+        if not express_data:
+            raise ExpressQueryError("未查询到快递信息")
+
+        return TrackingResult(
+            mail_no=express_data.get("mailNo", mail_no),
+            cp_code=express_data.get("cpCode", "未知快递公司"),
+            status=express_data.get("logisticsStatusDesc", "未知状态"),
+            traces=express_data.get("fullTraceDetail") or [],
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# 可用的查询接口：名称 -> 工厂函数（参数为配置）
+PROVIDERS: Dict[str, Callable[[Dict[str, Any]], ExpressProvider]] = {
+    'vivo': lambda settings: VivoExpressProvider(timeout=settings['timeout']),
+}
+
+
+def register_provider(name: str, factory: Callable[[Dict[str, Any]], ExpressProvider]):
+    """注册查询接口，配置 express_tracking.provider 为该名称时使用"""
+    PROVIDERS[name] = factory
+
+
+class ExpressTracker:
+    """提醒单号的轮询调度器"""
+
+    def __init__(self):
+        self.settings: Dict[str, Any] = dict(DEFAULT_SETTINGS)
+        self.provider: ExpressProvider = PROVIDERS['vivo'](self.settings)
+        self._context = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._heap: List[tuple] = []  # (下次查询时间, 序号, 单号)
+        self._due: Dict[str, float] = {}  # 单号 -> 堆中有效条目的时间
+        self._unchanged: Dict[str, int] = {}  # 单号 -> 连续没有变化的查询次数
+        self._counter = itertools.count()
+        self._synced: Any = None  # 上次检查过的提醒文件数据对象
+
+    def configure(self, settings: Optional[Dict[str, Any]]):
+        """应用配置（未配置的项使用默认值），查询接口变化时替换"""
+        merged = dict(DEFAULT_SETTINGS)
+        if isinstance(settings, dict):
+            merged.update({k: v for k, v in settings.items() if k in DEFAULT_SETTINGS})
+        provider_changed = merged['provider'] != self.settings['provider'] or merged['timeout'] != self.settings['timeout']
+        if merged['provider'] not in PROVIDERS:
+            logger.warning(f"未知的快递查询接口: {merged['provider']}，使用 vivo")
+            merged['provider'] = 'vivo'
+        self.settings = merged
+        if provider_changed:
+            self.set_provider(PROVIDERS[merged['provider']](merged))
+        if self._task is not None:
+            self._semaphore = asyncio.Semaphore(max(1, int(merged['concurrency'])))
+
+    def set_provider(self, provider: ExpressProvider):
+        """替换查询接口（旧接口的连接在后台关闭）"""
+        old, self.provider = self.provider, provider
+        if old is not provider:
+            try:
+                asyncio.get_running_loop().create_task(old.close())
+            except RuntimeError:
+                pass
+
+    @property
+    def running(self) -> bool:
+        """调度器是否在本进程中运行"""
+        return self._task is not None and not self._task.done()
+
+    @property
+    def tracked(self) -> int:
+        """正在跟踪的单号数"""
+        return len(self._due)
+
+    async def query(self, mail_no: str) -> TrackingResult:
+        """查询单号（受并发数限制）"""
+        if self._semaphore is None:
+            return await self.provider.query(mail_no)
+        async with self._semaphore:
+            return await self.provider.query(mail_no)
+
+    # ---------------------- 调度 ----------------------
+
+    async def start(self, context):
+        """启动调度器（已启动时只更新上下文），提醒文件中的所有单号立即查询一次；分片模式下只在主分片调用"""
+        self._context = context
+        if self.running:
+            return
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(max(1, int(self.settings['concurrency'])))
+        self._heap.clear()
+        self._due.clear()
+        self._unchanged.clear()
+        self._synced = None
+        self._sync()
+        self._task = loop.create_task(self._run(), name="express_tracker")
+        logger.info(f"快递跟踪调度器已启动，跟踪 {len(self._due)} 个单号")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._wake = None
+        await self.provider.close()
+
+    async def track(self, mail_no: str, info: dict, result: Optional[TrackingResult] = None):
+        """添加或更新提醒单号；调度器在本进程运行时按 result 的状态安排下次查询，否则由主分片同步提醒文件后查询"""
+        def add(reminders):
+            reminders[mail_no] = info
+        await json_store.update(EXPRESS_REMIND_FILE, add, default={})
+        self._unchanged.pop(mail_no, None)
+        if self.running:
+            self._schedule(mail_no, self.interval_for(result, mail_no) if result is not None else 0)
+
+    def interval_for(self, result: TrackingResult, mail_no: str) -> float:
+        """按物流状态决定下次查询的间隔"""
+        settings = self.settings
+        if result.delivering:
+            return settings['delivering_interval']
+        if result.idle or self._unchanged.get(mail_no, 0) >= settings['idle_after_polls']:
+            return settings['idle_interval']
+        return settings['transit_interval']
+
+    def _schedule(self, mail_no: str, delay: float):
+        due = asyncio.get_running_loop().time() + delay
+        self._due[mail_no] = due
+        heapq.heappush(self._heap, (due, next(self._counter), mail_no))
+        if self._wake is not None and self._heap[0][2] == mail_no:
+            self._wake.set()
+
+    def _sync(self):
+        """把提醒文件中还没有安排查询的单号（其他分片添加的）安排立即查询；文件没有变化时跳过"""
+        reminders = json_store.get(EXPRESS_REMIND_FILE, default={})
+        if reminders is self._synced or not isinstance(reminders, dict):
+            return
+        self._synced = reminders
+        for mail_no in reminders:
+            if mail_no not in self._due:
+                self._schedule(mail_no, 0)
+
+    def _pop_due(self, now: float) -> List[str]:
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            at, _, mail_no = heapq.heappop(heap)
+            if self._due.get(mail_no) == at:  # 重新安排过的单号留下的旧条目跳过
+                del self._due[mail_no]
+                due.append(mail_no)
+        return due
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_sync = loop.time() + self.settings['sync_interval']
+        while True:
+            wake_at = min(self._heap[0][0], next_sync) if self._heap else next_sync
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(0.0, wake_at - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if loop.time() >= next_sync:
+                next_sync = loop.time() + self.settings['sync_interval']
+                self._sync()
+            due = self._pop_due(loop.time())
+            if not due:
+                continue
+            try:
+                await self.poll(due)
+            except Exception as e:
+                logger.error(f"快递跟踪轮询失败: {e}")
+                for mail_no in due:
+                    if mail_no not in self._due:
+                        self._schedule(mail_no, self.settings['retry_interval'])
+
+    # ---------------------- 轮询 ----------------------
+
+    async def poll(self, mail_nos: Iterable[str]):
+        """并发查询一批单号，发送提醒，并把有变化的记录写回提醒文件"""
+        reminders = json_store.get(EXPRESS_REMIND_FILE, default={})
+        checks = [(mail_no, reminders.get(mail_no)) for mail_no in mail_nos]
+        checks = [(mail_no, dict(info)) for mail_no, info in checks if isinstance(info, dict)]
+        if not checks:
+            return
+        outcomes = await asyncio.gather(*(self._check(mail_no, info) for mail_no, info in checks))
+
+        # 单号 -> 新记录（None 表示删除），没有变化的单号不写回
+        changes = {mail_no: info for (mail_no, _), (changed, info) in zip(checks, outcomes) if changed}
+        if not changes:
+            return
+
+        def apply(data):
+            for mail_no, info in changes.items():
+                if info is None:
+                    data.pop(mail_no, None)
+                elif mail_no in data:  # 检查期间被删除的单号不再写回
+                    data[mail_no] = info
+        try:
+            await json_store.update(EXPRESS_REMIND_FILE, apply, default={})
+        except Exception as e:
+            logger.error(f"保存快递提醒数据失败: {e}")
+        logger.debug(f"快递跟踪：查询 {len(checks)} 个单号，{len(changes)} 个有变化")
+
+    async def _check(self, mail_no: str, info: dict):
+        """查询一个单号，返回 (是否有变化, 新记录或None)；未删除的单号按状态重新安排查询"""
+        try:
+            result = await self.query(mail_no)
+        except ExpressQueryError as e:
+            logger.error(f"快递查询失败: {mail_no}, {e}")
+            self._schedule(mail_no, self.settings['retry_interval'])
+            return False, info
+        except Exception as e:
+            logger.error(f"检查快递更新失败: {mail_no}, {e}")
+            self._schedule(mail_no, self.settings['retry_interval'])
+            return False, info
+
+        if result.delivered:
+            reply = f"📦 快递已签收提醒\n"
+            reply += f"单号：{mail_no}\n"
+            reply += f"状态：{result.status}\n"
+            if result.traces:
+                reply += f"签收信息：{result.latest_desc}\n"
+                reply += f"签收时间：{result.latest_time}\n"
+            reply += "\n✅ 已自动取消此单号的提醒"
+            # 无论是否发送成功，都删除此单号
+            await self._notify(info, reply)
+            self._unchanged.pop(mail_no, None)
+            return True, None
+
+        changed = False
+        if result.traces and result.latest_time != info.get("last_update_time"):
+            reply = f"📦 快递状态更新提醒\n"
+            reply += f"单号：{mail_no}\n"
+            reply += f"状态：{result.status}\n"
+            reply += f"最新信息：{result.latest_desc}\n"
+            reply += f"时间：{result.latest_time}\n"
+            if not await self._notify(info, reply):
+                logger.error(f"发送提醒失败，删除单号: {mail_no}")
+                self._unchanged.pop(mail_no, None)
+                return True, None
+            info["last_update_time"] = result.latest_time
+            changed = True
+            self._unchanged[mail_no] = 0
+        else:
+            self._unchanged[mail_no] = self._unchanged.get(mail_no, 0) + 1
+
+        self._schedule(mail_no, self.interval_for(result, mail_no))
+        return changed, info
+
+    async def _notify(self, info: dict, reply: str) -> bool:
+        """优先在群里@用户提醒，失败时私信"""
+        context = self._context
+        group_id = info.get("group_id")
+        user_id = info.get("user_id")
+        if group_id and user_id:
+            try:
+                # 群消息添加艾特
+                await context.send_group_message(group_id, f"[CQ:at,qq={user_id}] " + reply)
+                return True
+            except Exception as e:
+                logger.error(f"发送群消息失败: {e}")
+        # 如果群消息发送失败，尝试私信
+        if user_id:
+            try:
+                await context.send_private_message(user_id, reply)
+                return True
+            except Exception as e:
+                logger.error(f"发送私信失败: {e}")
+        return False
+
+
+# 全局实例
+express_tracker = ExpressTracker()
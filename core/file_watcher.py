@@ -0,0 +1,425 @@
+# core/file_watcher.py
+# 文件监控服务：Linux下使用inotify事件驱动，其他平台回退为轮询，支持去抖和原子重命名写入
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import re
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from logger_config import get_logger
+
+logger = get_logger("FileWatcher")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# inotify 常量（见 <sys/inotify.h>）
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# 监听目录而非文件本身：写临时文件再rename的原子替换会产生IN_MOVED_TO，
+# 普通写入在关闭时产生IN_CLOSE_WRITE，不会在写到一半时触发回调
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE
+               | IN_ATTRIB | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct('iIII')
+_GLOB_CHARS = re.compile(r'[*?\[]')
+
+ChangeCallback = Callable[[List[str]], None]
+
+
+def _glob_to_regex(pattern: str) -> re.Pattern:
+    """把glob转换为锚定的正则：* 和 ? 不跨越目录，**/ 匹配任意层目录"""
+    i, n = 0, len(pattern)
+    parts = []
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+            continue
+        if c == '*':
+            parts.append('[^/]*')
+        elif c == '?':
+            parts.append('[^/]')
+        elif c == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                parts.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                parts.append(f'[{body}]')
+                i = end
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return re.compile('^' + ''.join(parts) + '$')
+
+
+def _normalize(path: str) -> str:
+    if not os.path.isabs(path):
+        path = os.path.join(PROJECT_ROOT, path)
+    return os.path.normpath(path).replace(os.sep, '/')
+
+
+class Subscription:
+    """一个路径或glob的订阅"""
+
+    def __init__(self, pattern: str, callback: ChangeCallback):
+        self.pattern = _normalize(pattern)
+        self.callback = callback
+        self.is_glob = bool(_GLOB_CHARS.search(self.pattern))
+        if self.is_glob:
+            # 监听根目录为第一个通配符之前的目录
+            prefix = _GLOB_CHARS.split(self.pattern, 1)[0]
+            self.root = prefix.rsplit('/', 1)[0] or '/'
+            self.recursive = '**' in self.pattern or '/' in self.pattern[len(self.root) + 1:]
+            self._regex = _glob_to_regex(self.pattern)
+        else:
+            self.root = os.path.dirname(self.pattern)
+            self.recursive = False
+            self._regex = None
+
+    def matches(self, path: str) -> bool:
+        if self._regex is None:
+            return path == self.pattern
+        return bool(self._regex.match(path))
+
+    def existing_matches(self) -> List[str]:
+        """列出当前磁盘上匹配的文件（用于事件队列溢出后的全量补偿）"""
+        if not self.is_glob:
+            return [self.pattern]
+        result = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = f"{dirpath.replace(os.sep, '/')}/{filename}"
+                if self.matches(path):
+                    result.append(path)
+            if not self.recursive:
+                break
+        return result
+
+
+class _Inotify:
+    """基于ctypes的最小inotify封装"""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(_WATCH_MASK))
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout: float) -> List[Tuple[int, int, str]]:
+        """等待并读取事件，返回 (wd, mask, name) 列表"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buf):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            name = buf[offset:offset + length].split(b'\0', 1)[0]
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class FileWatcher:
+    """文件监控服务
+
+    任意模块都可以通过 subscribe() 订阅一个路径或glob（相对路径以项目根目录为基准）。
+    回调在监控线程中以去抖后的变化文件列表调用，应只做轻量工作（如刷新缓存）。
+    """
+
+    def __init__(self, debounce: float = 0.2, poll_interval: float = 1.0, use_inotify: Optional[bool] = None):
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._use_inotify = sys.platform.startswith('linux') if use_inotify is None else use_inotify
+        self._subscriptions: Dict[int, Subscription] = {}
+        self._next_token = 1
+        self._lock = threading.Lock()
+        self._pending: Dict[str, float] = {}  # path -> 最近一次事件时间
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        # inotify 状态
+        self._inotify: Optional[_Inotify] = None
+        self._wd_to_dir: Dict[int, str] = {}
+        self._dir_to_wd: Dict[str, int] = {}
+        self._recursive_dirs: Set[str] = set()
+
+        # 轮询状态：目录 -> {文件路径: (mtime_ns, size)}
+        self._poll_state: Dict[str, Dict[str, Tuple[int, int]]] = {}
+
+    @property
+    def backend(self) -> str:
+        return 'inotify' if self._inotify is not None else 'polling'
+
+    def subscribe(self, pattern: str, callback: ChangeCallback) -> int:
+        """订阅路径或glob的变化，返回用于取消订阅的token"""
+        sub = Subscription(pattern, callback)
+        with self._lock:
+            token = self._next_token
+            self._next_token += 1
+            self._subscriptions[token] = sub
+            if self._running:
+                self._watch_root(sub.root, sub.recursive)
+        logger.debug(f"新增文件订阅: {sub.pattern}")
+        return token
+
+    def unsubscribe(self, token: int):
+        """取消订阅（已建立的目录监听保留到stop为止）"""
+        with self._lock:
+            self._subscriptions.pop(token, None)
+
+    def start(self):
+        """启动监控线程"""
+        if self._running:
+            return
+        if self._use_inotify:
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError) as e:
+                logger.warning(f"inotify不可用，回退为轮询: {e}")
+                self._inotify = None
+        with self._lock:
+            self._running = True
+            for sub in self._subscriptions.values():
+                self._watch_root(sub.root, sub.recursive)
+        self._thread = threading.Thread(target=self._watch_loop, name="FileWatcher", daemon=True)
+        self._thread.start()
+        logger.info(f"文件监控已启动（{self.backend}）")
+
+    def stop(self):
+        """停止监控线程"""
+        if not self._running:
+            return
+        self._running = False
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._wd_to_dir.clear()
+        self._dir_to_wd.clear()
+        self._recursive_dirs.clear()
+        self._poll_state.clear()
+        logger.info("文件监控已停止")
+
+    # ---------------------- 目录监听 ----------------------
+
+    def _watch_root(self, root: str, recursive: bool):
+        """为订阅根目录建立监听；目录尚不存在时在后续循环中重试"""
+        if recursive:
+            self._recursive_dirs.add(root)
+        if not os.path.isdir(root):
+            self._poll_state.setdefault(root, None)
+            return
+        self._add_dir(root)
+        if recursive:
+            for dirpath, dirnames, _ in os.walk(root):
+                for dirname in dirnames:
+                    self._add_dir(f"{dirpath.replace(os.sep, '/')}/{dirname}")
+
+    def _add_dir(self, directory: str):
+        if self._inotify is not None:
+            if directory in self._dir_to_wd:
+                return
+            try:
+                wd = self._inotify.add_watch(directory)
+            except OSError as e:
+                logger.warning(f"无法监听目录 {directory}: {e}")
+                return
+            self._wd_to_dir[wd] = directory
+            self._dir_to_wd[directory] = wd
+        else:
+            if self._poll_state.get(directory) is None:
+                self._poll_state[directory] = self._scan_dir(directory)
+
+    def _is_under_recursive_root(self, directory: str) -> bool:
+        return any(directory == root or directory.startswith(root + '/') for root in self._recursive_dirs)
+
+    def _retry_missing_dirs(self):
+        """补建之前不存在的订阅根目录的监听"""
+        for directory in [d for d, state in self._poll_state.items() if state is None]:
+            if os.path.isdir(directory):
+                self._poll_state.pop(directory, None)
+                self._watch_root(directory, directory in self._recursive_dirs)
+                # 目录刚出现，其中已有的文件视为新建
+                for entry in self._scan_dir(directory):
+                    self._mark_changed(entry)
+
+    # ---------------------- 主循环 ----------------------
+
+    def _watch_loop(self):
+        while self._running:
+            try:
+                timeout = self._next_timeout()
+                if self._inotify is not None:
+                    self._process_inotify(self._inotify.read_events(timeout))
+                else:
+                    time.sleep(timeout)
+                    self._poll_once()
+                with self._lock:
+                    self._retry_missing_dirs()
+                self._flush_pending()
+            except Exception as e:
+                logger.error(f"文件监控循环出错: {e}")
+                time.sleep(1)
+
+    def _next_timeout(self) -> float:
+        if self._pending:
+            oldest = min(self._pending.values())
+            return max(0.0, min(self.poll_interval, oldest + self.debounce - time.monotonic()))
+        return self.poll_interval
+
+    def _process_inotify(self, events: List[Tuple[int, int, str]]):
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                logger.warning("inotify事件队列溢出，对所有订阅进行全量补偿")
+                with self._lock:
+                    subs = list(self._subscriptions.values())
+                for sub in subs:
+                    for path in sub.existing_matches():
+                        self._mark_changed(path)
+                continue
+
+            directory = self._wd_to_dir.get(wd)
+            if directory is None:
+                continue
+
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                # 目录被删除或移走，等待重新出现后再补建监听
+                with self._lock:
+                    self._wd_to_dir.pop(wd, None)
+                    self._dir_to_wd.pop(directory, None)
+                    self._poll_state[directory] = None
+                continue
+
+            path = f"{directory}/{name}" if name else directory
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and self._is_under_recursive_root(path):
+                    with self._lock:
+                        self._watch_root(path, True)
+                continue
+            self._mark_changed(path)
+
+    def _scan_dir(self, directory: str) -> Dict[str, Tuple[int, int]]:
+        state = {}
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_file():
+                        st = entry.stat()
+                        state[f"{directory}/{entry.name}"] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+        return state
+
+    def _poll_once(self):
+        with self._lock:
+            directories = [d for d, state in self._poll_state.items() if state is not None]
+        for directory in directories:
+            if not os.path.isdir(directory):
+                old = self._poll_state.get(directory) or {}
+                for path in old:
+                    self._mark_changed(path)
+                self._poll_state[directory] = None
+                continue
+            old = self._poll_state.get(directory) or {}
+            new = self._scan_dir(directory)
+            for path in set(old) | set(new):
+                if old.get(path) != new.get(path):
+                    self._mark_changed(path)
+            self._poll_state[directory] = new
+            if self._is_under_recursive_root(directory):
+                try:
+                    with os.scandir(directory) as it:
+                        for entry in it:
+                            if entry.is_dir():
+                                sub_dir = f"{directory}/{entry.name}"
+                                if sub_dir not in self._poll_state:
+                                    self._poll_state[sub_dir] = {}
+                except OSError:
+                    pass
+
+    # ---------------------- 去抖与分发 ----------------------
+
+    def _mark_changed(self, path: str):
+        self._pending[path] = time.monotonic()
+
+    def _flush_pending(self):
+        if not self._pending:
+            return
+        now = time.monotonic()
+        ready = [path for path, ts in self._pending.items() if now - ts >= self.debounce]
+        if not ready:
+            return
+        for path in ready:
+            del self._pending[path]
+
+        with self._lock:
+            subs = list(self._subscriptions.values())
+        # 同一回调订阅了多个路径时合并为一次调用
+        batches: Dict[ChangeCallback, List[str]] = {}
+        for sub in subs:
+            matched = [path for path in ready if sub.matches(path)]
+            if matched:
+                batch = batches.setdefault(sub.callback, [])
+                batch.extend(path for path in matched if path not in batch)
+        for callback, paths in batches.items():
+            try:
+                callback(paths)
+            except Exception as e:
+                logger.error(f"执行文件变化回调时出错 ({paths}): {e}")
+
+
+# 全局文件监控实例
+file_watcher = FileWatcher()
@@ -0,0 +1,110 @@
+# core/heartbeat_scheduler.py
+# 心跳截止时间调度器：所有账号的心跳截止时间放在一个最小堆中，只用一个事件循环定时器等待最早的截止时间
+#
+# 每个 key（账号的健康状态机）在堆中最多一个有效条目。收到心跳时截止时间只会后移，此时只更新记录、不动堆；
+# 旧条目到期弹出时发现截止时间已后移，再按新的截止时间放回堆中。因此每次心跳是 O(1)，
+# 每个截止时间周期每个账号最多一次 O(log n) 的堆操作，不再为每个账号/每次心跳创建任务或定时器
+
+import asyncio
+import heapq
+import itertools
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from logger_config import get_logger
+
+logger = get_logger("HeartbeatScheduler")
+
+class HeartbeatScheduler:
+    """按 key 维护心跳截止时间，到期时调用对应的回调"""
+
+    def __init__(self):
+        self._deadlines: Dict[Hashable, Tuple[float, Callable[[], None]]] = {}  # key -> (截止时间, 回调)
+        self._queued: Dict[Hashable, float] = {}  # key -> 堆中有效条目的时间
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._counter = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at: Optional[float] = None
+        self.fired = 0  # 已触发的超时次数
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key) -> bool:
+        return key in self._deadlines
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable[[], None]):
+        """设置或刷新 key 的截止时间（delay 秒后），到期时调用 callback；不在事件循环中调用时抛出 RuntimeError"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._reset(loop)
+        deadline = loop.time() + delay
+        self._deadlines[key] = (deadline, callback)
+        queued_at = self._queued.get(key)
+        if queued_at is not None and queued_at <= deadline:
+            # 堆中已有更早的条目，弹出时再按新的截止时间放回
+            return
+        self._push(key, deadline)
+        if self._timer_at is None or deadline < self._timer_at:
+            self._arm(deadline)
+
+    def cancel(self, key: Hashable):
+        """取消 key 的截止时间（堆中的条目弹出时丢弃）"""
+        self._deadlines.pop(key, None)
+
+    def remaining(self, key: Hashable) -> Optional[float]:
+        """距离截止时间的秒数，没有截止时间时为None"""
+        entry = self._deadlines.get(key)
+        if entry is None or self._loop is None:
+            return None
+        return entry[0] - self._loop.time()
+
+    def _push(self, key: Hashable, deadline: float):
+        self._queued[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), key))
+
+    def _arm(self, when: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = self._loop.call_at(when, self._run)
+        self._timer_at = when
+
+    def _reset(self, loop: asyncio.AbstractEventLoop):
+        """切换到新的事件循环（重启或回放环境），旧循环中的截止时间全部作废"""
+        if self._timer is not None:
+            self._timer.cancel()
+        self._loop = loop
+        self._timer = None
+        self._timer_at = None
+        self._deadlines.clear()
+        self._queued.clear()
+        self._heap.clear()
+
+    def _run(self):
+        self._timer = None
+        self._timer_at = None
+        now = self._loop.time()
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            queued_at, _, key = heapq.heappop(heap)
+            if self._queued.get(key) != queued_at:
+                continue  # 截止时间提前时留下的旧条目
+            entry = self._deadlines.get(key)
+            if entry is None:
+                del self._queued[key]  # 已取消
+                continue
+            deadline, callback = entry
+            if deadline > now:
+                self._push(key, deadline)  # 期间收到过心跳，按新的截止时间放回
+                continue
+            del self._queued[key]
+            del self._deadlines[key]
+            self.fired += 1
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"处理 {key} 的心跳超时时出错: {e}")
+        if heap and (self._timer_at is None or heap[0][0] < self._timer_at):
+            self._arm(heap[0][0])
+
+# 创建全局实例
+heartbeat_scheduler = HeartbeatScheduler()
@@ -6,6 +6,7 @@ import aiohttp
 from aiohttp import web
 from logger_config import get_logger, log_exception
 from typing import Callable, Awaitable, List
+from core.metrics import metrics
 
 logger = get_logger("HttpServer")
 
@@ -30,4 +31,22 @@ async def start_http_servers(context, handler: Callable[[web.Request], Awaitable
         runners.append(runner)
 
     # runners 需要在程序生命周期内保持引用，这里简单返回，由调用者管理
-    return runners
\ No newline at end of file
+    return runners
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """输出 Prometheus 文本格式的指标"""
+    return web.Response(body=metrics.render().encode('utf-8'),
+                        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+
+async def start_metrics_server(host: str = '127.0.0.1', port: int = 9464) -> web.AppRunner:
+    """在本地端口启动指标服务（GET /metrics），返回 runner 供退出时清理"""
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info(f"指标服务已启动: http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,435 @@
+# core/join_request_processor.py
+# 加群申请处理：申请进入有界队列，由固定数量的工作协程并发审核（黑名单、群配置中的审批/拒绝规则），
+# 同意/拒绝后把同一个群的审批通知和欢迎消息合并发送，每条申请的审核结果写入管理事件日志（kind 为 join_request）
+#
+# 群被分享后短时间内会涌入大量申请，逐条串行处理时每条都要等资料查询和API调用完成，后面的申请要排队几分钟；
+# 这里的审核并发进行（数量受 workers 限制，避免触发风控），资料查询走 profile_cache，黑名单按群缓存为集合
+
+import asyncio
+import contextvars
+from typing import Any, Dict, List, Optional, Tuple
+from logger_config import get_logger, log_exception
+from core.json_store import json_store
+from core.moderation_journal import moderation_journal
+from core.profile_cache import profile_cache, TTLCache
+from utils.api_utils import call_onebot_api
+from utils.message_sender import MessageBuilder
+from utils.task_utils import create_monitored_task
+
+logger = get_logger("JoinRequestProcessor")
+
+# 默认配置，可在 config.yml 的 join_requests 节中覆盖
+DEFAULT_SETTINGS = {
+    'workers': 4,  # 同时审核的申请数
+    'queue_size': 1000,  # 等待审核的申请上限，超出时留给管理员手动处理
+    'notify_interval': 2.0,  # 同一个群的审批通知和欢迎消息合并发送的等待时间（秒）
+    'notify_batch_size': 10,  # 攒够多少条通知时立即发送
+    'verdict_ttl': 600,  # 相同申请（群、用户、验证信息）审核结果的缓存时间（秒）
+    'max_verdicts': 5000,
+}
+
+# 审核结果
+APPROVE = 'approve'
+REJECT = 'reject'
+MANUAL = 'manual'  # 不符合自动审批条件，交给管理员处理
+
+BLACKLIST_REASON = "用户在黑名单中"
+
+
+def _int_value(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _profile_level(info: Optional[dict]) -> Optional[int]:
+    if not info:
+        return None
+    return _int_value(info.get('qqLevel', info.get('level')))
+
+
+def _profile_age(info: Optional[dict]) -> Optional[int]:
+    if not info:
+        return None
+    age = _int_value(info.get('age'))
+    return age if age else None  # 未公开年龄时为0
+
+
+def _split_values(value) -> List[str]:
+    return [item.strip() for item in str(value).split(',') if item.strip()]
+
+
+def match_answer(comment: str, value) -> Optional[str]:
+    """答案条件：优先从“问题：...答案：...”格式中提取答案匹配，否则在整个验证信息中匹配；返回匹配到的答案"""
+    valid_answers = [answer for answer in _split_values(value) if answer != "答案"]
+    if "问题：" in comment and "答案：" in comment:
+        question_pos = comment.find("问题：")
+        answer_pos = comment.find("答案：")
+        # 确保答案在问题之后
+        if answer_pos > question_pos:
+            answer = comment[answer_pos + 3:].strip()
+            for valid_answer in valid_answers:
+                if valid_answer in answer:
+                    return valid_answer
+    for valid_answer in valid_answers:
+        if valid_answer in comment:
+            return valid_answer
+    return None
+
+
+class JoinRequest:
+    """一条加群申请及其审核结果"""
+
+    __slots__ = ('context', 'group_id', 'group_name', 'user_id', 'comment', 'flag', 'account_id',
+                 'info', 'verdict', 'reasons', 'succeeded')
+
+    def __init__(self, context, event: dict):
+        self.context = context
+        self.group_id = str(event.get('group_id', ''))
+        self.group_name = event.get('group_name', '未知群')
+        self.user_id = str(event.get('user_id', ''))
+        self.comment = event.get('comment', '') or ''
+        self.flag = event.get('flag', '')
+        self.account_id = event.get('_account_id')
+        self.info: Optional[dict] = None
+        self.verdict = MANUAL
+        self.reasons: List[str] = []
+        self.succeeded = True
+
+    @property
+    def nickname(self) -> str:
+        return self.info.get('nick', '未知用户') if self.info else '未知用户'
+
+    @property
+    def level(self):
+        return self.info.get('qqLevel', '未知') if self.info else '未知'
+
+
+class JoinRequestProcessor:
+    """加群申请的并发审核队列"""
+
+    def __init__(self):
+        self.settings: Dict[str, Any] = dict(DEFAULT_SETTINGS)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._queued_flags: set = set()
+        self._blacklists: Dict[str, Tuple[Any, frozenset]] = {}  # 群号 -> (群配置数据对象, 黑名单集合)
+        self._verdicts = TTLCache(DEFAULT_SETTINGS['verdict_ttl'], DEFAULT_SETTINGS['max_verdicts'])
+        self._notifications: Dict[str, List[JoinRequest]] = {}  # 群号 -> 等待合并发送的审核结果
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+
+    def configure(self, settings: Optional[Dict[str, Any]]):
+        """应用配置（未配置的项使用默认值），工作协程数量在下次启动时生效"""
+        merged = dict(DEFAULT_SETTINGS)
+        if isinstance(settings, dict):
+            merged.update({k: v for k, v in settings.items() if k in DEFAULT_SETTINGS})
+        self.settings = merged
+        self._verdicts.ttl, self._verdicts.max_size = merged['verdict_ttl'], merged['max_verdicts']
+
+    @property
+    def pending(self) -> int:
+        """等待审核的申请数"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # ---------------------- 队列 ----------------------
+
+    async def start(self):
+        """按当前配置创建队列和工作协程（bot.py 启动时调用，不在任何事件的处理上下文中）"""
+        self._ensure_workers()
+
+    def submit(self, context, event: dict) -> bool:
+        """提交一条加群申请，队列已满或重复提交时返回 False"""
+        self._ensure_workers()
+        request = JoinRequest(context, event)
+        if request.flag and request.flag in self._queued_flags:
+            logger.debug(f"加群申请 {request.flag} 已在队列中，忽略重复提交")
+            return False
+        try:
+            self._queue.put_nowait(request)
+        except asyncio.QueueFull:
+            logger.warning(f"加群申请队列已满，用户 {request.user_id} 在群 {request.group_id} 的申请留给管理员处理")
+            moderation_journal.record('join_request', request.group_id, request.user_id, word="队列已满",
+                                      message=request.comment, action='dropped')
+            return False
+        if request.flag:
+            self._queued_flags.add(request.flag)
+        return True
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._workers:
+            return
+        # 未调用 start() 或事件循环已切换（重启、回放环境），按当前配置重新创建队列和工作协程
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.settings['queue_size'])
+        self._queued_flags.clear()
+        self._notifications.clear()
+        self._flush_tasks.clear()
+        # 工作协程在空的上下文中创建：从 submit() 补建时不继承当前事件的追踪 span，
+        # 否则之后所有申请的 api.* span 都会挂到第一条申请的根 span 下
+        self._workers = [contextvars.Context().run(loop.create_task, self._worker(), name=f"join_request_worker_{i}")
+                         for i in range(max(1, int(self.settings['workers'])))]
+
+    async def close(self, timeout: float = 10.0):
+        """等待队列中的申请处理完，发送剩余的通知"""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"退出时仍有 {self.pending} 条加群申请未处理")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for task in list(self._flush_tasks.values()):
+            task.cancel()
+        for group_id in list(self._notifications):
+            await self._flush_notifications(group_id)
+
+    async def _worker(self):
+        while True:
+            request = await self._queue.get()
+            try:
+                await self._process(request)
+            except Exception as e:
+                log_exception(logger, f"处理用户 {request.user_id} 在群 {request.group_id} 的加群申请时发生异常", e)
+            finally:
+                self._queued_flags.discard(request.flag)
+                self._queue.task_done()
+
+    # ---------------------- 审核 ----------------------
+
+    def is_blacklisted(self, group_id, user_id) -> bool:
+        """用户是否在群黑名单中（黑名单集合按群缓存，群配置文件变化时重建）"""
+        group_id = str(group_id)
+        group_config = json_store.get(f"data/group_config/{group_id}.json", default={})
+        cached = self._blacklists.get(group_id)
+        if cached is None or cached[0] is not group_config:
+            blacklist = group_config.get("blacklist", ()) if isinstance(group_config, dict) else ()
+            cached = (group_config, frozenset(str(user) for user in blacklist))
+            self._blacklists[group_id] = cached
+        return str(user_id) in cached[1]
+
+    async def _process(self, request: JoinRequest):
+        context = request.context
+        logger.info(f"审核加群申请 - 申请人：{request.user_id}, 群：{request.group_name}({request.group_id}), 验证信息: {request.comment}")
+
+        root_user_id = context.get_config_value("Root_user")
+        if root_user_id and request.user_id == str(root_user_id):
+            logger.info(f"ROOT 用户 {request.user_id} 申请加群，无条件通过，不记录成员信息。")
+            await self._approve_root_user(request)
+            return
+
+        if self.is_blacklisted(request.group_id, request.user_id):
+            logger.info(f"用户 {request.user_id} 在群 {request.group_id} 的黑名单中，拒绝其加群申请")
+            request.verdict, request.reasons = REJECT, [BLACKLIST_REASON]
+        else:
+            await self._evaluate(request)
+
+        if request.verdict in (APPROVE, REJECT):
+            request.succeeded = await self._set_request(request, request.verdict == APPROVE)
+        moderation_journal.record('join_request', request.group_id, request.user_id,
+                                  word=', '.join(request.reasons), message=request.comment,
+                                  action=request.verdict if request.succeeded else f"{request.verdict}_failed")
+        self._queue_notification(request)
+
+    async def _evaluate(self, request: JoinRequest):
+        """按群配置中的规则审核：先检查 event_rejections（命中即拒绝），再检查 event_approvals（任一条件满足即通过）"""
+        context = request.context
+        group_config = context.get_group_config(request.group_id) or {}
+        config_data = json_store.get(f"data/group_config/{request.group_id}.json", default={})
+
+        # 相同的申请（用户重复申请）在群配置未变化时直接使用缓存的结果
+        cache_key = (request.group_id, request.user_id, request.comment)
+        cached = self._verdicts.get(cache_key)
+        if cached is not None and cached[0] is config_data:
+            _, request.verdict, request.reasons, request.info = cached
+            logger.debug(f"使用缓存的加群审核结果: {request.user_id} -> {request.verdict}")
+            return
+
+        try:
+            request.info = await profile_cache.get_user(context, request.user_id, account_id=request.account_id)
+            if not request.info:
+                logger.warning(f"获取申请人 {request.user_id} 信息失败")
+        except Exception as e:
+            log_exception(logger, f"获取申请人 {request.user_id} 信息时发生异常", e)
+
+        rejections = group_config.get("event_rejections") or []
+        approvals = group_config.get("event_approvals")
+        reasons = self._match_rejections(request, rejections)
+        if reasons:
+            request.verdict, request.reasons = REJECT, reasons
+        elif approvals:
+            matched = self._match_approvals(request, approvals)
+            if matched:
+                request.verdict, request.reasons = APPROVE, matched
+            else:
+                request.verdict, request.reasons = MANUAL, ["不符合自动审批条件"]
+        else:
+            request.verdict, request.reasons = MANUAL, ["未配置自动审批条件"]
+        if request.info is not None or request.verdict != MANUAL:
+            self._verdicts.set(cache_key, (config_data, request.verdict, request.reasons, request.info))
+
+    @staticmethod
+    def _match_rejections(request: JoinRequest, rejections: list) -> List[str]:
+        """拒绝规则：level/age 低于设定值，或验证信息包含 keyword 中的任一关键词；资料获取失败时不按等级/年龄拒绝"""
+        reasons = []
+        for rule in rejections:
+            rule_type = rule.get("type")
+            value = rule.get("value")
+            if rule_type == "level":
+                level, required = _profile_level(request.info), _int_value(value)
+                if level is not None and required is not None and level < required:
+                    reasons.append(f"等级低于{required}")
+            elif rule_type == "age":
+                age, required = _profile_age(request.info), _int_value(value)
+                if age is not None and required is not None and age < required:
+                    reasons.append(f"年龄低于{required}")
+            elif rule_type == "keyword":
+                for keyword in _split_values(value):
+                    if keyword in request.comment:
+                        reasons.append(f"验证信息包含“{keyword}”")
+                        break
+            else:
+                logger.warning(f"无效的拒绝规则类型: {rule_type}")
+        return reasons
+
+    @staticmethod
+    def _match_approvals(request: JoinRequest, approvals: list) -> List[str]:
+        """审批条件：level/age 不低于设定值，或验证信息中包含 answer 中的任一答案"""
+        matched = []
+        for approval in approvals:
+            approval_type = approval.get("type")
+            approval_value = approval.get("value")
+            if approval_type == "level":
+                required = _int_value(approval_value)
+                level = _profile_level(request.info)
+                if required is None:
+                    logger.warning(f"无效的等级值: {approval_value}")
+                elif level is not None and level >= required:
+                    matched.append(f"等级条件: {required}")
+            elif approval_type == "age":
+                required = _int_value(approval_value)
+                age = _profile_age(request.info)
+                if required is None:
+                    logger.warning(f"无效的年龄值: {approval_value}")
+                elif age is not None and age >= required:
+                    matched.append(f"年龄条件: {required}")
+            elif approval_type == "answer":
+                answer = match_answer(request.comment, approval_value)
+                if answer is not None:
+                    matched.append(f"答案条件：{answer}")
+        return matched
+
+    # ---------------------- 执行 ----------------------
+
+    @staticmethod
+    async def _set_request(request: JoinRequest, approve: bool) -> bool:
+        api_params = {
+            "flag": request.flag,
+            "sub_type": "add",
+            "approve": approve,
+        }
+        if not approve:
+            api_params["reason"] = request.reasons[0] if request.reasons else ""
+        response = await call_onebot_api(request.context, 'set_group_add_request', api_params,
+                                         account_id=request.account_id)
+        if response and response.get('success'):
+            logger.info(f"已{'同意' if approve else '拒绝'}用户 {request.user_id} 的加群申请: "
+                        f"{request.group_name}({request.group_id})，原因: {', '.join(request.reasons)}")
+            return True
+        error_msg = response.get('error', '未知错误') if response else '无响应'
+        logger.warning(f"{'同意' if approve else '拒绝'}加群申请失败: {error_msg}")
+        return False
+
+    async def _approve_root_user(self, request: JoinRequest):
+        request.verdict, request.reasons = APPROVE, ["ROOT用户"]
+        if not await self._set_request(request, True):
+            return
+        builder = MessageBuilder(request.context, request.account_id)
+        builder.set_group_id(request.group_id)
+        builder.add_at(request.user_id)
+        builder.add_text(" 欢迎主人回来~")
+        await builder.send()
+        logger.info(f"已发送ROOT用户欢迎消息到群 {request.group_name}({request.group_id})")
+
+    # ---------------------- 通知 ----------------------
+
+    def _queue_notification(self, request: JoinRequest):
+        group_id = request.group_id
+        pending = self._notifications.setdefault(group_id, [])
+        pending.append(request)
+        if len(pending) >= self.settings['notify_batch_size']:
+            task = self._flush_tasks.pop(group_id, None)
+            if task is not None:
+                task.cancel()
+            create_monitored_task(self._flush_notifications(group_id), name=f"join_notify_{group_id}")
+        elif group_id not in self._flush_tasks:
+            # 退出时定时器被取消，攒下的通知由 close() 发送
+            self._flush_tasks[group_id] = create_monitored_task(self._flush_later(group_id),
+                                                                name=f"join_notify_{group_id}", timer=True)
+
+    async def _flush_later(self, group_id: str):
+        await asyncio.sleep(self.settings['notify_interval'])
+        self._flush_tasks.pop(group_id, None)
+        await self._flush_notifications(group_id)
+
+    async def _flush_notifications(self, group_id: str):
+        """把同一个群攒下的审核结果合并为一条通知，通过的用户合并为一条欢迎消息"""
+        requests = self._notifications.pop(group_id, None)
+        if not requests:
+            return
+        context = requests[-1].context
+        account_id = requests[-1].account_id
+        if not (context.websocket and not context.websocket.closed):
+            logger.warning(f"WebSocket连接无效，无法发送 {len(requests)} 条加群审核通知到群 {group_id}")
+            return
+
+        sections = [self._describe(request) for request in requests]
+        builder = MessageBuilder(context, account_id)
+        builder.set_group_id(group_id)
+        builder.add_text("\n\n".join(sections))
+        await builder.send()
+        logger.info(f"已发送 {len(requests)} 条加群审核通知到群 {group_id}")
+
+        approved = [request for request in requests if request.verdict == APPROVE and request.succeeded]
+        if approved:
+            await self._send_welcome(context, account_id, group_id, approved)
+
+    @staticmethod
+    def _describe(request: JoinRequest) -> str:
+        reasons = ', '.join(request.reasons)
+        if request.verdict == REJECT and request.reasons == [BLACKLIST_REASON]:
+            return f"已自动拒绝黑名单用户 {request.user_id} 的加群申请"
+        if not request.succeeded:
+            return (f"⚠️ {'通过' if request.verdict == APPROVE else '拒绝'} {request.nickname}({request.user_id}) "
+                    f"的加群申请失败，请管理员处理")
+        details = f"等级: {request.level}\n验证信息: {request.comment}"
+        if request.verdict == APPROVE:
+            return f"✅ 用户 {request.nickname}({request.user_id}) 的加群申请已自动通过\n{details}\n匹配条件: {reasons}"
+        if request.verdict == REJECT:
+            return f"❌ 已自动拒绝 {request.nickname}({request.user_id}) 的加群申请\n{details}\n原因: {reasons}"
+        return f"❕ 检测到 {request.nickname}({request.user_id}) 的加群申请，但{reasons}，请管理员处理。\n{details}"
+
+    @staticmethod
+    async def _send_welcome(context, account_id, group_id: str, approved: List[JoinRequest]):
+        # 获取群组配置，检查是否有自定义欢迎消息；多人同时通过时合并为一条
+        group_config = context.get_group_config(group_id)
+        if group_config and "welcome_message" in group_config:
+            welcome_msg = group_config["welcome_message"]
+            welcome_msg = welcome_msg.replace("{user_id}", "、".join(request.user_id for request in approved))
+            welcome_msg = welcome_msg.replace("{nickname}", "、".join(request.nickname for request in approved))
+        else:
+            welcome_msg = '欢→迎→光↘临↗～'
+        builder = MessageBuilder(context, account_id)
+        builder.set_group_id(group_id)
+        builder.add_text(welcome_msg)
+        await builder.send()
+        logger.info(f"已发送 {len(approved)} 位用户的欢迎消息到群 {group_id}")
+
+
+# 全局实例
+join_request_processor = JoinRequestProcessor()
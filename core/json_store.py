@@ -0,0 +1,330 @@
+# core/json_store.py
+# data/ 下JSON文件的持久化层：按文件串行化写入、临时文件+rename原子替换、批量合并写盘、损坏时回退到上一份有效副本，
+# 多进程分片时用文件锁串行化跨进程的修改
+
+import asyncio
+import copy
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+from logger_config import get_logger
+from core.file_watcher import file_watcher, PROJECT_ROOT
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，跨进程锁不可用
+    fcntl = None
+
+logger = get_logger("JsonStore")
+
+BACKUP_SUFFIX = ".bak"
+TMP_SUFFIX = ".tmp"
+LOCK_SUFFIX = ".lock"
+
+
+class _Entry:
+    """单个JSON文件的缓存状态"""
+
+    __slots__ = ('data', 'loaded', 'missing', 'source_ok', 'mtime_ns', 'lock', 'dirty', 'flush_future', 'indent')
+
+    def __init__(self):
+        self.data: Any = None
+        self.loaded = False
+        self.missing = False  # 文件不存在（或损坏且没有可用备份），读取时返回各调用方自己的默认值
+        self.source_ok = False  # 当前磁盘文件是否为可解析的有效内容（决定写盘前能否轮换为备份）
+        self.mtime_ns: Optional[int] = None
+        self.lock: Optional[asyncio.Lock] = None
+        self.dirty = False
+        self.flush_future: Optional[asyncio.Future] = None
+        self.indent = 2
+
+
+class JsonStore:
+    """JSON文件持久化层
+
+    - get(): 返回缓存中的数据（只读共享对象），适合每条消息都要查询的热路径
+    - load(): 返回深拷贝，调用方可以自由修改
+    - update(): 在该文件的锁内执行修改函数，短时间内的多次修改合并为一次原子写盘
+
+    文件不存在时不缓存任何调用方的默认值，get()/load() 返回本次调用传入的 default，update() 在 default 的副本上修改。
+
+    文件被外部修改时通过文件监控服务使缓存失效，update() 前还会重新检查文件的修改时间；文件损坏或被截断时回退到 .bak 副本。
+
+    process_lock 为 True 时（多进程分片），update() 持有 <文件>.lock 的 flock 完成读取、修改和替换，
+    每次都从磁盘重新读取并立即写盘，不再合并写入。
+    """
+
+    def __init__(self, flush_delay: float = 0.05):
+        self.flush_delay = flush_delay
+        self.process_lock = False
+        self._entries: Dict[str, _Entry] = {}
+        self._io_lock = threading.Lock()
+        self._watch_token = None
+
+    # ---------------------- 路径与缓存 ----------------------
+
+    @staticmethod
+    def _key(path: str) -> str:
+        if not os.path.isabs(path):
+            path = os.path.join(PROJECT_ROOT, path)
+        return os.path.normpath(path)
+
+    def _entry(self, key: str) -> _Entry:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _Entry()
+            self._entries[key] = entry
+        return entry
+
+    def watch(self, pattern: str = "data/**/*.json"):
+        """订阅文件监控，外部修改时丢弃对应缓存"""
+        if self._watch_token is None:
+            self._watch_token = file_watcher.subscribe(pattern, self._on_files_changed)
+
+    def _on_files_changed(self, paths):
+        for path in paths:
+            key = os.path.normpath(path)
+            entry = self._entries.get(key)
+            if entry is None or not entry.loaded or entry.dirty:
+                continue
+            try:
+                mtime_ns = os.stat(key).st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if mtime_ns != entry.mtime_ns:
+                # 监控线程中只做标记，下次读取时在调用方线程重新加载
+                entry.loaded = False
+                logger.debug(f"检测到 {key} 被外部修改，已丢弃缓存")
+
+    def invalidate(self, path: Optional[str] = None):
+        """丢弃缓存（未写盘的修改不受影响）"""
+        keys = [self._key(path)] if path else list(self._entries)
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None and not entry.dirty:
+                entry.loaded = False
+
+    # ---------------------- 读取 ----------------------
+
+    def _read_file(self, key: str):
+        """读取并解析文件，空文件视为损坏"""
+        with open(key, 'r', encoding='utf-8') as f:
+            content = f.read()
+        if not content.strip():
+            raise ValueError("文件为空")
+        return json.loads(content)
+
+    def _ensure_loaded(self, key: str) -> _Entry:
+        entry = self._entry(key)
+        if entry.loaded:
+            return entry
+
+        data = None
+        entry.source_ok = False
+        entry.mtime_ns = None
+        if os.path.exists(key):
+            try:
+                data = self._read_file(key)
+                entry.source_ok = True
+            except (ValueError, OSError) as e:
+                logger.error(f"JSON文件 {key} 已损坏或被截断 ({e})，尝试回退到备份")
+                backup = key + BACKUP_SUFFIX
+                if os.path.exists(backup):
+                    try:
+                        data = self._read_file(backup)
+                        logger.warning(f"已从备份 {backup} 恢复数据")
+                    except (ValueError, OSError) as backup_error:
+                        logger.error(f"备份文件 {backup} 同样不可用: {backup_error}")
+            try:
+                entry.mtime_ns = os.stat(key).st_mtime_ns
+            except OSError:
+                pass
+
+        entry.data = data
+        entry.missing = data is None
+        entry.loaded = True
+        return entry
+
+    @staticmethod
+    def _reload_if_changed(key: str, entry: _Entry):
+        """文件在磁盘上的修改时间与缓存不一致时丢弃缓存（文件监控的通知可能还没到）"""
+        if not entry.loaded or entry.dirty:
+            return
+        try:
+            mtime_ns = os.stat(key).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns != entry.mtime_ns:
+            entry.loaded = False
+
+    def get(self, path: str, default: Any = None) -> Any:
+        """返回缓存数据（共享对象，调用方不得修改）；文件不存在时返回 default"""
+        entry = self._ensure_loaded(self._key(path))
+        return default if entry.missing else entry.data
+
+    def load(self, path: str, default: Any = None) -> Any:
+        """返回数据的深拷贝"""
+        return copy.deepcopy(self.get(path, default))
+
+    # ---------------------- 写入 ----------------------
+
+    async def update(self, path: str, mutator: Callable[[Any], Any], default: Any = None, indent: int = 2) -> Any:
+        """在文件锁内修改数据并等待写盘完成
+
+        Args:
+            path: 文件路径
+            mutator: 接收当前数据（可原地修改）的函数；返回值原样返回给调用方
+            default: 文件不存在时的初始数据
+
+        Returns:
+            mutator 的返回值
+        """
+        key = self._key(path)
+        entry = self._entry(key)
+        if entry.lock is None:
+            entry.lock = asyncio.Lock()
+
+        async with entry.lock:
+            if self.process_lock and fcntl is not None:
+                return await self._update_locked(key, entry, mutator, default, indent)
+            self._reload_if_changed(key, entry)
+            self._ensure_loaded(key)
+            # 在副本上修改，mutator抛出异常时缓存保持不变
+            working = copy.deepcopy(default if entry.missing else entry.data)
+            result = mutator(working)
+            if not entry.missing and working == entry.data and entry.source_ok:
+                # 内容没有变化，无需写盘
+                return result
+            entry.data = working
+            entry.missing = False
+            entry.indent = indent
+            entry.dirty = True
+            future = self._schedule_flush(key, entry)
+
+        await asyncio.shield(future)
+        return result
+
+    async def _update_locked(self, key: str, entry: _Entry, mutator: Callable[[Any], Any], default: Any, indent: int) -> Any:
+        """持有跨进程文件锁完成读取、修改和替换，写盘完成后才释放锁"""
+        loop = asyncio.get_running_loop()
+        lock_fd = await loop.run_in_executor(None, self._acquire_file_lock, key)
+        try:
+            # 其他进程的写入可能落在同一个修改时间刻度内，持锁时总是重新读取
+            if not entry.dirty:
+                entry.loaded = False
+            self._ensure_loaded(key)
+            working = copy.deepcopy(default if entry.missing else entry.data)
+            result = mutator(working)
+            if not entry.missing and working == entry.data and entry.source_ok:
+                return result
+            content = json.dumps(working, ensure_ascii=False, indent=indent)
+            # 写盘失败时异常传给调用方，缓存保持为磁盘上的内容
+            await loop.run_in_executor(None, self._write_atomic, key, content, entry)
+            entry.data = working
+            entry.missing = False
+            entry.indent = indent
+            entry.dirty = False
+            return result
+        finally:
+            self._release_file_lock(lock_fd)
+
+    @staticmethod
+    def _acquire_file_lock(key: str) -> int:
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        fd = os.open(key + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except OSError:
+            os.close(fd)
+            raise
+        return fd
+
+    @staticmethod
+    def _release_file_lock(fd: int):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def _schedule_flush(self, key: str, entry: _Entry) -> asyncio.Future:
+        """合并短时间内的多次修改，只写盘一次"""
+        if entry.flush_future is None or entry.flush_future.done():
+            loop = asyncio.get_running_loop()
+            entry.flush_future = loop.create_future()
+            loop.call_later(self.flush_delay, lambda: asyncio.ensure_future(self._flush(key, entry)))
+        return entry.flush_future
+
+    async def _flush(self, key: str, entry: _Entry):
+        future = entry.flush_future
+        try:
+            # 持有文件锁保证同一文件的写盘按顺序进行；序列化在事件循环线程，写盘放到线程池
+            async with entry.lock:
+                content = json.dumps(entry.data, ensure_ascii=False, indent=entry.indent)
+                entry.flush_future = None
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self._write_atomic, key, content, entry)
+                # 持有文件锁期间不会有新的修改，写盘成功后缓存与文件一致
+                entry.dirty = False
+        except Exception as e:
+            # dirty 保持为 True：缓存中的修改不会被外部修改检测丢弃，下次 update() 或 flush_all() 时重新写盘
+            logger.error(f"写入JSON文件 {key} 失败: {e}")
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(None)
+
+    def _write_atomic(self, key: str, content: str, entry: _Entry):
+        """写临时文件并fsync，把当前有效文件保留为备份，再rename替换"""
+        with self._io_lock:
+            directory = os.path.dirname(key)
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = key + TMP_SUFFIX
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+
+            if entry.source_ok and os.path.exists(key):
+                self._rotate_backup(key)
+
+            os.replace(tmp_path, key)
+            entry.source_ok = True
+            try:
+                entry.mtime_ns = os.stat(key).st_mtime_ns
+            except OSError:
+                entry.mtime_ns = None
+
+    @staticmethod
+    def _rotate_backup(key: str):
+        """把当前有效文件保留为 .bak（优先硬链接，不复制内容）"""
+        backup = key + BACKUP_SUFFIX
+        backup_tmp = backup + TMP_SUFFIX
+        try:
+            if os.path.exists(backup_tmp):
+                os.remove(backup_tmp)
+            os.link(key, backup_tmp)
+        except OSError:
+            import shutil
+            try:
+                shutil.copy2(key, backup_tmp)
+            except OSError as e:
+                logger.warning(f"无法为 {key} 创建备份: {e}")
+                return
+        os.replace(backup_tmp, backup)
+
+    async def flush_all(self):
+        """等待所有待写盘的修改完成（用于关闭前），之前写盘失败的文件重试一次"""
+        for key, entry in self._entries.items():
+            if entry.dirty and (entry.flush_future is None or entry.flush_future.done()):
+                self._schedule_flush(key, entry)
+        pending = [entry.flush_future for entry in self._entries.values()
+                   if entry.flush_future is not None and not entry.flush_future.done()]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+# 全局JSON持久化实例
+json_store = JsonStore()
+json_store.watch()
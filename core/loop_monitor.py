@@ -0,0 +1,221 @@
+# core/loop_monitor.py
+# 事件循环延迟监控：协程按固定间隔打点测量调度延迟，辅助线程发现打点超时后抓取事件循环线程的调用栈，
+# 延迟恢复后在日志中报告阻塞时长、阻塞位置和当时正在处理的事件，并按模块统计阻塞次数，
+# 用于发现命令中的同步网络请求、同步图片处理等阻塞调用；测试中可用 guard() 让出现阻塞的用例失败
+
+import asyncio
+import contextlib
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from logger_config import get_logger
+from core.metrics import LOOP_LAG_SECONDS, LOOP_BLOCKS
+from core.tracing import tracer, RateLimiter
+
+logger = get_logger("LoopMonitor")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 未抓取到调用栈（阻塞时间短于看门狗的检查间隔）时使用的模块名
+UNKNOWN_MODULE = 'unknown'
+
+# 默认配置，可在 config.yml 的 loop_monitor 节中覆盖
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "interval": 0.1,  # 打点间隔（秒）
+    "threshold": 0.25,  # 调度延迟超过该值视为阻塞（秒）
+    "reports_per_minute": 10,  # 每分钟最多输出的阻塞报告数
+    "stack_depth": 12,  # 报告中保留的最内层栈帧数
+    "asyncio_debug": False,  # 开发时启用 asyncio 调试模式，额外报告执行时间超过阈值的单个回调
+}
+
+
+class LoopBlockedError(AssertionError):
+    """guard() 期间事件循环发生阻塞"""
+
+
+def blocking_module(stack: traceback.StackSummary) -> str:
+    """从调用栈最内层向外找到第一个属于本项目的栈帧，返回其模块名（如 commands.chat_command）"""
+    for frame in reversed(stack):
+        filename = os.path.abspath(frame.filename)
+        if not filename.startswith(PROJECT_ROOT + os.sep) or filename == os.path.abspath(__file__):
+            continue
+        relative = os.path.relpath(filename, PROJECT_ROOT)
+        if relative.split(os.sep, 1)[0] in ('venv', '.venv', 'site-packages'):
+            continue
+        return os.path.splitext(relative)[0].replace(os.sep, '.')
+    return UNKNOWN_MODULE
+
+
+class LoopLagMonitor:
+    """事件循环延迟监控
+
+    - 打点协程：每隔 interval 醒来一次，实际醒来时间与预期的差值即调度延迟
+    - 看门狗线程：距上次打点超过 interval + threshold 仍未醒来，说明事件循环正被同步代码占用，
+      此时抓取事件循环线程的调用栈，并在正在处理的事件上记下阻塞位置（慢事件的 span 树中可以看到）
+    - module_counts: 按阻塞位置所在的项目模块统计次数，同时计入 zhrbot_loop_blocks_total{module}
+    - 看门狗线程每 threshold/2 醒来一次，只读取一个时间戳，常驻运行的开销可以忽略
+    """
+
+    def __init__(self):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.blocked_count = 0
+        self.max_lag = 0.0
+        self.module_counts: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        # (被阻塞前最后一次打点的时间, 阻塞所在模块, 调用栈, 受影响的事件描述)
+        self._captured: Optional[Tuple[float, str, List[str], List[str]]] = None
+        self._report_limiter = RateLimiter(DEFAULT_SETTINGS['reports_per_minute'])
+
+    def configure(self, settings: Optional[Dict[str, Any]]):
+        """应用配置（未配置的项使用默认值）"""
+        merged = dict(DEFAULT_SETTINGS)
+        if isinstance(settings, dict):
+            merged.update({k: v for k, v in settings.items() if k in DEFAULT_SETTINGS})
+        self.settings = merged
+        self._report_limiter.limit = int(merged['reports_per_minute'])
+
+    # ---------------------- 生命周期 ----------------------
+
+    def start(self):
+        """在事件循环中调用"""
+        if not self.settings['enabled'] or self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        if self.settings['asyncio_debug']:
+            loop = asyncio.get_running_loop()
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.settings['threshold']
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat_loop())
+        self._thread = threading.Thread(target=self._watch, name="LoopMonitor", daemon=True)
+        self._thread.start()
+        logger.debug(f"事件循环监控已启动（阈值 {self.settings['threshold']}s）")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    # ---------------------- 打点协程 ----------------------
+
+    async def _beat_loop(self):
+        while True:
+            interval = self.settings['interval']
+            # 从上次打点（首次为 start() 调用时）开始计算，任务启动前的阻塞也能统计到
+            expected = self._last_beat + interval
+            await asyncio.sleep(max(0.0, expected - time.monotonic()))
+            now = time.monotonic()
+            previous_beat = self._last_beat
+            self._last_beat = now
+
+            lag = max(0.0, now - expected)
+            LOOP_LAG_SECONDS.observe(lag)
+            if lag >= self.settings['threshold']:
+                self._report(lag, previous_beat)
+
+    def _report(self, lag: float, previous_beat: float):
+        captured, self._captured = self._captured, None
+        if captured is not None and captured[0] != previous_beat:
+            # 上一次阻塞留下的记录
+            captured = None
+        module = captured[1] if captured is not None else UNKNOWN_MODULE
+
+        self.blocked_count += 1
+        self.max_lag = max(self.max_lag, lag)
+        self.module_counts[module] += 1
+        LOOP_BLOCKS.labels(module).inc()
+        if not self._report_limiter.allow():
+            return
+
+        lines = [f"事件循环阻塞 {lag * 1000:.0f}ms（阈值 {self.settings['threshold'] * 1000:.0f}ms），模块: {module}"]
+        if captured is None:
+            lines.append("阻塞时间较短，未抓取到调用栈")
+        else:
+            _, _, stack, events = captured
+            if events:
+                lines.append("阻塞时正在处理的事件:")
+                lines.extend(f"  {event}" for event in events)
+            lines.append("阻塞位置（最内层在最后）:")
+            lines.append(''.join(stack).rstrip())
+        logger.warning('\n'.join(lines))
+
+    # ---------------------- 看门狗线程 ----------------------
+
+    def _watch(self):
+        while not self._stop.wait(self.settings['threshold'] / 2):
+            last_beat = self._last_beat
+            stalled = time.monotonic() - last_beat
+            if stalled < self.settings['interval'] + self.settings['threshold']:
+                continue
+            if self._captured is not None and self._captured[0] == last_beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            summary = traceback.extract_stack(frame)
+            del frame
+            module = blocking_module(summary)
+            stack = summary.format()[-self.settings['stack_depth']:]
+            events = tracer.describe_active()
+            location = f"{summary[-1].filename}:{summary[-1].lineno} {summary[-1].name}" if summary else "未知"
+            for trace in tracer.active_traces():
+                trace.notes.append(f"事件循环阻塞超过 {stalled * 1000:.0f}ms，模块: {module}，位置: {location}")
+            self._captured = (last_beat, module, stack, events)
+
+    # ---------------------- 统计与测试 ----------------------
+
+    def summary(self) -> str:
+        """阻塞次数最多的模块，例如 'commands.chat_command×3, utils.mcstatus×1'"""
+        return ', '.join(f"{module}×{count}" for module, count in self.module_counts.most_common())
+
+    @contextlib.asynccontextmanager
+    async def guard(self, threshold: float = None):
+        """测试用：块内事件循环发生阻塞时抛出 LoopBlockedError
+
+        监控未运行时临时启动，结束后停止；threshold 可临时调低阈值以发现较短的阻塞。
+        """
+        started_here = not self.running
+        previous_settings = self.settings
+        if threshold is not None:
+            self.settings = {**self.settings, 'threshold': threshold}
+        if started_here:
+            self.settings = {**self.settings, 'enabled': True}
+            self.start()
+        before = Counter(self.module_counts)
+        try:
+            yield self
+            # 让打点协程在退出前至少运行一次，块末尾的阻塞也能被统计到
+            await asyncio.sleep(self.settings['interval'] * 2)
+        finally:
+            if started_here:
+                await self.stop()
+            self.settings = previous_settings
+        blocked = self.module_counts - before
+        if blocked:
+            details = ', '.join(f"{module}×{count}" for module, count in blocked.most_common())
+            raise LoopBlockedError(f"事件循环发生阻塞: {details}")
+
+
+# 全局事件循环监控实例
+loop_monitor = LoopLagMonitor()
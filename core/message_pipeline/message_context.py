@@ -1,27 +1,37 @@
 # core/message_pipeline/message_context.py
 # 消息上下文，用于在管道中传递消息和相关信息
 
+from functools import cached_property
 from typing import Dict, Any, Optional, List, Union
 from core.bot_context import BotContext as CoreBotContext
+from core.events import MessageEvent, Sender
 
 class MessageContext:
-    """消息上下文，封装消息处理过程中的所有相关信息"""
+    """消息上下文，封装消息处理过程中的所有相关信息
     
-    def __init__(self, core_context: CoreBotContext, event: dict):
+    text、nickname、group_config 等字段在第一次访问时才解析/查询，没有处理器用到时不产生开销。
+    处理器通过 requires 声明用到的这些字段，管道编译时校验字段名。
+    """
+    
+    # 按需解析的字段
+    LAZY_FIELDS = frozenset({'account_info', 'text', 'plain_text', 'first_word', 'sender', 'nickname',
+                             'sender_role', 'group_config', 'image_urls'})
+    
+    def __init__(self, core_context: CoreBotContext, event: Union[MessageEvent, dict]):
+        if not isinstance(event, MessageEvent):
+            event = MessageEvent(event)
         self.core_context = core_context  # 核心Bot上下文
-        self.event = event  # 原始事件数据
-        self.message = event.get('message', '')  # 原始消息内容
-        self.user_id = str(event.get('user_id', ''))  # 用户ID
-        self.group_id = event.get('group_id')  # 群ID，私聊为None
-        self.message_id = event.get('message_id')  # 消息ID
-        self.message_type = event.get('message_type', '')  # 消息类型：group/private
-        self.post_type = event.get('post_type', '')  # 事件类型：message/request/notice
+        self.message_event = event  # 事件对象，消息段/发送者按需解析
+        self.event = event.raw  # 原始事件数据
+        self.message = event.message  # 原始消息内容
+        self.user_id = event.user_id  # 用户ID
+        self.group_id = event.group_id  # 群ID，私聊为None
+        self.message_id = event.message_id  # 消息ID
+        self.message_type = event.message_type  # 消息类型：group/private
+        self.post_type = event.post_type  # 事件类型：message/request/notice
         
         # 账号信息（parallel模式下使用）
-        self.account_id = event.get('_account_id')  # 接收消息的账号ID
-        self.account_info = None  # 账号详细信息
-        if self.account_id is not None:
-            self.account_info = core_context.get_account_by_id(self.account_id)
+        self.account_id = event.account_id  # 接收消息的账号ID
         
         # 处理结果
         self.processed = False  # 消息是否已被处理
@@ -34,6 +44,59 @@ class MessageContext:
         # 处理器优先级
         self.priority_handlers: List[str] = []  # 优先处理的处理器列表
         
+        # 各阶段耗时（秒）
+        self.stage_timings: Dict[str, float] = {}
+        
+    # ---------------------- 按需解析的字段 ----------------------
+    
+    @cached_property
+    def account_info(self) -> Optional[dict]:
+        """账号详细信息"""
+        if self.account_id is None:
+            return None
+        return self.core_context.get_account_by_id(self.account_id)
+    
+    @cached_property
+    def text(self) -> str:
+        """消息纯文本（保留CQ码），去除首尾空白"""
+        return self.message_event.parsed.text
+    
+    @cached_property
+    def plain_text(self) -> str:
+        """不含CQ码的纯文本"""
+        return self.message_event.parsed.plain_text
+    
+    @cached_property
+    def first_word(self) -> str:
+        """消息的第一个词，用于匹配无斜杠的中文命令"""
+        words = self.text.split(maxsplit=1)
+        return words[0] if words else ""
+    
+    @cached_property
+    def sender(self) -> Sender:
+        return self.message_event.sender
+    
+    @cached_property
+    def nickname(self) -> str:
+        """发送者名称，优先使用群名片"""
+        return self.sender.display_name or '未知用户'
+    
+    @cached_property
+    def sender_role(self) -> Optional[str]:
+        return self.sender.role
+    
+    @cached_property
+    def group_config(self) -> Optional[dict]:
+        if self.group_id is None:
+            return None
+        return self.core_context.get_group_config(str(self.group_id))
+    
+    @cached_property
+    def image_urls(self) -> List[str]:
+        return self.message_event.image_urls
+    
+    # ---------------------- 状态 ----------------------
+    
     def is_group_message(self) -> bool:
         """判断是否为群消息"""
         return self.message_type == 'group'
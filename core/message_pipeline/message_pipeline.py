@@ -1,20 +1,43 @@
 # core/message_pipeline/message_pipeline.py
 # 消息管道核心类，管理和执行各个处理阶段
+#
+# 阶段和处理器在启动时（以及插件增删阶段/处理器后）编译为固定的调用链，处理消息时按链依次执行，
+# 不再逐条消息查找阶段、排序处理器；每个阶段的耗时记入指标和事件追踪
 
-from typing import Dict, List, Any, Optional
+import time
+from typing import Dict, Hashable, List, Any, Optional, Tuple
 from logger_config import get_logger
+from core.metrics import PIPELINE_STAGE_SECONDS
+from core.tracing import tracer
 from .message_context import MessageContext
-from .pipeline_stage import PipelineStage, StageType
+from .pipeline_stage import PipelineStage, StageType, stage_key_label
 from .processor import MessageProcessor
 
 logger = get_logger("MessagePipeline")
 
+# 处理器 message_types 中可以声明的消息类型
+MESSAGE_TYPES = frozenset({'group', 'private'})
+
+
+def validate_processor(processor: MessageProcessor) -> Optional[str]:
+    """检查处理器声明的 requires/message_types，有误时返回错误描述"""
+    declarations = (('requires', processor.requires, MessageContext.LAZY_FIELDS),
+                    ('message_types', processor.message_types, MESSAGE_TYPES))
+    for attribute, values, known in declarations:
+        if isinstance(values, str) or not isinstance(values, (tuple, list, set, frozenset)):
+            return f"{attribute} 应为元组，实际为 {values!r}"
+        unknown = set(values) - known
+        if unknown:
+            return f"{attribute} 中有未知的值: {', '.join(sorted(map(str, unknown)))}"
+    return None
+
+
 class MessagePipeline:
     """消息处理管道，管理多个处理阶段"""
-    
+
     def __init__(self):
-        self.stages: Dict[StageType, PipelineStage] = {}  # 按类型存储阶段
-        self.stage_order: List[StageType] = [  # 阶段执行顺序
+        self.stages: Dict[Hashable, PipelineStage] = {}  # 按类型存储阶段
+        self.stage_order: List[Hashable] = [  # 阶段执行顺序
             StageType.PRE_PROCESS,
             StageType.COMMAND_DETECTION,
             StageType.COMMAND_PROCESSING,
@@ -22,77 +45,164 @@ class MessagePipeline:
             StageType.POST_PROCESS,
             StageType.RESPONSE_GENERATION
         ]
-    
+        # 编译后的调用链：(阶段, span名称, 阶段耗时直方图)
+        self._chain: Optional[Tuple[tuple, ...]] = None
+
+    # ---------------------- 编译 ----------------------
+
+    def compile(self) -> Tuple[tuple, ...]:
+        """按当前的阶段顺序生成调用链
+
+        处理器在 add_processor/add_stage 时已经校验；直接调用 stage.add_processor 加入的处理器在这里补充校验，
+        声明有误的记录错误并移除，不会让之后的每条消息都失败
+        """
+        chain = []
+        for stage_type in self.stage_order:
+            stage = self.stages.get(stage_type)
+            if stage is None:
+                continue
+            self._drop_invalid(stage)
+            chain.append((stage, f"stage.{stage.name}", PIPELINE_STAGE_SECONDS.labels(stage.name)))
+        self._chain = tuple(chain)
+        logger.debug(f"消息管道已编译: {' -> '.join(stage.name for stage, _, _ in self._chain)}")
+        return self._chain
+
+    def _invalidate(self):
+        """阶段或处理器变化后，下一条消息处理前重新编译"""
+        self._chain = None
+
+    def describe(self, message_types=('group', 'private')) -> List[str]:
+        """按消息类型列出编译后的调用链及各阶段平均耗时"""
+        chain = self._chain or self.compile()
+        lines = []
+        for message_type in message_types:
+            lines.append(f"{message_type}:")
+            for stage, _, histogram in chain:
+                processors = stage.processors_for(message_type)
+                mean = f"{histogram.sum / histogram.count * 1000:.2f}ms" if histogram.count else "-"
+                names = ', '.join(f"{p.name}({p.priority})" for p in processors) or '无处理器'
+                lines.append(f"  {stage.name:<20} 平均 {mean:<10} {names}")
+        return lines
+
+    # ---------------------- 阶段与处理器 ----------------------
+
+    @staticmethod
+    def _drop_invalid(stage: PipelineStage):
+        """移除阶段中声明有误的处理器"""
+        invalid = []
+        for processor in stage.processors:
+            error = validate_processor(processor)
+            if error:
+                logger.error(f"阶段 {stage.name} 中的处理器 {processor.name} 声明有误，已跳过: {error}")
+                invalid.append(processor)
+        if invalid:
+            stage.processors = [p for p in stage.processors if p not in invalid]
+            stage._compiled.clear()
+
     def add_stage(self, stage: PipelineStage):
-        """添加处理阶段"""
+        """添加处理阶段（阶段自带的处理器声明有误时记录错误并跳过）"""
+        self._drop_invalid(stage)
         self.stages[stage.stage_type] = stage
+        self._invalidate()
         logger.debug(f"Added stage: {stage.name} ({len(stage.processors)} processors)")
-    
-    def get_stage(self, stage_type: StageType) -> Optional[PipelineStage]:
+
+    def get_stage(self, stage_type: Hashable) -> Optional[PipelineStage]:
         """获取指定类型的阶段"""
         return self.stages.get(stage_type)
-    
-    def add_processor(self, stage_type: StageType, processor: MessageProcessor):
-        """向指定阶段添加处理器"""
+
+    def add_processor(self, stage_type: Hashable, processor: MessageProcessor) -> bool:
+        """向指定阶段添加处理器；阶段不存在或处理器声明的 requires/message_types 有误时记录错误并跳过，返回 False"""
+        error = validate_processor(processor)
+        if error:
+            logger.error(f"处理器 {processor.name} 声明有误，已跳过: {error}")
+            return False
         if stage_type in self.stages:
             self.stages[stage_type].add_processor(processor)
-            logger.debug(f"Added processor '{processor.name}' (priority {processor.priority}) to stage '{stage_type.value}'")
-        else:
-            logger.error(f"Cannot add processor to non-existent stage: {stage_type.value}")
-    
+            self._invalidate()
+            logger.debug(f"Added processor '{processor.name}' (priority {processor.priority}) to stage '{stage_key_label(stage_type)}'")
+            return True
+        logger.error(f"Cannot add processor to non-existent stage: {stage_key_label(stage_type)}")
+        return False
+
+    def remove_stage(self, stage_type: Hashable):
+        """移除阶段（同时从执行顺序中移除）"""
+        self.stages.pop(stage_type, None)
+        if stage_type in self.stage_order:
+            self.stage_order.remove(stage_type)
+        self._invalidate()
+
+    def remove_owner(self, owner: str):
+        """移除某个插件添加的全部阶段和处理器"""
+        removed = 0
+        for stage_type, stage in list(self.stages.items()):
+            if stage.owner == owner:
+                self.remove_stage(stage_type)
+                removed += 1
+            else:
+                removed += stage.remove_owner(owner)
+        if removed:
+            self._invalidate()
+            logger.info(f"已移除插件 {owner} 添加的 {removed} 个管道阶段/处理器")
+
+    # ---------------------- 执行 ----------------------
+
     async def process_message(self, context: MessageContext) -> bool:
-        """处理消息，按顺序执行各个阶段
-        
+        """处理消息，按编译好的调用链依次执行各个阶段
+
         Args:
             context: 消息上下文
-            
+
         Returns:
             bool: 是否成功处理
         """
-        logger.debug(f"Processing message with pipeline: {context}")
-        
-        for stage_type in self.stage_order:
-            if stage_type not in self.stages:
-                logger.debug(f"Skipping missing stage: {stage_type.value}")
-                continue
-            
-            stage = self.stages[stage_type]
-            logger.debug(f"Executing stage: {stage.name}")
-            
-            # 执行阶段处理
+        chain = self._chain or self.compile()
+        timings = context.stage_timings
+
+        for stage, span_name, histogram in chain:
+            started = time.perf_counter()
+            should_continue = True
             try:
-                should_continue = await stage.execute(context)
-                if not should_continue:
-                    logger.debug(f"Stage {stage.name} requested to stop processing")
-                    break
+                async with tracer.span(span_name):
+                    should_continue = await stage.execute(context)
             except Exception as e:
                 logger.error(f"Error executing stage {stage.name}: {e}", exc_info=True)
                 # 继续执行后续阶段，不要因为一个阶段失败而中断整个流程
-        
-        logger.debug(f"Message processing completed: {context}")
+            finally:
+                elapsed = time.perf_counter() - started
+                timings[stage.name] = elapsed
+                histogram.observe(elapsed)
+            if not should_continue:
+                logger.debug(f"Stage {stage.name} requested to stop processing")
+                break
+
         return context.processed
-    
-    def get_stage_order(self) -> List[StageType]:
+
+    def get_stage_order(self) -> List[Hashable]:
         """获取阶段执行顺序"""
         return self.stage_order.copy()
-    
-    def set_stage_order(self, order: List[StageType]):
+
+    def set_stage_order(self, order: List[Hashable]):
         """设置阶段执行顺序"""
         self.stage_order = order
-        logger.info(f"Set stage order: {[stage.value for stage in order]}")
-    
-    def add_stage_after(self, new_stage: PipelineStage, after_stage_type: StageType):
+        self._invalidate()
+        logger.info(f"Set stage order: {[stage_key_label(stage) for stage in order]}")
+
+    def add_stage_after(self, new_stage: PipelineStage, after_stage_type: Hashable):
         """在指定阶段后添加新阶段"""
         self.add_stage(new_stage)
+        if new_stage.stage_type in self.stage_order:
+            self.stage_order.remove(new_stage.stage_type)
         if after_stage_type in self.stage_order:
             index = self.stage_order.index(after_stage_type)
             self.stage_order.insert(index + 1, new_stage.stage_type)
         else:
             self.stage_order.append(new_stage.stage_type)
-    
-    def add_stage_before(self, new_stage: PipelineStage, before_stage_type: StageType):
+
+    def add_stage_before(self, new_stage: PipelineStage, before_stage_type: Hashable):
         """在指定阶段前添加新阶段"""
         self.add_stage(new_stage)
+        if new_stage.stage_type in self.stage_order:
+            self.stage_order.remove(new_stage.stage_type)
         if before_stage_type in self.stage_order:
             index = self.stage_order.index(before_stage_type)
             self.stage_order.insert(index, new_stage.stage_type)
@@ -1,6 +1,14 @@
 # core/message_pipeline/pipeline_manager.py
 # 管道管理器，负责初始化和管理消息处理管道
+#
+# 群聊和私聊消息都经过这里处理，各处理器在各阶段中的位置（按优先级从高到低）:
+#   pre_process:        message_echo(200) softmute(190) allquote(180) account_context(100) blacklist_filter(90)
+#                       traditional_chinese(80) sensitive_word(70) self_message(60) auto_mute(50)
+#   command_detection:  command_detector
+#   command_processing: command_processor（群聊）/ private_command（私聊）
+#   post_process:       leg_photo
 
+from typing import Union
 from logger_config import get_logger
 from .message_pipeline import MessagePipeline
 from .stages.pre_process_stage import PreProcessStage
@@ -9,8 +17,10 @@ from .stages.command_processing_stage import CommandProcessingStage
 from .stages.post_process_stage import PostProcessStage
 from .stages.response_generation_stage import ResponseGenerationStage
 from .message_context import MessageContext
-from .pipeline_stage import StageType
+from .pipeline_stage import PipelineStage, StageType
+from .processor import MessageProcessor
 from core.bot_context import BotContext as CoreBotContext
+from core.events import MessageEvent
 
 logger = get_logger("PipelineManager")
 
@@ -21,6 +31,8 @@ class PipelineManager:
         self.core_context = core_context
         self.pipeline = MessagePipeline()
         self._initialize_pipeline()
+        # 启动时编译为固定的调用链（声明有误的处理器在添加时已被跳过）
+        self.pipeline.compile()
     
     def _initialize_pipeline(self):
         """初始化管道的各个阶段"""
@@ -37,12 +49,29 @@ class PipelineManager:
         # 添加处理器到相应阶段
         from .processors.command_detector import CommandDetector
         from .processors.command_processor import CommandProcessor
+        from .processors.private_command_processor import PrivateCommandProcessor
+        from .processors.message_echo import MessageEchoProcessor
+        from .processors.group_filters import AccountContextProcessor, BlacklistFilter, SpamFilter, SelfMessageProcessor
+        from .processors.group_features import (
+            SoftmuteProcessor, AllQuoteProcessor, TraditionalChineseProcessor,
+            SensitiveWordProcessor, AutoMuteProcessor, LegPhotoProcessor
+        )
+        
+        # 预处理：控制台回显、软禁言/句句名言、过滤、刷屏和敏感词检测
+        for processor in (MessageEchoProcessor(), SoftmuteProcessor(), AllQuoteProcessor(), AccountContextProcessor(),
+                          BlacklistFilter(), SpamFilter(), TraditionalChineseProcessor(), SensitiveWordProcessor(),
+                          SelfMessageProcessor(), AutoMuteProcessor()):
+            self.pipeline.add_processor(StageType.PRE_PROCESS, processor)
         
         # 添加命令检测器到命令检测阶段
         self.pipeline.add_processor(StageType.COMMAND_DETECTION, CommandDetector())
         
         # 添加命令处理器到命令处理阶段
         self.pipeline.add_processor(StageType.COMMAND_PROCESSING, CommandProcessor())
+        self.pipeline.add_processor(StageType.COMMAND_PROCESSING, PrivateCommandProcessor())
+        
+        # 后处理：图片识别
+        self.pipeline.add_processor(StageType.POST_PROCESS, LegPhotoProcessor())
         
         logger.debug("Message processing pipeline initialized successfully")
     
@@ -50,11 +79,11 @@ class PipelineManager:
         """获取消息处理管道"""
         return self.pipeline
     
-    async def process_message(self, event: dict) -> bool:
+    async def process_message(self, event: Union[MessageEvent, dict]) -> bool:
         """处理消息，创建上下文并通过管道处理
         
         Args:
-            event: 原始消息事件
+            event: 消息事件对象或原始消息事件
             
         Returns:
             bool: 是否成功处理
@@ -65,9 +94,27 @@ class PipelineManager:
         # 通过管道处理消息
         return await self.pipeline.process_message(context)
     
-    def add_processor(self, stage_type, processor):
-        """向指定阶段添加处理器"""
-        self.pipeline.add_processor(stage_type, processor)
+    def add_processor(self, stage_type, processor: MessageProcessor, owner: str = None) -> bool:
+        """向指定阶段添加处理器，owner 为插件ID时卸载插件会一并移除；处理器声明有误时跳过并返回 False"""
+        processor.owner = owner
+        return self.pipeline.add_processor(stage_type, processor)
+    
+    def add_stage(self, stage: PipelineStage, after=None, before=None, owner: str = None):
+        """插入新的阶段，after/before 为已有阶段的类型，都不指定时追加到最后"""
+        stage.owner = owner
+        if after is not None:
+            self.pipeline.add_stage_after(stage, after)
+        elif before is not None:
+            self.pipeline.add_stage_before(stage, before)
+        else:
+            self.pipeline.add_stage_after(stage, None)
+    
+    def remove_owner(self, owner: str):
+        """移除插件添加的阶段和处理器"""
+        self.pipeline.remove_owner(owner)
+    
+    def describe(self):
+        return self.pipeline.describe()
     
     def get_stage(self, stage_type):
         """获取指定类型的阶段"""
@@ -2,7 +2,7 @@
 # 管道阶段基类，定义不同的消息处理阶段
 
 from enum import Enum
-from typing import Dict, Any, List
+from typing import Dict, Any, Hashable, List, Optional, Tuple
 from abc import ABC, abstractmethod
 from .message_context import MessageContext
 
@@ -15,13 +15,22 @@ class StageType(Enum):
     POST_PROCESS = "post_process"  # 后处理阶段
     RESPONSE_GENERATION = "response_generation"  # 响应生成阶段
 
+def stage_key_label(stage_type: Hashable) -> str:
+    """阶段类型的显示名称：内置阶段为 StageType，插件添加的阶段可以直接使用字符串"""
+    return stage_type.value if isinstance(stage_type, StageType) else str(stage_type)
+
 class PipelineStage(ABC):
-    """管道阶段基类"""
+    """管道阶段基类
+    
+    处理器按消息类型预先筛选并按优先级排好序（processors_for），execute 中不再逐条消息排序。
+    """
     
-    def __init__(self, name: str, stage_type: StageType):
+    def __init__(self, name: str, stage_type: Hashable):
         self.name = name  # 阶段名称
-        self.stage_type = stage_type  # 阶段类型
+        self.stage_type = stage_type  # 阶段类型，内置阶段为 StageType，插件阶段可使用字符串
         self.processors: List['MessageProcessor'] = []  # 该阶段的处理器列表
+        self.owner: Optional[str] = None  # 由插件添加时为插件ID
+        self._compiled: Dict[str, Tuple['MessageProcessor', ...]] = {}
         
     @abstractmethod
     async def execute(self, context: MessageContext) -> bool:
@@ -38,6 +47,16 @@ class PipelineStage(ABC):
     def add_processor(self, processor: 'MessageProcessor'):
         """添加处理器到该阶段"""
         self.processors.append(processor)
+        self._compiled.clear()
+    
+    def processors_for(self, message_type: str) -> Tuple['MessageProcessor', ...]:
+        """该类型消息依次执行的处理器（按优先级从高到低）"""
+        compiled = self._compiled.get(message_type)
+        if compiled is None:
+            compiled = tuple(sorted((p for p in self.processors if p.accepts(message_type)),
+                                    key=lambda p: p.priority, reverse=True))
+            self._compiled[message_type] = compiled
+        return compiled
     
     def get_processor(self, name: str) -> 'MessageProcessor':
         """根据名称获取处理器"""
@@ -49,6 +68,14 @@ class PipelineStage(ABC):
     def remove_processor(self, name: str):
         """根据名称移除处理器"""
         self.processors = [p for p in self.processors if p.name != name]
+        self._compiled.clear()
+    
+    def remove_owner(self, owner: str) -> int:
+        """移除某个插件添加的全部处理器，返回移除数量"""
+        before = len(self.processors)
+        self.processors = [p for p in self.processors if p.owner != owner]
+        self._compiled.clear()
+        return before - len(self.processors)
     
     def __str__(self) -> str:
-        return f"PipelineStage(name={self.name}, type={self.stage_type.value}, processors={len(self.processors)})"
+        return f"PipelineStage(name={self.name}, type={stage_key_label(self.stage_type)}, processors={len(self.processors)})"
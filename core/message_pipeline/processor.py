@@ -2,15 +2,26 @@
 # 消息处理器基类，定义处理器的基本接口
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 from .message_context import MessageContext
 
 class MessageProcessor(ABC):
-    """消息处理器基类"""
+    """消息处理器基类
+    
+    子类可以声明:
+        message_types: 处理的消息类型（'group'/'private'），为空表示全部；编译管道时按类型预先筛选，
+            不匹配的处理器不会出现在该类型消息的调用链中
+        requires: 用到的 MessageContext 按需解析字段（见 MessageContext.LAZY_FIELDS）
+    加入管道时校验这两项声明，有未知值的处理器会记录错误并跳过
+    """
+    
+    message_types: Tuple[str, ...] = ()
+    requires: Tuple[str, ...] = ()
     
     def __init__(self, name: str, priority: int = 0):
         self.name = name  # 处理器名称
         self.priority = priority  # 优先级，数字越大优先级越高
+        self.owner: Optional[str] = None  # 由插件添加时为插件ID，卸载插件时据此移除
         
     @abstractmethod
     async def process(self, context: MessageContext) -> bool:
@@ -35,6 +46,10 @@ class MessageProcessor(ABC):
         """
         return True
     
+    def accepts(self, message_type: str) -> bool:
+        """是否处理该类型的消息（编译时判断，运行时的条件判断放在 can_handle 中）"""
+        return not self.message_types or message_type in self.message_types
+    
     def get_name(self) -> str:
         """获取处理器名称"""
         return self.name
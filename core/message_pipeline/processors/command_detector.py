@@ -4,13 +4,15 @@
 from logger_config import get_logger
 from ..processor import MessageProcessor
 from ..message_context import MessageContext
-from utils.message_utils import parse_message
 
 logger = get_logger("CommandDetector")
 
 class CommandDetector(MessageProcessor):
     """命令检测处理器"""
     
+    message_types = ('group', 'private')
+    requires = ('text', 'first_word')
+    
     def __init__(self):
         super().__init__("command_detector", priority=10)
     
@@ -27,21 +29,22 @@ class CommandDetector(MessageProcessor):
         Returns:
             bool: 是否检测到命令
         """
-        # 解析消息内容
-        raw_message = context.event.get('message', '')
-        original_message = parse_message(raw_message).strip()
+        original_message = context.text
         
         # 检查是否为命令
         is_command = False
         
+        if context.is_private_message():
+            # 私聊消息全部交给私聊命令处理器，由其校验Root用户
+            is_command = True
         # 检查是否以斜杠开头
-        if original_message.startswith('/'):
+        elif original_message.startswith('/'):
             is_command = True
             logger.debug(f"Command detected (slash): {original_message}")
         else:
-            # 检查是否为中文命令
+            # 检查是否为中文命令（仅允许中文命令别名无斜杠触发）
             from commands.command_dispatcher import CHINESE_COMMAND_MAPPING
-            first_word = original_message.strip().split()[0] if original_message.strip() else ""
+            first_word = context.first_word
             if first_word in CHINESE_COMMAND_MAPPING or first_word in ['赞我']:
                 is_command = True
                 logger.debug(f"Command detected (Chinese): {original_message}")
@@ -49,7 +52,7 @@ class CommandDetector(MessageProcessor):
         if is_command:
             # 存储命令信息到上下文
             context.add_extra_data("original_message", original_message)
-            context.add_extra_data("raw_message", raw_message)
+            context.add_extra_data("raw_message", context.message)
             return True
         
         return False
@@ -11,6 +11,9 @@ logger = get_logger("CommandProcessor")
 class CommandProcessor(MessageProcessor):
     """命令处理器"""
     
+    message_types = ('group',)
+    requires = ('nickname', 'sender_role', 'first_word')
+    
     def __init__(self):
         super().__init__("command_processor", priority=10)
     
@@ -19,7 +22,7 @@ class CommandProcessor(MessageProcessor):
         return context.post_type == 'message' and context.get_extra_data("command_detected", False)
     
     async def process(self, context: MessageContext) -> bool:
-        """处理命令
+        """处理命令（新版命令处理器会自己发送消息）
         
         Args:
             context: 消息上下文
@@ -27,44 +30,33 @@ class CommandProcessor(MessageProcessor):
         Returns:
             bool: 是否成功处理
         """
+        original_message = context.get_extra_data("original_message")
+        raw_message = context.get_extra_data("raw_message")
+        user_id = context.user_id
+        group_id = context.group_id
+        
+        if original_message.startswith('/'):
+            logger.info(f"收到斜杠命令: {original_message} 来自用户: {user_id} (群: {group_id})")
+        else:
+            logger.info(f"收到无斜杠命令: {context.first_word} 来自用户: {user_id} (群: {group_id})")
+        
+        # 命令处理结果由dispatch_command直接发送，无论成功与否都标记为已处理，不再交给AI等后续处理
+        context.set_processed(self.name)
         try:
-            # 获取命令信息
-            original_message = context.get_extra_data("original_message")
-            raw_message = context.get_extra_data("raw_message")
-            
-            user_id = context.user_id
-            group_id = context.group_id
-            message_id = context.message_id
-            
-            # 获取发送者昵称
-            nickname = "未知用户"
-            if 'sender' in context.event:
-                sender = context.event['sender']
-                nickname = sender.get('card') or sender.get('nickname', '未知用户')
-            
-            # 获取发送者角色
-            sender_role = context.event.get('sender', {}).get('role')
-            
-            logger.debug(f"Processing command: {original_message} from {user_id} in {group_id}")
-            
-            # 调用命令分发器处理命令
-            result = await dispatch_command(
+            await dispatch_command(
                 context.core_context, 
                 original_message, 
                 user_id, 
                 group_id, 
-                nickname, 
+                context.nickname, 
                 raw_message=raw_message, 
                 websocket=context.core_context.websocket, 
-                message_id=message_id, 
-                sender_role=sender_role
+                message_id=context.message_id, 
+                sender_role=context.sender_role,
+                account_id=context.account_id
             )
-            
-            # 命令处理结果会由dispatch_command直接发送，这里标记为已处理
-            context.set_processed("command_processor")
             logger.debug(f"Command processed: {original_message}")
-            
             return True
         except Exception as e:
-            logger.error(f"Error processing command: {e}", exc_info=True)
+            logger.error(f"处理命令 {original_message} 时发生异常: {e}", exc_info=True)
             return False
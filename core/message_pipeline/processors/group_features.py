@@ -0,0 +1,181 @@
+# core/message_pipeline/processors/group_features.py
+# 群消息功能处理器：软禁言撤回、句句名言、繁体转换、敏感词检测、主动禁言、腿照识别
+
+from logger_config import get_logger
+from ..processor import MessageProcessor
+from ..message_context import MessageContext
+from utils.api_utils import call_onebot_api
+from utils.message_sender import MessageBuilder
+
+logger = get_logger("GroupFeatures")
+
+class SoftmuteProcessor(MessageProcessor):
+    """撤回被软禁言用户的消息（Root用户不受限制），之后仍继续处理"""
+
+    message_types = ('group',)
+
+    def __init__(self):
+        super().__init__("softmute", priority=190)
+
+    async def process(self, context: MessageContext) -> bool:
+        from commands.softmute_command import is_user_softmuted
+        group_id = context.group_id
+        user_id = context.user_id
+        if user_id == str(context.core_context.get_config_value("Root_user", "")) or not is_user_softmuted(group_id, user_id):
+            return False
+
+        logger.info(f"检测到软禁言用户 {user_id} 在群 {group_id} 发送消息，尝试撤回")
+        try:
+            recall_result = await call_onebot_api(context.core_context, 'delete_msg', {'message_id': context.message_id},
+                                                  account_id=context.account_id)
+            # 检查API调用是否成功以及业务处理是否成功
+            if recall_result and recall_result.get('success') and recall_result.get('data', {}).get('status') == 'ok':
+                logger.info(f"成功撤回软禁言用户 {user_id} 的消息")
+            else:
+                logger.warning(f"撤回软禁言用户消息失败: {recall_result}")
+        except Exception as e:
+            logger.error(f"撤回消息时发生异常: {e}")
+        return True
+
+class AllQuoteProcessor(MessageProcessor):
+    """句句名言：名单中的用户在信任群发送的每条消息都生成名言图片"""
+
+    message_types = ('group',)
+
+    def __init__(self):
+        super().__init__("allquote", priority=180)
+
+    async def process(self, context: MessageContext) -> bool:
+        from commands.allquote_command import is_user_allquoted
+        from core.trust_manager import trust_manager
+        group_id = context.group_id
+        user_id = context.user_id
+        if not (is_user_allquoted(group_id, user_id) and trust_manager.is_trusted_group(str(group_id))):
+            return False
+
+        logger.info(f"检测到句句名言用户 {user_id} 在群 {group_id} 发送消息，尝试生成名言图片")
+        try:
+            from commands.quote_command import handle_quote_internal
+            # 构建原始消息结构，包含引用消息
+            raw_message_with_reply = [{"type": "reply", "data": {"id": context.message_id}}]
+            await handle_quote_internal(context.core_context, user_id, group_id, raw_message_with_reply, is_configured=True)
+        except Exception as e:
+            logger.error(f"生成名言图片时发生异常: {e}")
+        return True
+
+class TraditionalChineseProcessor(MessageProcessor):
+    """信任群中的繁体消息发送简体转换结果；转换结果存入 extra_data['simplified_text'] 供敏感词检测使用"""
+
+    message_types = ('group',)
+    requires = ('text', 'plain_text')
+
+    def __init__(self):
+        super().__init__("traditional_chinese", priority=80)
+
+    async def process(self, context: MessageContext) -> bool:
+        from utils.message_utils import is_traditional_chinese, convert_to_simplified
+        from core.trust_manager import trust_manager
+        group_id = context.group_id
+        original_message = context.text
+        if not is_traditional_chinese(original_message):
+            return False
+        # 检查群组是否在信任列表中，使用字符串类型确保类型一致
+        if not trust_manager.is_trusted_group(str(group_id)):
+            logger.info(f"群 {group_id} 不在信任列表中，不进行繁体转换")
+            return False
+        # 只对不含CQ码的纯文本进行繁简转换
+        filtered_text = context.plain_text
+        if not filtered_text:
+            return False
+        simplified_text = convert_to_simplified(filtered_text)
+        if not simplified_text:
+            return False
+        context.add_extra_data("simplified_text", simplified_text)
+
+        logger.info(f"发送繁体转换结果到群: {group_id}")
+        core_context = context.core_context
+        if core_context.websocket and not core_context.websocket.closed:
+            async def simplified_message_sent_callback(message_id):
+                logger.debug(f"已发送繁体转换结果到群: {group_id}，消息ID: {message_id}")
+
+            builder = MessageBuilder(core_context, context.account_id)
+            builder.set_group_id(group_id)
+            builder.add_text(f"繁体转换：{simplified_text}")
+            builder.set_callback(simplified_message_sent_callback)
+            await builder.send()
+        return True
+
+class SensitiveWordProcessor(MessageProcessor):
+    """敏感词检测：开启自动撤回的群撤回并终止处理，否则只记录日志并发送报告"""
+
+    message_types = ('group',)
+    requires = ('text', 'group_config')
+
+    def __init__(self):
+        super().__init__("sensitive_word", priority=70)
+
+    async def process(self, context: MessageContext) -> bool:
+        from core.sensitive_word_manager import is_sensitive, log_sensitive_trigger
+        from handlers.group_handler import handle_sensitive_message, send_sensitive_report
+        original_message = context.text
+        text_to_check = context.get_extra_data("simplified_text") or original_message
+        contains_sensitive, sensitive_word, sensitive_reason = is_sensitive(text_to_check)
+        if not contains_sensitive:
+            return False
+
+        group_id = context.group_id
+        user_id = context.user_id
+        group_config = context.group_config
+        # 使用toggle功能控制的配置
+        if group_config and group_config.get('sensitive_word_recall_enabled', False):
+            await handle_sensitive_message(context.core_context, context.event, group_id, user_id, original_message,
+                                           sensitive_word, sensitive_reason, account_id=context.account_id)
+            # 敏感消息已被处理，不再继续
+            context.set_processed(self.name)
+            return True
+
+        # 敏感词功能未启用，仅记录日志并发送报告
+        log_sensitive_trigger(original_message, sensitive_word, group_id, user_id, action="report")
+        logger.debug(f"已记录敏感词触发日志，但未启用自动撤回功能")
+        await send_sensitive_report(context.core_context, group_id, user_id, original_message, sensitive_word)
+        return True
+
+class AutoMuteProcessor(MessageProcessor):
+    """主动禁言：“禁言我”等消息"""
+
+    message_types = ('group',)
+    requires = ('text', 'nickname')
+
+    AUTO_MUTE_COMMANDS = frozenset({'禁言我', '禁我', '塞我口球'})
+
+    def __init__(self):
+        super().__init__("auto_mute", priority=50)
+
+    async def process(self, context: MessageContext) -> bool:
+        if context.text not in self.AUTO_MUTE_COMMANDS:
+            return False
+        from handlers.group_handler import handle_auto_mute
+        # 黑名单用户已在黑名单过滤中忽略
+        await handle_auto_mute(context.core_context, context.user_id, context.nickname, context.group_id,
+                               account_id=context.account_id)
+        context.set_processed(self.name)
+        return True
+
+class LegPhotoProcessor(MessageProcessor):
+    """后处理：消息中的图片交给腿照识别（后台任务），命令消息同样处理"""
+
+    message_types = ('group',)
+    requires = ('nickname', 'image_urls')
+
+    def __init__(self):
+        super().__init__("leg_photo", priority=10)
+
+    def can_handle(self, context: MessageContext) -> bool:
+        # 被过滤的消息（黑名单、敏感消息、主动禁言等）不处理图片，命令消息照常处理
+        return context.handled_by in (None, 'command_processor') and bool(context.image_urls)
+
+    async def process(self, context: MessageContext) -> bool:
+        from handlers.group_handler import handle_image_messages
+        await handle_image_messages(context.core_context, context.event, context.group_id, context.user_id,
+                                    context.nickname, account_id=context.account_id, image_urls=context.image_urls)
+        return True
@@ -0,0 +1,186 @@
+# core/message_pipeline/processors/group_filters.py
+# 群消息过滤处理器：处理账号、黑名单、刷屏检测、机器人自身消息，命中时终止后续处理
+
+from logger_config import get_logger
+from ..processor import MessageProcessor
+from ..message_context import MessageContext
+from core.json_store import json_store
+from core.moderation_journal import moderation_journal
+from core.spam_detector import spam_detector
+from utils.api_utils import call_onebot_api
+from utils.message_sender import MessageBuilder
+
+logger = get_logger("GroupFilters")
+
+class AccountContextProcessor(MessageProcessor):
+    """记录处理该消息的账号供后续发送使用（是否由本账号处理已在 MessageRouter 中按 should_handle_message 判断）"""
+
+    message_types = ('group',)
+
+    def __init__(self):
+        super().__init__("account_context", priority=100)
+
+    async def process(self, context: MessageContext) -> bool:
+        account_id = context.account_id
+        # 设置当前账号ID到上下文变量，供后续消息发送使用
+        if account_id is not None:
+            from core.current_account import set_current_account_id
+            set_current_account_id(account_id)
+            logger.debug(f"设置当前处理账号ID: {account_id}")
+        return False
+
+class BlacklistFilter(MessageProcessor):
+    """忽略群黑名单用户的消息和配置中 blacklist_msg 列出的消息"""
+
+    message_types = ('group',)
+    requires = ('text',)
+
+    def __init__(self):
+        super().__init__("blacklist_filter", priority=90)
+
+    async def process(self, context: MessageContext) -> bool:
+        group_id = context.group_id
+        user_id = context.user_id
+        logger.debug(f"群 {group_id} 中用户 {user_id} 发送消息: {context.text}")
+
+        # 检查用户是否在黑名单中（群配置由json_store缓存，文件变化时自动失效）
+        group_config = json_store.get(f"data/group_config/{group_id}.json", default={})
+        if isinstance(group_config, dict) and user_id in group_config.get("blacklist", ()):
+            logger.info(f"用户 {user_id} 在群 {group_id} 的黑名单中，忽略其消息")
+            context.set_processed(self.name)
+            return True
+
+        # 检查消息是否在黑名单中（完全匹配）
+        blacklist_msg = context.core_context.get_config_value('blacklist_msg', [])
+        if blacklist_msg and context.text in blacklist_msg:
+            logger.info(f"消息 '{context.text}' 在黑名单中，不进行处理，群: {group_id}，用户: {user_id}")
+            context.set_processed(self.name)
+            return True
+        return False
+
+class SpamFilter(MessageProcessor):
+    """刷屏检测：开启 spam_detection 的群中，命中规则的消息按配置撤回/警告/禁言并终止后续处理
+
+    检测本身是 O(1) 的内存操作；warn/mute 对同一用户有冷却时间，刷屏期间只撤回不重复警告
+    """
+
+    message_types = ('group',)
+    requires = ('plain_text', 'group_config', 'sender_role')
+
+    # 警告/禁言时的提示
+    RULE_REASONS = {
+        'mentions': '一次@了过多成员',
+        'flood': '发言过快',
+        'duplicate': '重复发送相同内容',
+        'group_duplicate': '参与刷屏',
+        'group_flood': '群内消息过多',
+    }
+
+    def __init__(self):
+        super().__init__("spam_filter", priority=85)
+
+    def can_handle(self, context: MessageContext) -> bool:
+        group_config = context.group_config
+        return bool(group_config) and group_config.get('spam_detection_enabled', False)
+
+    async def process(self, context: MessageContext) -> bool:
+        core_context = context.core_context
+        group_id = context.group_id
+        user_id = context.user_id
+        if user_id in (str(core_context.get_config_value("Root_user", "")), str(core_context.get_config_value("bot_qq", ""))):
+            return False
+        if spam_detector.settings['exempt_admins'] and context.sender_role in ('admin', 'owner'):
+            return False
+
+        rule = spam_detector.check(group_id, user_id, context.plain_text, context.message_event.parsed.mentions)
+        if rule is None:
+            return False
+        actions = spam_detector.actions_for(rule)
+        if not actions:
+            # 未配置处理动作，只计数
+            return False
+
+        context.set_processed(self.name)
+        if actions == ['ignore']:
+            logger.debug(f"群 {group_id} 触发刷屏规则 {rule}，忽略用户 {user_id} 的消息")
+            return True
+
+        logger.info(f"群 {group_id} 用户 {user_id} 触发刷屏规则 {rule}，处理动作: {', '.join(actions)}")
+        applied = []
+        if 'recall' in actions and await self._call(context, 'delete_msg', {'message_id': context.message_id}):
+            applied.append('recall')
+        if ('warn' in actions or 'mute' in actions) and spam_detector.claim_action(group_id, user_id):
+            reason = self.RULE_REASONS.get(rule, '刷屏')
+            mute_seconds = spam_detector.settings['mute_seconds']
+            if 'mute' in actions and await self._call(context, 'set_group_ban', {
+                    'group_id': group_id, 'user_id': user_id, 'duration': mute_seconds}):
+                applied.append('mute')
+                await self._notify(context, f" {reason}，已被禁言{max(1, mute_seconds // 60)}分钟")
+            elif 'warn' in actions:
+                applied.append('warn')
+                await self._notify(context, f" {reason}，请注意发言")
+        moderation_journal.record('spam', group_id, user_id, word=rule, message=context.plain_text,
+                                  action='+'.join(applied) or 'ignore')
+        return True
+
+    @staticmethod
+    async def _call(context: MessageContext, action: str, params: dict) -> bool:
+        try:
+            result = await call_onebot_api(context.core_context, action, params, account_id=context.account_id)
+        except Exception as e:
+            logger.error(f"刷屏处理调用 {action} 时发生异常: {e}")
+            return False
+        # 检查API调用是否成功以及业务处理是否成功
+        if result and result.get('success') and result.get('data', {}).get('status') == 'ok':
+            return True
+        logger.warning(f"刷屏处理调用 {action} 失败: {result}")
+        return False
+
+    @staticmethod
+    async def _notify(context: MessageContext, text: str):
+        builder = MessageBuilder(context.core_context, context.account_id)
+        builder.set_group_id(str(context.group_id))
+        builder.set_user_id(context.user_id)
+        builder.add_at()
+        builder.add_text(text)
+        await builder.send()
+
+class SelfMessageProcessor(MessageProcessor):
+    """机器人自身在群里发送的消息：只执行其中的指令，不再进入普通消息处理"""
+
+    message_types = ('group',)
+    requires = ('text',)
+
+    def __init__(self):
+        super().__init__("self_message", priority=60)
+
+    async def process(self, context: MessageContext) -> bool:
+        core_context = context.core_context
+        bot_qq = str(core_context.get_config_value("bot_qq", ""))
+        if context.user_id != bot_qq:
+            return False
+
+        original_message = context.text
+        group_id = context.group_id
+        user_id = context.user_id
+        context.set_processed(self.name)
+        logger.debug(f"检测到来自机器人自身在群聊中发送: {original_message}")
+        if not (original_message.startswith('/') or original_message in ['赞我']):
+            logger.debug("该消息不是指令。")
+            return True
+
+        logger.info(f"检测到消息为指令，正在执行: {original_message}")
+        from commands.command_dispatcher import dispatch_command
+        result = await dispatch_command(core_context, original_message, user_id, group_id, "Bot",
+                                        raw_message=context.message, websocket=core_context.websocket)
+        if result is not None and core_context.websocket and not core_context.websocket.closed:
+            async def bot_message_sent_callback(message_id):
+                logger.info(f"已将指令 '{original_message}' 的执行结果发送到 QQ 群 {group_id}，消息ID: {message_id}")
+
+            builder = MessageBuilder(core_context, context.account_id)
+            builder.set_group_id(group_id)
+            builder.add_at(user_id)
+            builder.add_text(f"{result}")
+            builder.set_callback(bot_message_sent_callback)
+            await builder.send()
+        return True
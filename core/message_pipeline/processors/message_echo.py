@@ -0,0 +1,39 @@
+# core/message_pipeline/processors/message_echo.py
+# 控制台消息回显处理器，把收到的群聊/私聊消息以彩色格式输出到控制台
+
+from datetime import datetime
+from logger_config import get_logger, print_colored_message
+from utils.message_codec import strip_cq
+from ..processor import MessageProcessor
+from ..message_context import MessageContext
+
+logger = get_logger("MessageEcho")
+
+class MessageEchoProcessor(MessageProcessor):
+    """控制台消息回显"""
+
+    message_types = ('group', 'private')
+    requires = ('sender',)
+
+    def __init__(self):
+        super().__init__("message_echo", priority=200)
+
+    async def process(self, context: MessageContext) -> bool:
+        # 仅在控制台输出中过滤CQ码，不影响原始消息处理
+        filtered_message = strip_cq(context.message_event.raw_message)
+        sender = context.sender
+        timestamp = datetime.now().strftime('%m-%d %H:%M:%S')
+
+        if context.is_private_message():
+            # 获取用户名，优先使用nickname
+            username = sender.nickname or context.user_id
+            print_colored_message(timestamp, "私信", username, filtered_message)
+            return False
+
+        # 获取群名，优先使用group_name
+        group_name = context.event.get('group_name', f"{context.group_id}")
+        # 获取用户名，优先使用群昵称(card)，然后是nickname，最后是user_id
+        username = sender.display_name or context.user_id
+        logger.debug(f"Sender info: card='{sender.card}', nickname='{sender.nickname}', user_id={context.user_id}, username='{username}'")
+        print_colored_message(timestamp, group_name, username, filtered_message)
+        return False
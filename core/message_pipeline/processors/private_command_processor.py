@@ -0,0 +1,20 @@
+# core/message_pipeline/processors/private_command_processor.py
+# 私聊命令处理器，私聊消息交给 handlers/private_handler 处理（仅Root用户的 /bad 命令）
+
+from ..processor import MessageProcessor
+from ..message_context import MessageContext
+
+class PrivateCommandProcessor(MessageProcessor):
+    """私聊命令处理器"""
+
+    message_types = ('private',)
+    requires = ('text',)
+
+    def __init__(self):
+        super().__init__("private_command", priority=10)
+
+    async def process(self, context: MessageContext) -> bool:
+        from handlers.private_handler import handle_private_message
+        await handle_private_message(context.core_context, context.event, text=context.text)
+        context.set_processed(self.name)
+        return True
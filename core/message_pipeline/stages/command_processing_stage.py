@@ -29,8 +29,8 @@ class CommandProcessingStage(PipelineStage):
             logger.debug("No command detected, skipping command processing")
             return True
         
-        # 按优先级顺序执行处理器
-        sorted_processors = sorted(self.processors, key=lambda p: p.priority, reverse=True)
+        # 按优先级顺序执行处理器（编译时已按消息类型筛选并排序）
+        sorted_processors = self.processors_for(context.message_type)
         
         for processor in sorted_processors:
             if processor.can_handle(context):
@@ -38,8 +38,10 @@ class CommandProcessingStage(PipelineStage):
                     logger.debug(f"Executing command processor: {processor.name}")
                     result = await processor.process(context)
                     if not context.should_continue_processing():
+                        # 命令已处理：不再尝试其他命令处理器，但后处理阶段（如图片识别）仍需执行，
+                        # AI处理等阶段会根据 context.processed 自行跳过
                         logger.debug(f"Command processed by {processor.name}")
-                        return False
+                        return True
                 except Exception as e:
                     logger.error(f"Error in command processor {processor.name}: {e}", exc_info=True)
         
@@ -24,8 +24,8 @@ class PostProcessStage(PipelineStage):
         """
         logger.debug(f"Executing post-process stage for: {context}")
         
-        # 按优先级顺序执行处理器
-        sorted_processors = sorted(self.processors, key=lambda p: p.priority, reverse=True)
+        # 按优先级顺序执行处理器（编译时已按消息类型筛选并排序）
+        sorted_processors = self.processors_for(context.message_type)
         
         for processor in sorted_processors:
             if processor.can_handle(context):
@@ -29,8 +29,8 @@ class ResponseGenerationStage(PipelineStage):
             logger.debug("No response to generate")
             return True
         
-        # 按优先级顺序执行处理器
-        sorted_processors = sorted(self.processors, key=lambda p: p.priority, reverse=True)
+        # 按优先级顺序执行处理器（编译时已按消息类型筛选并排序）
+        sorted_processors = self.processors_for(context.message_type)
         
         response_sent = False
         for processor in sorted_processors:
@@ -1,21 +1,29 @@
 # core/message_router.py
 # 负责接收WebSocket和HTTP消息，并将其分发给相应的处理器
 
-import json
 import asyncio
+import logging
+import base64
 import aiohttp
 from aiohttp import web
 from typing import Optional
-from logger_config import get_logger, log_exception, print_colored_message
+from logger_config import get_logger, log_exception
 from core.bot_context import BotContext
-from handlers import private_handler, group_handler, request_handler, notice_handler, meta_event_handler
+from handlers import request_handler, notice_handler, meta_event_handler
 from handlers.http_handler import handle_http_request as process_http_request
 from core.message_pipeline.pipeline_manager import PipelineManager
+from core.message_store import message_store, fetch_message
+from core.event_dedup import event_deduplicator
+from core.profile_cache import profile_cache
+from core.shard_coordinator import shard_coordinator
+from core.shutdown import shutdown_manager
+from core.metrics import EVENTS_RECEIVED, EVENT_HANDLE_SECONDS
+from core.tracing import tracer
+from core.events import MessageEvent, loads, dumps, is_api_response, is_heartbeat
 import os
 import sys
+import time
 import uuid
-from utils.api_utils import call_onebot_api
-from datetime import datetime
 
 logger = get_logger("MessageRouter")
 
@@ -46,27 +54,33 @@ class MessageRouter:
                     # 记录非文本消息类型的debug日志
                     logger.debug(f"收到非文本WebSocket消息，类型: {msg.type}")
                     continue
+                received_at = time.perf_counter()
 
-                # 添加debug级别的websocket原始消息日志
-                logger.debug(f"收到原始WebSocket文本消息: {msg.data}")
-                
-                event = json.loads(msg.data)
-                logger.debug(f"收到WebSocket文本消息，事件类型: {event.get('post_type')}")
+                event = loads(msg.data)
+                # 心跳在帧层面直接更新连接健康状态，不进入事件路由、日志、追踪和插件分发
+                if is_heartbeat(event):
+                    EVENTS_RECEIVED.labels('meta_event', getattr(ws, '_account_id', None)).inc()
+                    meta_event_handler.handle_heartbeat(self.context, event)
+                    continue
+                # 原始消息日志只在DEBUG级别下格式化，避免每帧都拼接整条消息
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"收到原始WebSocket文本消息: {msg.data}")
+                    logger.debug(f"收到WebSocket文本消息，事件类型: {event.get('post_type')}")
                 
                 # 获取当前连接对应的账号ID
                 account_id = None
                 if hasattr(ws, '_account_id'):
                     account_id = ws._account_id
                 
-                # 检查是否为 Parallel 模式
+                # 检查是否为 Parallel / Parallel Pro 模式（同一事件会从多个账号到达，需要去重）
                 is_parallel = False
                 if hasattr(self.context, 'multi_ws_manager'):
                     multi_ws_manager = self.context.multi_ws_manager
-                    is_parallel = multi_ws_manager.is_parallel_mode()
+                    is_parallel = multi_ws_manager.is_any_parallel_mode()
                     
                     if is_parallel:
                         # Parallel 模式下，处理所有来自已知账号的消息
-                        logger.debug(f"Parallel 模式: 处理账号 {account_id} 的消息")
+                        logger.debug(f"{multi_ws_manager.mode} 模式: 处理账号 {account_id} 的消息")
 
                     else:
                         # Fallback 模式下，只处理活跃账号的消息
@@ -81,7 +95,7 @@ class MessageRouter:
                 post_type = event.get('post_type')
                 
                 # 优先处理消息发送反馈（包含status和data字段的消息反馈事件）
-                if 'status' in event and 'data' in event:
+                if is_api_response(event):
                     await self._handle_message_feedback(event)
                     continue
                 
@@ -90,156 +104,119 @@ class MessageRouter:
                     await self._handle_api_callback(event)
                     continue
 
-                # 处理不同类型的消息
-                if post_type == 'message':
-                    message_type = event.get('message_type')
-                    user_id = event.get('user_id', 'unknown')
-                    raw_message = event.get('raw_message', '')
-                    message_id = event.get('message_id', 'unknown')
-                    
-                    # 检查是否应该处理该消息（Parallel Pro 模式需要传递 account_id）
-                    if not self.context.should_handle_message(event, account_id=account_id):
-                        continue
-                    
-                    # 在事件中添加账号 ID 信息，供后续处理使用
-                    if account_id is not None:
-                        event['_account_id'] = account_id
-                    
-                    # 分发事件到插件（在处理器之前）
-                    if self.plugin_manager:
-                        await self.plugin_manager.dispatch_event(post_type, event)
-                    
-                    # 仅在日志中过滤CQ代码，不影响原始消息处理
-                    def filter_cq_code_for_log(text):
-                        import re
-                        # 使用正则表达式移除所有CQ代码
-                        return re.sub(r'\[CQ:[^\]]*\]', '', text)
+                EVENTS_RECEIVED.labels(post_type or 'unknown', account_id).inc()
+
+                # 退出排空期间只处理上面的API回调，不再分发新事件
+                if not shutdown_manager.accepting:
+                    continue
+
+                async with shutdown_manager.track(), EVENT_HANDLE_SECONDS.labels(post_type or 'unknown').time(), \
+                        tracer.trace(post_type or 'unknown', received_at, account=account_id,
+                                     group=event.get('group_id'), user=event.get('user_id')):
+                    # 处理不同类型的消息
+                    if post_type == 'message':
+                        message_type = event.get('message_type')
                         
-    
-                    
-                    if message_type == 'private':
-                        sub_type = event.get('sub_type', 'unknown')
-                        filtered_message = filter_cq_code_for_log(raw_message)
-                        # 获取用户名，优先使用nickname
-                        sender = event.get('sender', {})
-                        username = sender.get('nickname', str(user_id))
-                        # 使用彩色输出格式
-                        timestamp = datetime.now().strftime('%m-%d %H:%M:%S')
-                        print_colored_message(timestamp, "私信", username, filtered_message)
-                        await private_handler.handle_private_message(self.context, event)
-                    elif message_type == 'group':
-                        group_id = event.get('group_id', 'unknown')
-                        sub_type = event.get('sub_type', 'unknown')
-                        filtered_message = filter_cq_code_for_log(raw_message)
-                        # 获取群名，优先使用group_name
-                        group_name = event.get('group_name', f"{group_id}")
-                        # 获取用户名，优先使用群昵称(card)，然后是nickname，最后是user_id
-                        sender = event.get('sender', {})
-                        card = sender.get('card', '')
-                        nickname = sender.get('nickname', '')
-                        # 确保card和nickname不为空字符串
-                        if card:
-                            username = card
-                        elif nickname:
-                            username = nickname
-                        else:
-                            username = str(user_id)
-                        # 添加debug日志，查看sender信息
-                        logger.debug(f"Sender info: card='{card}', nickname='{nickname}', user_id={user_id}, username='{username}'")
-                        # 使用彩色输出格式
-                        timestamp = datetime.now().strftime('%m-%d %H:%M:%S')
-                        print_colored_message(timestamp, group_name, username, filtered_message)
+                        # 记录到本地消息历史（所有账号收到的消息都记录，供引用/撤回等本地查询）
+                        message_store.record_event(event)
                         
-                        # 检查用户是否被软禁言（Root用户不受限制）
-                        from commands.softmute_command import is_user_softmuted
-                        if str(user_id) != str(self.context.get_config_value("Root_user", "")) and is_user_softmuted(group_id, user_id):
-                            logger.info(f"检测到软禁言用户 {user_id} 在群 {group_id} 发送消息，尝试撤回")
-                            try:
-                                recall_result = await call_onebot_api(self.context, 'delete_msg', {'message_id': message_id}, account_id=account_id)
-                                # 检查API调用是否成功以及业务处理是否成功
-                                if recall_result and recall_result.get('success') and recall_result.get('data', {}).get('status') == 'ok':
-                                    logger.info(f"成功撤回软禁言用户 {user_id} 的消息")
-                                else:
-                                    logger.warning(f"撤回软禁言用户消息失败: {recall_result}")
-                            except Exception as e:
-                                logger.error(f"撤回消息时发生异常: {e}")
+                        # 检查是否应该处理该消息（Parallel Pro 模式需要传递 account_id）
+                        if not self.context.should_handle_message(event, account_id=account_id):
+                            continue
+                        # Parallel / Parallel Pro 模式下同一事件会从多个账号到达，只处理第一份
+                        if is_parallel and await self._is_duplicate_event(event):
+                            continue
                         
-                        # 检查用户是否在句句名言名单中且本群被信任
-                        from commands.allquote_command import is_user_allquoted
-                        from core.trust_manager import trust_manager
-                        if is_user_allquoted(group_id, user_id) and trust_manager.is_trusted_group(str(group_id)):
-                            logger.info(f"检测到句句名言用户 {user_id} 在群 {group_id} 发送消息，尝试生成名言图片")
-                            try:
-                                # 调用quote命令的内部处理函数
-                                from commands.quote_command import handle_quote_internal
-                                # 构建原始消息结构，包含引用消息
-                                raw_message_with_reply = [
-                                    {
-                                        "type": "reply",
-                                        "data": {
-                                            "id": message_id
-                                        }
-                                    }
-                                ]
-                                await handle_quote_internal(self.context, user_id, group_id, raw_message_with_reply, is_configured=True)
-                            except Exception as e:
-                                logger.error(f"生成名言图片时发生异常: {e}")
+                        # 在事件中添加账号 ID 信息，供后续处理使用
+                        if account_id is not None:
+                            event['_account_id'] = account_id
                         
-                        await group_handler.handle_group_message(self.context, event)
-                elif post_type == 'request':
-                    # 对于 request 事件，尝试从 self_id 获取账号 ID
-                    if account_id is None:
-                        self_id = event.get('self_id')
-                        if self_id:
-                            account = self.context.get_account_by_qq(str(self_id))
-                            if account:
-                                account_id = account.get('id')
-                                logger.debug(f"Request 事件：从 self_id {self_id} 推断出账号 ID {account_id}")
-                    
-                    # 检查是否应该处理该消息（Parallel Pro 模式需要传递 account_id）
-                    if not self.context.should_handle_message(event, account_id=account_id):
-                        continue
-                    # 在事件中添加账号 ID 信息
-                    if account_id is not None:
-                        event['_account_id'] = account_id
-                    # 分发事件到插件
-                    if self.plugin_manager:
-                        await self.plugin_manager.dispatch_event(post_type, event)
-                    await request_handler.handle_request_event(self.context, event)
-                elif post_type == 'notice':
-                    # 对于 notice 事件，尝试从 self_id 获取账号 ID
-                    if account_id is None:
-                        self_id = event.get('self_id')
-                        if self_id:
-                            account = self.context.get_account_by_qq(str(self_id))
-                            if account:
-                                account_id = account.get('id')
-                                logger.debug(f"Notice 事件：从 self_id {self_id} 推断出账号 ID {account_id}")
-                    
-                    # 检查是否应该处理该消息（Parallel Pro 模式需要传递 account_id）
-                    if not self.context.should_handle_message(event, account_id=account_id):
-                        continue
-                    # 在事件中添加账号 ID 信息
-                    if account_id is not None:
-                        event['_account_id'] = account_id
-                    # 分发事件到插件
-                    if self.plugin_manager:
-                        await self.plugin_manager.dispatch_event(post_type, event)
-                    await notice_handler.handle_notice_event(self.context, event)
-                elif post_type == 'meta_event':
-                    # 在事件中添加账号ID信息
-                    if account_id is not None:
-                        event['_account_id'] = account_id
-                    # 分发事件到插件
-                    if self.plugin_manager:
-                        await self.plugin_manager.dispatch_event(post_type, event)
-                    await meta_event_handler.handle_meta_event(self.context, event)
-                else:
-                    logger.debug(f"忽略未知事件类型: {post_type}")
+                        # 分发事件到插件（在处理器之前）
+                        if self.plugin_manager:
+                            async with tracer.span('plugins'):
+                                await self.plugin_manager.dispatch_event(post_type, event)
+                        
+                        # 群聊和私聊消息交给编译好的消息管道处理（控制台回显、过滤、命令、敏感词、图片识别等）
+                        if message_type in ('private', 'group'):
+                            async with tracer.span('handler'):
+                                await self.pipeline_manager.process_message(MessageEvent(event, account_id))
+                    elif post_type == 'message_sent':
+                        # 机器人自身发出的消息，只记录到消息历史
+                        message_store.record_event(event)
+                    elif post_type == 'request':
+                        # 对于 request 事件，尝试从 self_id 获取账号 ID
+                        if account_id is None:
+                            self_id = event.get('self_id')
+                            if self_id:
+                                account = self.context.get_account_by_qq(str(self_id))
+                                if account:
+                                    account_id = account.get('id')
+                                    logger.debug(f"Request 事件：从 self_id {self_id} 推断出账号 ID {account_id}")
+                        
+                        # 检查是否应该处理该消息（Parallel Pro 模式需要传递 account_id）
+                        if not self.context.should_handle_message(event, account_id=account_id):
+                            continue
+                        # Parallel / Parallel Pro 模式下同一事件会从多个账号到达，只处理第一份
+                        if is_parallel and await self._is_duplicate_event(event):
+                            continue
+                        # 在事件中添加账号 ID 信息
+                        if account_id is not None:
+                            event['_account_id'] = account_id
+                        # 分发事件到插件
+                        if self.plugin_manager:
+                            await self.plugin_manager.dispatch_event(post_type, event)
+                        await request_handler.handle_request_event(self.context, event)
+                    elif post_type == 'notice':
+                        # 对于 notice 事件，尝试从 self_id 获取账号 ID
+                        if account_id is None:
+                            self_id = event.get('self_id')
+                            if self_id:
+                                account = self.context.get_account_by_qq(str(self_id))
+                                if account:
+                                    account_id = account.get('id')
+                                    logger.debug(f"Notice 事件：从 self_id {self_id} 推断出账号 ID {account_id}")
+                        
+                        # 涉及机器人自身的进退群通知，实时更新 Parallel Pro 模式的群成员关系
+                        if hasattr(self.context, 'multi_ws_manager'):
+                            self.context.multi_ws_manager.handle_membership_notice(event, account_id)
+                        # 成员变动、群名片和管理员变更使资料缓存中的对应条目失效
+                        profile_cache.handle_notice(event)
+                        
+                        # 检查是否应该处理该消息（Parallel Pro 模式需要传递 account_id）
+                        if not self.context.should_handle_message(event, account_id=account_id):
+                            continue
+                        # Parallel / Parallel Pro 模式下同一事件会从多个账号到达，只处理第一份
+                        if is_parallel and await self._is_duplicate_event(event):
+                            continue
+                        # 在事件中添加账号 ID 信息
+                        if account_id is not None:
+                            event['_account_id'] = account_id
+                        # 分发事件到插件
+                        if self.plugin_manager:
+                            await self.plugin_manager.dispatch_event(post_type, event)
+                        await notice_handler.handle_notice_event(self.context, event)
+                    elif post_type == 'meta_event':
+                        # 在事件中添加账号ID信息
+                        if account_id is not None:
+                            event['_account_id'] = account_id
+                        # 分发事件到插件
+                        if self.plugin_manager:
+                            await self.plugin_manager.dispatch_event(post_type, event)
+                        await meta_event_handler.handle_meta_event(self.context, event)
+                    else:
+                        logger.debug(f"忽略未知事件类型: {post_type}")
 
             except Exception as e:
                 log_exception(logger, f"消息处理异常", e)
 
+    async def _is_duplicate_event(self, event: dict) -> bool:
+        """本进程内已处理过，或已被其他分片进程认领的事件"""
+        if event_deduplicator.is_duplicate(event):
+            return True
+        if shard_coordinator.enabled:
+            return not await shard_coordinator.claim_event(event)
+        return False
+
     async def _handle_message_feedback(self, event: dict):
         """处理消息发送反馈
         
@@ -300,7 +277,7 @@ class MessageRouter:
             
             # 发送API请求
             if websocket and not websocket.closed:
-                await websocket.send_json(payload)
+                await websocket.send_json(payload, dumps=dumps)
                 # 等待回调结果，设置超时时间
                 result = await asyncio.wait_for(future, timeout=30.0)
                 return result
@@ -339,10 +316,17 @@ class MessageRouter:
 
     async def get_image_base64(self, url):
         """获取图片的base64编码"""
-        # 这里应该实现图片下载和转base64的逻辑
-        # 暂时返回None，后续需要实现具体逻辑
-        logger.warning("get_image_base64功能尚未实现")
-        return None
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        logger.warning(f"下载图片失败，状态码: {response.status}, URL: {url}")
+                        return None
+                    content = await response.read()
+            return base64.b64encode(content).decode()
+        except Exception as e:
+            logger.error(f"获取图片base64编码失败: {e}")
+            return None
 
     async def get_record_detail(self, file):
         """获取语音详情"""
@@ -364,8 +348,10 @@ class MessageRouter:
             logger.error(f"获取自身信息失败: {e}")
             return None
 
-    async def get_message_detail(self, message_id):
-        """获取消息详情"""
-        # 已移除对get_message_storage的引用
-        logger.warning("get_message_detail功能尚未实现")
-        return None
+    async def get_message_detail(self, message_id, account_id: int = None):
+        """获取消息详情，优先从本地消息历史中查询"""
+        try:
+            return await fetch_message(self.context, message_id, account_id=account_id)
+        except Exception as e:
+            logger.error(f"获取消息详情失败: {e}")
+            return None
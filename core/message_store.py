@@ -0,0 +1,436 @@
+# core/message_store.py
+# 本地消息历史存储：记录收发的消息，按消息ID/群/用户建索引，批量写入SQLite并按保留期清理
+
+import asyncio
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from logger_config import get_logger
+from core.file_watcher import PROJECT_ROOT
+
+logger = get_logger("MessageStore")
+
+AIOSQLITE_AVAILABLE = True
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+    AIOSQLITE_AVAILABLE = False
+
+DEFAULT_DB_PATH = "data/message_history.db"
+
+# 默认配置，可在 config.yml 的 message_history 节中覆盖
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "db_path": DEFAULT_DB_PATH,
+    "retention_days": 7,  # 0 表示不按时间清理
+    "batch_size": 200,  # 待写入条数达到该值时立即写盘
+    "flush_interval": 1.0,  # 最长写盘间隔（秒）
+    "cache_size": 5000,  # 内存中保留的最近消息条数
+    "purge_interval": 3600,  # 清理过期消息的间隔（秒）
+}
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS messages (
+        message_id TEXT NOT NULL,
+        self_id TEXT NOT NULL DEFAULT '',
+        direction TEXT NOT NULL,
+        message_type TEXT,
+        group_id TEXT,
+        user_id TEXT,
+        time INTEGER NOT NULL,
+        raw_message TEXT,
+        message TEXT,
+        sender TEXT,
+        PRIMARY KEY (message_id, self_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_messages_group_time ON messages (group_id, time)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_user_time ON messages (user_id, time)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_time ON messages (time)",
+]
+
+_COLUMNS = "message_id, self_id, direction, message_type, group_id, user_id, time, raw_message, message, sender"
+
+# 出站消息中单个文本字段保留的最大长度，与审核日志的截断长度一致
+_MAX_TEXT = 500
+
+_BASE64_RE = re.compile(r"base64://[^,\]]*")
+
+
+def _text_of(message) -> str:
+    """提取消息段中的纯文本，用于出站消息的 raw_message"""
+    if isinstance(message, str):
+        return message
+    if not isinstance(message, list):
+        return ""
+    return "".join(
+        seg.get("data", {}).get("text", "")
+        for seg in message
+        if isinstance(seg, dict) and seg.get("type") == "text"
+    )
+
+
+def _base64_placeholder(value: str) -> str:
+    """把 base64:// 内联数据替换为只记录大小的占位符"""
+    return f"base64://<{len(value) - len('base64://')} bytes>"
+
+
+def _compact_message(message):
+    """压缩出站消息：替换图片/语音等的 base64 数据，过长的字段截断到 _MAX_TEXT 字"""
+    if isinstance(message, str):
+        return _BASE64_RE.sub(lambda m: _base64_placeholder(m.group(0)), message)[:_MAX_TEXT]
+    if not isinstance(message, list):
+        return message
+    compact = []
+    for seg in message:
+        if not isinstance(seg, dict) or not isinstance(seg.get("data"), dict):
+            compact.append(seg)
+            continue
+        data = {}
+        for key, value in seg["data"].items():
+            if isinstance(value, str):
+                if value.startswith("base64://"):
+                    value = _base64_placeholder(value)
+                elif len(value) > _MAX_TEXT:
+                    value = value[:_MAX_TEXT]
+            data[key] = value
+        compact.append({**seg, "data": data})
+    return compact
+
+
+class MessageStore:
+    """消息历史存储
+
+    - record_event()/record_outgoing() 为同步调用，只写入内存缓存和待写队列，不阻塞消息处理
+    - 后台任务按批次把待写队列写入SQLite，并定期清理超过保留期的消息
+    - get() 返回与 OneBot get_msg 的 data 字段相同结构的字典，优先命中内存缓存
+    - 各账号的 message_id 由各自的OneBot实现分配，可能重复，缓存和查询都按 (self_id, message_id) 区分
+    """
+
+    def __init__(self):
+        self.settings: Dict[str, Any] = dict(DEFAULT_SETTINGS)
+        self._db = None
+        self._pending: List[tuple] = []
+        self._recent: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()  # (self_id, message_id) -> 记录
+        self._flush_event: Optional[asyncio.Event] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._running = False
+        self._next_purge = 0.0
+
+    def configure(self, settings: Optional[Dict[str, Any]]):
+        """应用配置（未配置的项使用默认值）"""
+        merged = dict(DEFAULT_SETTINGS)
+        if isinstance(settings, dict):
+            merged.update({k: v for k, v in settings.items() if k in DEFAULT_SETTINGS})
+        self.settings = merged
+        self._trim_cache()
+
+    @property
+    def persistent(self) -> bool:
+        """是否写入数据库（否则仅保留内存缓存）"""
+        return self._db is not None
+
+    @property
+    def pending_writes(self) -> int:
+        """等待批量写入数据库的记录数"""
+        return len(self._pending)
+
+    # ---------------------- 生命周期 ----------------------
+
+    async def start(self):
+        """打开数据库并启动后台写入任务"""
+        if self._running:
+            return
+        self._running = True
+        self._flush_event = asyncio.Event()
+
+        if not self.settings["enabled"]:
+            logger.info("消息历史存储已禁用，仅保留内存缓存")
+        elif not AIOSQLITE_AVAILABLE:
+            logger.warning("aiosqlite库未安装，消息历史仅保留在内存中。请运行 'pip install aiosqlite' 安装。")
+        else:
+            db_path = self.settings["db_path"]
+            if not os.path.isabs(db_path):
+                db_path = os.path.join(PROJECT_ROOT, db_path)
+            try:
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+                self._db = await aiosqlite.connect(db_path)
+                await self._db.execute("PRAGMA journal_mode=WAL")
+                await self._db.execute("PRAGMA synchronous=NORMAL")
+                for statement in _SCHEMA:
+                    await self._db.execute(statement)
+                await self._db.commit()
+                logger.info(f"消息历史存储已启动: {db_path}")
+            except Exception as e:
+                logger.error(f"打开消息历史数据库失败，仅保留内存缓存: {e}")
+                await self._close_db()
+
+        self._next_purge = time.time()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+
+    async def close(self):
+        """写入剩余消息并关闭数据库"""
+        if not self._running:
+            return
+        self._running = False
+        if self._flush_event is not None:
+            self._flush_event.set()
+        if self._writer_task is not None:
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+        await self._flush()
+        await self._close_db()
+
+    async def _close_db(self):
+        if self._db is not None:
+            try:
+                await self._db.close()
+            except Exception as e:
+                logger.error(f"关闭消息历史数据库失败: {e}")
+            self._db = None
+
+    async def _writer_loop(self):
+        while self._running:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.settings["flush_interval"])
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self._flush()
+            if time.time() >= self._next_purge:
+                self._next_purge = time.time() + self.settings["purge_interval"]
+                await self.purge_expired()
+
+    # ---------------------- 记录 ----------------------
+
+    def record_event(self, event: dict):
+        """记录一条来自WebSocket的消息事件（message / message_sent）"""
+        message_id = event.get("message_id")
+        if message_id is None:
+            return
+        direction = "out" if event.get("post_type") == "message_sent" else "in"
+        record = {
+            "message_id": message_id,
+            "self_id": event.get("self_id"),
+            "time": event.get("time") or int(time.time()),
+            "message_type": event.get("message_type"),
+            "user_id": event.get("user_id"),
+            "sender": event.get("sender") or {},
+            "message": event.get("message", []),
+            "raw_message": event.get("raw_message", ""),
+        }
+        if direction == "out":
+            record["message"] = _compact_message(record["message"])
+            record["raw_message"] = _compact_message(record["raw_message"])
+        if event.get("group_id") is not None:
+            record["group_id"] = event.get("group_id")
+        self._add(record, direction)
+
+    def record_outgoing(self, action: str, params: dict, message_id, self_id=None):
+        """记录一条通过API发送成功的消息"""
+        if message_id is None:
+            return
+        message = _compact_message(params.get("message", []))
+        record = {
+            "message_id": message_id,
+            "self_id": self_id,
+            "time": int(time.time()),
+            "message_type": "group" if action == "send_group_msg" else "private",
+            "user_id": self_id,
+            "sender": {"user_id": self_id},
+            "message": message,
+            "raw_message": _text_of(message)[:_MAX_TEXT],
+        }
+        if action == "send_group_msg":
+            record["group_id"] = params.get("group_id")
+        else:
+            record["target_id"] = params.get("user_id")
+        self._add(record, "out")
+
+    def _add(self, record: Dict[str, Any], direction: str):
+        message_id = str(record["message_id"])
+        self_id = str(record.get("self_id") or "")
+        key = (self_id, message_id)
+        self._recent[key] = record
+        self._recent.move_to_end(key)
+        self._trim_cache()
+
+        if self._db is None:
+            return
+        group_id = record.get("group_id")
+        self._pending.append((
+            message_id,
+            self_id,
+            direction,
+            record.get("message_type"),
+            str(group_id) if group_id is not None else None,
+            str(record.get("user_id")) if record.get("user_id") is not None else None,
+            int(record["time"]),
+            record.get("raw_message"),
+            json.dumps(record.get("message"), ensure_ascii=False),
+            json.dumps(record.get("sender"), ensure_ascii=False),
+        ))
+        if len(self._pending) >= self.settings["batch_size"] and self._flush_event is not None:
+            self._flush_event.set()
+
+    def _trim_cache(self):
+        limit = max(int(self.settings["cache_size"]), 0)
+        while len(self._recent) > limit:
+            self._recent.popitem(last=False)
+
+    async def _flush(self):
+        """把待写队列一次性写入数据库"""
+        if not self._pending or self._db is None:
+            self._pending.clear()
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await self._db.executemany(
+                f"INSERT OR REPLACE INTO messages ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                batch
+            )
+            await self._db.commit()
+            logger.debug(f"已写入 {len(batch)} 条消息历史")
+        except Exception as e:
+            logger.error(f"写入消息历史失败，丢弃 {len(batch)} 条记录: {e}")
+
+    async def purge_expired(self) -> int:
+        """删除超过保留期的消息，返回删除条数"""
+        retention_days = self.settings["retention_days"]
+        if self._db is None or not retention_days:
+            return 0
+        cutoff = int(time.time() - retention_days * 86400)
+        try:
+            cursor = await self._db.execute("DELETE FROM messages WHERE time < ?", (cutoff,))
+            await self._db.commit()
+            deleted = cursor.rowcount
+            if deleted:
+                logger.info(f"已清理 {deleted} 条超过 {retention_days} 天的消息历史")
+            return deleted
+        except Exception as e:
+            logger.error(f"清理消息历史失败: {e}")
+            return 0
+
+    # ---------------------- 查询 ----------------------
+
+    @staticmethod
+    def _row_to_record(row) -> Dict[str, Any]:
+        message_id, self_id, direction, message_type, group_id, user_id, msg_time, raw_message, message, sender = row
+        record = {
+            "message_id": int(message_id) if message_id.lstrip("-").isdigit() else message_id,
+            "self_id": int(self_id) if self_id.isdigit() else self_id or None,
+            "time": msg_time,
+            "message_type": message_type,
+            "user_id": int(user_id) if user_id and user_id.isdigit() else user_id,
+            "sender": json.loads(sender) if sender else {},
+            "message": json.loads(message) if message else [],
+            "raw_message": raw_message or "",
+        }
+        if group_id is not None:
+            record["group_id"] = int(group_id) if group_id.isdigit() else group_id
+        return record
+
+    async def get(self, message_id, self_id=None) -> Optional[Dict[str, Any]]:
+        """按消息ID查询收到/发出该消息的账号（self_id 为机器人QQ号）的记录，返回与 get_msg 的 data 相同结构的字典，
+        不存在时返回None；self_id 为 None 时（无法确定账号）返回任一账号最近的同ID消息"""
+        message_id = str(message_id)
+        if self_id is not None:
+            self_id = str(self_id)
+            record = self._recent.get((self_id, message_id))
+        else:
+            record = next((record for key, record in reversed(self._recent.items()) if key[1] == message_id), None)
+        if record is not None:
+            return dict(record)
+        if self._db is None:
+            return None
+        if self_id is not None:
+            query = f"SELECT {_COLUMNS} FROM messages WHERE message_id = ? AND self_id = ?"
+            params = (message_id, self_id)
+        else:
+            query = f"SELECT {_COLUMNS} FROM messages WHERE message_id = ? ORDER BY time DESC LIMIT 1"
+            params = (message_id,)
+        try:
+            async with self._db.execute(query, params) as cursor:
+                row = await cursor.fetchone()
+        except Exception as e:
+            logger.error(f"查询消息历史失败: {e}")
+            return None
+        return self._row_to_record(row) if row else None
+
+    async def search(self, group_id=None, user_id=None, keyword: str = None,
+                     since: int = None, until: int = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """按群、用户、关键词和时间范围检索消息历史，按时间倒序返回"""
+        if self._db is None:
+            return []
+        conditions, params = [], []
+        if group_id is not None:
+            conditions.append("group_id = ?")
+            params.append(str(group_id))
+        if user_id is not None:
+            conditions.append("user_id = ?")
+            params.append(str(user_id))
+        if keyword:
+            conditions.append("raw_message LIKE ?")
+            params.append(f"%{keyword}%")
+        if since is not None:
+            conditions.append("time >= ?")
+            params.append(int(since))
+        if until is not None:
+            conditions.append("time <= ?")
+            params.append(int(until))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(int(limit))
+        # 先写入待写队列，保证刚收到的消息也能被检索到
+        await self._flush()
+        try:
+            async with self._db.execute(
+                f"SELECT {_COLUMNS} FROM messages {where} ORDER BY time DESC LIMIT ?",
+                params
+            ) as cursor:
+                rows = await cursor.fetchall()
+        except Exception as e:
+            logger.error(f"检索消息历史失败: {e}")
+            return []
+        return [self._row_to_record(row) for row in rows]
+
+
+# 全局消息历史存储实例
+message_store = MessageStore()
+
+
+def self_id_of(context, account_id: int = None) -> Optional[str]:
+    """账号ID对应的机器人QQ号（即事件中的 self_id），未指定账号时使用当前活跃账号"""
+    if context is None:
+        return None
+    account = context.get_account_by_id(account_id) if account_id is not None else context.get_active_account()
+    bot_qq = account.get('bot_qq') if account else None
+    return str(bot_qq) if bot_qq else None
+
+
+async def fetch_message(context, message_id, account_id: int = None) -> Optional[Dict[str, Any]]:
+    """获取消息详情：先查本地历史中该账号的记录，未命中时再用该账号调用 get_msg 并把结果记入历史"""
+    self_id = self_id_of(context, account_id)
+    record = await message_store.get(message_id, self_id=self_id)
+    if record is not None:
+        return record
+
+    from utils.api_utils import call_onebot_api
+    result = await call_onebot_api(context, 'get_msg', {'message_id': message_id}, account_id=account_id)
+    if not result or not result.get("success"):
+        return None
+    data = result.get("data") or {}
+    if data.get('status') != 'ok' or not isinstance(data.get('data'), dict):
+        return None
+    record = data['data']
+    if self_id is not None:
+        record.setdefault('self_id', self_id)
+    message_store.record_event(record)
+    return record
@@ -0,0 +1,315 @@
+# core/metrics.py
+# 指标注册表：计数器、仪表、直方图，按 Prometheus 文本格式输出，由 core/http_server.py 在本地端口提供
+
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from logger_config import get_logger
+
+logger = get_logger("Metrics")
+
+# 默认直方图分桶（秒），覆盖从毫秒级的事件处理到十几秒的渲染
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 事件循环延迟通常在毫秒级，超过数百毫秒即说明有阻塞调用
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# 大模型请求通常需要数秒到数十秒
+LLM_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[str, str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """指标基类：按标签值保存子指标"""
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际传入 {values}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._new_child()
+            self._children[key] = child
+        return child
+
+    def _default_child(self):
+        if self.labelnames:
+            raise ValueError(f"指标 {self.name} 带有标签，请先调用 labels()")
+        return self.labels()
+
+    def remove(self, *values):
+        self._children.pop(tuple(str(value) for value in values), None)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        if amount < 0:
+            raise ValueError("计数器只能增加")
+        self.value += amount
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default_child().inc(amount)
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+                for key, child in self._children.items()]
+
+
+class _GaugeChild:
+    __slots__ = ('value', 'function')
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """采集时调用 function 取值，适合队列长度等现成的状态"""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception as e:
+                logger.debug(f"采集仪表值失败: {e}")
+                return math.nan
+        return self.value
+
+
+class Gauge(_Metric):
+    """可增可减的仪表"""
+
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default_child().set(value)
+
+    def inc(self, amount: float = 1):
+        self._default_child().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default_child().dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default_child().set_function(function)
+
+    def _samples(self):
+        lines = []
+        for key, child in self._children.items():
+            value = child.get()
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} "
+                         f"{'NaN' if math.isnan(value) else _format_value(value)}")
+        return lines
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * len(upper_bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+
+    def time(self) -> '_Timer':
+        """记录 with / async with 块的耗时（秒）"""
+        return _Timer(self)
+
+
+class _Timer:
+    """计时上下文，同时支持 with 和 async with（便于与其他异步上下文写在同一行）"""
+
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class Histogram(_Metric):
+    """直方图，分桶计数在输出时累加"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        bounds = sorted(float(bucket) for bucket in buckets)
+        if not bounds or bounds[-1] != math.inf:
+            bounds.append(math.inf)
+        self.upper_bounds = tuple(bounds)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self._default_child().observe(value)
+
+    def time(self):
+        return self._default_child().time()
+
+    def _samples(self):
+        lines = []
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(child.upper_bounds, child.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表，同名指标重复注册时返回已有实例"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = cls(name, *args, **kwargs)
+            self._metrics[name] = metric
+        elif not isinstance(metric, cls):
+            raise ValueError(f"指标 {name} 已注册为 {metric.type_name}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式（text/plain; version=0.0.4）"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# 全局指标注册表
+metrics = MetricsRegistry()
+
+# ---------------------- 内置指标 ----------------------
+
+EVENTS_RECEIVED = metrics.counter(
+    'zhrbot_events_received_total', '从OneBot收到的事件数', ['post_type', 'account'])
+EVENT_HANDLE_SECONDS = metrics.histogram(
+    'zhrbot_event_handle_seconds', '单个事件从分发到处理完成的耗时', ['post_type'])
+COMMAND_SECONDS = metrics.histogram(
+    'zhrbot_command_seconds', '命令处理耗时', ['command', 'status'])
+API_CALL_SECONDS = metrics.histogram(
+    'zhrbot_api_call_seconds', 'OneBot API调用耗时', ['action', 'status'])
+WS_CONNECT_ATTEMPTS = metrics.counter(
+    'zhrbot_ws_connect_attempts_total', 'WebSocket连接尝试次数', ['account', 'result'])
+ACCOUNT_USABLE = metrics.gauge(
+    'zhrbot_account_usable', '账号连接是否可用于处理消息（1可用，0不可用）', ['account'])
+QUEUE_DEPTH = metrics.gauge(
+    'zhrbot_queue_depth', '各内部队列当前长度', ['queue'])
+LLM_REQUEST_SECONDS = metrics.histogram(
+    'zhrbot_llm_request_seconds', '大模型API请求耗时', ['model', 'status'], buckets=LLM_BUCKETS)
+RENDER_SECONDS = metrics.histogram(
+    'zhrbot_render_seconds', '浏览器页面从获取到关闭的渲染耗时')
+SLOW_EVENTS = metrics.counter(
+    'zhrbot_slow_events_total', '处理耗时超过追踪阈值的事件数', ['post_type'])
+LOOP_LAG_SECONDS = metrics.histogram(
+    'zhrbot_loop_lag_seconds', '事件循环调度延迟', buckets=LAG_BUCKETS)
+LOOP_BLOCKS = metrics.counter(
+    'zhrbot_loop_blocks_total', '事件循环延迟超过阈值的次数，按阻塞位置所在模块统计', ['module'])
+PROFILE_CACHE_LOOKUPS = metrics.counter(
+    'zhrbot_profile_cache_lookups_total', '用户资料/群成员缓存查询次数（hit 命中、miss 请求API、coalesced 合并到进行中的请求）',
+    ['kind', 'result'])
+SPAM_DETECTIONS = metrics.counter(
+    'zhrbot_spam_detections_total', '刷屏检测命中次数', ['rule'])
+PIPELINE_STAGE_SECONDS = metrics.histogram(
+    'zhrbot_pipeline_stage_seconds', '消息管道各阶段耗时', ['stage'], buckets=LAG_BUCKETS)
@@ -0,0 +1,309 @@
+# core/moderation_journal.py
+# 管理事件日志：敏感词等管理事件的最近记录保存在固定大小的环形缓冲区中，
+# 完整历史按天追加写入本地 JSONL 文件（在线程池中批量写入，不阻塞事件循环），支持按群/用户/词/时间查询和统计
+
+import asyncio
+import json
+import os
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from logger_config import get_logger
+from core.file_watcher import PROJECT_ROOT
+
+logger = get_logger("ModerationJournal")
+
+# 默认配置，可在 config.yml 的 moderation_journal 节中覆盖
+DEFAULT_SETTINGS = {
+    "enabled": True,  # 是否写入本地文件，关闭时只保留内存中的最近记录
+    "dir": "data/moderation",
+    "recent_size": 500,  # 内存中保留的最近记录条数
+    "flush_interval": 1.0,  # 最长写盘间隔（秒）
+    "retention_days": 90,  # 0 表示不清理
+}
+
+_FILE_PREFIX = "journal-"
+_FILE_SUFFIX = ".jsonl"
+
+
+def _day_of(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y%m%d")
+
+
+def _matches(entry: Dict[str, Any], kind, group_id, user_id, word, since, until) -> bool:
+    if kind is not None and entry.get("kind") != kind:
+        return False
+    if group_id is not None and entry.get("group_id") != group_id:
+        return False
+    if user_id is not None and entry.get("user_id") != user_id:
+        return False
+    if word is not None and entry.get("word") != word:
+        return False
+    timestamp = entry.get("timestamp", 0)
+    if since is not None and timestamp < since:
+        return False
+    if until is not None and timestamp > until:
+        return False
+    return True
+
+
+class ModerationJournal:
+    """管理事件日志
+
+    - record() 为同步调用，只写入环形缓冲区和待写队列
+    - 后台任务定期把待写队列追加到当天的文件，并删除超过保留期的文件
+    - query() 查询的时间范围在环形缓冲区覆盖范围内（且该类型的记录之后没有被 clear_recent 清除）时直接从内存返回，
+      否则只读取时间范围涉及的日期文件
+    """
+
+    def __init__(self):
+        self.settings: Dict[str, Any] = dict(DEFAULT_SETTINGS)
+        self._recent: deque = deque(maxlen=DEFAULT_SETTINGS["recent_size"])
+        self._cleared: Dict[Optional[str], float] = {}  # 各类型最近一次 clear_recent 的时间，None 表示全部类型
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_event: Optional[asyncio.Event] = None
+        self._io_lock: Optional[asyncio.Lock] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._running = False
+        self._next_purge = 0.0
+
+    def configure(self, settings: Optional[Dict[str, Any]]):
+        """应用配置（未配置的项使用默认值）"""
+        merged = dict(DEFAULT_SETTINGS)
+        if isinstance(settings, dict):
+            merged.update({k: v for k, v in settings.items() if k in DEFAULT_SETTINGS})
+        self.settings = merged
+        if self._recent.maxlen != merged["recent_size"]:
+            self._recent = deque(self._recent, maxlen=max(1, int(merged["recent_size"])))
+
+    @property
+    def persistent(self) -> bool:
+        return bool(self.settings["enabled"])
+
+    @property
+    def pending_writes(self) -> int:
+        """等待写入文件的记录数"""
+        return len(self._pending)
+
+    def _dir(self) -> str:
+        path = self.settings["dir"]
+        return path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+
+    # ---------------------- 生命周期 ----------------------
+
+    async def start(self):
+        """启动后台写入任务"""
+        if self._running:
+            return
+        self._running = True
+        self._flush_event = asyncio.Event()
+        self._io_lock = asyncio.Lock()
+        self._next_purge = time.time()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+
+    async def close(self):
+        """写入剩余记录"""
+        if not self._running:
+            return
+        self._running = False
+        if self._flush_event is not None:
+            self._flush_event.set()
+        if self._writer_task is not None:
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+        await self._flush()
+
+    async def _writer_loop(self):
+        while self._running:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.settings["flush_interval"])
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self._flush()
+            if time.time() >= self._next_purge:
+                self._next_purge = time.time() + 3600
+                await self.purge_expired()
+
+    # ---------------------- 记录 ----------------------
+
+    def record(self, kind: str, group_id, user_id, word: str = "", message: str = "", action: str = "",
+               **extra) -> Dict[str, Any]:
+        """记录一条管理事件
+
+        Args:
+            kind: 事件类型，如 sensitive
+            word: 触发的敏感词/规则
+            message: 原始消息（截断到500字）
+            action: 采取的处理，如 recall、mute
+        """
+        entry = {
+            "timestamp": time.time(),
+            "kind": kind,
+            "group_id": str(group_id) if group_id is not None else "",
+            "user_id": str(user_id) if user_id is not None else "",
+            "word": word,
+            "message": message[:500] if isinstance(message, str) else str(message),
+            "action": action,
+        }
+        if extra:
+            entry.update(extra)
+        self._recent.append(entry)
+        if self.persistent:
+            self._pending.append(entry)
+        return entry
+
+    def recent(self, limit: Optional[int] = None, kind: Optional[str] = None, group_id=None, user_id=None,
+               word: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None) -> List[Dict[str, Any]]:
+        """从内存中的最近记录查询，按时间从新到旧"""
+        group_id = str(group_id) if group_id is not None else None
+        user_id = str(user_id) if user_id is not None else None
+        result = []
+        for entry in reversed(self._recent):
+            if _matches(entry, kind, group_id, user_id, word, since, until):
+                result.append(entry)
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+    def clear_recent(self, kind: Optional[str] = None):
+        """清空内存中的最近记录（已写入文件的历史不受影响）"""
+        self._cleared[kind] = time.time()
+        if kind is None:
+            self._recent.clear()
+        else:
+            kept = [entry for entry in self._recent if entry.get("kind") != kind]
+            self._recent.clear()
+            self._recent.extend(kept)
+
+    # ---------------------- 查询 ----------------------
+
+    async def query(self, kind: Optional[str] = None, group_id=None, user_id=None, word: Optional[str] = None,
+                    since: Optional[float] = None, until: Optional[float] = None,
+                    limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """查询管理事件，按时间从新到旧；since/until 为时间戳"""
+        if since is not None and self._covers(kind, since):
+            return self.recent(limit, kind, group_id, user_id, word, since, until)
+        if not self.persistent or self._io_lock is None:
+            return self.recent(limit, kind, group_id, user_id, word, since, until)
+
+        group_id = str(group_id) if group_id is not None else None
+        user_id = str(user_id) if user_id is not None else None
+        async with self._io_lock:
+            # 持有锁期间不会写盘，待写队列与文件中的记录不重叠
+            pending = [entry for entry in self._pending
+                       if _matches(entry, kind, group_id, user_id, word, since, until)]
+            paths = self._files_between(since, until)
+            loop = asyncio.get_running_loop()
+            stored = await loop.run_in_executor(None, self._scan_files, paths, kind, group_id, user_id, word, since, until)
+        result = list(reversed(pending)) + stored
+        return result[:limit] if limit is not None else result
+
+    def _covers(self, kind: Optional[str], since: float) -> bool:
+        """内存中的最近记录是否包含 since 之后该类型的全部记录"""
+        # 环形缓冲区保存的是最新的连续记录，最早一条不晚于 since 时，范围内的记录都还没有被挤出
+        if not self._recent or self._recent[0]["timestamp"] > since:
+            return False
+        # clear_recent 清除的是该时间之前的记录，查询全部类型时任何类型被清除都不完整
+        cleared = [at for cleared_kind, at in self._cleared.items()
+                   if cleared_kind is None or kind is None or cleared_kind == kind]
+        return max(cleared, default=0.0) < since
+
+    async def top(self, n: int = 10, **filters) -> Tuple[List[Tuple[str, int]], List[Tuple[Tuple[str, str], int]]]:
+        """只查询一次，统计触发次数最多的词/规则和用户
+
+        Returns:
+            (词/规则及次数, ((群号, QQ号), 次数))
+        """
+        entries = await self.query(limit=None, **filters)
+        words = Counter(entry.get("word", "") for entry in entries if entry.get("word"))
+        offenders = Counter((entry.get("group_id", ""), entry.get("user_id", "")) for entry in entries)
+        return words.most_common(n), offenders.most_common(n)
+
+    def _files_between(self, since: Optional[float], until: Optional[float]) -> List[str]:
+        """时间范围涉及的日期文件，从新到旧"""
+        directory = self._dir()
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        first = _day_of(since) if since is not None else None
+        last = _day_of(until) if until is not None else None
+        paths = []
+        for name in names:
+            if not (name.startswith(_FILE_PREFIX) and name.endswith(_FILE_SUFFIX)):
+                continue
+            day = name[len(_FILE_PREFIX):-len(_FILE_SUFFIX)]
+            if (first is None or day >= first) and (last is None or day <= last):
+                paths.append(os.path.join(directory, name))
+        paths.sort(reverse=True)
+        return paths
+
+    @staticmethod
+    def _scan_files(paths: Iterable[str], kind, group_id, user_id, word, since, until) -> List[Dict[str, Any]]:
+        """在线程池中读取日期文件并过滤，按时间从新到旧"""
+        result = []
+        for path in paths:
+            matched = []
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if _matches(entry, kind, group_id, user_id, word, since, until):
+                            matched.append(entry)
+            except OSError as e:
+                logger.error(f"读取管理事件日志失败 {path}: {e}")
+                continue
+            matched.reverse()
+            result.extend(matched)
+        return result
+
+    # ---------------------- 写入与清理 ----------------------
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        async with self._io_lock:
+            batch, self._pending = self._pending, []
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, self._append, batch)
+            except Exception as e:
+                logger.error(f"写入管理事件日志失败，{len(batch)} 条记录将在下次重试: {e}")
+                self._pending[:0] = batch
+
+    def _append(self, batch: List[Dict[str, Any]]):
+        directory = self._dir()
+        os.makedirs(directory, exist_ok=True)
+        by_day: Dict[str, List[str]] = {}
+        for entry in batch:
+            by_day.setdefault(_day_of(entry["timestamp"]), []).append(json.dumps(entry, ensure_ascii=False))
+        for day, lines in by_day.items():
+            with open(os.path.join(directory, f"{_FILE_PREFIX}{day}{_FILE_SUFFIX}"), "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+    async def purge_expired(self):
+        """删除超过保留期的日期文件"""
+        retention_days = self.settings["retention_days"]
+        if not retention_days or not self.persistent:
+            return
+        cutoff = (datetime.now() - timedelta(days=retention_days)).strftime("%Y%m%d")
+        for path in self._files_between(None, None):
+            day = os.path.basename(path)[len(_FILE_PREFIX):-len(_FILE_SUFFIX)]
+            if day < cutoff:
+                try:
+                    os.remove(path)
+                    logger.info(f"已删除过期的管理事件日志: {path}")
+                except OSError as e:
+                    logger.error(f"删除管理事件日志失败 {path}: {e}")
+
+
+# 全局实例
+moderation_journal = ModerationJournal()
@@ -4,8 +4,12 @@
 import asyncio
 import aiohttp
 from logger_config import get_logger, log_exception
-from typing import Callable, Awaitable, Dict, List, Optional
-import time
+from typing import Callable, Awaitable, Dict, List, Optional, Set
+from utils.task_utils import create_monitored_task
+from core.connection_health import ConnectionState, HealthTracker
+from core.reconnect_policy import AttemptBudget, CircuitBreaker, DecorrelatedJitterBackoff
+from core.shard_coordinator import shard_coordinator
+from core.metrics import ACCOUNT_USABLE, WS_CONNECT_ATTEMPTS
 
 logger = get_logger("MultiWebSocketManager")
 
@@ -22,23 +26,75 @@ class AccountConnection:
         self.onebot_access_token = account_config.get('onebot_access_token')
         self.bot_qq = account_config.get('bot_qq')
         
-        # 连接状态
-        self.websocket = None
-        self.is_connected = False
-        self.is_healthy = True  # 基于心跳的健康状态
-        self.last_heartbeat_time = time.time()  # 初始化为当前时间
         # 从配置中获取心跳间隔，默认为30秒（OneBot常见默认值）
         self.heartbeat_interval = self.websocket_config.get('heartbeat_interval', 30)
         
-        # 重试相关
+        # 连接状态：健康状态机由连接建立/断开、心跳和API结果驱动，状态变化时通知 state_listener
+        self.websocket = None
+        self._is_connected = False
+        self.health = HealthTracker(self.id, heartbeat_interval=self.heartbeat_interval, on_change=self._on_health_change)
+        self.state_listener: Optional[Callable[['AccountConnection'], None]] = None
+        
+        # 重试相关：去相关抖动退避，连续失败 max_retries 次后熔断
         self.retry_count = 0
         self.max_retries = self.websocket_config.get('max_retries', 10)
         self.retry_delay_base = self.websocket_config.get('retry_delay_base', 5)
         self.retry_delay_max = self.websocket_config.get('retry_delay_max', 60)
-        self.retry_backoff_factor = self.websocket_config.get('retry_backoff_factor', 2)
+        self.retry_backoff_factor = self.websocket_config.get('retry_backoff_factor', 3)
+        self.backoff = DecorrelatedJitterBackoff(self.retry_delay_base, self.retry_delay_max, self.retry_backoff_factor)
+        self.breaker = CircuitBreaker(self.id, failure_threshold=self.max_retries,
+                                      open_duration=self.websocket_config.get('circuit_open_duration', 300))
         
-        # 静默状态
-        self.is_silent = False
+        # 长期复用的HTTP会话（连接池、DNS缓存），重连时不再重新创建
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def is_silent(self) -> bool:
+        """熔断期间不再尝试连接，也不再输出重试日志"""
+        return self.breaker.state != CircuitBreaker.CLOSED
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+        return self.session
+
+    async def close_session(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self._is_connected
+
+    @is_connected.setter
+    def is_connected(self, value: bool):
+        if value != self._is_connected:
+            self._is_connected = value
+            if value:
+                self.health.on_connected()
+            else:
+                self.health.on_disconnected()
+
+    @property
+    def is_healthy(self) -> bool:
+        """是否可以处理消息（HEALTHY 或 RECOVERING）"""
+        return self.health.is_usable
+
+    @property
+    def state(self) -> str:
+        return self.health.state
+
+    @property
+    def last_heartbeat_time(self) -> float:
+        return self.health.last_heartbeat_time
+
+    def _on_health_change(self, tracker, old_state: str, new_state: str):
+        if self.state_listener:
+            try:
+                self.state_listener(self)
+            except Exception as e:
+                logger.error(f"处理账号 {self.id} 状态变化时出错: {e}")
 
 class MultiWebSocketManager:
     """管理多个账号的WebSocket连接。"""
@@ -47,16 +103,24 @@ class MultiWebSocketManager:
         self.context = context
         self._is_running = True
         self.connections: Dict[int, AccountConnection] = {}
+        self._connections_by_qq: Dict[str, AccountConnection] = {}  # bot_qq -> 连接
+        self._failover_task = None
+        self._failover_pending = False
         self.active_connection_id: Optional[int] = None
         self._lock = asyncio.Lock()
         self._connection_success_callback = None
         self._callback_executed = False  # 添加回调执行状态跟踪
         self.mode = 'fallback'  # 运行模式: 'fallback', 'parallel' 或 'parallel-pro'
         
-        # Parallel Pro 模式专用：群列表缓存
-        self._group_list_cache: Dict[int, List[dict]] = {}  # account_id -> group_list
-        self._group_accounts_map: Dict[str, List[int]] = {}  # group_id -> [account_ids]
+        # Parallel Pro 模式专用：群成员关系，由进退群通知增量维护，定期全量校对
+        self._group_list_cache: Dict[int, Set[str]] = {}  # account_id -> {group_id}
+        self._group_accounts_map: Dict[str, Set[int]] = {}  # group_id -> {account_id}
+        self._group_responsible: Dict[str, Optional[int]] = {}  # group_id -> 负责处理该群消息的账号
         self._group_list_task = None
+        self._group_sync_interval = 1800  # 全量校对间隔（秒）
+        
+        # 所有账号共享的连接尝试预算，避免OneBot重启后集中重连
+        self._attempt_budget: Optional[AttemptBudget] = None
         
         logger.debug("MultiWebSocketManager已初始化")
     
@@ -72,6 +136,11 @@ class MultiWebSocketManager:
         # 读取运行模式配置
         self.mode = self.context.get_config_value('mode', 'fallback')
         logger.info(f"运行模式: {self.mode}")
+        self._group_sync_interval = self.context.get_config_value('group_sync_interval', 1800)
+        self._attempt_budget = AttemptBudget(self.context.get_config_value('connect_attempts_per_minute', 30))
+        
+        if shard_coordinator.enabled and self.mode not in ('parallel', 'parallel-pro'):
+            logger.warning(f"{self.mode} 模式下只有一个活跃账号，不进行分片，所有账号由主分片连接")
         
         for index, account_config in enumerate(accounts_config):
             logger.debug(f"处理账号配置 #{index}: {account_config}")
@@ -80,7 +149,15 @@ class MultiWebSocketManager:
                 account_config['id'] = index + 1  # 从1开始计数
                 logger.debug(f"为账号 #{index} 分配默认ID: {account_config['id']}")
             
-    
+            # 多进程分片时只连接分配给本分片的账号
+            if shard_coordinator.enabled:
+                if self.mode in ('parallel', 'parallel-pro'):
+                    owned = shard_coordinator.owns_account(index)
+                else:
+                    owned = shard_coordinator.is_primary
+                if not owned:
+                    logger.debug(f"账号 #{index} 不属于分片 {shard_coordinator.shard_index}，跳过")
+                    continue
             
             conn = AccountConnection(account_config)
             logger.debug(f"创建账号连接对象: ID={conn.id}, Priority={conn.priority}, WS_URI={conn.ws_uri}")
@@ -88,7 +165,12 @@ class MultiWebSocketManager:
             # 确保id是整数
             try:
                 conn_id = int(conn.id)
+                conn.id = conn_id
+                conn.state_listener = self._on_connection_state_changed
+                ACCOUNT_USABLE.labels(conn_id).set_function(lambda conn=conn: 1 if conn.is_healthy else 0)
                 self.connections[conn_id] = conn
+                if conn.bot_qq is not None:
+                    self._connections_by_qq[str(conn.bot_qq)] = conn
                 logger.info(f"初始化账号连接: ID={conn_id}, Priority={conn.priority}")
             except (ValueError, TypeError):
                 logger.error(f"账号ID '{conn.id}' 无效，跳过该账号")
@@ -104,11 +186,6 @@ class MultiWebSocketManager:
         else:
             # Fallback 模式下设置初始活跃连接为优先级最高的账号
             self._set_initial_active_connection()
-        
-        # 初始化所有连接的心跳时间为当前时间，避免首次检查时出现超大时间差
-        current_time = time.time()
-        for conn in self.connections.values():
-            conn.last_heartbeat_time = current_time
 
     def _set_initial_active_connection(self):
         """设置初始活跃连接"""
@@ -126,6 +203,12 @@ class MultiWebSocketManager:
         self.initialize_connections()
         
         if not self.connections:
+            if shard_coordinator.enabled:
+                # 分片数多于账号数时本分片空闲，保持运行以免被监控进程反复重启
+                logger.warning(f"分片 {shard_coordinator.shard_index} 没有分配到账号，保持空闲")
+                while self._is_running:
+                    await asyncio.sleep(1)
+                return
             logger.error("没有配置任何账号连接")
             return
             
@@ -140,9 +223,7 @@ class MultiWebSocketManager:
             task = asyncio.create_task(self._connection_loop(conn, wrapped_message_handler))
             tasks.append(task)
             
-        # 启动连接监控任务
-        monitor_task = asyncio.create_task(self._monitor_connections())
-        tasks.append(monitor_task)
+        # 连接健康由事件驱动（连接断开、心跳截止时间、API错误率），不再需要定时轮询
         
         # Parallel Pro 模式下启动群列表更新任务
         if self.mode == 'parallel-pro':
@@ -167,137 +248,149 @@ class MultiWebSocketManager:
         """单个连接的主循环"""
         logger.debug(f"启动账号 {conn.id} 的连接循环")
         
+        try:
+            await self._run_connection(conn, message_handler)
+        finally:
+            await conn.close_session()
+
+    async def _run_connection(self, conn: AccountConnection, message_handler: Callable[[aiohttp.ClientWebSocketResponse], Awaitable[None]]):
         while self._is_running:
+            # 熔断期间等待到期后再探测
+            remaining = conn.breaker.remaining_open_time()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+                continue
+            
+            if self._attempt_budget is not None:
+                await self._attempt_budget.acquire()
+            if not self._is_running:
+                break
+            
             try:
                 headers = {
                     "Authorization": f"Bearer {conn.access_token}",
                     "User-Agent": "PythonWebSocketClient/1.0"
                 }
                 
-                logger.debug(f"账号 {conn.id}: 准备创建WebSocket会话")
-
-                async with aiohttp.ClientSession() as session:
-                    logger.debug(f"账号 {conn.id}: 创建WebSocket会话，连接到: {conn.ws_uri}")
-                    
-                    # 准备WebSocket连接参数
-                    ws_connect_params = {
-                        "url": conn.ws_uri,
-                        "headers": headers
-                    }
+                session = conn.get_session()
+                logger.debug(f"账号 {conn.id}: 连接到: {conn.ws_uri}")
+                
+                # 准备WebSocket连接参数
+                ws_connect_params = {
+                    "url": conn.ws_uri,
+                    "headers": headers
+                }
+                
+                # 只有当心跳间隔大于0时才设置心跳参数
+                if conn.heartbeat_interval > 0:
+                    ws_connect_params["heartbeat"] = conn.heartbeat_interval
+                
+                async with session.ws_connect(**ws_connect_params) as ws:
+                    # 更新连接状态
+                    conn.websocket = ws
+                    conn.is_connected = True
+                    conn.retry_count = 0  # 重置重试计数器
+                    WS_CONNECT_ATTEMPTS.labels(conn.id, 'success').inc()
+                    conn.backoff.reset()
+                    conn.breaker.record_success()
                     
-                    # 只有当心跳间隔大于0时才设置心跳参数
-                    if conn.heartbeat_interval > 0:
-                        ws_connect_params["heartbeat"] = conn.heartbeat_interval
+                    # 为WebSocket连接添加账号ID属性，以便在消息处理时获取
+                    ws._account_id = conn.id
                     
-                    async with session.ws_connect(**ws_connect_params) as ws:
-                        # 更新连接状态
-                        conn.websocket = ws
-                        conn.is_connected = True
-                        conn.retry_count = 0  # 重置重试计数器
-                        conn.is_healthy = True  # 连接成功，标记为健康
-                        conn.is_silent = False  # 连接成功，清除静默状态
-                        
-                        # 为WebSocket连接添加账号ID属性，以便在消息处理时获取
-                        ws._account_id = conn.id
-                        
-                        # 更新上下文的websocket
-                        async with self._lock:
-                            if self.mode in ('parallel', 'parallel-pro'):
-                                # Parallel 和 Parallel Pro 模式下，每个连接都独立处理消息
-                                logger.info(f"账号 {conn.id} 在 {self.mode} 模式下连接成功")
-                                # 第一个连接的回调用于启动子机器人管理器
-                                if not self._callback_executed and self._connection_success_callback:
-                                    logger.info(f"{self.mode} 模式: 准备执行连接成功回调")
-                                    try:
-                                        await self._connection_success_callback()
-                                        self._callback_executed = True
-                                        logger.info("连接成功回调执行完成")
-                                    except Exception as e:
-                                        logger.error(f"执行连接成功回调时发生错误: {e}", exc_info=True)
-                            elif conn.id == self.active_connection_id:
-                                logger.info(f"账号 {conn.id} 是活跃连接 (active_id: {self.active_connection_id})")
-                                # 只更新活跃连接的上下文
-                                await self.context.set_websocket(ws)
-                                logger.info(f"账号 {conn.id} 成为活跃连接")
-                                
-                                # 调用连接成功回调函数，启动子机器人管理器
-                                logger.info(f"检查连接成功回调: {self._connection_success_callback}")
-                                logger.info(f"回调执行状态: {self._callback_executed}")
-                                if self._connection_success_callback and not self._callback_executed:
-                                    logger.info("准备执行连接成功回调")
-                                    try:
-                                        await self._connection_success_callback()
-                                        self._callback_executed = True
-                                        logger.info("连接成功回调执行完成")
-                                    except Exception as e:
-                                        logger.error(f"执行连接成功回调时发生错误: {e}", exc_info=True)
-                                elif self._callback_executed:
-                                    logger.info("连接成功回调已执行过，跳过")
-                                else:
-                                    logger.warning("连接成功回调未设置")
+                    # 更新上下文的websocket
+                    async with self._lock:
+                        if self.mode in ('parallel', 'parallel-pro'):
+                            # Parallel 和 Parallel Pro 模式下，每个连接都独立处理消息
+                            logger.info(f"账号 {conn.id} 在 {self.mode} 模式下连接成功")
+                            # 第一个连接的回调用于启动子机器人管理器
+                            if not self._callback_executed and self._connection_success_callback:
+                                logger.info(f"{self.mode} 模式: 准备执行连接成功回调")
+                                try:
+                                    await self._connection_success_callback()
+                                    self._callback_executed = True
+                                    logger.info("连接成功回调执行完成")
+                                except Exception as e:
+                                    logger.error(f"执行连接成功回调时发生错误: {e}", exc_info=True)
+                        elif conn.id == self.active_connection_id:
+                            logger.info(f"账号 {conn.id} 是活跃连接 (active_id: {self.active_connection_id})")
+                            # 只更新活跃连接的上下文
+                            await self.context.set_websocket(ws)
+                            logger.info(f"账号 {conn.id} 成为活跃连接")
+                            
+                            # 调用连接成功回调函数，启动子机器人管理器
+                            logger.info(f"检查连接成功回调: {self._connection_success_callback}")
+                            logger.info(f"回调执行状态: {self._callback_executed}")
+                            if self._connection_success_callback and not self._callback_executed:
+                                logger.info("准备执行连接成功回调")
+                                try:
+                                    await self._connection_success_callback()
+                                    self._callback_executed = True
+                                    logger.info("连接成功回调执行完成")
+                                except Exception as e:
+                                    logger.error(f"执行连接成功回调时发生错误: {e}", exc_info=True)
+                            elif self._callback_executed:
+                                logger.info("连接成功回调已执行过，跳过")
                             else:
-                                logger.info(f"账号 {conn.id} 不是活跃连接 (active_id: {self.active_connection_id})")
-                        
-                        logger.info(f"账号 {conn.id} WebSocket连接成功")
-                        await message_handler(ws)
+                                logger.warning("连接成功回调未设置")
+                        else:
+                            logger.info(f"账号 {conn.id} 不是活跃连接 (active_id: {self.active_connection_id})")
+                    
+                    logger.info(f"账号 {conn.id} WebSocket连接成功")
+
+                    # 断线期间可能错过进退群通知，重连后单独校对该账号的群列表
+                    if self.mode == 'parallel-pro':
+                        create_monitored_task(
+                            self._sync_account_groups(conn.id),
+                            name=f"GroupSync_account_{conn.id}"
+                        )
+
+                    await message_handler(ws)
+
+                # 连接正常关闭（通常是OneBot重启），同样随机等待后再重连，避免各账号同时重连
+                conn.is_connected = False
+                delay = conn.backoff.jitter()
+                logger.info(f"账号 {conn.id} WebSocket连接已关闭，{delay:.1f}秒后重连")
 
             except Exception as e:
+                if not conn.is_connected:
+                    WS_CONNECT_ATTEMPTS.labels(conn.id, 'failure').inc()
                 conn.retry_count += 1
                 conn.is_connected = False
                 logger.debug(f"账号 {conn.id} WebSocket连接异常，异常类型: {type(e).__name__}")
                 
-                if conn.retry_count > conn.max_retries:
-                    if not conn.is_silent:
-                        logger.error(f"账号 {conn.id} WebSocket连接失败超过{conn.max_retries}次，进入静默模式")
-                        conn.is_silent = True
-                    conn.is_healthy = False
-                    delay = conn.retry_delay_max
-                else:
-                    delay = min(conn.retry_delay_max, conn.retry_delay_base * (conn.retry_backoff_factor ** conn.retry_count))
-                    log_exception(logger, f"账号 {conn.id} WebSocket连接错误，{delay}秒后重试... (第{conn.retry_count}次)", e)
-                
-                await asyncio.sleep(delay)
+                conn.breaker.record_failure()
+                if conn.is_silent:
+                    # 熔断打开，下一轮循环等待熔断到期
+                    continue
+                delay = conn.backoff.next_delay()
+                log_exception(logger, f"账号 {conn.id} WebSocket连接错误，{delay:.1f}秒后重试... (第{conn.retry_count}次)", e)
+            
+            await asyncio.sleep(delay)
 
 
 
-    async def _monitor_connections(self):
-        """监控所有连接的状态并执行故障转移"""
-        logger.debug("启动连接监控任务")
-        while self._is_running:
-            try:
-                await asyncio.sleep(5)  # 每5秒检查一次
-                # Parallel 模式下不需要故障转移，只监控心跳
-                if self.mode == 'parallel':
-                    await self._check_connections_health()
-                else:
-                    await self._check_and_transfer()
-            except Exception as e:
-                logger.error(f"连接监控任务异常: {e}")
+    def _on_connection_state_changed(self, conn: AccountConnection):
+        """连接状态变化时立即刷新群负责账号，并在 fallback 模式下评估故障转移"""
+        for group_id in self._group_list_cache.get(conn.id, ()):
+            self._recompute_responsible(group_id)
+        
+        if self.mode not in ('parallel', 'parallel-pro') and self._is_running:
+            self._failover_pending = True
+            if self._failover_task is None or self._failover_task.done():
+                try:
+                    self._failover_task = create_monitored_task(self._run_failover(), name="ConnectionFailover")
+                except RuntimeError:
+                    # 没有运行中的事件循环（例如初始化阶段）
+                    pass
+    
+    async def _run_failover(self):
+        """处理故障转移评估，评估期间又发生的状态变化会在本轮结束后再评估一次"""
+        while self._failover_pending:
+            self._failover_pending = False
+            await self._check_and_transfer()
     
-    async def _check_connections_health(self):
-        """Parallel 模式下检查所有连接的健康状态（仅监控，不切换）"""
-        current_time = time.time()
-        for conn in self.connections.values():
-            if conn.is_connected:
-                time_since_last_heartbeat = current_time - conn.last_heartbeat_time
-                expected_heartbeat_interval = conn.heartbeat_interval
-                
-                # 安全检查
-                if time_since_last_heartbeat < 0 or time_since_last_heartbeat > 86400:
-                    logger.warning(f"账号 {conn.id} 心跳时间异常，重置为当前时间")
-                    conn.last_heartbeat_time = current_time
-                    time_since_last_heartbeat = 0
-                
-                # 检查是否超时
-                if time_since_last_heartbeat > expected_heartbeat_interval * 3:
-                    conn.is_healthy = False
-                    logger.warning(f"账号 {conn.id} 心跳超时({time_since_last_heartbeat:.1f}秒)，标记为不健康")
-                else:
-                    conn.is_healthy = True
-                    logger.debug(f"账号 {conn.id} 心跳正常({time_since_last_heartbeat:.1f}秒)")
-
     async def _check_and_transfer(self):
-        """检查连接状态并执行必要的故障转移"""
+        """根据当前各连接的健康状态执行必要的故障转移"""
         async with self._lock:
             if not self.active_connection_id:
                 return
@@ -305,40 +398,10 @@ class MultiWebSocketManager:
             active_conn = self.connections.get(self.active_connection_id)
             if not active_conn:
                 return
-                
-            # 检查活跃连接是否健康（基于心跳）
-            current_time = time.time()
-            if active_conn.is_connected:
-                # 如果超过两倍心跳间隔没有收到心跳，则认为连接不健康
-                # 但我们也要考虑到MetaEventHandler可能已经更新了状态
-                time_since_last_heartbeat = current_time - active_conn.last_heartbeat_time
-                
-                # 添加额外的安全检查，防止异常的时间值
-                if time_since_last_heartbeat < 0 or time_since_last_heartbeat > 86400:  # 一天的秒数
-                    logger.warning(f"账号 {active_conn.id} 心跳时间异常: {time_since_last_heartbeat:.1f}秒，重置为当前时间")
-                    active_conn.last_heartbeat_time = current_time
-                    time_since_last_heartbeat = 0
-                
-                # 使用实际的心跳间隔而不是配置值
-                expected_heartbeat_interval = active_conn.heartbeat_interval
-                logger.debug(f"账号 {active_conn.id} 心跳检查 - 距离上次心跳: {time_since_last_heartbeat:.1f}秒, 期望间隔: {expected_heartbeat_interval:.1f}秒")
-                
-                if time_since_last_heartbeat > expected_heartbeat_interval * 2:
-                    # 只有当连接确实超时并且不是刚刚更新过状态时才标记为不健康
-                    # 添加一个缓冲时间避免竞争条件，但这个缓冲时间应该与实际的心跳间隔相关
-                    buffer_time = min(expected_heartbeat_interval * 0.5, 2.0)  # 最多2秒或心跳间隔的一半
-                    if time_since_last_heartbeat > expected_heartbeat_interval * 2 + buffer_time:
-                        active_conn.is_healthy = False
-                        logger.warning(f"账号 {active_conn.id} 心跳超时({time_since_last_heartbeat:.1f}秒)，标记为不健康")
-                    else:
-                        logger.debug(f"账号 {active_conn.id} 心跳接近超时({time_since_last_heartbeat:.1f}秒)，等待确认")
-                else:
-                    logger.debug(f"账号 {active_conn.id} 心跳正常({time_since_last_heartbeat:.1f}秒)")
             
-            # 执行故障转移逻辑
-            # 如果活跃连接不健康，寻找替代连接
-            if not active_conn.is_healthy or not active_conn.is_connected:
-                logger.info(f"活跃账号 {active_conn.id} 不健康，寻找替代连接")
+            # 如果活跃连接不可用，立即寻找替代连接
+            if not active_conn.is_connected or not active_conn.is_healthy:
+                logger.info(f"活跃账号 {active_conn.id} 状态为 {active_conn.state}，寻找替代连接")
                 await self._switch_to_best_connection()
             else:
                 # 检查是否有更高优先级的健康连接可用，如果有则切换回去
@@ -346,22 +409,22 @@ class MultiWebSocketManager:
 
     async def _switch_to_best_connection(self):
         """切换到最佳的健康连接"""
-        # 寻找优先级最高且健康的连接
+        # 寻找状态最好、优先级最高的可用连接（没有健康连接时退而选择降级的连接）
         healthy_connections = [
             conn for conn in self.connections.values() 
-            if conn.is_connected and conn.is_healthy and conn.websocket and not conn.websocket.closed
+            if conn.is_connected and conn.state != ConnectionState.DOWN and conn.websocket and not conn.websocket.closed
         ]
         
-        logger.debug(f"健康连接检查: 共找到 {len(healthy_connections)} 个健康连接")
+        logger.debug(f"健康连接检查: 共找到 {len(healthy_connections)} 个可用连接")
         for conn in self.connections.values():
-            logger.debug(f"账号 {conn.id} 状态 - 连接: {conn.is_connected}, 健康: {conn.is_healthy}, WebSocket有效: {conn.websocket and not conn.websocket.closed}")
+            logger.debug(f"账号 {conn.id} 状态 - 连接: {conn.is_connected}, 健康状态: {conn.state}, WebSocket有效: {conn.websocket and not conn.websocket.closed}")
         
         if not healthy_connections:
             logger.warning("没有找到健康的连接")
             return
             
-        # 按优先级排序（数字小的优先）
-        healthy_connections.sort(key=lambda x: x.priority)
+        # 按健康状态和优先级排序（数字小的优先）
+        healthy_connections.sort(key=lambda x: (x.health.rank, x.priority))
         best_connection = healthy_connections[0]
         
         # 如果最佳连接不是当前活跃连接，则切换
@@ -402,11 +465,12 @@ class MultiWebSocketManager:
             return
             
         # 查找所有比当前连接优先级更高的健康连接
+        # 只切回已确认稳定（HEALTHY）的连接，刚恢复的连接需要先通过滞回确认，避免来回切换
         higher_priority_connections = [
             conn for conn in self.connections.values()
             if conn.priority < active_conn.priority  # 优先级数字更小
             and conn.is_connected 
-            and conn.is_healthy 
+            and conn.state == ConnectionState.HEALTHY
             and conn.websocket 
             and not conn.websocket.closed
         ]
@@ -436,34 +500,29 @@ class MultiWebSocketManager:
 
     def update_heartbeat(self, self_id: str, status: dict):
         """更新指定账号的心跳状态"""
-        current_time = time.time()
         logger.debug(f"MultiWebSocketManager收到账号 {self_id} 的心跳更新")
-        # 根据self_id找到对应的连接
-        for conn in self.connections.values():
-            if conn.bot_qq == str(self_id):
-                prev_healthy = conn.is_healthy
-                prev_interval = conn.heartbeat_interval
-                if status.get('good', False) and status.get('online', False):
-                    conn.last_heartbeat_time = current_time
-                    conn.is_healthy = True
-                    # 如果状态中有interval信息，更新心跳间隔
-                    if 'interval' in status:
-                        # interval是以毫秒为单位的
-                        new_interval = status['interval'] / 1000
-                        if new_interval != conn.heartbeat_interval:
-                            logger.info(f"账号 {conn.id} 心跳间隔更新: {conn.heartbeat_interval:.1f} -> {new_interval:.1f}秒")
-                        conn.heartbeat_interval = new_interval
-                    if not prev_healthy:
-                        logger.info(f"账号 {conn.id} 心跳恢复正常")
-                    else:
-                        logger.debug(f"账号 {conn.id} 心跳正常，间隔: {conn.heartbeat_interval:.1f}秒")
-                else:
-                    conn.is_healthy = False
-                    # 即使状态异常，我们也更新时间，这样可以知道异常是什么时候发生的
-                    conn.last_heartbeat_time = current_time
-                    logger.warning(f"账号 {conn.id} 心跳异常")
-                return  # 找到匹配的连接后直接返回
-        logger.debug(f"未找到匹配账号 {self_id} 的连接")
+        conn = self._connections_by_qq.get(str(self_id))
+        if conn is None:
+            logger.debug(f"未找到匹配账号 {self_id} 的连接")
+            return
+        
+        interval = None
+        if 'interval' in status:
+            # interval是以毫秒为单位的
+            interval = status['interval'] / 1000
+            conn.heartbeat_interval = interval
+        good = status.get('good', False) and status.get('online', False)
+        if not good:
+            logger.warning(f"账号 {conn.id} 心跳异常")
+        conn.health.on_heartbeat(good, interval)
+    
+    def record_api_result(self, account_id: Optional[int], ok: bool):
+        """记录一次API调用结果（ok 为 False 表示超时或网络错误），用于按错误率判断连接健康状态"""
+        if account_id is None:
+            account_id = self.active_connection_id
+        conn = self.connections.get(account_id)
+        if conn is not None and conn.is_connected:
+            conn.health.on_api_result(ok)
 
     def get_connection_by_id(self, account_id: int) -> Optional[AccountConnection]:
         """根据账号ID获取连接信息"""
@@ -471,10 +530,7 @@ class MultiWebSocketManager:
     
     def get_connection_by_qq(self, bot_qq: str) -> Optional[AccountConnection]:
         """根据QQ号获取连接信息"""
-        for conn in self.connections.values():
-            if conn.bot_qq == str(bot_qq):
-                return conn
-        return None
+        return self._connections_by_qq.get(str(bot_qq))
     
     def get_all_connections(self) -> Dict[int, AccountConnection]:
         """获取所有连接"""
@@ -484,100 +540,180 @@ class MultiWebSocketManager:
         """检查是否为并行模式"""
         return self.mode == 'parallel'
 
+    def is_any_parallel_mode(self) -> bool:
+        """检查是否为 parallel 或 parallel-pro 模式（多个账号同时接收事件）"""
+        return self.mode in ('parallel', 'parallel-pro')
+
     async def _update_group_list_loop(self):
-        """Parallel Pro 模式下定时更新群列表"""
-        logger.info("启动群列表更新循环")
-        
-        # 首次运行前等待一段时间，确保所有连接都已建立
-        await asyncio.sleep(10)
+        """Parallel Pro 模式下定期全量校对群列表
+
+        群成员关系平时由进退群通知和连接建立时的单账号同步增量维护，
+        这里只做兜底校对，修正可能遗漏的通知。
+        """
+        logger.info(f"启动群列表校对循环，间隔 {self._group_sync_interval} 秒")
         
         while self._is_running:
             try:
+                await asyncio.sleep(self._group_sync_interval)
                 await self._fetch_all_group_lists()
-                # 每5分钟更新一次
-                await asyncio.sleep(300)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.error(f"群列表更新循环发生异常: {e}", exc_info=True)
+                logger.error(f"群列表校对循环发生异常: {e}", exc_info=True)
                 await asyncio.sleep(60)  # 发生异常时1分钟后重试
     
     async def _fetch_all_group_lists(self):
-        """获取所有账号的群列表"""
-        from utils.api_utils import call_onebot_api
-        
+        """并发获取所有已连接账号的群列表并全量校对"""
         logger.debug("开始获取所有账号的群列表")
         
-        success_count = 0
+        account_ids = [account_id for account_id, conn in self.connections.items() if conn.is_connected]
         for account_id, conn in self.connections.items():
             if not conn.is_connected:
                 logger.warning(f"账号 {account_id} 未连接，跳过群列表获取")
-                continue
-            
-            if not conn.is_healthy:
-                logger.warning(f"账号 {account_id} 不健康，但仍尝试获取群列表")
-            
-            try:
-                result = await call_onebot_api(
-                    context=self.context,
-                    action='get_group_list',
-                    params={},
-                    account_id=account_id
-                )
-                
-                if result and result.get('success'):
-                    data = result.get('data', {})
-                    if data.get('status') == 'ok' and 'data' in data:
-                        group_list = data['data']
-                        self._group_list_cache[account_id] = group_list
-                        logger.debug(f"账号 {account_id} 获取到 {len(group_list)} 个群")
-                        success_count += 1
-                    else:
-                        logger.warning(f"账号 {account_id} 获取群列表失败：{data}")
-                else:
-                    logger.warning(f"账号 {account_id} 获取群列表失败：{result}")
-                    
-            except Exception as e:
-                logger.error(f"获取账号 {account_id} 群列表时发生异常：{e}")
         
-        # 更新群 - 账号映射
-        self._update_group_accounts_map()
+        results = await asyncio.gather(
+            *(self._sync_account_groups(account_id) for account_id in account_ids),
+            return_exceptions=True
+        )
+        success_count = sum(1 for result in results if result is True)
         
         # 统计总连接数和成功获取群列表的账号数
-        total_connected = sum(1 for conn in self.connections.values() if conn.is_connected)
-        logger.info(f"群列表更新完成，缓存了 {success_count}/{total_connected} 个已连接账号的群列表")
+        total_connected = len(account_ids)
+        logger.info(f"群列表校对完成，缓存了 {success_count}/{total_connected} 个已连接账号的群列表")
         
         # 如果有账号未成功获取群列表，记录警告
         if success_count < total_connected:
             logger.warning(f"有 {total_connected - success_count} 个已连接账号未能获取群列表，优先级判断可能不准确")
-    
-    def _update_group_accounts_map(self):
-        """更新群-账号映射关系"""
-        self._group_accounts_map.clear()
-        
-        for account_id, group_list in self._group_list_cache.items():
-            for group in group_list:
-                group_id = str(group.get('group_id'))
-                if group_id not in self._group_accounts_map:
-                    self._group_accounts_map[group_id] = []
-                self._group_accounts_map[group_id].append(account_id)
         
         # 统计有多个账号的群
         multi_account_groups = [
             (gid, accounts) for gid, accounts in self._group_accounts_map.items()
             if len(accounts) > 1
         ]
-        
         if multi_account_groups:
             logger.info(f"发现 {len(multi_account_groups)} 个群有多个账号共存")
             for gid, accounts in multi_account_groups[:5]:  # 只显示前5个
-                logger.debug(f"群 {gid}: 账号 {accounts}")
+                logger.debug(f"群 {gid}: 账号 {sorted(accounts)}")
+    
+    async def _sync_account_groups(self, account_id: int) -> bool:
+        """获取单个账号的群列表，并以其为准校对该账号的群成员关系"""
+        from utils.api_utils import call_onebot_api
+        
+        conn = self.connections.get(account_id)
+        if conn and not conn.is_healthy:
+            logger.warning(f"账号 {account_id} 不健康，但仍尝试获取群列表")
+        
+        try:
+            result = await call_onebot_api(
+                context=self.context,
+                action='get_group_list',
+                params={},
+                account_id=account_id
+            )
+        except Exception as e:
+            logger.error(f"获取账号 {account_id} 群列表时发生异常：{e}")
+            return False
+        
+        if not result or not result.get('success'):
+            logger.warning(f"账号 {account_id} 获取群列表失败：{result}")
+            return False
+        data = result.get('data', {})
+        if data.get('status') != 'ok' or 'data' not in data:
+            logger.warning(f"账号 {account_id} 获取群列表失败：{data}")
+            return False
+        
+        group_list = data['data'] or []
+        self._set_account_groups(account_id, {str(group.get('group_id')) for group in group_list})
+        logger.debug(f"账号 {account_id} 获取到 {len(group_list)} 个群")
+        return True
+    
+    def _set_account_groups(self, account_id: int, group_ids: Set[str]):
+        """用完整的群列表替换某账号的成员关系，只重新计算发生变化的群"""
+        old_group_ids = self._group_list_cache.get(account_id, set())
+        for group_id in old_group_ids - group_ids:
+            self.remove_group_member(group_id, account_id)
+        for group_id in group_ids - old_group_ids:
+            self.add_group_member(group_id, account_id)
+        self._group_list_cache[account_id] = set(group_ids)
+    
+    def add_group_member(self, group_id: str, account_id: int):
+        """记录账号加入了某群"""
+        group_id = str(group_id)
+        members = self._group_accounts_map.setdefault(group_id, set())
+        if account_id in members:
+            return
+        members.add(account_id)
+        self._group_list_cache.setdefault(account_id, set()).add(group_id)
+        self._recompute_responsible(group_id)
+        logger.debug(f"群 {group_id} 成员关系更新: 加入账号 {account_id}")
+    
+    def remove_group_member(self, group_id: str, account_id: int):
+        """记录账号离开了某群"""
+        group_id = str(group_id)
+        members = self._group_accounts_map.get(group_id)
+        if not members or account_id not in members:
+            return
+        members.discard(account_id)
+        self._group_list_cache.get(account_id, set()).discard(group_id)
+        if not members:
+            del self._group_accounts_map[group_id]
+        self._recompute_responsible(group_id)
+        logger.debug(f"群 {group_id} 成员关系更新: 移除账号 {account_id}")
+    
+    def handle_membership_notice(self, event: dict, account_id: int = None):
+        """根据涉及机器人自身的进退群通知增量更新群成员关系"""
+        notice_type = event.get('notice_type')
+        if notice_type not in ('group_increase', 'group_decrease'):
+            return
+        self_id = str(event.get('self_id', ''))
+        if not self_id or str(event.get('user_id', '')) != self_id:
+            return
+        if account_id is None:
+            conn = self.get_connection_by_qq(self_id)
+            if not conn:
+                return
+            account_id = conn.id
+        group_id = event.get('group_id')
+        if group_id is None:
+            return
+        if notice_type == 'group_increase':
+            logger.info(f"账号 {account_id} 加入群 {group_id}，已更新群成员关系")
+            self.add_group_member(group_id, account_id)
+        else:
+            logger.info(f"账号 {account_id} 离开群 {group_id}，已更新群成员关系")
+            self.remove_group_member(group_id, account_id)
+    
+    def _recompute_responsible(self, group_id: str):
+        """重新计算某群的负责账号：优先选择已连接且健康的账号中优先级最高者，其次是已连接的账号"""
+        members = self._group_accounts_map.get(group_id)
+        if not members:
+            self._group_responsible.pop(group_id, None)
+            return
+        best_key = None
+        responsible = None
+        for account_id in members:
+            conn = self.connections.get(account_id)
+            if not conn or not conn.is_connected:
+                continue
+            key = (0 if conn.is_healthy else 1, conn.priority, account_id)
+            if best_key is None or key < best_key:
+                best_key = key
+                responsible = account_id
+        self._group_responsible[group_id] = responsible
     
     def get_accounts_in_group(self, group_id: str) -> List[int]:
         """获取指定群中的所有账号ID列表"""
-        return self._group_accounts_map.get(str(group_id), [])
+        return sorted(self._group_accounts_map.get(str(group_id), ()))
+    
+    def get_responsible_account(self, group_id: str) -> Optional[int]:
+        """获取负责处理指定群消息的账号ID，未知时返回None"""
+        return self._group_responsible.get(str(group_id))
     
     def is_highest_priority_in_group(self, account_id: int, group_id: str) -> bool:
         """检查指定账号是否是该群中优先级最高的活跃账号
         
+        负责账号在成员关系或连接状态变化时预先计算，这里只做O(1)查询。
+        
         Args:
             account_id: 要检查的账号 ID
             group_id: 群 ID
@@ -585,48 +721,45 @@ class MultiWebSocketManager:
         Returns:
             True 如果该账号是该群最高优先级的活跃账号，否则 False
         """
-        accounts_in_group = self.get_accounts_in_group(group_id)
+        group_id = str(group_id)
+        accounts_in_group = self._group_accounts_map.get(group_id)
+        
+        # 能收到该群的消息说明账号在群中，成员关系缺失时立即补记，不必等待下一次校对
+        if accounts_in_group is None or account_id not in accounts_in_group:
+            if account_id in self.connections:
+                self.add_group_member(group_id, account_id)
+                accounts_in_group = self._group_accounts_map[group_id]
+            else:
+                accounts_in_group = accounts_in_group or set()
         
-        # 如果该群只有一个账号或没有缓存信息，直接返回 True
+        # 如果该群只有一个账号，直接返回 True
         if len(accounts_in_group) <= 1:
             logger.debug(f"群 {group_id} 只有 {len(accounts_in_group)} 个账号缓存，允许处理")
             return True
         
-        # 获取当前账号的优先级
-        current_conn = self.connections.get(account_id)
-        if not current_conn:
-            logger.warning(f"账号 {account_id} 的连接信息不存在")
-            return False
+        responsible = self._group_responsible.get(group_id)
+        if responsible is None:
+            logger.debug(f"群 {group_id} 中的账号均未连接或不健康，允许账号 {account_id} 处理消息")
+            return True
         
-        # 如果当前账号未连接或不健康，不应该处理消息
-        if not current_conn.is_connected or not current_conn.is_healthy:
-            logger.debug(f"账号 {account_id} 未连接或不健康，不应该处理消息")
+        if responsible != account_id:
+            logger.debug(f"账号 {account_id} 在群 {group_id} 中有更高优先级的账号 {responsible} (优先级：{self.connections[responsible].priority})")
             return False
         
-        current_priority = current_conn.priority
-        
-        # 检查是否有其他更高优先级的活跃账号
-        for other_account_id in accounts_in_group:
-            if other_account_id == account_id:
-                continue
-            
-            other_conn = self.connections.get(other_account_id)
-            if not other_conn:
-                continue
-            
-            # 如果其他账号优先级更高且活跃，返回 False
-            if other_conn.priority < current_priority and other_conn.is_connected and other_conn.is_healthy:
-                logger.debug(f"账号 {account_id} 在群 {group_id} 中有更高优先级的账号 {other_account_id} (优先级：{other_conn.priority} < {current_priority})")
-                return False
-        
-        logger.debug(f"账号 {account_id} 是群 {group_id} 中最高优先级的活跃账号 (优先级：{current_priority})")
+        logger.debug(f"账号 {account_id} 是群 {group_id} 中最高优先级的活跃账号 (优先级：{self.connections[account_id].priority})")
         return True
     
     def is_parallel_pro_mode(self) -> bool:
         """检查是否为 Parallel Pro 模式"""
         return self.mode == 'parallel-pro'
 
+    def get_shard_status(self):
+        """返回 (本进程管理的账号ID列表, 已连接账号数)，用于分片心跳"""
+        return list(self.connections), sum(1 for conn in self.connections.values() if conn.is_connected)
+
     def stop(self):
         """停止主循环。"""
         logger.debug("MultiWebSocketManager停止主循环")
-        self._is_running = False
\ No newline at end of file
+        self._is_running = False
+        for conn in self.connections.values():
+            conn.health.stop()
\ No newline at end of file
@@ -0,0 +1,298 @@
+# core/profile_cache.py
+# 用户资料与群成员缓存：get_stranger_info / get_group_member_info / get_group_member_list 的结果按TTL缓存，
+# 同一个键的并发查询合并为一次请求，进退群、群名片、管理员变动通知到达时更新或失效对应条目
+#
+# 大群的成员列表拉取既慢又容易触发风控，命令和审批应优先通过这里查询，而不是直接调用API
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+from logger_config import get_logger
+from core.metrics import PROFILE_CACHE_LOOKUPS
+
+logger = get_logger("ProfileCache")
+
+DEFAULT_SETTINGS = {
+    'enabled': True,
+    'user_ttl': 3600,          # 用户资料（昵称、等级等）缓存时间（秒）
+    'member_ttl': 600,         # 单个群成员信息缓存时间（秒）
+    'member_list_ttl': 300,    # 整个群成员列表缓存时间（秒）
+    'max_users': 20000,        # 用户资料最多缓存条数
+    'max_members': 50000,      # 群成员信息最多缓存条数
+    'max_groups': 200,         # 群成员列表最多缓存的群数
+    'batch_concurrency': 5,    # 批量查询时同时进行的API请求数
+}
+
+
+class TTLCache:
+    """带过期时间的有界LRU缓存"""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]):
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ProfileCache:
+    """用户资料和群成员缓存
+
+    缓存的是OneBot返回的原始数据字典，调用方按原来的字段名读取（nickname、card、role、qqLevel 等）。
+    查询失败时返回 None 且不缓存，下次查询会重新请求。
+    """
+
+    def __init__(self):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self._users = TTLCache(DEFAULT_SETTINGS['user_ttl'], DEFAULT_SETTINGS['max_users'])
+        self._members = TTLCache(DEFAULT_SETTINGS['member_ttl'], DEFAULT_SETTINGS['max_members'])
+        self._member_lists = TTLCache(DEFAULT_SETTINGS['member_list_ttl'], DEFAULT_SETTINGS['max_groups'])
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def configure(self, settings: Optional[dict]):
+        merged = dict(DEFAULT_SETTINGS)
+        if settings:
+            merged.update({key: value for key, value in settings.items() if key in DEFAULT_SETTINGS})
+        self.settings = merged
+        self._users.ttl, self._users.max_size = merged['user_ttl'], merged['max_users']
+        self._members.ttl, self._members.max_size = merged['member_ttl'], merged['max_members']
+        self._member_lists.ttl, self._member_lists.max_size = merged['member_list_ttl'], merged['max_groups']
+        if not merged['enabled']:
+            self.clear()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.settings['enabled'])
+
+    # ---------------------- 查询 ----------------------
+
+    async def get_user(self, context, user_id, account_id: int = None) -> Optional[dict]:
+        """获取用户资料（get_stranger_info 的 data）"""
+        user_id = str(user_id)
+        return await self._lookup('user', self._users, user_id,
+                                  lambda: self._fetch_user(context, user_id, account_id))
+
+    async def get_users(self, context, user_ids: Iterable, account_id: int = None) -> Dict[str, dict]:
+        """批量获取用户资料，返回 {user_id: data}，查询失败的用户不在结果中"""
+        return await self._batch(user_ids, lambda user_id: self.get_user(context, user_id, account_id))
+
+    async def get_member(self, context, group_id, user_id, account_id: int = None) -> Optional[dict]:
+        """获取群成员信息，已缓存该群的成员列表时直接从列表中取"""
+        key = (str(group_id), str(user_id))
+        if self.enabled and self._members.get(key) is None:
+            members = self._member_lists.get(key[0])
+            if members is not None:
+                for member in members:
+                    if str(member.get('user_id')) == key[1]:
+                        self._members.set(key, member)
+                        break
+        return await self._lookup('member', self._members, key,
+                                  lambda: self._fetch_member(context, key[0], key[1], account_id))
+
+    async def get_member_list(self, context, group_id, account_id: int = None, refresh: bool = False) -> Optional[List[dict]]:
+        """获取群成员列表，refresh 为 True 时忽略缓存重新拉取"""
+        group_id = str(group_id)
+        if refresh:
+            self._member_lists.pop(group_id)
+        return await self._lookup('member_list', self._member_lists, group_id,
+                                  lambda: self._fetch_member_list(context, group_id, account_id))
+
+    async def _lookup(self, kind: str, cache: TTLCache, key: Hashable,
+                      fetch: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        if not self.enabled:
+            return await fetch()
+
+        value = cache.get(key)
+        if value is not None:
+            PROFILE_CACHE_LOOKUPS.labels(kind, 'hit').inc()
+            return value
+
+        inflight_key = (kind, key)
+        pending = self._inflight.get(inflight_key)
+        if pending is not None:
+            # 同一个键已有请求在进行，等待它的结果而不是再请求一次
+            PROFILE_CACHE_LOOKUPS.labels(kind, 'coalesced').inc()
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # 发起请求的任务被取消了，由当前任务重新请求
+                return await self._lookup(kind, cache, key, fetch)
+
+        PROFILE_CACHE_LOOKUPS.labels(kind, 'miss').inc()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[inflight_key] = future
+        try:
+            value = await fetch()
+            if value is not None:
+                cache.set(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(inflight_key, None)
+
+    async def _batch(self, keys: Iterable, lookup: Callable[[str], Awaitable[Optional[dict]]]) -> Dict[str, dict]:
+        semaphore = asyncio.Semaphore(max(1, int(self.settings['batch_concurrency'])))
+
+        async def limited(key: str):
+            async with semaphore:
+                return key, await lookup(key)
+
+        unique_keys = list(dict.fromkeys(str(key) for key in keys))
+        results = await asyncio.gather(*(limited(key) for key in unique_keys), return_exceptions=True)
+        found = {}
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"批量查询资料时出错: {result}")
+                continue
+            key, value = result
+            if value is not None:
+                found[key] = value
+        return found
+
+    # ---------------------- 请求 ----------------------
+
+    @staticmethod
+    async def _call(context, action: str, params: dict, account_id: int = None) -> Optional[Any]:
+        from utils.api_utils import call_onebot_api
+        response = await call_onebot_api(context, action, params, account_id=account_id)
+        if not response or not response.get('success'):
+            error = response.get('error', '未知错误') if response else '无响应'
+            logger.warning(f"{action} 调用失败: {error}")
+            return None
+        api_data = response.get('data') or {}
+        if api_data.get('status') != 'ok':
+            logger.warning(f"{action} 返回错误: {api_data.get('message') or api_data.get('wording') or api_data}")
+            return None
+        return api_data.get('data')
+
+    async def _fetch_user(self, context, user_id: str, account_id: int = None) -> Optional[dict]:
+        data = await self._call(context, 'get_stranger_info', {'user_id': int(user_id), 'no_cache': True}, account_id)
+        return data if isinstance(data, dict) else None
+
+    async def _fetch_member(self, context, group_id: str, user_id: str, account_id: int = None) -> Optional[dict]:
+        data = await self._call(context, 'get_group_member_info',
+                                {'group_id': int(group_id), 'user_id': int(user_id), 'no_cache': True}, account_id)
+        return data if isinstance(data, dict) else None
+
+    async def _fetch_member_list(self, context, group_id: str, account_id: int = None) -> Optional[List[dict]]:
+        data = await self._call(context, 'get_group_member_list', {'group_id': int(group_id)}, account_id)
+        if not isinstance(data, list):
+            return None
+        members = [member for member in data if isinstance(member, dict)]
+        logger.debug(f"已拉取群 {group_id} 的成员列表，共 {len(members)} 人")
+        return members
+
+    # ---------------------- 失效 ----------------------
+
+    def invalidate_user(self, user_id):
+        self._users.pop(str(user_id))
+
+    def invalidate_member(self, group_id, user_id):
+        self._members.pop((str(group_id), str(user_id)))
+
+    def invalidate_group(self, group_id):
+        group_id = str(group_id)
+        self._member_lists.pop(group_id)
+        self._members.pop_where(lambda key: key[0] == group_id)
+
+    def clear(self):
+        self._users.clear()
+        self._members.clear()
+        self._member_lists.clear()
+
+    def handle_notice(self, event: dict):
+        """根据通知事件更新缓存：进退群、群名片变更、管理员变动"""
+        notice_type = event.get('notice_type')
+        group_id = event.get('group_id')
+        user_id = event.get('user_id')
+        if not group_id or not user_id:
+            return
+        group_id, user_id = str(group_id), str(user_id)
+
+        if notice_type == 'group_increase':
+            # 新成员的完整信息只能重新拉取，成员列表直接失效
+            self._member_lists.pop(group_id)
+            self.invalidate_member(group_id, user_id)
+        elif notice_type == 'group_decrease':
+            if event.get('sub_type') == 'kick_me' or user_id == str(event.get('self_id')):
+                self.invalidate_group(group_id)
+                return
+            self.invalidate_member(group_id, user_id)
+            self._update_list_member(group_id, user_id, None)
+        elif notice_type == 'group_card':
+            card = event.get('card_new')
+            if card is None:
+                self.invalidate_member(group_id, user_id)
+                self._member_lists.pop(group_id)
+            else:
+                self._update_member(group_id, user_id, {'card': card})
+        elif notice_type == 'group_admin':
+            role = 'admin' if event.get('sub_type') == 'set' else 'member'
+            self._update_member(group_id, user_id, {'role': role})
+
+    def _update_member(self, group_id: str, user_id: str, changes: dict):
+        """就地更新已缓存的成员信息，不延长其过期时间"""
+        member = self._members.get((group_id, user_id))
+        if member is not None:
+            member.update(changes)
+        self._update_list_member(group_id, user_id, changes)
+
+    def _update_list_member(self, group_id: str, user_id: str, changes: Optional[dict]):
+        """changes 为 None 时从缓存的成员列表中移除该成员"""
+        members = self._member_lists.get(group_id)
+        if members is None:
+            return
+        for index, member in enumerate(members):
+            if str(member.get('user_id')) == user_id:
+                if changes is None:
+                    del members[index]
+                else:
+                    member.update(changes)
+                return
+
+    def stats(self) -> Dict[str, int]:
+        return {'users': len(self._users), 'members': len(self._members),
+                'member_lists': len(self._member_lists), 'inflight': len(self._inflight)}
+
+
+# 全局资料缓存实例
+profile_cache = ProfileCache()
@@ -0,0 +1,104 @@
+# core/reconnect_policy.py
+# 重连策略：去相关抖动的指数退避、熔断器，以及所有账号共享的连接尝试预算
+
+import asyncio
+import random
+import time
+from logger_config import get_logger
+
+logger = get_logger("ReconnectPolicy")
+
+
+class DecorrelatedJitterBackoff:
+    """去相关抖动退避：delay = min(cap, uniform(base, prev * factor))
+
+    每个账号的等待时间相互独立地随机分布，OneBot重启后各账号不会同时重连。
+    """
+
+    def __init__(self, base: float = 5, cap: float = 60, factor: float = 3):
+        self.base = max(base, 0.1)
+        self.cap = max(cap, self.base)
+        self.factor = max(factor, 1.5)
+        self._prev = self.base
+
+    def next_delay(self) -> float:
+        self._prev = min(self.cap, random.uniform(self.base, self._prev * self.factor))
+        return self._prev
+
+    def reset(self):
+        self._prev = self.base
+
+    def jitter(self) -> float:
+        """连接正常关闭后的短暂随机等待，打散各账号的重连时刻"""
+        return random.uniform(0, self.base)
+
+
+class CircuitBreaker:
+    """连接熔断器
+
+    连续失败达到 failure_threshold 次后打开，open_duration 秒内不再尝试连接；
+    到期后进入半开状态放行一次探测，成功则关闭，失败则重新打开。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold: int = 10, open_duration: float = 300):
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.open_duration = open_duration
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def remaining_open_time(self) -> float:
+        """熔断打开时距离允许探测的剩余秒数，可以尝试时返回0"""
+        if self.state != self.OPEN:
+            return 0.0
+        remaining = self.opened_at + self.open_duration - time.time()
+        if remaining <= 0:
+            self.state = self.HALF_OPEN
+            logger.info(f"账号 {self.name} 熔断结束，尝试探测连接")
+            return 0.0
+        return remaining
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"账号 {self.name} 连接恢复，熔断器关闭")
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self.opened_at = time.time()
+            logger.error(f"账号 {self.name} 连续连接失败 {self.failures} 次，熔断 {self.open_duration:.0f} 秒")
+
+
+class AttemptBudget:
+    """所有账号共享的连接尝试预算（令牌桶），限制单位时间内的总连接尝试次数"""
+
+    def __init__(self, attempts_per_minute: float = 30, burst: int = None):
+        self.rate = max(attempts_per_minute, 1) / 60.0
+        self.capacity = burst if burst is not None else max(int(attempts_per_minute), 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """获取一次连接尝试的配额，预算用尽时等待补充"""
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                logger.debug(f"连接尝试预算已用尽，等待 {wait:.1f} 秒")
+                await asyncio.sleep(wait)
+                self._refill()
+            self._tokens -= 1
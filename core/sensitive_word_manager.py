@@ -2,15 +2,13 @@
 # 独立的敏感词管理模块
 
 import os
-from datetime import datetime
 from logger_config import get_logger
+from core.moderation_journal import moderation_journal
 
 logger = get_logger("SensitiveWordManager")
 
-# 敏感词库和触发日志现在由本模块管理
+# 敏感词库由本模块管理，触发日志记录在管理事件日志中（kind 为 sensitive）
 sensitive_words = {}
-sensitive_trigger_log = []
-MAX_LOG_ENTRIES = 50
 
 def load_sensitive_words():
     """加载敏感词库，支持新旧格式并自动转换"""
@@ -77,29 +75,17 @@ def remove_sensitive_word(word: str) -> bool:
         logger.error(f"更新敏感词文件失败: {e}")
         return False
 
-def get_sensitive_trigger_log() -> list:
-    """获取敏感词触发日志"""
-    global sensitive_trigger_log
-    return sensitive_trigger_log.copy() # 返回副本，防止外部修改
+def get_sensitive_trigger_log(limit: int = 50, **filters) -> list:
+    """获取最近的敏感词触发日志（从新到旧），可按 group_id/user_id/word 过滤"""
+    return moderation_journal.recent(limit, kind="sensitive", **filters)
 
 def clear_sensitive_trigger_log():
-    """清空敏感词触发日志"""
-    global sensitive_trigger_log
-    sensitive_trigger_log.clear()
+    """清空内存中的敏感词触发日志（已写入文件的历史保留）"""
+    moderation_journal.clear_recent("sensitive")
 
-def log_sensitive_trigger(message: str, word: str, group_id: str, user_id: str):
+def log_sensitive_trigger(message: str, word: str, group_id: str, user_id: str, action: str = ""):
     """记录敏感词触发日志"""
-    global sensitive_trigger_log
-    log_entry = {
-        "message": message,
-        "word": word,
-        "group_id": str(group_id),
-        "user_id": str(user_id),
-        "timestamp": int(datetime.now().timestamp())
-    }
-    sensitive_trigger_log.append(log_entry)
-    if len(sensitive_trigger_log) > MAX_LOG_ENTRIES:
-        sensitive_trigger_log.pop(0)
+    moderation_journal.record("sensitive", group_id, user_id, word=word, message=message, action=action)
 
 def is_sensitive(text: str) -> tuple:
     """检查文本是否包含敏感词，返回 (是否包含, 触发的词, 原因)"""
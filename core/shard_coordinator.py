@@ -0,0 +1,200 @@
+# core/shard_coordinator.py
+# 多进程分片协调：start.py 以 --shard i/N 启动多个 bot.py 工作进程，各进程只连接分配给自己的账号，
+# 通过本地SQLite共享分片注册信息、健康心跳，并认领跨分片重复到达的事件
+
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+from logger_config import get_logger
+from core.event_dedup import event_fingerprint
+
+logger = get_logger("ShardCoordinator")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHARD_DB_PATH = os.path.join(PROJECT_ROOT, 'data', 'shards.db')
+
+# start.py 读取 shards 表判断工作进程是否存活，修改表结构时需同步修改 start.py
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS shards (
+        shard INTEGER PRIMARY KEY,
+        shard_count INTEGER NOT NULL,
+        pid INTEGER NOT NULL,
+        accounts TEXT NOT NULL DEFAULT '',
+        connected INTEGER NOT NULL DEFAULT 0,
+        started_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS claims (
+        fingerprint TEXT PRIMARY KEY,
+        shard INTEGER NOT NULL,
+        expires_at REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_claims_expires ON claims(expires_at)",
+)
+
+
+def parse_shard_arg(argv: List[str]) -> Tuple[int, int]:
+    """解析 --shard i/N 参数，未指定或格式错误时返回 (0, 1)"""
+    if '--shard' not in argv:
+        return 0, 1
+    try:
+        value = argv[argv.index('--shard') + 1]
+        index, count = (int(part) for part in value.split('/', 1))
+    except (IndexError, ValueError):
+        return 0, 1
+    if count < 1 or not 0 <= index < count:
+        return 0, 1
+    return index, count
+
+
+class ShardCoordinator:
+    """分片工作进程一侧的协调器
+
+    - shard_count 为1（默认）时不做任何事，单进程行为与之前完全相同
+    - owns_account(): 按账号在配置中的顺序轮流分配给各分片
+    - 心跳：定期写入 shards 表，start.py 据此对每个分片做健康检查，心跳过期即重启该分片
+    - claim_event(): 同一个群事件可能被不同分片的账号收到，先写入认领记录的分片负责处理
+    """
+
+    def __init__(self, db_path: str = SHARD_DB_PATH, heartbeat_interval: float = 5, claim_ttl: float = 60):
+        self.db_path = db_path
+        self.heartbeat_interval = heartbeat_interval
+        self.claim_ttl = claim_ttl
+        self.shard_index = 0
+        self.shard_count = 1
+        self.started_at = time.time()
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._status_provider: Optional[Callable[[], Tuple[List[int], int]]] = None
+
+    def configure_from_argv(self, argv: List[str]):
+        self.shard_index, self.shard_count = parse_shard_arg(argv)
+        if self.enabled:
+            logger.info(f"以分片模式运行: 分片 {self.shard_index + 1}/{self.shard_count}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.shard_count > 1
+
+    @property
+    def is_primary(self) -> bool:
+        """主分片负责控制台输入和全局性的清理工作"""
+        return self.shard_index == 0
+
+    def owns_account(self, index: int) -> bool:
+        """配置中第 index 个账号是否由本分片连接"""
+        return index % self.shard_count == self.shard_index
+
+    def set_status_provider(self, provider: Callable[[], Tuple[List[int], int]]):
+        """设置心跳内容来源，返回 (本分片账号ID列表, 已连接账号数)"""
+        self._status_provider = provider
+
+    # ---------------------- 生命周期 ----------------------
+
+    async def start(self):
+        if not self.enabled or self._db is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ShardCoordinator")
+        await self._run(self._open)
+        await self._run(self._write_heartbeat, [], 0)
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        logger.info(f"分片 {self.shard_index} 已注册到协调数据库 {self.db_path}")
+
+    async def close(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        if self._db is not None:
+            await self._run(self._close)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _run(self, func, *args):
+        # 所有数据库操作都在同一个专用线程中执行，既不阻塞事件循环，也满足sqlite3的线程要求
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self._db.execute(statement)
+
+    def _close(self):
+        try:
+            self._db.execute("DELETE FROM shards WHERE shard = ? AND pid = ?", (self.shard_index, os.getpid()))
+        except sqlite3.Error:
+            pass
+        self._db.close()
+        self._db = None
+
+    # ---------------------- 健康心跳 ----------------------
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            accounts, connected = [], 0
+            if self._status_provider:
+                try:
+                    accounts, connected = self._status_provider()
+                except Exception as e:
+                    logger.error(f"获取分片状态失败: {e}")
+            try:
+                await self._run(self._write_heartbeat, accounts, connected)
+                if self.is_primary:
+                    await self._run(self._purge_claims)
+            except sqlite3.Error as e:
+                logger.warning(f"写入分片心跳失败: {e}")
+
+    def _write_heartbeat(self, accounts: List[int], connected: int):
+        now = time.time()
+        self._db.execute(
+            "INSERT INTO shards (shard, shard_count, pid, accounts, connected, started_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(shard) DO UPDATE SET shard_count = excluded.shard_count, pid = excluded.pid, "
+            "accounts = excluded.accounts, connected = excluded.connected, "
+            "started_at = excluded.started_at, updated_at = excluded.updated_at",
+            (self.shard_index, self.shard_count, os.getpid(), ','.join(str(a) for a in accounts),
+             connected, self.started_at, now)
+        )
+
+    def _purge_claims(self):
+        self._db.execute("DELETE FROM claims WHERE expires_at < ?", (time.time(),))
+
+    # ---------------------- 跨分片事件认领 ----------------------
+
+    async def claim_event(self, event: dict) -> bool:
+        """认领事件，返回本分片是否应该处理；未启用分片或数据库不可用时总是返回 True"""
+        if self._db is None:
+            return True
+        fingerprint = event_fingerprint(event)
+        if fingerprint is None:
+            return True
+        try:
+            return await self._run(self._claim, repr(fingerprint))
+        except sqlite3.Error as e:
+            # 协调数据库异常时宁可重复处理，也不丢消息
+            logger.warning(f"认领事件失败，按未认领处理: {e}")
+            return True
+
+    def _claim(self, key: str) -> bool:
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO claims (fingerprint, shard, expires_at) VALUES (?, ?, ?)",
+            (key, self.shard_index, time.time() + self.claim_ttl)
+        )
+        return cursor.rowcount == 1
+
+
+# 全局分片协调实例
+shard_coordinator = ShardCoordinator()
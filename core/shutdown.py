@@ -0,0 +1,206 @@
+# core/shutdown.py
+# 协调退出与重启：停止接收新事件 -> 在截止时间内等待处理中的事件和后台任务（定时器任务直接取消） -> 由 bot.py 写盘并关闭连接；
+# 可选的交接重启会先让新进程连上，旧进程再排空退出
+
+import asyncio
+import contextlib
+import os
+import time
+from typing import Callable, Iterable, Optional
+from logger_config import get_logger
+
+logger = get_logger("Shutdown")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESTART_FLAG = os.path.join(PROJECT_ROOT, '.restart_flag')
+# 交接重启时新进程第一次连接成功后写入该文件，通知旧进程可以停止接收事件
+HANDOVER_READY_FLAG = os.path.join(PROJECT_ROOT, '.handover_ready')
+# 写入 RESTART_FLAG 的内容为该值时，start.py 先启动新进程，不终止旧进程
+HANDOVER_MODE = 'handover'
+
+DEFAULT_SETTINGS = {
+    'drain_timeout': 15,  # 等待处理中的事件和后台任务的最长时间（秒）
+    'handover': False,  # 重启时是否先启动新进程再退出旧进程
+    'handover_timeout': 60,  # 等待新进程连接成功的最长时间（秒）
+}
+
+
+def write_restart_flag(content: str = None):
+    """写入重启标志，start.py 检测到后重新启动机器人"""
+    with open(RESTART_FLAG, 'w') as f:
+        f.write(content if content is not None else str(time.time()))
+
+
+class ShutdownManager:
+    """退出协调器
+
+    - request(): 请求退出或重启，可以从任意线程调用
+    - accepting: 为 False 后消息路由器不再分发新事件（API回调仍然处理，保证排空中的发送能拿到结果）
+    - track(): 包裹单个事件的处理过程，用于统计处理中的事件
+    - sleep(): 可被退出请求提前唤醒的等待，例如自动撤回在退出前立即执行
+    - drain(): 等待处理中的事件和受监控的后台任务完成，超过截止时间后放弃；长时间等待的定时器任务直接取消
+    """
+
+    def __init__(self):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.restart = False
+        self.handover_started = False
+        self.reason = ''
+        self._accepting = True
+        self._in_flight = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._requested: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+
+    def configure(self, settings: Optional[dict]):
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """在事件循环启动后调用"""
+        self._loop = loop
+        self._requested = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def accepting(self) -> bool:
+        return self._accepting
+
+    @property
+    def requested(self) -> bool:
+        return self._requested is not None and self._requested.is_set()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    # ---------------------- 退出请求 ----------------------
+
+    def request(self, restart: bool = False, reason: str = ''):
+        """请求退出（restart=True 时退出后由 start.py 重新启动）"""
+        if self._loop is None:
+            raise RuntimeError("ShutdownManager 尚未绑定事件循环")
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._set_requested(restart, reason)
+        else:
+            self._loop.call_soon_threadsafe(self._set_requested, restart, reason)
+
+    def _set_requested(self, restart: bool, reason: str):
+        if self._requested.is_set():
+            return
+        self.restart = restart
+        self.reason = reason
+        logger.info(f"收到{'重启' if restart else '退出'}请求{f'（{reason}）' if reason else ''}")
+        self._requested.set()
+
+    async def wait_requested(self):
+        await self._requested.wait()
+
+    async def sleep(self, seconds: float) -> bool:
+        """等待指定时间，收到退出请求时提前返回；返回值表示是否被退出请求打断"""
+        if self._requested is None:
+            await asyncio.sleep(seconds)
+            return False
+        try:
+            await asyncio.wait_for(self._requested.wait(), timeout=seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    # ---------------------- 处理中的事件 ----------------------
+
+    @contextlib.asynccontextmanager
+    async def track(self):
+        self._in_flight += 1
+        if self._idle is not None:
+            self._idle.clear()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0 and self._idle is not None:
+                self._idle.set()
+
+    def stop_accepting(self):
+        if self._accepting:
+            self._accepting = False
+            logger.info("已停止接收新事件")
+
+    # ---------------------- 交接与排空 ----------------------
+
+    async def wait_for_handover(self) -> bool:
+        """写入交接重启标志并等待新进程连接成功，期间继续处理事件"""
+        timeout = self.settings['handover_timeout']
+        with contextlib.suppress(OSError):
+            os.remove(HANDOVER_READY_FLAG)
+        write_restart_flag(HANDOVER_MODE)
+        self.handover_started = True
+        logger.info(f"交接重启：等待新进程连接（最多 {timeout} 秒）")
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if os.path.exists(HANDOVER_READY_FLAG):
+                with contextlib.suppress(OSError):
+                    os.remove(HANDOVER_READY_FLAG)
+                logger.info("新进程已连接，开始排空")
+                return True
+            await asyncio.sleep(0.2)
+        logger.warning("等待新进程连接超时，直接排空退出")
+        return False
+
+    async def drain(self, pending_tasks: Callable[[], Iterable[asyncio.Task]] = tuple,
+                    timer_tasks: Callable[[], Iterable[asyncio.Task]] = tuple):
+        """等待处理中的事件和后台任务完成，返回未完成的任务数
+
+        Args:
+            pending_tasks: 返回需要等待的后台任务（处理中的API调用等）
+            timer_tasks: 返回需要取消的定时器任务；它们要等很久才执行，且状态另有保存，等待只会拖到超时
+        """
+        self.stop_accepting()
+        timeout = self.settings['drain_timeout']
+        deadline = time.monotonic() + timeout
+        started = time.monotonic()
+
+        if self._in_flight:
+            logger.info(f"等待 {self._in_flight} 个处理中的事件完成...")
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+
+        # 事件处理过程中可能又创建了后台任务，等事件处理完再取快照
+        timers = [task for task in timer_tasks() if not task.done()]
+        for task in timers:
+            task.cancel()
+        if timers:
+            await asyncio.gather(*timers, return_exceptions=True)
+            logger.info(f"已取消 {len(timers)} 个定时器任务")
+
+        tasks = [task for task in pending_tasks() if not task.done()]
+        remaining = max(0.0, deadline - time.monotonic())
+        if tasks and remaining > 0:
+            logger.info(f"等待 {len(tasks)} 个后台任务完成...")
+            await asyncio.wait(tasks, timeout=remaining)
+
+        unfinished = self._in_flight + sum(1 for task in tasks if not task.done())
+        elapsed = time.monotonic() - started
+        if unfinished:
+            logger.warning(f"排空超时（{timeout}秒），仍有 {unfinished} 个任务未完成")
+        else:
+            logger.info(f"排空完成，用时 {elapsed:.1f} 秒")
+        return unfinished
+
+
+def notify_handover_ready():
+    """交接重启的新进程连接成功后调用"""
+    try:
+        with open(HANDOVER_READY_FLAG, 'w') as f:
+            f.write(str(os.getpid()))
+    except OSError as e:
+        logger.warning(f"写入交接就绪标志失败: {e}")
+
+
+# 全局退出协调实例
+shutdown_manager = ShutdownManager()
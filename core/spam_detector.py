@@ -0,0 +1,224 @@
+# core/spam_detector.py
+# 刷屏检测：按用户和按群的滑动窗口统计消息频率、重复内容和@人数，命中规则时返回规则名，由消息管道执行配置的处理动作
+#
+# 每个用户/群的窗口是按时间排序的 deque，新消息从右侧加入，过期消息从左侧弹出，每条消息只进出窗口各一次；
+# 重复内容按指纹计数（dict），因此每条消息的检测是均摊 O(1)，与窗口内的消息数无关。
+# 指纹取消息纯文本归一化（去除标点、空白和数字，转小写）后的字符二元组集合的哈希：
+# 插入标点/表情、改数字或重复字词的变体会得到相同的指纹
+
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional, Sequence, Tuple
+from logger_config import get_logger
+from core.metrics import SPAM_DETECTIONS
+
+logger = get_logger("SpamDetector")
+
+# 规则名
+RULE_MENTIONS = 'mentions'  # 单条消息@人数过多
+RULE_FLOOD = 'flood'  # 单个用户发送过快
+RULE_DUPLICATE = 'duplicate'  # 单个用户重复发送相同（近似）内容
+RULE_GROUP_DUPLICATE = 'group_duplicate'  # 多人在群内发送相同（近似）内容（刷屏攻击）
+RULE_GROUP_FLOOD = 'group_flood'  # 群消息总量过大
+
+# 处理动作：ignore 只停止后续处理；warn 在群里@提醒；recall 撤回消息；mute 禁言 mute_seconds 秒
+ACTIONS = frozenset({'ignore', 'warn', 'recall', 'mute'})
+
+# 默认配置，可在 config.yml 的 spam_detection 节中覆盖；群配置中 spam_detection_enabled 为 true 时才检测
+DEFAULT_SETTINGS = {
+    'user_window': 10,  # 用户消息频率窗口（秒）
+    'user_max_messages': 8,  # 窗口内单个用户最多消息数
+    'duplicate_window': 60,  # 重复内容窗口（秒）
+    'duplicate_max': 3,  # 窗口内单个用户最多发送几条相同内容
+    'group_window': 10,  # 群消息频率窗口（秒）
+    'group_max_messages': 40,  # 窗口内整个群最多消息数
+    'group_duplicate_max': 8,  # 重复内容窗口内整个群最多几条相同内容
+    'max_mentions': 5,  # 单条消息最多@人数
+    'min_length': 4,  # 归一化后短于此长度的消息不计算重复（“哈哈”“+1”等）
+    'mute_seconds': 600,
+    'action_cooldown': 60,  # 同一用户两次 warn/mute 之间的最短间隔（秒），recall 不受限制
+    'exempt_admins': True,  # 群主和管理员不检测
+    'max_tracked_users': 10000,  # 最多保留多少个用户的窗口，超出时淘汰最久未发言的
+    'max_tracked_groups': 1000,
+    'actions': {
+        RULE_MENTIONS: ['recall', 'warn'],
+        RULE_FLOOD: ['recall', 'mute'],
+        RULE_DUPLICATE: ['recall', 'warn'],
+        RULE_GROUP_DUPLICATE: ['recall'],
+        RULE_GROUP_FLOOD: ['ignore'],
+    },
+}
+
+# 指纹计算前去除的字符：标点、空白、数字和下划线
+_NORMALIZE_PATTERN = re.compile(r'[\W\d_]+')
+# 参与指纹计算的最大字符数
+_FINGERPRINT_CHARS = 200
+
+
+def fingerprint(text: str, min_length: int = DEFAULT_SETTINGS['min_length']) -> Optional[int]:
+    """计算消息的近似重复指纹，消息过短时返回 None"""
+    normalized = _NORMALIZE_PATTERN.sub('', text[:_FINGERPRINT_CHARS * 2].lower())[:_FINGERPRINT_CHARS]
+    if len(normalized) < min_length:
+        return None
+    return hash(frozenset(normalized[i:i + 2] for i in range(len(normalized) - 1)))
+
+
+class _Window:
+    """一个用户或一个群的滑动窗口"""
+
+    __slots__ = ('times', 'recent', 'counts', 'last_action')
+
+    def __init__(self, max_messages: int):
+        # 只需要知道窗口内的消息数是否超过上限，保留 上限+1 条即可
+        self.times: deque = deque(maxlen=max_messages + 1)
+        self.recent: deque = deque()  # (时间, 指纹)
+        self.counts: Dict[int, int] = {}  # 指纹 -> 窗口内出现次数
+        self.last_action = 0.0
+
+    def add(self, now: float, fp: Optional[int], window: float, duplicate_window: float, limit: int) -> Tuple[int, int]:
+        """记录一条消息，返回 (频率窗口内的消息数, 重复窗口内相同指纹的消息数)"""
+        times = self.times
+        times.append(now)
+        while times and times[0] <= now - window:
+            times.popleft()
+
+        recent = self.recent
+        counts = self.counts
+        cutoff = now - duplicate_window
+        while recent and (recent[0][0] <= cutoff or len(recent) >= limit):
+            self._forget(recent.popleft()[1])
+        if fp is None:
+            return len(times), 0
+        recent.append((now, fp))
+        count = counts.get(fp, 0) + 1
+        counts[fp] = count
+        return len(times), count
+
+    def _forget(self, fp: int):
+        count = self.counts[fp] - 1
+        if count:
+            self.counts[fp] = count
+        else:
+            del self.counts[fp]
+
+
+class SpamDetector:
+    """按用户和按群的滑动窗口刷屏检测"""
+
+    # 每个窗口最多保留的指纹条数，防止刷屏时重复窗口无限增长
+    MAX_RECENT = 500
+
+    def __init__(self):
+        self.settings: Dict[str, Any] = {}
+        self._users: "OrderedDict[Tuple[str, str], _Window]" = OrderedDict()
+        self._groups: "OrderedDict[str, _Window]" = OrderedDict()
+        self.configure(None)
+
+    def configure(self, settings: Optional[Dict[str, Any]]):
+        """应用配置（未配置的项使用默认值），actions 按规则合并"""
+        merged = dict(DEFAULT_SETTINGS)
+        merged['actions'] = dict(DEFAULT_SETTINGS['actions'])
+        if isinstance(settings, dict):
+            merged.update({k: v for k, v in settings.items() if k in DEFAULT_SETTINGS and k != 'actions'})
+            actions = settings.get('actions')
+            if isinstance(actions, dict):
+                for rule, value in actions.items():
+                    if rule not in merged['actions']:
+                        logger.warning(f"未知的刷屏检测规则: {rule}")
+                        continue
+                    merged['actions'][rule] = self._normalize_actions(rule, value)
+        self.settings = merged
+        # 窗口上限可能变化，旧窗口丢弃后重新统计
+        self._users.clear()
+        self._groups.clear()
+
+    @staticmethod
+    def _normalize_actions(rule: str, value) -> list:
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, (list, tuple)):
+            logger.warning(f"刷屏检测规则 {rule} 的处理动作格式错误: {value}")
+            return list(DEFAULT_SETTINGS['actions'][rule])
+        actions = []
+        for action in value:
+            if action in ACTIONS:
+                actions.append(action)
+            else:
+                logger.warning(f"刷屏检测规则 {rule} 的处理动作无效: {action}")
+        return actions
+
+    def actions_for(self, rule: str) -> list:
+        return self.settings['actions'].get(rule, [])
+
+    @property
+    def tracked_users(self) -> int:
+        return len(self._users)
+
+    def _window(self, table: OrderedDict, key, max_messages: int, max_size: int) -> _Window:
+        window = table.get(key)
+        if window is None:
+            window = table[key] = _Window(max_messages)
+            if len(table) > max_size:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(key)
+        return window
+
+    def check(self, group_id, user_id, text: str, mentions: Sequence = (), now: Optional[float] = None) -> Optional[str]:
+        """记录一条群消息并检测，命中时返回规则名，否则返回 None"""
+        settings = self.settings
+        now = time.monotonic() if now is None else now
+        group_id = str(group_id)
+        user_id = str(user_id)
+        fp = fingerprint(text, settings['min_length'])
+
+        user = self._window(self._users, (group_id, user_id), settings['user_max_messages'],
+                            settings['max_tracked_users'])
+        group = self._window(self._groups, group_id, settings['group_max_messages'],
+                             settings['max_tracked_groups'])
+        user_count, user_duplicates = user.add(now, fp, settings['user_window'], settings['duplicate_window'],
+                                               self.MAX_RECENT)
+        group_count, group_duplicates = group.add(now, fp, settings['group_window'], settings['duplicate_window'],
+                                                  self.MAX_RECENT)
+
+        rule = None
+        if len(mentions) > settings['max_mentions']:
+            rule = RULE_MENTIONS
+        elif user_count > settings['user_max_messages']:
+            rule = RULE_FLOOD
+        elif user_duplicates > settings['duplicate_max']:
+            rule = RULE_DUPLICATE
+        elif group_duplicates > settings['group_duplicate_max']:
+            rule = RULE_GROUP_DUPLICATE
+        elif group_count > settings['group_max_messages']:
+            rule = RULE_GROUP_FLOOD
+        if rule is not None:
+            SPAM_DETECTIONS.labels(rule).inc()
+        return rule
+
+    def claim_action(self, group_id, user_id, now: Optional[float] = None) -> bool:
+        """冷却时间已过时返回 True 并开始新的冷却，用于限制对同一用户的 warn/mute 次数"""
+        now = time.monotonic() if now is None else now
+        window = self._users.get((str(group_id), str(user_id)))
+        if window is None:
+            return True
+        if window.last_action and now - window.last_action < self.settings['action_cooldown']:
+            return False
+        window.last_action = now
+        return True
+
+    def reset(self, group_id=None):
+        """清空窗口（指定群号时只清空该群）"""
+        if group_id is None:
+            self._users.clear()
+            self._groups.clear()
+            return
+        group_id = str(group_id)
+        self._groups.pop(group_id, None)
+        for key in [key for key in self._users if key[0] == group_id]:
+            del self._users[key]
+
+
+# 全局实例
+spam_detector = SpamDetector()
@@ -0,0 +1,276 @@
+# core/tracing.py
+# 轻量级事件追踪：每个事件分配一个 trace id，在接收、解析、权限检查、分发、命令处理、发送等阶段记录 span，
+# 处理耗时超过阈值的事件把 span 树写入日志（按分钟限流）
+
+import contextvars
+import itertools
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+from logger_config import get_logger
+from core.metrics import SLOW_EVENTS
+
+logger = get_logger("Tracing")
+
+# 默认配置，可在 config.yml 的 tracing 节中覆盖
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "slow_event_seconds": 3.0,  # 事件处理超过该时间时输出 span 树
+    "dumps_per_minute": 6,  # 每分钟最多输出的慢事件数，其余只计数
+    "keep_slow_traces": 20,  # 内存中保留最近的慢事件，供控制台查看
+}
+
+# 当前任务所在的 span；asyncio 创建任务时会复制上下文，后台任务中的 span 也会挂到同一个事件下
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('zhrbot_current_span', default=None)
+
+
+class RateLimiter:
+    """滑动窗口限流，用于控制诊断日志的输出频率"""
+
+    def __init__(self, limit: int, window: float = 60.0):
+        self.limit = limit
+        self.window = window
+        self._times = deque()
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+        if len(self._times) >= self.limit:
+            return False
+        self._times.append(now)
+        return True
+
+
+class Span:
+    __slots__ = ('name', 'trace', 'attrs', 'start', 'end', 'children')
+
+    def __init__(self, name: str, trace: 'Trace', attrs: Dict[str, Any], start: float):
+        self.name = name
+        self.trace = trace
+        self.attrs = attrs
+        self.start = start
+        self.end: Optional[float] = None
+        self.children: List['Span'] = []
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+    def open_path(self) -> List[str]:
+        """从当前 span 沿未结束的子 span 走到最深处，用于说明事件此刻卡在哪个阶段"""
+        path = [self.name]
+        span = self
+        while True:
+            open_children = [child for child in span.children if child.end is None]
+            if not open_children:
+                return path
+            span = open_children[-1]
+            path.append(span.name)
+
+
+class Trace:
+    __slots__ = ('trace_id', 'root', 'notes')
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.root: Optional[Span] = None
+        # 追踪期间发生的事件循环阻塞等附加信息，由 core/loop_monitor.py 写入
+        self.notes: List[str] = []
+
+
+class _SpanContext:
+    """span 上下文，同时支持 with 和 async with（便于与其他异步上下文写在同一行）"""
+
+    __slots__ = ('_tracer', '_name', '_attrs', '_received_at', '_span', '_token')
+
+    def __init__(self, tracer: 'Tracer', name: str, attrs: Dict[str, Any], received_at: Optional[float] = None):
+        self._tracer = tracer
+        self._name = name
+        self._attrs = attrs
+        self._received_at = received_at
+        self._span: Optional[Span] = None
+        self._token = None
+
+    def __enter__(self):
+        now = time.perf_counter()
+        parent = _current_span.get()
+        if parent is None:
+            trace = self._tracer._begin_trace()
+            start = self._received_at if self._received_at is not None else now
+            span = Span(self._name, trace, self._attrs, start)
+            trace.root = span
+            if self._received_at is not None:
+                # 从收到原始帧到开始分发之间的解码、路由判断
+                receive = Span('receive', trace, {}, self._received_at)
+                receive.end = now
+                span.children.append(receive)
+        else:
+            span = Span(self._name, parent.trace, self._attrs, now)
+            parent.children.append(span)
+        self._span = span
+        self._token = _current_span.set(span)
+        return span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self._span
+        span.end = time.perf_counter()
+        if exc_type is not None:
+            span.attrs['error'] = exc_type.__name__
+        _current_span.reset(self._token)
+        if span.trace.root is span:
+            self._tracer._finish_trace(span.trace)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class _NoopContext:
+    """追踪关闭或不在事件中时使用，不记录任何内容"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopContext()
+
+
+class Tracer:
+    """事件追踪器
+
+    - trace(): 包裹单个事件的处理过程，生成 trace id 并作为根 span
+    - span(): 在当前事件下记录一个阶段；不在事件处理中时不做任何事
+    - 事件结束时若总耗时超过 slow_event_seconds，把 span 树写入日志
+    """
+
+    def __init__(self):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.slow_traces: deque = deque(maxlen=DEFAULT_SETTINGS['keep_slow_traces'])
+        self.suppressed = 0
+        self._active: Dict[str, Trace] = {}
+        self._ids = itertools.count(1)
+        self._prefix = f"{os.getpid():x}"
+        self._dump_limiter = RateLimiter(DEFAULT_SETTINGS['dumps_per_minute'])
+        self._listeners: List[Callable[[Trace], None]] = []
+
+    def configure(self, settings: Optional[Dict[str, Any]]):
+        """应用配置（未配置的项使用默认值）"""
+        merged = dict(DEFAULT_SETTINGS)
+        if isinstance(settings, dict):
+            merged.update({k: v for k, v in settings.items() if k in DEFAULT_SETTINGS})
+        self.settings = merged
+        self.slow_traces = deque(self.slow_traces, maxlen=max(1, int(merged['keep_slow_traces'])))
+        self._dump_limiter.limit = int(merged['dumps_per_minute'])
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.settings['enabled'])
+
+    def add_listener(self, listener: Callable[[Trace], None]):
+        """每个事件处理完成时调用 listener(trace)，例如压测统计延迟分布"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Trace], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    # ---------------------- 记录 ----------------------
+
+    def trace(self, name: str, received_at: float = None, **attrs):
+        """开始追踪一个事件；received_at 为收到原始帧时的 time.perf_counter()"""
+        if not self.enabled:
+            return _NOOP
+        return _SpanContext(self, name, {k: v for k, v in attrs.items() if v is not None}, received_at)
+
+    def span(self, name: str, **attrs):
+        """在当前事件下记录一个阶段"""
+        if _current_span.get() is None:
+            return _NOOP
+        return _SpanContext(self, name, attrs)
+
+    def record(self, name: str, start: float, **attrs):
+        """补记一个已经结束的阶段（start 为 time.perf_counter()），用于不便缩进成 with 块的代码段"""
+        parent = _current_span.get()
+        if parent is None:
+            return
+        span = Span(name, parent.trace, attrs, start)
+        span.end = time.perf_counter()
+        parent.children.append(span)
+
+    def current_trace_id(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.trace.trace_id if span is not None else None
+
+    def _begin_trace(self) -> Trace:
+        trace = Trace(f"{self._prefix}-{next(self._ids):x}")
+        self._active[trace.trace_id] = trace
+        return trace
+
+    def _finish_trace(self, trace: Trace):
+        self._active.pop(trace.trace_id, None)
+        for listener in self._listeners:
+            try:
+                listener(trace)
+            except Exception as e:
+                logger.error(f"执行追踪监听器时出错: {e}")
+        duration = trace.root.duration
+        if duration < self.settings['slow_event_seconds']:
+            return
+        SLOW_EVENTS.labels(trace.root.name).inc()
+        self.slow_traces.append(trace)
+        if self._dump_limiter.allow():
+            logger.warning(f"慢事件 {duration:.3f}s 超过阈值 {self.settings['slow_event_seconds']}s：\n"
+                           f"{self.format_trace(trace)}")
+        else:
+            self.suppressed += 1
+
+    # ---------------------- 诊断 ----------------------
+
+    def active_traces(self) -> List[Trace]:
+        """正在处理的事件；可能从监控线程调用，字典在复制过程中变化时返回空列表"""
+        try:
+            return list(self._active.values())
+        except RuntimeError:
+            return []
+
+    def describe_active(self) -> List[str]:
+        """正在处理的事件及其当前所处阶段，例如 'a1b-3f: message > handler > dispatch > command.chat'"""
+        return [f"{trace.trace_id}: {' > '.join(trace.root.open_path())}"
+                for trace in self.active_traces() if trace.root is not None]
+
+    def format_trace(self, trace: Trace) -> str:
+        root = trace.root
+        lines = [f"[trace {trace.trace_id}]"]
+
+        def walk(span: Span, depth: int):
+            duration = f"{span.duration * 1000:.1f}ms" if span.end is not None else "未结束"
+            attrs = ' '.join(f"{key}={value}" for key, value in span.attrs.items())
+            offset = (span.start - root.start) * 1000
+            lines.append(f"{'  ' * depth}{span.name} {duration} (+{offset:.1f}ms){' ' + attrs if attrs else ''}")
+            for child in span.children:
+                walk(child, depth + 1)
+
+        walk(root, 1)
+        lines.extend(f"  ! {note}" for note in trace.notes)
+        return '\n'.join(lines)
+
+
+# 全局追踪器
+tracer = Tracer()
@@ -5,6 +5,7 @@ import json
 import os
 from typing import Set, Dict, Any
 from logger_config import get_logger
+from core.file_watcher import file_watcher
 
 logger = get_logger("TrustManager")
 
@@ -16,6 +17,8 @@ class TrustManager:
     def __init__(self):
         self._trusted_groups: Set[str] = set()
         self._load_trusted_groups()
+        # 文件被外部修改时才重新加载，而不是每次查询都读文件
+        file_watcher.subscribe(TRUST_FILE_PATH, lambda paths: self._load_trusted_groups())
     
     def _load_trusted_groups(self):
         """从文件加载信任群组列表"""
@@ -91,8 +94,6 @@ class TrustManager:
         Returns:
             bool: 是否为信任群组
         """
-        # 实时检查文件以确保获取最新的信任状态
-        self._load_trusted_groups()
         return group_id in self._trusted_groups
     
     def get_trusted_groups(self) -> Set[str]:
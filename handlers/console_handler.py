@@ -7,13 +7,15 @@ import logging
 import threading
 import queue
 import os
-import time
 import json
 from typing import Dict, Any
 
 from logger_config import get_logger, LOG_LEVEL_MAP
 from core.config_manager import reload_config
 from utils.api_utils import call_onebot_api
+from core.shutdown import shutdown_manager
+from core.tracing import tracer
+from core.loop_monitor import loop_monitor
 
 logger = get_logger("ConsoleHandler")
 
@@ -208,6 +210,10 @@ class ConsoleHandler:
             await self._handle_restart()
         elif command == "help" or command == "h":
             self._show_help()
+        elif command == "slow":
+            self._show_slow_events()
+        elif command == "pipeline":
+            self._show_pipeline()
         elif command.startswith("ws send "):
             await self._handle_ws_send(command)
 
@@ -274,12 +280,8 @@ class ConsoleHandler:
         """处理重启命令"""
         logger.info("收到重启命令，正在准备重启...")
         self.should_restart = True
-        self.should_exit = True
-        # 创建重启标志文件并快速退出
-        restart_flag = os.path.join(os.path.dirname(__file__), '..', '.restart_flag')
-        with open(restart_flag, 'w') as f:
-            f.write(str(time.time()))
-        os._exit(0)
+        # 排空处理中的任务并写盘后再由start.py重启
+        shutdown_manager.request(restart=True, reason="控制台重启命令")
     
     async def _handle_ws_send(self, command: str):
         """处理WebSocket发送命令"""
@@ -533,6 +535,35 @@ class ConsoleHandler:
         else:
             print(f"  禁用插件 {plugin_name} 失败")
 
+    def _show_slow_events(self):
+        """显示最近的慢事件 span 树和事件循环阻塞统计"""
+        print(f"\n事件循环阻塞 {loop_monitor.blocked_count} 次，最大延迟 {loop_monitor.max_lag * 1000:.0f}ms")
+        if loop_monitor.module_counts:
+            print(f"阻塞位置所在模块: {loop_monitor.summary()}")
+        active = tracer.describe_active()
+        if active:
+            print("正在处理的事件:")
+            for line in active:
+                print(f"  {line}")
+        if not tracer.slow_traces:
+            print(f"暂无超过 {tracer.settings['slow_event_seconds']}s 的慢事件")
+            return
+        print(f"最近 {len(tracer.slow_traces)} 个慢事件（未输出到日志 {tracer.suppressed} 个）:")
+        for trace in tracer.slow_traces:
+            print(tracer.format_trace(trace))
+        print()
+
+    def _show_pipeline(self):
+        """显示编译后的消息管道（各阶段的处理器和平均耗时）"""
+        router = getattr(self.context, 'message_router', None)
+        if router is None:
+            print("消息路由器尚未初始化")
+            return
+        print("\n消息管道:")
+        for line in router.pipeline_manager.describe():
+            print(f"  {line}")
+        print()
+
     def _show_help(self):
         """显示帮助信息"""
         print("\n可用命令:")
@@ -547,6 +578,8 @@ class ConsoleHandler:
         print("  plugin reload <name> - 重载插件")
         print("  plugin enable <name> - 启用插件")
         print("  plugin disable <name> - 禁用插件")
+        print("  slow             - 查看最近的慢事件和事件循环阻塞统计")
+        print("  pipeline         - 查看消息管道各阶段的处理器和平均耗时")
         print("  help/h           - 显示此帮助信息")
         print()
         print("示例:")
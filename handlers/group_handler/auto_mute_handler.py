@@ -1,16 +1,16 @@
 # handlers/group_handler/auto_mute_handler.py
 # 处理自动禁言
 
-import asyncio
 from logger_config import get_logger
 from core.bot_context import BotContext
 from utils.message_sender import MessageBuilder
 from utils.api_utils import call_onebot_api
 from utils.task_utils import create_monitored_task
+from core.shutdown import shutdown_manager
 
 logger = get_logger("AutoMuteHandler")
 
-async def handle_auto_mute(context: BotContext, user_id: str, nickname: str, group_id: str):
+async def handle_auto_mute(context: BotContext, user_id: str, nickname: str, group_id: str, account_id=None):
     """处理用户主动请求禁言。"""
     logger.info(f"用户 {user_id}({nickname}) 请求主动禁言")
     try:
@@ -21,22 +21,23 @@ async def handle_auto_mute(context: BotContext, user_id: str, nickname: str, gro
                 'group_id': group_id,
                 'user_id': user_id,
                 'duration': mute_duration
-            }
+            },
+            account_id=account_id
         )
         # 检查API调用是否成功以及业务处理是否成功
         if mute_result and mute_result.get('success') and mute_result.get('data', {}).get('status') == 'ok':
             logger.info(f"成功禁言用户 {user_id}({nickname})，时长：{mute_duration}秒")
             # 构建消息并发送
-            builder = MessageBuilder(context)
+            builder = MessageBuilder(context, account_id)
             builder.set_group_id(str(group_id))
             builder.set_user_id(user_id)
             builder.add_at()
             builder.add_text(" 已为您禁言11天4小时5分钟捏")
             await builder.send()
 
-            # 创建一个后台任务，在20秒后自动解禁
+            # 创建一个后台任务，在20秒后自动解禁；禁言时长远超20秒且没有其他记录，退出时不能取消，改为立即解禁
             async def auto_unmute_task():
-                await asyncio.sleep(20)
+                await shutdown_manager.sleep(20)
                 try:
                     unmute_result = await call_onebot_api(
                         context, 'set_group_ban',
@@ -44,7 +45,8 @@ async def handle_auto_mute(context: BotContext, user_id: str, nickname: str, gro
                             'group_id': group_id,
                             'user_id': user_id,
                             'duration': 0
-                        }
+                        },
+                        account_id=account_id
                     )
                     # 检查API调用是否成功以及业务处理是否成功
                     if unmute_result and unmute_result.get('success') and unmute_result.get('data', {}).get('status') == 'ok':
@@ -66,7 +68,7 @@ async def handle_auto_mute(context: BotContext, user_id: str, nickname: str, gro
                     failure_reason = f"业务状态非成功: {mute_result.get('data', {}).get('status', '未知')}"
             logger.error(f"禁言用户失败，群: {group_id}，用户: {user_id}，原因: {failure_reason}")
             # 发送失败消息
-            builder = MessageBuilder(context)
+            builder = MessageBuilder(context, account_id)
             builder.set_group_id(str(group_id))
             builder.set_user_id(user_id)
             builder.add_at()
@@ -75,7 +77,7 @@ async def handle_auto_mute(context: BotContext, user_id: str, nickname: str, gro
     except Exception as e:
         logger.error(f"处理用户主动禁言时发生异常: {e}")
         # 发送异常消息
-        builder = MessageBuilder(context)
+        builder = MessageBuilder(context, account_id)
         builder.set_group_id(str(group_id))
         builder.set_user_id(user_id)
         builder.add_at()
@@ -11,11 +11,12 @@ from utils.task_utils import create_monitored_task
 # 导入图片处理相关函数
 from utils.vision_utils import download_image_async, image_to_base64_async, is_leg_photo_async
 from utils.api_utils import call_onebot_api
+from utils.message_codec import parse
 
 logger = get_logger("ImageHandler")
 
-async def handle_image_messages(context: BotContext, event: dict, group_id: str, user_id: str, nickname: str):
-    """处理消息中的图片，识别腿照并设置精华"""
+async def handle_image_messages(context: BotContext, event: dict, group_id: str, user_id: str, nickname: str, account_id=None, image_urls=None):
+    """处理消息中的图片，识别腿照并设置精华；image_urls 为已从消息中解析出的图片URL"""
     # 检查是否启用了腿照自动设为精华功能
     # 使用toggle功能控制的配置
     group_config = context.get_group_config(str(group_id))
@@ -30,8 +31,8 @@ async def handle_image_messages(context: BotContext, event: dict, group_id: str,
         return
 
     # 从消息中提取图片URL
-    message = event.get('message', [])
-    image_urls = extract_image_urls(message)
+    if image_urls is None:
+        image_urls = extract_image_urls(event.get('message', []))
     
     # 如果没有图片，直接返回
     if not image_urls:
@@ -52,25 +53,15 @@ async def handle_image_messages(context: BotContext, event: dict, group_id: str,
     
     # 创建后台任务处理图片，避免阻塞WebSocket连接
     create_monitored_task(
-        process_image_for_leg_detection(context, event, group_id, user_id, nickname, image_urls),
+        process_image_for_leg_detection(context, event, group_id, user_id, nickname, image_urls, account_id),
         f"LegPhotoDetection-{group_id}-{user_id}"
     )
 
 def extract_image_urls(message):
     """从消息中提取图片URL"""
-    image_urls = []
-    if isinstance(message, list):
-        for segment in message:
-            if isinstance(segment, dict) and segment.get('type') == 'image':
-                # 尝试获取URL，OneBot不同版本字段可能不同
-                image_url = segment.get('data', {}).get('url')
-                if not image_url:
-                    image_url = segment.get('data', {}).get('file')
-                if image_url:
-                    image_urls.append(image_url)
-    return image_urls
+    return parse(message).image_urls
 
-async def process_image_for_leg_detection(context, event, group_id, user_id, nickname, image_urls):
+async def process_image_for_leg_detection(context, event, group_id, user_id, nickname, image_urls, account_id=None):
     """在后台处理图片并识别腿照的协程函数"""
     project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     temp_dir = os.path.join(project_root, 'temp_images')
@@ -91,13 +82,13 @@ async def process_image_for_leg_detection(context, event, group_id, user_id, nic
                     if is_leg_photo and event.get('message_id'):
                         # 调用onebot API设置精华消息
                         essence_result = await call_onebot_api(
-                            context, 'set_essence_msg', {'message_id': event.get('message_id')}
+                            context, 'set_essence_msg', {'message_id': event.get('message_id')}, account_id=account_id
                         )
                         # 检查设置精华是否成功
                         if essence_result and essence_result.get('success') and essence_result.get('data', {}).get('status') == 'ok':
                             logger.info(f"成功将腿照设置为精华消息，群: {group_id}，用户: {user_id}({nickname})")
                             # 发送提示消息
-                            builder = MessageBuilder(context)
+                            builder = MessageBuilder(context, account_id)
                             builder.set_group_id(str(group_id))
                             builder.set_user_id(user_id)
                             builder.add_at()
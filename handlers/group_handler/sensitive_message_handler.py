@@ -12,16 +12,17 @@ from utils.api_utils import call_onebot_api
 
 logger = get_logger("SensitiveMessageHandler")
 
-async def handle_sensitive_message(context: BotContext, event: dict, group_id, user_id, original_message, sensitive_word, sensitive_reason):
+async def handle_sensitive_message(context: BotContext, event: dict, group_id, user_id, original_message, sensitive_word, sensitive_reason, account_id=None):
     """处理包含敏感词的消息。"""
     logger.info(f"检测到敏感词，群: {group_id}，用户: {user_id}，敏感词: {sensitive_word}，原因: {sensitive_reason}")
-    # 使用管理器记录日志
-    log_sensitive_trigger(original_message, sensitive_word, group_id, user_id)
-    logger.debug(f"已记录敏感词触发日志")
-
     # 检查是否启用了敏感词自动撤回功能
     group_config = context.get_group_config(str(group_id))
     sensitive_word_recall_enabled = group_config.get("sensitive_word_recall_enabled", False) if group_config else False
+
+    # 使用管理器记录日志
+    log_sensitive_trigger(original_message, sensitive_word, group_id, user_id,
+                          action="recall" if sensitive_word_recall_enabled else "report")
+    logger.debug(f"已记录敏感词触发日志")
     
     if not sensitive_word_recall_enabled:
         logger.debug(f"敏感词自动撤回功能未启用，群: {group_id}")
@@ -35,17 +36,19 @@ async def handle_sensitive_message(context: BotContext, event: dict, group_id, u
             message_id = event.get('message_id')
             if message_id:
                 recall_result = await call_onebot_api(
-                    context, 'delete_msg', {'message_id': message_id}
+                    context, 'delete_msg', {'message_id': message_id}, account_id=account_id
                 )
                 # 检查API调用是否成功以及业务处理是否成功
                 if recall_result and recall_result.get('success') and recall_result.get('data', {}).get('status') == 'ok':
                     logger.info(f"已成功撤回敏感消息，群: {group_id}，用户: {user_id}")
                     # 构建消息并发送
-                    builder = MessageBuilder(context)
+                    builder = MessageBuilder(context, account_id)
                     builder.set_group_id(str(group_id))
                     builder.set_user_id(user_id)
                     builder.add_at()
                     builder.add_text(f" 含有{sensitive_reason}内容，已撤回")
+                    # 启用敏感词绕过，原因是系统通知
+                    builder.set_badword_bypass(True, "系统敏感词通知", "system")
                     await builder.send()
 
                     # 推送报告到指定群（已撤回）
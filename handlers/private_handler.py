@@ -8,15 +8,15 @@ from utils.message_sender import CommandResponse, MessageBuilder
 
 logger = get_logger("PrivateHandler")
 
-async def handle_private_message(context: BotContext, event: dict):
-    """处理私聊消息事件。"""
+async def handle_private_message(context: BotContext, event: dict, text: str = None):
+    """处理私聊消息事件。text 为消息管道中已解析的文本，未提供时从事件解析。"""
     # 检查是否应该处理该消息（基于当前活跃账号）
     if not context.should_handle_message(event):
         return
 
     user_id = str(event.get('user_id', ''))
     raw_message = event.get('message', '')
-    original_message = parse_message(raw_message).strip()
+    original_message = text if text is not None else parse_message(raw_message).strip()
     
     # 只有Root用户可以执行私聊命令
     if user_id != str(context.get_config_value("Root_user", "")):
@@ -0,0 +1,12 @@
+# harness/__init__.py
+# 回放与压测工具：本地模拟OneBot、虚拟时间事件循环、事件流回放，不连接真实QQ账号
+
+from harness.virtual_clock import VirtualClockEventLoop, run
+from harness.fake_onebot import FakeOneBotServer, RecordedAction
+from harness.events import group_message, private_message, group_notice, group_request, load_events, save_events
+
+__all__ = [
+    'VirtualClockEventLoop', 'run',
+    'FakeOneBotServer', 'RecordedAction',
+    'group_message', 'private_message', 'group_notice', 'group_request', 'load_events', 'save_events',
+]
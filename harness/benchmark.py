@@ -0,0 +1,416 @@
+# harness/benchmark.py
+# 合成负载压测：按负载配置生成群聊/命令/图片/通知风暴/多账号重复事件，在模拟OneBot上进程内运行，
+# 统计吞吐、各类事件的延迟分位数、事件循环延迟和内存分配，结果保存为JSON以便比较不同版本
+#
+# 命令行用法:
+#   python -m harness.benchmark --list
+#   python -m harness.benchmark --profile chat [--events 5000] [--output result.json]
+#   python -m harness.benchmark --profile mixed --baseline old.json [--tolerance 0.15]
+# 指定 --baseline 时与基线比较，发现性能回退则以退出码 1 结束，可直接用于CI
+
+import argparse
+import asyncio
+import copy
+import gc
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from logger_config import get_logger
+from core.tracing import tracer, Trace
+from harness import virtual_clock
+from harness.events import group_message, private_message, group_notice, group_request
+from harness.replay import ReplayHarness
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+logger = get_logger("Benchmark")
+
+# 默认负载配置，各内置负载只覆盖其中的部分项
+DEFAULT_PROFILE = {
+    'events': 2000,                 # 生成的事件数量（不含多账号重复推送）
+    'rate': 200,                    # 每秒事件数（虚拟时间）；0 表示不等待，尽快推送
+    'groups': 20,
+    'users': 500,
+    'accounts': 1,
+    'mode': 'fallback',
+    'private_ratio': 0.05,          # 私聊消息占比
+    'command_ratio': 0.1,           # 群消息中命令的占比
+    'command_mix': {'help': 1, 'whoami': 2},  # 命令 -> 权重，只使用不依赖外部服务的命令
+    'image_ratio': 0.1,             # 群消息附带图片的占比
+    'request_ratio': 0.005,         # 加群请求占比
+    'notice_storm_every': 0,        # 每生成多少个事件插入一次通知风暴，0 表示不插入
+    'notice_storm_size': 100,       # 一次通知风暴中同时到达的入群/退群通知数量
+    'duplicate_ratio': 0.0,         # 通过所有账号重复推送的事件占比（模拟多个机器人账号在同一个群）
+    'trace_allocations': True,      # 使用 tracemalloc 统计分配（会拖慢处理，比较结果时两边应一致）
+    'seed': 1,
+    'config': {},                   # 合并到回放配置中的配置项
+}
+
+# 内置负载
+PROFILES: Dict[str, Dict[str, Any]] = {
+    'chat': {'command_ratio': 0.02, 'image_ratio': 0.05},
+    'commands': {'command_ratio': 0.6, 'image_ratio': 0.0, 'rate': 100},
+    'images': {'image_ratio': 0.6, 'command_ratio': 0.0},
+    'notice_storm': {'events': 1000, 'notice_storm_every': 250, 'notice_storm_size': 300},
+    'parallel': {'accounts': 3, 'mode': 'parallel', 'duplicate_ratio': 0.5},
+    'mixed': {'events': 3000, 'accounts': 2, 'mode': 'parallel', 'duplicate_ratio': 0.2,
+              'command_ratio': 0.15, 'image_ratio': 0.1, 'notice_storm_every': 1000},
+}
+
+# 比较时参与回退判定的指标：(路径, 越大越好)
+COMPARED_METRICS: List[Tuple[str, bool]] = [
+    ('throughput_eps', True),
+    ('latency_ms.all.p50', False),
+    ('latency_ms.all.p99', False),
+    ('loop_lag_ms.p99', False),
+    ('memory.peak_kb', False),
+]
+
+_CHAT_LINES = [
+    '早上好', '今天吃什么', '哈哈哈哈哈', '有人打游戏吗', '这个怎么弄啊', '收到', '+1',
+    '刚下班，累死了', '周末去哪玩', '晚安', '图片看不了', '谁知道这题怎么做', '好耶',
+]
+
+
+def build_profile(name: str = 'chat', **overrides) -> Dict[str, Any]:
+    """按内置负载名生成完整的负载配置，overrides 中值为 None 的项忽略"""
+    if name not in PROFILES:
+        raise ValueError(f"未知的负载: {name}，可选: {', '.join(PROFILES)}")
+    profile = copy.deepcopy(DEFAULT_PROFILE)
+    profile.update(copy.deepcopy(PROFILES[name]))
+    profile.update({key: value for key, value in overrides.items() if value is not None})
+    profile['name'] = name
+    return profile
+
+
+# ---------------------- 流量生成 ----------------------
+
+def generate_traffic(profile: Dict[str, Any], image_url=None) -> List[Tuple[float, List[int], dict]]:
+    """按负载配置生成 (间隔秒数, 推送账号列表, 事件)，相同的配置和种子生成相同的流量
+
+    image_url: callable(name) -> str，生成图片消息中的图片地址，通常为 FakeOneBotServer.file_url
+    """
+    rng = random.Random(profile['seed'])
+    group_ids = [100000 + i for i in range(profile['groups'])]
+    user_ids = [200000 + i for i in range(profile['users'])]
+    accounts = list(range(1, profile['accounts'] + 1))
+    commands = list(profile['command_mix'])
+    weights = [profile['command_mix'][command] for command in commands]
+    interval = 1.0 / profile['rate'] if profile['rate'] else 0
+    image_url = image_url or (lambda name: f"http://127.0.0.1/files/{name}")
+    now = int(time.time())
+
+    traffic = []
+    for index in range(profile['events']):
+        storm_every = profile['notice_storm_every']
+        if storm_every and index and index % storm_every == 0:
+            for _ in range(profile['notice_storm_size']):
+                notice_type = rng.choice(('group_increase', 'group_decrease'))
+                sub_type = 'approve' if notice_type == 'group_increase' else 'leave'
+                event = group_notice(notice_type, rng.choice(group_ids), rng.choice(user_ids), sub_type, at=now)
+                traffic.append((0, [rng.choice(accounts)], event))
+
+        roll = rng.random()
+        group_id = rng.choice(group_ids)
+        user_id = rng.choice(user_ids)
+        if roll < profile['private_ratio']:
+            event = private_message(user_id, rng.choice(_CHAT_LINES), at=now)
+        elif roll < profile['private_ratio'] + profile['request_ratio']:
+            event = group_request(group_id, user_id, comment='想加群', at=now)
+        elif rng.random() < profile['command_ratio']:
+            command = rng.choices(commands, weights)[0]
+            event = group_message(group_id, user_id, f"/{command}", at=now)
+        else:
+            images = ()
+            if rng.random() < profile['image_ratio']:
+                images = [image_url(f"{index}.png")]
+            event = group_message(group_id, user_id, rng.choice(_CHAT_LINES), at=now, images=images)
+
+        # 同一个群里的多个机器人账号会各自收到一份群事件
+        if len(accounts) > 1 and event.get('group_id') and rng.random() < profile['duplicate_ratio']:
+            targets = list(accounts)
+        else:
+            targets = [rng.choice(accounts)]
+        traffic.append((interval, targets, event))
+    return traffic
+
+
+# ---------------------- 统计 ----------------------
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法求分位数，sorted_values 需已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(values: List[float], scale: float = 1000.0) -> Dict[str, float]:
+    """统计一组耗时（秒），默认换算为毫秒"""
+    values = sorted(values)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values) * scale, 3),
+        'p50': round(percentile(values, 50) * scale, 3),
+        'p90': round(percentile(values, 90) * scale, 3),
+        'p99': round(percentile(values, 99) * scale, 3),
+        'max': round(values[-1] * scale, 3),
+    }
+
+
+class LoopLagSampler:
+    """定期测量事件循环调度延迟（真实时间）：从让出控制权到重新被调度经过的时间"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            started = time.perf_counter()
+            await asyncio.sleep(0)
+            self.samples.append(time.perf_counter() - started)
+
+
+class _LatencyCollector:
+    """通过追踪监听器收集每个事件从接收到处理完成的耗时"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+
+    def __call__(self, trace: Trace):
+        self.latencies[trace.root.name].append(trace.root.duration)
+
+    @property
+    def count(self) -> int:
+        return sum(len(values) for values in self.latencies.values())
+
+
+# ---------------------- 运行 ----------------------
+
+async def run_benchmark(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """在模拟OneBot上运行一次压测，返回结果字典"""
+    collector = _LatencyCollector()
+    sampler = LoopLagSampler()
+    # 压测期间不输出慢事件转储
+    tracing_settings = {'enabled': True, 'slow_event_seconds': 1e9}
+    tracer.configure(tracing_settings)
+
+    async with ReplayHarness(accounts=profile['accounts'], mode=profile['mode'],
+                             config=profile.get('config') or None) as harness:
+        traffic = generate_traffic(profile, harness.server.file_url)
+        frames = sum(len(targets) for _, targets, _ in traffic)
+        logger.info(f"负载 {profile['name']}: {len(traffic)} 个事件，{frames} 次推送")
+
+        gc.collect()
+        gc_before = [stats['collections'] for stats in gc.get_stats()]
+        if profile['trace_allocations']:
+            tracemalloc.start()
+        tracer.add_listener(collector)
+        sampler.start()
+        loop = asyncio.get_running_loop()
+        virtual_started = loop.time()
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            for delay, targets, event in traffic:
+                if delay:
+                    await asyncio.sleep(delay)
+                for account_id in targets:
+                    await harness.push(dict(event), account_id)
+            await harness.settle()
+        finally:
+            wall = time.perf_counter() - started
+            cpu = time.process_time() - cpu_started
+            virtual = loop.time() - virtual_started
+            tracer.remove_listener(collector)
+            await sampler.stop()
+
+        memory: Dict[str, Any] = {}
+        if profile['trace_allocations']:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            memory.update({'current_kb': round(current / 1024, 1), 'peak_kb': round(peak / 1024, 1),
+                           'top_allocations': _top_allocations(snapshot)})
+        if PSUTIL_AVAILABLE:
+            memory['rss_mb'] = round(psutil.Process().memory_info().rss / 1024 / 1024, 1)
+        gc_after = [stats['collections'] for stats in gc.get_stats()]
+        actions = len(harness.actions)
+
+    all_latencies = [value for values in collector.latencies.values() for value in values]
+    # 虚拟时间下真实耗时主要是空闲判定的等待，吞吐按进程CPU时间计算（包括模拟OneBot本身的开销）
+    return {
+        'profile': profile['name'],
+        'settings': profile,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpu_count': os.cpu_count()},
+        'frames_pushed': frames,
+        'events_handled': collector.count,
+        'actions': actions,
+        'wall_seconds': round(wall, 3),
+        'cpu_seconds': round(cpu, 3),
+        'virtual_seconds': round(virtual, 3),
+        'throughput_eps': round(collector.count / cpu, 1) if cpu else 0.0,
+        'latency_ms': {'all': summarize(all_latencies),
+                       **{key: summarize(values) for key, values in sorted(collector.latencies.items())}},
+        'loop_lag_ms': summarize(sampler.samples),
+        'memory': memory,
+        'gc_collections': [after - before for before, after in zip(gc_before, gc_after)],
+    }
+
+
+def _top_allocations(snapshot: tracemalloc.Snapshot, limit: int = 10) -> List[Dict[str, Any]]:
+    """按源码行汇总的最大分配点，只保留项目内的文件"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    stats = snapshot.filter_traces([tracemalloc.Filter(True, os.path.join(root, '*'))]).statistics('lineno')
+    result = []
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        result.append({'where': f"{os.path.relpath(frame.filename, root)}:{frame.lineno}",
+                       'size_kb': round(stat.size / 1024, 1), 'count': stat.count})
+    return result
+
+
+# ---------------------- 比较 ----------------------
+
+def _metric(result: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = result
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value if isinstance(value, (int, float)) else None
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.1) -> List[str]:
+    """与基线比较，返回超出容差的性能回退描述；两次结果的负载不同时无法比较"""
+    if baseline.get('profile') != current.get('profile'):
+        raise ValueError(f"负载不同，无法比较: {baseline.get('profile')} / {current.get('profile')}")
+    if baseline.get('settings', {}).get('trace_allocations') != current.get('settings', {}).get('trace_allocations'):
+        logger.warning("两次结果的 trace_allocations 设置不同，延迟和吞吐不可直接比较")
+
+    regressions = []
+    for path, higher_is_better in COMPARED_METRICS:
+        old, new = _metric(baseline, path), _metric(current, path)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f"{path}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    lines = [
+        f"负载: {result['profile']}  推送 {result['frames_pushed']} 次，处理 {result['events_handled']} 个事件，"
+        f"发出 {result['actions']} 个动作",
+        f"耗时: 真实 {result['wall_seconds']}s，CPU {result['cpu_seconds']}s，虚拟 {result['virtual_seconds']}s",
+        f"吞吐: {result['throughput_eps']} 事件/CPU秒",
+        "延迟(ms):",
+    ]
+    for key, stats in result['latency_ms'].items():
+        if stats.get('count'):
+            lines.append(f"  {key:<24} n={stats['count']:<6} p50={stats['p50']:<8} p90={stats['p90']:<8} "
+                         f"p99={stats['p99']:<8} max={stats['max']}")
+    lag = result['loop_lag_ms']
+    if lag.get('count'):
+        lines.append(f"事件循环延迟(ms): p50={lag['p50']} p99={lag['p99']} max={lag['max']}")
+    memory = result['memory']
+    if 'peak_kb' in memory:
+        lines.append(f"内存分配: 峰值 {memory['peak_kb']}KB，结束时 {memory['current_kb']}KB")
+        for item in memory['top_allocations'][:5]:
+            lines.append(f"  {item['where']:<48} {item['size_kb']}KB / {item['count']} 个对象")
+    if 'rss_mb' in memory:
+        lines.append(f"RSS: {memory['rss_mb']}MB")
+    return '\n'.join(lines)
+
+
+# ---------------------- 命令行 ----------------------
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m harness.benchmark', description='在模拟OneBot上运行合成负载压测')
+    parser.add_argument('--profile', default='chat', help='内置负载名称')
+    parser.add_argument('--list', action='store_true', help='列出内置负载')
+    parser.add_argument('--events', type=int, help='覆盖事件数量')
+    parser.add_argument('--rate', type=float, help='覆盖每秒事件数（0 表示不等待）')
+    parser.add_argument('--accounts', type=int, help='覆盖账号数量')
+    parser.add_argument('--mode', choices=['fallback', 'parallel', 'parallel-pro'], help='覆盖运行模式')
+    parser.add_argument('--seed', type=int, help='覆盖随机种子')
+    parser.add_argument('--no-alloc', action='store_true', help='不使用 tracemalloc 统计内存分配')
+    parser.add_argument('--output', help='结果JSON文件，默认写入 logs/benchmark-<负载>-<时间>.json')
+    parser.add_argument('--baseline', help='与该结果JSON比较，发现回退时退出码为 1')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='允许的相对变化（默认 0.1，即10%%）')
+    parser.add_argument('--realtime', action='store_true', help='使用真实时间而不是虚拟时间')
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None) -> int:
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    if args.list:
+        for name, overrides in PROFILES.items():
+            print(f"{name:<14} {json.dumps(overrides, ensure_ascii=False)}")
+        return 0
+
+    profile = build_profile(args.profile, events=args.events, rate=args.rate, accounts=args.accounts,
+                            mode=args.mode, seed=args.seed,
+                            trace_allocations=False if args.no_alloc else None)
+    if args.realtime:
+        result = asyncio.run(run_benchmark(profile))
+    else:
+        result = virtual_clock.run(run_benchmark(profile))
+    print(format_result(result))
+
+    output = args.output
+    if not output:
+        os.makedirs('logs', exist_ok=True)
+        output = os.path.join('logs', f"benchmark-{profile['name']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, result, args.tolerance)
+        if regressions:
+            print("发现性能回退:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("与基线相比没有超出容差的回退")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+# harness/events.py
+# 合成OneBot事件和事件流文件（JSONL）的读写
+#
+# 事件流文件每行一个OneBot事件，可附带两个回放控制字段：
+#   _account: 通过哪个模拟账号推送（默认1）
+#   _delay:   与上一个事件之间的间隔（秒，虚拟时间）；未填写时按相邻事件的 time 字段之差计算
+
+import itertools
+import json
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+_message_ids = itertools.count(1)
+
+
+def _text_segments(text: str) -> List[Dict[str, Any]]:
+    return [{'type': 'text', 'data': {'text': text}}]
+
+
+def image_segment(url: str) -> Dict[str, Any]:
+    name = url.rsplit('/', 1)[-1]
+    return {'type': 'image', 'data': {'file': name, 'url': url}}
+
+
+def group_message(group_id: int, user_id: int, text: str, message_id: int = None,
+                  nickname: str = None, card: str = '', role: str = 'member', at: int = None,
+                  images: Iterable[str] = ()) -> Dict[str, Any]:
+    """构造一条群消息事件，images 为附带的图片地址"""
+    segments = _text_segments(text)
+    raw_message = text
+    for url in images:
+        segments.append(image_segment(url))
+        raw_message += f"[CQ:image,file={url.rsplit('/', 1)[-1]},url={url}]"
+    return {
+        'post_type': 'message',
+        'message_type': 'group',
+        'sub_type': 'normal',
+        'message_id': message_id if message_id is not None else next(_message_ids),
+        'group_id': group_id,
+        'user_id': user_id,
+        'message': segments,
+        'raw_message': raw_message,
+        'font': 0,
+        'sender': {'user_id': user_id, 'nickname': nickname or str(user_id), 'card': card, 'role': role},
+        'time': at if at is not None else int(time.time()),
+    }
+
+
+def private_message(user_id: int, text: str, message_id: int = None, nickname: str = None,
+                    at: int = None) -> Dict[str, Any]:
+    """构造一条私聊消息事件"""
+    return {
+        'post_type': 'message',
+        'message_type': 'private',
+        'sub_type': 'friend',
+        'message_id': message_id if message_id is not None else next(_message_ids),
+        'user_id': user_id,
+        'message': _text_segments(text),
+        'raw_message': text,
+        'font': 0,
+        'sender': {'user_id': user_id, 'nickname': nickname or str(user_id)},
+        'time': at if at is not None else int(time.time()),
+    }
+
+
+def group_notice(notice_type: str, group_id: int, user_id: int, sub_type: str = '',
+                 operator_id: int = None, at: int = None) -> Dict[str, Any]:
+    """构造一条群通知事件，例如 group_increase / group_decrease"""
+    return {
+        'post_type': 'notice',
+        'notice_type': notice_type,
+        'sub_type': sub_type,
+        'group_id': group_id,
+        'user_id': user_id,
+        'operator_id': operator_id if operator_id is not None else user_id,
+        'time': at if at is not None else int(time.time()),
+    }
+
+
+def group_request(group_id: int, user_id: int, comment: str = '', flag: str = None,
+                  sub_type: str = 'add', at: int = None) -> Dict[str, Any]:
+    """构造一条加群请求事件"""
+    return {
+        'post_type': 'request',
+        'request_type': 'group',
+        'sub_type': sub_type,
+        'group_id': group_id,
+        'user_id': user_id,
+        'comment': comment,
+        'flag': flag or f"flag-{group_id}-{user_id}",
+        'time': at if at is not None else int(time.time()),
+    }
+
+
+def load_events(path: str) -> List[Dict[str, Any]]:
+    """读取事件流文件，跳过空行和 # 开头的注释行"""
+    events = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no} 不是有效的JSON: {e}") from e
+    return events
+
+
+def save_events(path: str, events: Iterable[Dict[str, Any]]):
+    with open(path, 'w', encoding='utf-8') as f:
+        for event in events:
+            f.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+
+def schedule(events: Iterable[Dict[str, Any]], paced: bool = True) -> Iterator[tuple]:
+    """把事件流展开为 (间隔秒数, 账号ID, 事件)，事件本身不含回放控制字段
+
+    paced 为 False 时忽略所有间隔，尽快推送。
+    """
+    previous_time: Optional[float] = None
+    for raw in events:
+        event = dict(raw)
+        account_id = event.pop('_account', 1)
+        delay = event.pop('_delay', None)
+        event_time = event.get('time')
+        if delay is None:
+            delay = max(0, event_time - previous_time) if (event_time is not None and previous_time is not None) else 0
+        if event_time is not None:
+            previous_time = event_time
+        yield (delay if paced else 0), account_id, event
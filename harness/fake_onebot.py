@@ -0,0 +1,231 @@
+# harness/fake_onebot.py
+# 本地OneBot替身：为每个模拟账号提供反向WebSocket事件推送和HTTP动作接口，
+# 记录机器人发出的每一个动作（HTTP和WebSocket两种方式），供回放和压测断言
+
+import asyncio
+import base64
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional
+from aiohttp import web, WSMsgType
+from logger_config import get_logger
+
+logger = get_logger("FakeOneBot")
+
+# 模拟账号的QQ号为 BOT_QQ_BASE + 账号ID
+BOT_QQ_BASE = 10000
+
+# /files/{name} 返回的 1x1 PNG，用作图片消息中的图片地址，避免下载外部图片
+STUB_PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg==')
+
+
+class RecordedAction:
+    """机器人发出的一次OneBot动作"""
+
+    __slots__ = ('account_id', 'action', 'params', 'transport', 'time')
+
+    def __init__(self, account_id: int, action: str, params: dict, transport: str, at: float):
+        self.account_id = account_id
+        self.action = action
+        self.params = params
+        self.transport = transport  # 'http' 或 'ws'
+        self.time = at  # 服务器启动后经过的秒数（事件循环时间）
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'account_id': self.account_id, 'action': self.action, 'params': self.params,
+                'transport': self.transport, 'time': self.time}
+
+    def __repr__(self):
+        return f"<RecordedAction {self.account_id}:{self.action} {self.params}>"
+
+
+class FakeOneBotServer:
+    """模拟OneBot实现
+
+    - WebSocket: ws://host:port/ws/{account_id}，连接后推送 lifecycle 事件，之后由 push() 推送事件；
+      通过WebSocket发来的API请求（带 echo）同样记录并按 echo 返回结果
+    - HTTP: POST http://host:port/api/{account_id}/{action}，即 call_onebot_api 使用的接口
+    - GET http://host:port/files/{name} 返回一张1x1图片，file_url() 生成图片消息中使用的地址
+    - responders: 动作名 -> callable(account_id, params) 返回 data，未注册的动作返回空数据
+    - heartbeat_interval > 0 时定期推送心跳事件（在虚拟时间事件循环中不会拖慢回放）
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, heartbeat_interval: float = 0):
+        self.host = host
+        self.port = port
+        self.heartbeat_interval = heartbeat_interval
+        self.actions: List[RecordedAction] = []
+        self.responders: Dict[str, Callable[[int, dict], Any]] = {}
+        self._sockets: Dict[int, web.WebSocketResponse] = {}
+        self._connected: Dict[int, asyncio.Event] = {}
+        self._action_added = asyncio.Condition()
+        self._message_ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+        self._heartbeat_tasks: Dict[int, asyncio.Task] = {}
+        self._started_at = 0.0
+        self._install_default_responders()
+
+    # ---------------------- 生命周期 ----------------------
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/ws/{account_id}', self._handle_ws)
+        app.router.add_post('/api/{account_id}/{action}', self._handle_http)
+        app.router.add_get('/files/{name}', self._handle_file)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self._started_at = asyncio.get_running_loop().time()
+        # 端口为0时由系统分配，取回实际端口
+        self.port = self._runner.addresses[0][1]
+        logger.debug(f"模拟OneBot已启动: {self.host}:{self.port}")
+
+    async def close(self):
+        for task in self._heartbeat_tasks.values():
+            task.cancel()
+        for ws in list(self._sockets.values()):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def account_config(self, account_id: int, priority: int = None) -> Dict[str, Any]:
+        """生成指向本服务器的账号配置（config.yml 中 accounts 的一项）"""
+        return {
+            'id': account_id,
+            'priority': account_id if priority is None else priority,
+            'bot_qq': BOT_QQ_BASE + account_id,
+            'ws_uri': f"ws://{self.host}:{self.port}/ws/{account_id}",
+            'access_token': '',
+            'onebot_api_base': f"http://{self.host}:{self.port}/api/{account_id}",
+            'onebot_access_token': '',
+            'websocket': {'heartbeat_interval': self.heartbeat_interval, 'retry_delay_base': 0.1},
+        }
+
+    def file_url(self, name: str) -> str:
+        return f"http://{self.host}:{self.port}/files/{name}"
+
+    # ---------------------- 事件推送 ----------------------
+
+    def is_connected(self, account_id: int) -> bool:
+        ws = self._sockets.get(account_id)
+        return ws is not None and not ws.closed
+
+    async def wait_connected(self, account_ids: List[int], timeout: float = 10):
+        for account_id in account_ids:
+            event = self._connected.setdefault(account_id, asyncio.Event())
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+
+    async def push(self, event: dict, account_id: int = 1):
+        """向指定账号的连接推送一个事件，未填写的 self_id/time 自动补全"""
+        ws = self._sockets.get(account_id)
+        if ws is None or ws.closed:
+            raise ConnectionError(f"账号 {account_id} 未连接")
+        event.setdefault('self_id', BOT_QQ_BASE + account_id)
+        event.setdefault('time', int(time.time()))
+        await ws.send_json(event)
+
+    async def disconnect(self, account_id: int):
+        """模拟OneBot断开某个账号的连接"""
+        ws = self._sockets.pop(account_id, None)
+        self._connected.pop(account_id, None)
+        if ws is not None:
+            await ws.close()
+
+    # ---------------------- 动作记录 ----------------------
+
+    def actions_named(self, action: str) -> List[RecordedAction]:
+        return [recorded for recorded in self.actions if recorded.action == action]
+
+    async def wait_for_action(self, action: str, count: int = 1, timeout: float = 10) -> List[RecordedAction]:
+        """等待某个动作累计出现 count 次"""
+        async with self._action_added:
+            await asyncio.wait_for(
+                self._action_added.wait_for(lambda: len(self.actions_named(action)) >= count), timeout=timeout)
+        return self.actions_named(action)
+
+    async def _record(self, account_id: int, action: str, params: dict, transport: str) -> dict:
+        at = round(asyncio.get_running_loop().time() - self._started_at, 6)
+        self.actions.append(RecordedAction(account_id, action, params, transport, at))
+        async with self._action_added:
+            self._action_added.notify_all()
+        responder = self.responders.get(action)
+        try:
+            result = responder(account_id, params) if responder else None
+            if asyncio.iscoroutine(result):
+                result = await result
+        except Exception as e:
+            logger.error(f"模拟动作 {action} 出错: {e}")
+            return {'status': 'failed', 'retcode': 100, 'data': None, 'message': str(e)}
+        return {'status': 'ok', 'retcode': 0, 'data': result}
+
+    def _install_default_responders(self):
+        def send_msg(account_id, params):
+            return {'message_id': next(self._message_ids)}
+
+        self.responders.update({
+            'send_group_msg': send_msg,
+            'send_private_msg': send_msg,
+            'send_msg': send_msg,
+            'get_login_info': lambda account_id, params: {'user_id': BOT_QQ_BASE + account_id, 'nickname': f"bot{account_id}"},
+            'get_group_list': lambda account_id, params: [],
+            'get_group_member_info': lambda account_id, params: {
+                'group_id': params.get('group_id'), 'user_id': params.get('user_id'),
+                'nickname': str(params.get('user_id')), 'card': '', 'role': 'member'},
+            'get_stranger_info': lambda account_id, params: {
+                'user_id': params.get('user_id'), 'nickname': str(params.get('user_id'))},
+        })
+
+    # ---------------------- 请求处理 ----------------------
+
+    async def _handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        account_id = int(request.match_info['account_id'])
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._sockets[account_id] = ws
+        await ws.send_json({'post_type': 'meta_event', 'meta_event_type': 'lifecycle', 'sub_type': 'connect',
+                            'self_id': BOT_QQ_BASE + account_id, 'time': int(time.time())})
+        self._connected.setdefault(account_id, asyncio.Event()).set()
+        if self.heartbeat_interval > 0:
+            self._heartbeat_tasks[account_id] = asyncio.create_task(self._heartbeat_loop(account_id, ws))
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                payload = msg.json()
+                if 'action' not in payload:
+                    continue
+                response = await self._record(account_id, payload['action'], payload.get('params') or {}, 'ws')
+                response['echo'] = payload.get('echo')
+                await ws.send_json(response)
+        finally:
+            task = self._heartbeat_tasks.pop(account_id, None)
+            if task is not None:
+                task.cancel()
+            if self._sockets.get(account_id) is ws:
+                del self._sockets[account_id]
+                self._connected.pop(account_id, None)
+        return ws
+
+    async def _handle_http(self, request: web.Request) -> web.Response:
+        account_id = int(request.match_info['account_id'])
+        try:
+            params = await request.json()
+        except ValueError:
+            params = {}
+        response = await self._record(account_id, request.match_info['action'], params or {}, 'http')
+        return web.json_response(response)
+
+    async def _handle_file(self, request: web.Request) -> web.Response:
+        return web.Response(body=STUB_PNG, content_type='image/png')
+
+    async def _heartbeat_loop(self, account_id: int, ws: web.WebSocketResponse):
+        while not ws.closed:
+            await asyncio.sleep(self.heartbeat_interval)
+            await ws.send_json({'post_type': 'meta_event', 'meta_event_type': 'heartbeat',
+                                'self_id': BOT_QQ_BASE + account_id, 'time': int(time.time()),
+                                'interval': int(self.heartbeat_interval * 1000),
+                                'status': {'online': True, 'good': True}})
@@ -0,0 +1,203 @@
+# harness/replay.py
+# 事件回放：启动模拟OneBot，用与 bot.py 相同的 MultiWebSocketManager/MessageRouter 连接它，
+# 把录制的或合成的事件流推送进去，并记录机器人发出的全部动作
+#
+# 命令行用法（在虚拟时间中运行，事件间隔和超时不需要真实等待）:
+#   python -m harness.replay events.jsonl [--accounts 2] [--mode parallel] [--config extra.yml] [--output actions.jsonl]
+
+import argparse
+import asyncio
+import json
+import sys
+from typing import Any, Dict, Iterable, List, Optional
+
+import yaml
+
+from logger_config import get_logger
+from core.bot_context import BotContext
+from core.config_manager import _load_config_file
+from core.multi_websocket_manager import MultiWebSocketManager
+from core.message_router import MessageRouter
+from core.shutdown import shutdown_manager
+from commands.command_dispatcher import initialize_command_mappings
+from commands.command_loader import load_command_handlers
+from utils.task_utils import get_background_tasks
+from harness import virtual_clock
+from harness.events import load_events, schedule
+from harness.fake_onebot import FakeOneBotServer, RecordedAction
+
+logger = get_logger("Replay")
+
+
+def build_config(server: FakeOneBotServer, accounts: int = 1, mode: str = 'fallback',
+                 overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """生成回放用的配置：命令配置来自 commands.yml，账号和OneBot地址全部指向模拟服务器
+
+    不读取 config.yml，避免回放时连接真实账号或调用真实的第三方API；需要的配置项通过 overrides 提供。
+    """
+    config: Dict[str, Any] = {}
+    _load_config_file("commands.yml", config)
+    config.setdefault("commands", {})
+    config.setdefault("features", {})
+    config.setdefault("command_categories", {})
+    config.setdefault("error_messages", {})
+    config.update(overrides or {})
+
+    config['mode'] = mode
+    config['accounts'] = [server.account_config(account_id) for account_id in range(1, accounts + 1)]
+    config['onebot_api_base'] = config['accounts'][0]['onebot_api_base']
+    config['onebot_access_token'] = ''
+    return config
+
+
+class ReplayHarness:
+    """事件回放环境
+
+    用法::
+
+        async with ReplayHarness(accounts=2, mode='parallel') as harness:
+            await harness.push(group_message(123, 456, '/help'))
+            await harness.settle()
+            assert harness.actions_named('send_group_msg')
+
+    应在 harness.virtual_clock.run() 中运行，以便 sleep/超时立即完成；在普通事件循环中也可以使用，只是按真实时间等待。
+    """
+
+    def __init__(self, accounts: int = 1, mode: str = 'fallback', config: Optional[Dict[str, Any]] = None,
+                 heartbeat_interval: float = 0, load_commands: bool = True):
+        self.accounts = accounts
+        self.mode = mode
+        self.config_overrides = config
+        self.load_commands = load_commands
+        self.server = FakeOneBotServer(heartbeat_interval=heartbeat_interval)
+        self.context: Optional[BotContext] = None
+        self.manager: Optional[MultiWebSocketManager] = None
+        self.router: Optional[MessageRouter] = None
+        self._main_task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> 'ReplayHarness':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+    @property
+    def actions(self) -> List[RecordedAction]:
+        return self.server.actions
+
+    def actions_named(self, action: str) -> List[RecordedAction]:
+        return self.server.actions_named(action)
+
+    # ---------------------- 生命周期 ----------------------
+
+    async def start(self, connect_timeout: float = 10):
+        await self.server.start()
+        config = build_config(self.server, self.accounts, self.mode, self.config_overrides)
+
+        self.context = BotContext(config)
+        initialize_command_mappings(config)
+        if self.load_commands:
+            load_command_handlers(config)
+
+        shutdown_manager.bind(asyncio.get_running_loop())
+
+        # 与 bot.py 相同的组装方式
+        self.manager = MultiWebSocketManager(self.context)
+        setattr(self.context, 'multi_ws_manager', self.manager)
+        self.router = MessageRouter(self.context)
+        setattr(self.context, 'message_router', self.router)
+
+        self._main_task = asyncio.create_task(self.manager.start_main_loop(self.router.handle_websocket_message))
+        await self.server.wait_connected(list(range(1, self.accounts + 1)), timeout=connect_timeout)
+        # 连接建立后还有一轮上下文更新（活跃连接、群列表校对），等它们完成再开始回放
+        await self.settle()
+        self.server.actions.clear()
+
+    async def close(self):
+        if self.manager is not None:
+            self.manager.stop()
+        await self.server.close()
+        if self._main_task is not None:
+            self._main_task.cancel()
+            try:
+                await self._main_task
+            except asyncio.CancelledError:
+                pass
+            self._main_task = None
+
+    # ---------------------- 回放 ----------------------
+
+    async def push(self, event: dict, account_id: int = 1):
+        await self.server.push(event, account_id)
+
+    async def replay(self, events: Iterable[dict], paced: bool = True):
+        """按事件间隔推送事件流（间隔使用虚拟时间），推送完后等待处理完成"""
+        for delay, account_id, event in schedule(events, paced):
+            if delay:
+                await asyncio.sleep(delay)
+            await self.push(event, account_id)
+        await self.settle()
+
+    async def settle(self, quiet: float = 0.5, timeout: float = 60):
+        """等待处理中的事件和后台任务完成，且 quiet 秒内没有新的动作"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        last_count = -1
+        quiet_since = loop.time()
+        while True:
+            now = loop.time()
+            busy = shutdown_manager.in_flight > 0 or any(not task.done() for task in get_background_tasks())
+            if busy or len(self.actions) != last_count:
+                last_count = len(self.actions)
+                quiet_since = now
+            elif now - quiet_since >= quiet:
+                return
+            if now > deadline:
+                raise asyncio.TimeoutError(f"{timeout} 秒内未处理完成（处理中的事件: {shutdown_manager.in_flight}）")
+            await asyncio.sleep(0.05)
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m harness.replay', description='在模拟OneBot上回放事件流')
+    parser.add_argument('events', help='事件流文件（JSONL）')
+    parser.add_argument('--accounts', type=int, default=1, help='模拟账号数量')
+    parser.add_argument('--mode', default='fallback', choices=['fallback', 'parallel', 'parallel-pro'])
+    parser.add_argument('--config', help='合并到回放配置中的YAML文件（servers、Root_user 等）')
+    parser.add_argument('--output', help='把记录到的动作写入该文件（JSONL），默认输出到标准输出')
+    parser.add_argument('--no-pacing', action='store_true', help='忽略事件间隔，尽快推送')
+    parser.add_argument('--realtime', action='store_true', help='使用真实时间而不是虚拟时间')
+    return parser.parse_args(argv)
+
+
+async def _replay_file(args: argparse.Namespace) -> List[RecordedAction]:
+    overrides = None
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            overrides = yaml.safe_load(f) or {}
+    events = load_events(args.events)
+    async with ReplayHarness(accounts=args.accounts, mode=args.mode, config=overrides) as harness:
+        await harness.replay(events, paced=not args.no_pacing)
+        logger.info(f"回放完成: {len(events)} 个事件，{len(harness.actions)} 个动作")
+        return list(harness.actions)
+
+
+def main(argv: List[str] = None) -> int:
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    if args.realtime:
+        actions = asyncio.run(_replay_file(args))
+    else:
+        actions = virtual_clock.run(_replay_file(args))
+
+    lines = [json.dumps(action.to_dict(), ensure_ascii=False) for action in actions]
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + ('\n' if lines else ''))
+    else:
+        print('\n'.join(lines))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
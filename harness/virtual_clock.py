@@ -0,0 +1,96 @@
+# harness/virtual_clock.py
+# 虚拟时间事件循环：loop.time() 返回虚拟时间，事件循环空闲时直接把虚拟时间拨到下一个定时器，
+# asyncio.sleep、wait_for 超时、重连退避等都会立即完成，而本地套接字上的真实IO照常进行
+
+import asyncio
+import selectors
+import time
+from typing import Any, Coroutine, Optional
+
+
+class _VirtualSelector:
+    """包装真实的 selector：先等待一小段真实时间让本地IO到达，仍然没有IO时推进虚拟时间"""
+
+    def __init__(self, selector: selectors.BaseSelector, idle_window: float):
+        self._selector = selector
+        self._idle_window = idle_window
+        self.loop: Optional['VirtualClockEventLoop'] = None
+
+    def select(self, timeout: Optional[float] = None):
+        events = self._selector.select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            # 没有任何定时器，只能等待真实IO
+            return self._selector.select(None)
+        events = self._selector.select(min(timeout, self._idle_window))
+        if events:
+            return events
+        if self.loop._pending_executor_jobs:
+            # 线程池中的任务还在执行（例如SQLite写盘），不能跳过时间，否则它们的超时会被提前触发
+            return events
+        self.loop.advance(timeout)
+        return []
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualClockEventLoop(asyncio.SelectorEventLoop):
+    """虚拟时间事件循环
+
+    Args:
+        idle_window: 判定事件循环空闲前等待真实IO的时间（秒）；本地回环上的收发通常在该时间内完成
+        start: 虚拟时间起点，默认取当前的 time.monotonic()
+
+    注意只有基于 loop.time() 的等待会被加速；直接读取 time.monotonic()/time.time() 的代码看到的仍是真实时间。
+    """
+
+    def __init__(self, idle_window: float = 0.005, start: float = None):
+        selector = _VirtualSelector(selectors.DefaultSelector(), idle_window)
+        super().__init__(selector)
+        selector.loop = self
+        self._virtual_now = time.monotonic() if start is None else start
+        self._virtual_start = self._virtual_now
+        self._pending_executor_jobs = 0
+
+    def time(self) -> float:
+        return self._virtual_now
+
+    @property
+    def elapsed(self) -> float:
+        """从事件循环创建到现在经过的虚拟时间（秒）"""
+        return self._virtual_now - self._virtual_start
+
+    def advance(self, seconds: float):
+        if seconds > 0:
+            self._virtual_now += seconds
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self._pending_executor_jobs += 1
+        future.add_done_callback(self._executor_job_done)
+        return future
+
+    def _executor_job_done(self, future):
+        self._pending_executor_jobs -= 1
+
+
+def run(main: Coroutine, idle_window: float = 0.005) -> Any:
+    """类似 asyncio.run()，但在虚拟时间事件循环中运行"""
+    loop = VirtualClockEventLoop(idle_window=idle_window)
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            pending = [task for task in asyncio.all_tasks(loop) if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
@@ -119,16 +119,29 @@ class ColoredFormatter(logging.Formatter):
             reset = self.COLORS['RESET']
             
             # 组合最终格式
-            formatted = f"{white}{date_str} {time_str}{reset} {color}[{record.name}]{reset} {message}"
+            formatted = f"{white}{date_str} {time_str}{reset} {SHARD_PREFIX}{color}[{record.name}]{reset} {message}"
         else:
             # 不使用颜色时的格式
-            formatted = f"{asctime} [{record.name}] {message}"
+            formatted = f"{asctime} {SHARD_PREFIX}[{record.name}] {message}"
         
         return formatted
 
 
+# 多进程分片运行时（bot.py --shard i/N），日志带上分片编号，并写入各自的日志文件，避免多个进程同时轮转同一个文件
+def _get_shard_tag() -> str:
+    if '--shard' not in sys.argv:
+        return ''
+    try:
+        index, count = sys.argv[sys.argv.index('--shard') + 1].split('/', 1)
+        return f"S{int(index)}" if int(count) > 1 else ''
+    except (IndexError, ValueError):
+        return ''
+
+SHARD_TAG = _get_shard_tag()
+SHARD_PREFIX = f"[{SHARD_TAG}] " if SHARD_TAG else ''
+
 # 定义日志格式
-LOG_FORMAT = '%(asctime)s %(name)s %(message)s'
+LOG_FORMAT = f'%(asctime)s [{SHARD_TAG}] %(name)s %(message)s' if SHARD_TAG else '%(asctime)s %(name)s %(message)s'
 DATE_FORMAT = '%m-%d %H:%M:%S'
 
 # 创建日志目录
@@ -141,7 +154,7 @@ console_handler.setFormatter(ColoredFormatter(LOG_FORMAT, DATE_FORMAT))
 
 # 创建文件处理器（无颜色，纯文本，轮转）
 file_handler = RotatingFileHandler(
-    os.path.join(LOG_DIR, 'app.log'),
+    os.path.join(LOG_DIR, f'app.{SHARD_TAG.lower()}.log' if SHARD_TAG else 'app.log'),
     maxBytes=1024 * 1024 * 5,  # 5MB
     backupCount=5,
     encoding='utf-8'
@@ -213,6 +226,10 @@ def _configure_third_party_loggers():
     httpx_logger = logging.getLogger('httpx')
     httpx_logger.setLevel(logging.WARNING)
     
+    # 抑制aiosqlite的debug日志（每条SQL都会输出）
+    aiosqlite_logger = logging.getLogger('aiosqlite')
+    aiosqlite_logger.setLevel(logging.WARNING)
+    
     # 抑制peewee的debug日志
     peewee_logger = logging.getLogger('peewee')
     peewee_logger.setLevel(logging.WARNING)
@@ -280,6 +280,33 @@ class PluginContext:
             是否应该处理该消息
         """
         return self.core_context.should_handle_message(event)
+    
+    def _pipeline_manager(self):
+        router = getattr(self.core_context, 'message_router', None)
+        manager = getattr(router, 'pipeline_manager', None)
+        if manager is None:
+            raise PluginError("消息管道尚未初始化")
+        return manager
+    
+    def add_pipeline_processor(self, stage_type, processor):
+        """向消息管道的某个阶段添加处理器，插件卸载时自动移除
+        
+        Args:
+            stage_type: 阶段类型（core.message_pipeline.pipeline_stage.StageType 或插件阶段的名称）
+            processor: MessageProcessor 子类实例，可通过 message_types/requires 声明处理的消息类型和用到的字段
+        """
+        self._pipeline_manager().add_processor(stage_type, processor, owner=self.plugin_id)
+        self.logger.info(f"添加消息管道处理器: {processor.name} -> {stage_type}")
+    
+    def add_pipeline_stage(self, stage, after=None, before=None):
+        """在消息管道中插入新的阶段，插件卸载时自动移除
+        
+        Args:
+            stage: PipelineStage 子类实例，stage_type 可以使用字符串
+            after/before: 插入到该类型的阶段之后/之前
+        """
+        self._pipeline_manager().add_stage(stage, after=after, before=before, owner=self.plugin_id)
+        self.logger.info(f"添加消息管道阶段: {stage.name}")
 
 
 class PluginBase(ABC):
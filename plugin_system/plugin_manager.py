@@ -194,6 +194,11 @@ class PluginManager:
                 # 清理服务注册
                 await self.service_registry.clear_plugin(plugin_id)
                 
+                # 清理插件添加的消息管道阶段和处理器
+                router = getattr(self.core_context, 'message_router', None)
+                if router is not None and getattr(router, 'pipeline_manager', None) is not None:
+                    router.pipeline_manager.remove_owner(plugin_id)
+                
                 # 清理插件命令从全局命令列表
                 if hasattr(self.core_context, 'config') and isinstance(self.core_context.config, dict):
                     commands = self.core_context.config.get('commands', {})
@@ -14,6 +14,21 @@ BUNDLED_PYTHON = os.path.join(RUNTIME_DIR, 'python31211', 'bin', 'python.exe')
 REQUIREMENTS_FILE = os.path.join(PROJECT_ROOT, 'requirements.txt')
 
 RESTART_FLAG = os.path.join(PROJECT_ROOT, '.restart_flag')
+# 重启标志内容为 handover 时先启动新进程，旧进程排空后自行退出（见 core/shutdown.py）
+HANDOVER_MODE = 'handover'
+HANDOVER_EXIT_TIMEOUT = 120  # 交接重启时等待旧进程自行退出的最长时间（秒）
+
+# 多进程分片（--shards N）：各分片进程把心跳写入该SQLite数据库（见 core/shard_coordinator.py）
+SHARD_DB = os.path.join(PROJECT_ROOT, 'data', 'shards.db')
+SHARD_HEALTH_CHECK_INTERVAL = 5  # 健康检查间隔（秒）
+SHARD_HEALTH_TIMEOUT = 60  # 心跳超过该时间未更新视为失去响应（秒）
+SHARD_STARTUP_GRACE = 180  # 启动阶段（加载插件、预热浏览器）允许没有心跳的时间（秒）
+SHARD_RESTART_DELAY_MAX = 60  # 连续崩溃时的最大重启间隔（秒）
+SHARD_STABLE_TIME = 600  # 运行超过该时间后崩溃，重启间隔从头计算（秒）
+SHARD_STOP_TIMEOUT = 30  # 停止分片时等待其排空退出的时间（秒）
+
+shard_workers = []
+retiring_processes = []  # 交接重启中等待排空退出的旧进程 [(process, 开始交接时间)]
 
 
 def get_python_executable():
@@ -236,6 +251,13 @@ def setup_signal_handler():
     """设置信号处理器，用于优雅退出"""
     def signal_handler(sig, frame):
         print("\n收到退出信号，正在停止机器人...")
+        for worker in shard_workers:
+            worker.stop(timeout=1)
+        for process, _ in retiring_processes:
+            try:
+                process.kill()
+            except Exception:
+                pass
         if 'bot_process' in globals() and is_psutil_available():
             try:
                 import psutil
@@ -298,7 +320,7 @@ def cleanup_all_child_processes():
     except Exception as e:
         print(f"清理子进程时出错: {e}")
 
-def start_bot(python_executable):
+def start_bot(python_executable, bot_args=None):
     """启动bot.py子进程"""
     global bot_process
 
@@ -309,7 +331,7 @@ def start_bot(python_executable):
             pass
 
     bot_script = os.path.join(PROJECT_ROOT, 'bot.py')
-    cmd = [python_executable, bot_script] + sys.argv[1:]
+    cmd = [python_executable, bot_script] + (sys.argv[1:] if bot_args is None else bot_args)
 
     print(f"启动机器人: {' '.join(cmd)}")
 
@@ -321,27 +343,232 @@ def start_bot(python_executable):
 
     return bot_process
 
+
+def read_restart_mode():
+    """读取重启标志内容，交接重启返回 HANDOVER_MODE"""
+    try:
+        with open(RESTART_FLAG, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+def reap_retiring_processes():
+    """回收已经退出的旧进程，超时仍未退出的强制结束"""
+    now = time.time()
+    for entry in list(retiring_processes):
+        process, since = entry
+        if process.poll() is not None:
+            retiring_processes.remove(entry)
+        elif now - since > HANDOVER_EXIT_TIMEOUT:
+            print(f"旧进程 {process.pid} 在交接后 {HANDOVER_EXIT_TIMEOUT} 秒内未退出，强制结束")
+            try:
+                process.kill()
+            except Exception:
+                pass
+            retiring_processes.remove(entry)
+
+def parse_shard_count(args):
+    """解析 --shards N 参数，返回 (分片数, 传给bot.py的其余参数)"""
+    args = list(args)
+    if '--shards' not in args:
+        return 1, args
+    index = args.index('--shards')
+    value = args[index + 1] if index + 1 < len(args) else ''
+    del args[index:index + 2]
+    try:
+        return max(1, int(value)), args
+    except ValueError:
+        print(f"--shards 参数无效: {value!r}，使用单进程模式")
+        return 1, args
+
+
+def read_shard_heartbeats():
+    """读取各分片最近一次心跳，返回 {分片编号: (pid, 心跳时间)}"""
+    if not os.path.exists(SHARD_DB):
+        return {}
+    try:
+        import sqlite3
+        conn = sqlite3.connect(SHARD_DB, timeout=1)
+        try:
+            rows = conn.execute("SELECT shard, pid, updated_at FROM shards").fetchall()
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"读取分片心跳失败: {e}")
+        return {}
+    return {shard: (pid, updated_at) for shard, pid, updated_at in rows}
+
+
+class ShardWorker:
+    """一个分片工作进程及其重启状态"""
+
+    def __init__(self, index, count):
+        self.index = index
+        self.count = count
+        self.process = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.restart_at = None
+
+    def start(self, python_executable, bot_args):
+        bot_script = os.path.join(PROJECT_ROOT, 'bot.py')
+        cmd = [python_executable, bot_script] + bot_args + ['--shard', f'{self.index}/{self.count}']
+        print(f"启动分片 {self.index}: {' '.join(cmd)}")
+        # 只有主分片读取控制台输入
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=None if self.index == 0 else subprocess.DEVNULL,
+            stdout=None,
+            stderr=None
+        )
+        self.started_at = time.time()
+        self.restart_at = None
+
+    def request_stop(self):
+        """发送终止信号（非Windows平台上分片会先排空再退出），不等待"""
+        if self.process is not None and self.process.poll() is None:
+            try:
+                self.process.terminate()
+            except Exception:
+                pass
+
+    def stop(self, timeout=SHARD_STOP_TIMEOUT):
+        if self.process is None or self.process.poll() is not None:
+            return
+        try:
+            self.process.terminate()
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            try:
+                self.process.kill()
+                self.process.wait(timeout=1)
+            except Exception:
+                pass
+        except Exception:
+            pass
+
+    def is_stale(self, heartbeats, now):
+        """心跳是否过期；进程刚启动、还没写入心跳时按启动宽限时间判断"""
+        beat = heartbeats.get(self.index)
+        if beat is None or beat[0] != self.process.pid or beat[1] < self.started_at:
+            return now - self.started_at > SHARD_STARTUP_GRACE
+        return now - beat[1] > SHARD_HEALTH_TIMEOUT
+
+    def schedule_restart(self, now):
+        """安排重启，连续崩溃时重启间隔指数增长，返回等待秒数"""
+        if now - self.started_at > SHARD_STABLE_TIME:
+            self.failures = 0
+        self.failures += 1
+        delay = min(SHARD_RESTART_DELAY_MAX, 2 ** (self.failures - 1))
+        self.restart_at = now + delay
+        return delay
+
+
+def run_sharded(python_executable, shard_count, bot_args):
+    """多进程分片模式：每个分片单独做健康检查，崩溃或失去响应的分片单独重启"""
+    shard_workers[:] = [ShardWorker(index, shard_count) for index in range(shard_count)]
+
+    if os.path.exists(RESTART_FLAG):
+        try:
+            os.remove(RESTART_FLAG)
+        except OSError:
+            pass
+
+    for worker in shard_workers:
+        worker.start(python_executable, bot_args)
+
+    last_health_check = time.time()
+    while True:
+        time.sleep(0.2)
+        now = time.time()
+
+        # 任一分片请求重启时重启全部分片
+        if os.path.exists(RESTART_FLAG):
+            print("检测到重启请求，正在重新启动所有分片...")
+            for worker in shard_workers:
+                worker.request_stop()
+            for worker in shard_workers:
+                worker.stop()
+            try:
+                os.remove(RESTART_FLAG)
+            except OSError:
+                pass
+            time.sleep(0.5)
+            for worker in shard_workers:
+                worker.failures = 0
+                worker.start(python_executable, bot_args)
+            continue
+
+        heartbeats = None
+        if now - last_health_check >= SHARD_HEALTH_CHECK_INTERVAL:
+            heartbeats = read_shard_heartbeats()
+            last_health_check = now
+
+        for worker in shard_workers:
+            if worker.restart_at is not None:
+                if now >= worker.restart_at:
+                    worker.start(python_executable, bot_args)
+                continue
+
+            code = worker.process.poll()
+            if code is not None:
+                if code == 0 and worker.index == 0 and not os.path.exists(RESTART_FLAG):
+                    # 主分片正常退出（例如控制台输入退出命令）时停止所有分片
+                    print("主分片已退出，正在停止所有分片...")
+                    for other in shard_workers:
+                        other.request_stop()
+                    for other in shard_workers:
+                        other.stop()
+                    return
+                if os.path.exists(RESTART_FLAG):
+                    break
+                delay = worker.schedule_restart(now)
+                print(f"分片 {worker.index} 已退出 (退出码 {code})，{delay}秒后重启")
+            elif heartbeats is not None and worker.is_stale(heartbeats, now):
+                print(f"分片 {worker.index} 健康检查失败（心跳超时），正在重启...")
+                worker.stop()
+                delay = worker.schedule_restart(now)
+                print(f"分片 {worker.index} 将在 {delay} 秒后重启")
+
+
 def main():
     """主函数"""
     print_startup_art()
     print("ZHRrobot 启动器")
     print("输入 Ctrl+C 退出")
 
+    shard_count, bot_args = parse_shard_count(sys.argv[1:])
+
     python_executable = get_python_executable()
     install_dependencies(python_executable)
 
     setup_signal_handler()
 
+    if shard_count > 1:
+        print(f"多进程分片模式: 启动 {shard_count} 个工作进程")
+        run_sharded(python_executable, shard_count, bot_args)
+        cleanup_all_child_processes()
+        return
+
+    handover = False
     while True:
-        process = start_bot(python_executable)
+        process = start_bot(python_executable, bot_args + (['--handover'] if handover else []))
+        handover = False
         
         # 更快速地检测子进程结束和重启标志
         restart_requested = False
         while process.poll() is None and not restart_requested:
             # 每100ms检查一次进程状态和重启标志
             time.sleep(0.1)
+            reap_retiring_processes()
             if os.path.exists(RESTART_FLAG):
                 restart_requested = True
+                if read_restart_mode() == HANDOVER_MODE:
+                    # 交接重启：保留旧进程继续处理事件，直到新进程连接成功后它自行排空退出
+                    handover = True
+                    retiring_processes.append((process, time.time()))
+                    break
                 # 尝试快速终止进程
                 try:
                     process.terminate()
@@ -354,6 +581,10 @@ def main():
                     except:
                         pass
         
+        if handover:
+            print("检测到交接重启请求，正在启动新进程...")
+            continue
+        
         # 等待子进程完全结束
         try:
             process.wait(timeout=1)
@@ -373,6 +604,13 @@ def main():
             print("机器人已停止，无重启请求")
             break
     
+    # 等待交接中的旧进程退出
+    for process, _ in retiring_processes:
+        try:
+            process.wait(timeout=HANDOVER_EXIT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
     # 程序退出前清理所有子进程
     cleanup_all_child_processes()
 
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# test_connection_health.py
+# 测试连接健康状态：只有超时和网络错误计入API错误率，接口返回的业务错误不会让连接降级
+
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import utils.api_utils as api_utils
+from core.connection_health import ConnectionState, HealthTracker
+
+
+class StubContext:
+    """只提供API配置和连接管理器的上下文"""
+
+    def __init__(self, ws_manager):
+        self.multi_ws_manager = ws_manager
+
+    def get_account_by_id(self, account_id):
+        return None
+
+    def get_config_value(self, key, default=None):
+        return {'onebot_api_base': 'http://127.0.0.1:1'}.get(key, default)
+
+
+class RecordingManager:
+    def __init__(self):
+        self.results = []
+
+    def record_api_result(self, account_id, ok):
+        self.results.append(ok)
+
+
+def _call_with_response(response) -> bool:
+    """让 call_onebot_api 收到 response，返回计入健康状态的结果"""
+    manager = RecordingManager()
+
+    async def fake_request(**kwargs):
+        return response
+
+    original = api_utils.safe_api_request
+    api_utils.safe_api_request = fake_request
+    try:
+        asyncio.run(api_utils.call_onebot_api(StubContext(manager), 'set_group_ban', {}))
+    finally:
+        api_utils.safe_api_request = original
+    return manager.results[0]
+
+
+def test_only_transport_errors_count():
+    """业务错误（如无权限）不算失败，超时和网络错误算失败"""
+    assert _call_with_response({'success': True, 'data': {'status': 'ok'}}) is True
+    assert _call_with_response({'success': False, 'data': {'status': 'failed'}, 'error': '无权限'}) is True
+    assert _call_with_response({'success': False, 'error': '请求超时 (5秒)', 'transport_error': True}) is False
+
+
+def test_timeout_marks_transport_error():
+    """连接失败时 safe_api_request 返回 transport_error"""
+    response = asyncio.run(api_utils.safe_api_request('http://127.0.0.1:1/', method='post', json_data={}, timeout=2))
+    assert response['success'] is False and response['transport_error'] is True
+
+
+def test_error_rate_degrades_healthy_connection():
+    """健康连接的错误率超过阈值时降级"""
+    tracker = HealthTracker('1', heartbeat_interval=0, error_min_samples=4, error_rate_threshold=0.5)
+    tracker.on_connected()
+    assert tracker.state == ConnectionState.HEALTHY
+    for ok in (True, True, False):
+        tracker.on_api_result(ok)
+    assert tracker.state == ConnectionState.HEALTHY
+    tracker.on_api_result(False)
+    assert tracker.state == ConnectionState.DEGRADED
+
+
+if __name__ == '__main__':
+    test_only_transport_errors_count()
+    test_timeout_marks_transport_error()
+    test_error_rate_degrades_healthy_connection()
+    print("✓ 所有检查通过")
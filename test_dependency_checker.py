@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# test_dependency_checker.py
+# 测试依赖校验：标记为 optional 的依赖缺失时不阻止启动
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.dependency_checker import parse_requirements, verify_dependencies
+
+
+def _requirements(content):
+    path = os.path.join(tempfile.mkdtemp(), 'requirements.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return path
+
+
+def test_optional_requirement_parsed():
+    """行尾注释以 optional 开头的依赖为可选依赖，普通注释不影响"""
+    path = _requirements("pyyaml>=5  # 配置文件\norjson  # optional: 加速解码\n")
+    requirements = parse_requirements(path)
+    assert [(r.name, r.specifier, r.optional) for r in requirements] == [('pyyaml', '>=5', False),
+                                                                          ('orjson', '', True)]
+
+
+def test_missing_optional_does_not_fail():
+    """缺失的可选依赖记为 skipped，缺失的必需依赖仍然报错"""
+    path = _requirements("surely-not-installed-optional  # optional\n")
+    report = verify_dependencies(path)
+    assert report.ok and report.statuses[0].status == 'skipped'
+
+    report = verify_dependencies(_requirements("surely-not-installed-required\n"))
+    assert not report.ok and [s.name for s in report.missing] == ['surely-not-installed-required']
+
+
+def test_repository_orjson_is_optional():
+    """项目的 orjson 依赖为可选（未安装时回退到标准库 json）"""
+    optional = {r.key for r in parse_requirements() if r.optional}
+    assert 'orjson' in optional
+
+
+if __name__ == '__main__':
+    test_optional_requirement_parsed()
+    test_missing_optional_does_not_fail()
+    test_repository_orjson_is_optional()
+    print("✓ 所有检查通过")
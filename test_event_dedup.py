@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# test_event_dedup.py
+# 测试多账号模式下的跨账号事件去重
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.event_dedup import EventDeduplicator, event_fingerprint
+from harness import virtual_clock
+from harness.events import group_message, group_notice, group_request, private_message
+from harness.replay import ReplayHarness
+
+
+def test_group_events_share_fingerprint_across_accounts():
+    """同一个群事件从不同账号到达时指纹相同，私聊消息按账号区分"""
+    notice = group_notice('group_increase', 100, 200, at=1000)
+    assert event_fingerprint(dict(notice, self_id=1)) == event_fingerprint(dict(notice, self_id=2))
+    message = group_message(100, 200, 'hello', at=1000)
+    assert event_fingerprint(dict(message, self_id=1, message_id=1)) == \
+        event_fingerprint(dict(message, self_id=2, message_id=9))
+    private = private_message(200, 'hello', at=1000)
+    assert event_fingerprint(dict(private, self_id=1)) != event_fingerprint(dict(private, self_id=2))
+    assert event_fingerprint({'post_type': 'meta_event', 'meta_event_type': 'heartbeat'}) is None
+
+
+def test_deduplicator_passes_first_copy_only():
+    """只放行第一份，超出容量时淘汰最早的指纹"""
+    dedup = EventDeduplicator(ttl=60, max_size=2)
+    first = group_notice('group_increase', 100, 1, at=1000)
+    assert not dedup.is_duplicate(dict(first, self_id=1))
+    assert dedup.is_duplicate(dict(first, self_id=2))
+    assert dedup.dropped == 1
+    for user_id in (2, 3):
+        dedup.is_duplicate(group_notice('group_increase', 100, user_id, at=1000))
+    assert not dedup.is_duplicate(dict(first, self_id=3))
+
+
+def _count_handled(mode: str, event: dict, handler_module, handler_name: str) -> int:
+    """在 mode 模式下让两个账号各收到一份 event，返回处理函数被调用的次数"""
+    calls = []
+
+    async def record(context, handled_event):
+        calls.append(handled_event.get('_account_id'))
+
+    original = getattr(handler_module, handler_name)
+    setattr(handler_module, handler_name, record)
+
+    async def main():
+        async with ReplayHarness(accounts=2, mode=mode, load_commands=False) as harness:
+            await harness.push(dict(event), account_id=1)
+            await harness.push(dict(event), account_id=2)
+            await harness.settle()
+
+    try:
+        virtual_clock.run(main())
+    finally:
+        setattr(handler_module, handler_name, original)
+    return len(calls)
+
+
+def test_parallel_pro_notices_handled_once():
+    """parallel-pro 模式下群通知和加群请求只处理一次"""
+    from handlers import notice_handler, request_handler
+    from core.event_dedup import event_deduplicator
+    event_deduplicator.clear()
+    notice = group_notice('group_increase', 100, 300)
+    assert _count_handled('parallel-pro', notice, notice_handler, 'handle_notice_event') == 1
+    request = group_request(100, 301, 'hi')
+    assert _count_handled('parallel-pro', request, request_handler, 'handle_request_event') == 1
+
+
+if __name__ == '__main__':
+    test_group_events_share_fingerprint_across_accounts()
+    test_deduplicator_passes_first_copy_only()
+    test_parallel_pro_notices_handled_once()
+    print("✓ 所有检查通过")
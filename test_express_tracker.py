@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# test_express_tracker.py
+# 测试快递跟踪调度器：按物流状态调整查询间隔、只写回有变化的单号、未运行调度器的分片只写入提醒文件
+
+import asyncio
+import os
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import core.express_tracker as express_module
+from core.express_tracker import ExpressProvider, ExpressTracker, TrackingResult, DEFAULT_SETTINGS
+from core.json_store import json_store
+from harness import virtual_clock
+
+
+class StubProvider(ExpressProvider):
+    """返回固定状态的本地查询接口"""
+
+    def __init__(self, statuses):
+        self.statuses = statuses  # 单号 -> (状态, 最新轨迹时间)
+        self.calls = Counter()
+
+    async def query(self, mail_no):
+        self.calls[mail_no] += 1
+        status, time = self.statuses[mail_no]
+        return TrackingResult(mail_no, 'SF', status, [{'time': time, 'desc': status}])
+
+
+class StubContext:
+    def __init__(self):
+        self.sent = []
+
+    async def send_group_message(self, group_id, message):
+        self.sent.append((group_id, message))
+
+    async def send_private_message(self, user_id, message):
+        self.sent.append((user_id, message))
+
+
+def _run_with_reminders(reminders, scenario):
+    """在临时提醒文件和虚拟时间中运行 scenario(path)"""
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'express_command.json')
+    original = express_module.EXPRESS_REMIND_FILE
+    express_module.EXPRESS_REMIND_FILE = path
+
+    async def main():
+        await json_store.update(path, lambda data: data.update(reminders), default={})
+        await scenario(path)
+
+    try:
+        virtual_clock.run(main())
+    finally:
+        express_module.EXPRESS_REMIND_FILE = original
+
+
+def _info(last_update_time='t1'):
+    return {'group_id': '100', 'user_id': '200', 'last_update_time': last_update_time}
+
+
+def test_provider_is_abstract():
+    """查询接口必须实现 query()"""
+    class Incomplete(ExpressProvider):
+        pass
+
+    try:
+        Incomplete()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("未实现 query() 的查询接口不应能实例化")
+
+
+def test_interval_follows_status():
+    """派送中查得勤，运输中按常规间隔，待取件或多次没有变化时查得少"""
+    tracker = ExpressTracker()
+    assert tracker.interval_for(TrackingResult('A', '', '派送中', []), 'A') == DEFAULT_SETTINGS['delivering_interval']
+    assert tracker.interval_for(TrackingResult('A', '', '运输中', []), 'A') == DEFAULT_SETTINGS['transit_interval']
+    assert tracker.interval_for(TrackingResult('A', '', '待取件', []), 'A') == DEFAULT_SETTINGS['idle_interval']
+    tracker._unchanged['A'] = DEFAULT_SETTINGS['idle_after_polls']
+    assert tracker.interval_for(TrackingResult('A', '', '运输中', []), 'A') == DEFAULT_SETTINGS['idle_interval']
+
+
+def test_adaptive_polling_and_changed_only_writes():
+    """各单号按自己的间隔查询，签收的单号提醒后删除，没有变化的单号不写回"""
+    provider = StubProvider({'A': ('派送中', 't1'), 'B': ('运输中', 't1')})
+    context = StubContext()
+    writes = []
+
+    async def scenario(path):
+        tracker = ExpressTracker()
+        tracker.configure({'idle_after_polls': 100})
+        tracker.set_provider(provider)
+        await tracker.start(context)
+        original_update = json_store.update
+
+        async def counting_update(file_path, mutator, default=None, indent=2):
+            writes.append(file_path)
+            return await original_update(file_path, mutator, default=default, indent=indent)
+
+        json_store.update = counting_update
+        try:
+            await asyncio.sleep(1250)
+            assert provider.calls == Counter({'A': 5, 'B': 2})  # A: 0/300/600/900/1200，B: 0/1200
+            assert writes == [] and context.sent == []
+
+            provider.statuses['A'] = ('已签收', 't2')
+            await asyncio.sleep(300)
+            assert writes == [path]
+            assert sorted(json_store.get(path)) == ['B']
+            assert len(context.sent) == 1 and '已签收' in context.sent[0][1]
+        finally:
+            json_store.update = original_update
+            await tracker.close()
+
+    _run_with_reminders({'A': _info(), 'B': _info()}, scenario)
+
+
+def test_only_running_tracker_polls():
+    """没有运行调度器的进程（非主分片）只写入提醒文件，由运行调度器的进程同步后查询"""
+    provider = StubProvider({'A': ('运输中', 't1'), 'C': ('运输中', 't1')})
+
+    async def scenario(path):
+        primary, other = ExpressTracker(), ExpressTracker()
+        for tracker in (primary, other):
+            tracker.set_provider(provider)
+        await primary.start(StubContext())
+        await asyncio.sleep(1)
+        assert provider.calls == Counter({'A': 1})
+
+        await other.track('C', _info())
+        assert not other.running and other.tracked == 0
+        await asyncio.sleep(DEFAULT_SETTINGS['sync_interval'])
+        assert provider.calls == Counter({'A': 1, 'C': 1})
+        assert primary.tracked == 2
+        await primary.close()
+
+    _run_with_reminders({'A': _info()}, scenario)
+
+
+if __name__ == '__main__':
+    test_provider_is_abstract()
+    test_interval_follows_status()
+    test_adaptive_polling_and_changed_only_writes()
+    test_only_running_tracker_polls()
+    print("✓ 所有检查通过")
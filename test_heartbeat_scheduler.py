@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# test_heartbeat_scheduler.py
+# 测试心跳截止时间调度器：按时触发、收到心跳后顺延、取消、回调中重新计时，以及刷新不会让堆增长
+
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.heartbeat_scheduler import HeartbeatScheduler
+from harness import virtual_clock
+
+
+def test_deadlines_fire_in_order():
+    """各 key 在自己的截止时间触发，顺延和取消的 key 不会提前触发"""
+    fired = []
+
+    async def main():
+        scheduler = HeartbeatScheduler()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        def record(key):
+            return lambda: fired.append((key, round(loop.time() - start)))
+
+        scheduler.schedule('a', 10, record('a'))
+        scheduler.schedule('b', 20, record('b'))
+        scheduler.schedule('c', 5, record('c'))
+        scheduler.cancel('c')
+        await asyncio.sleep(8)
+        scheduler.schedule('a', 10, record('a'))  # 8 秒时收到心跳，顺延到 18 秒
+        assert round(scheduler.remaining('a')) == 10
+        await asyncio.sleep(15)
+        assert len(scheduler) == 0 and scheduler.fired == 2
+
+    virtual_clock.run(main())
+    assert fired == [('a', 18), ('b', 20)]
+
+
+def test_refresh_does_not_grow_heap():
+    """频繁刷新截止时间只更新记录，堆中每个 key 最多一个条目"""
+    async def main():
+        scheduler = HeartbeatScheduler()
+        for _ in range(100):
+            for key in range(10):
+                scheduler.schedule(key, 30, lambda: None)
+            await asyncio.sleep(1)
+        assert len(scheduler._heap) <= 10 and scheduler.fired == 0
+
+    virtual_clock.run(main())
+
+
+def test_callback_can_reschedule():
+    """回调中重新计时（如连续错过心跳）会在下一个周期再次触发"""
+    fired = []
+
+    async def main():
+        scheduler = HeartbeatScheduler()
+
+        def missed():
+            fired.append(asyncio.get_running_loop().time())
+            if len(fired) < 3:
+                scheduler.schedule('a', 10, missed)
+
+        scheduler.schedule('a', 10, missed)
+        await asyncio.sleep(45)
+        assert 'a' not in scheduler
+
+    virtual_clock.run(main())
+    assert len(fired) == 3
+    assert [round(b - a) for a, b in zip(fired, fired[1:])] == [10, 10]
+
+
+if __name__ == '__main__':
+    test_deadlines_fire_in_order()
+    test_refresh_does_not_grow_heap()
+    test_callback_can_reschedule()
+    print("✓ 所有检查通过")
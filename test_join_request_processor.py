@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# test_join_request_processor.py
+# 测试加群申请审核队列：审核规则和工作协程的上下文
+
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.join_request_processor import JoinRequest, JoinRequestProcessor, match_answer
+from core.tracing import tracer
+
+
+def _request(comment='', level=None, age=None):
+    request = JoinRequest(None, {'group_id': 100, 'user_id': 200, 'comment': comment, 'flag': 'f'})
+    if level is not None or age is not None:
+        request.info = {'qqLevel': level, 'age': age}
+    return request
+
+
+def test_match_answer():
+    """答案优先从“问题/答案”格式中提取，多个答案用逗号分隔"""
+    assert match_answer("问题：暗号\n答案：芝麻开门", "芝麻开门,open") == "芝麻开门"
+    assert match_answer("open please", "芝麻开门,open") == "open"
+    assert match_answer("随便写写", "芝麻开门") is None
+
+
+def test_rejections_and_approvals():
+    """拒绝规则命中任一条即拒绝，资料缺失时不按等级拒绝"""
+    rules = [{'type': 'level', 'value': 10}, {'type': 'keyword', 'value': '广告,推广'}]
+    assert JoinRequestProcessor._match_rejections(_request('hi', level=5), rules) == ["等级低于10"]
+    assert JoinRequestProcessor._match_rejections(_request('推广', level=20), rules) == ["验证信息包含“推广”"]
+    assert JoinRequestProcessor._match_rejections(_request('hi'), rules) == []
+    approvals = [{'type': 'age', 'value': 18}, {'type': 'answer', 'value': 'abc'}]
+    assert JoinRequestProcessor._match_approvals(_request('x', age=20), approvals) == ["年龄条件: 18"]
+    assert JoinRequestProcessor._match_approvals(_request('x', age=10), approvals) == []
+
+
+def test_workers_do_not_inherit_event_trace():
+    """在事件的追踪上下文中补建的工作协程不挂到该事件的 span 下"""
+    seen = []
+
+    async def main():
+        processor = JoinRequestProcessor()
+
+        async def process(request):
+            seen.append(tracer.current_trace_id())
+
+        processor._process = process
+        for i in range(3):
+            async with tracer.trace('request'):
+                processor.submit(None, {'group_id': 100, 'user_id': i, 'flag': f'flag-{i}'})
+        await processor.close()
+
+    asyncio.run(main())
+    assert seen == [None, None, None]
+
+
+def test_start_creates_workers():
+    """start() 按配置创建工作协程，close() 等待队列处理完"""
+    handled = []
+
+    async def main():
+        processor = JoinRequestProcessor()
+        processor.configure({'workers': 2})
+        await processor.start()
+        assert len(processor._workers) == 2
+
+        async def process(request):
+            handled.append(request.user_id)
+
+        processor._process = process
+        assert processor.submit(None, {'group_id': 100, 'user_id': 1, 'flag': 'a'})
+        assert not processor.submit(None, {'group_id': 100, 'user_id': 1, 'flag': 'a'})
+        await processor.close()
+
+    asyncio.run(main())
+    assert handled == ['1']
+
+
+if __name__ == '__main__':
+    test_match_answer()
+    test_rejections_and_approvals()
+    test_workers_do_not_inherit_event_trace()
+    test_start_creates_workers()
+    print("✓ 所有检查通过")
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# test_json_store.py
+# 测试JSON持久化层：并发修改不互相覆盖、写盘失败时保留修改并重试、权限文件通过文件锁写入
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.json_store import JsonStore
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_concurrent_updates_are_merged():
+    """同一文件的并发修改在锁内依次执行，全部写入"""
+    store = JsonStore(flush_delay=0.01)
+    path = os.path.join(tempfile.mkdtemp(), 'config.json')
+
+    async def add(i):
+        await asyncio.sleep(0)
+        await store.update(path, lambda data: data.setdefault('Admin', []).append(i), default={})
+
+    async def main():
+        await asyncio.gather(*(add(i) for i in range(20)))
+
+    asyncio.run(main())
+    assert sorted(_read(path)['Admin']) == list(range(20))
+
+
+def test_failed_write_stays_dirty_and_retries():
+    """写盘失败时缓存中的修改保留（dirty 不清除），flush_all() 重新写盘"""
+    store = JsonStore(flush_delay=0.01)
+    path = os.path.join(tempfile.mkdtemp(), 'config.json')
+    write_atomic = store._write_atomic
+    failures = [OSError("disk full")]
+
+    def flaky_write(key, content, entry):
+        if failures:
+            raise failures.pop()
+        write_atomic(key, content, entry)
+
+    store._write_atomic = flaky_write
+
+    async def main():
+        try:
+            await store.update(path, lambda data: data.update(value=1), default={})
+        except OSError:
+            pass
+        entry = store._entries[store._key(path)]
+        assert entry.dirty and not os.path.exists(path)
+        store.invalidate(path)  # 未写盘的修改不会被丢弃
+        assert store.get(path) == {'value': 1}
+        await store.flush_all()
+        assert not entry.dirty
+
+    asyncio.run(main())
+    assert _read(path) == {'value': 1}
+
+
+def test_update_sees_other_process_writes():
+    """另一个实例（模拟其他分片进程）写盘后，update() 基于磁盘上的最新内容修改"""
+    path = os.path.join(tempfile.mkdtemp(), 'shared.json')
+    first, second = JsonStore(flush_delay=0), JsonStore(flush_delay=0)
+
+    async def main():
+        await first.update(path, lambda data: data.append('first'), default=[])
+        await second.update(path, lambda data: data.append('second'), default=[])
+        # 两次写盘可能落在同一个修改时间刻度内，这里把修改时间往后调，模拟真实的间隔
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        await first.update(path, lambda data: data.append('third'), default=[])
+
+    asyncio.run(main())
+    assert _read(path) == ['first', 'second', 'third']
+
+
+def test_process_lock_serializes_updates():
+    """开启 process_lock 后，多个实例并发修改同一文件不会丢失修改"""
+    import threading
+    path = os.path.join(tempfile.mkdtemp(), 'counter.json')
+
+    def worker():
+        store = JsonStore()
+        store.process_lock = True
+
+        async def main():
+            for _ in range(30):
+                await store.update(path, lambda data: data.update(count=data.get('count', 0) + 1), default={})
+
+        asyncio.run(main())
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert _read(path) == {'count': 90}
+
+
+def test_missing_file_returns_callers_default():
+    """文件不存在时不缓存第一个调用方的默认值，每次读取返回本次传入的 default"""
+    store = JsonStore(flush_delay=0.01)
+    path = os.path.join(tempfile.mkdtemp(), 'group.json')
+    assert store.get(path) is None
+    assert store.get(path, default={}) == {}
+    assert store.load(path, default={'Admin': []}) == {'Admin': []}
+
+    async def main():
+        await store.update(path, lambda data: data.append(1), default=[])
+
+    asyncio.run(main())
+    assert store.get(path, default={}) == [1] and _read(path) == [1]
+
+
+def _permission_context(directory):
+    """把权限文件重定向到临时目录，返回 (上下文, 还原函数)"""
+    import commands.permission_manager as permission_manager
+
+    class StubContext:
+        def get_config_value(self, key, default=None):
+            return 10000 if key == 'Root_user' else default
+
+    original = permission_manager._permission_file
+    permission_manager._permission_file = lambda group_id: os.path.join(directory, f"{group_id}.json")
+
+    def restore():
+        permission_manager._permission_file = original
+
+    return StubContext(), restore
+
+
+def test_permissions_default_regardless_of_call_order():
+    """新群的权限配置：先读权限或先以 default={} 读群配置，都返回默认 Root/Admin 并创建文件"""
+    import commands.permission_manager as permission_manager
+    from core.json_store import json_store
+
+    for config_first in (False, True):
+        directory = tempfile.mkdtemp()
+        context, restore = _permission_context(directory)
+        path = os.path.join(directory, '100.json')
+
+        async def main():
+            if config_first:
+                # 黑名单过滤、加群审核等以 default={} 读取同一个群配置文件
+                assert json_store.get(path, default={}) == {}
+            assert permission_manager.load_permissions(context, '100') == {'Root': [10000], 'Admin': []}
+            await asyncio.sleep(0.2)
+            await json_store.flush_all()
+
+        try:
+            asyncio.run(main())
+        finally:
+            restore()
+        assert _read(path) == {'Root': [10000], 'Admin': []}
+
+
+def test_permissions_written_through_store():
+    """权限配置的修改和默认文件的创建都经过 json_store.update"""
+    import commands.permission_manager as permission_manager
+    from core.json_store import json_store
+
+    directory = tempfile.mkdtemp()
+    context, restore = _permission_context(directory)
+
+    async def main():
+        # 文件不存在：返回默认配置并在后台创建
+        assert permission_manager.check_permission(context, '200', '100') == 0
+        await asyncio.sleep(0.2)
+        await json_store.flush_all()
+        assert _read(os.path.join(directory, '100.json')) == {'Root': [10000], 'Admin': []}
+
+        def add_admin(permissions):
+            permissions['Admin'].append('200')
+            return True
+
+        assert await permission_manager.update_permissions(context, '100', add_admin)
+        assert permission_manager.check_permission(context, '200', '100') == 1
+
+    try:
+        asyncio.run(main())
+    finally:
+        restore()
+    assert _read(os.path.join(directory, '100.json'))['Admin'] == ['200']
+
+
+if __name__ == '__main__':
+    test_concurrent_updates_are_merged()
+    test_failed_write_stays_dirty_and_retries()
+    test_update_sees_other_process_writes()
+    test_process_lock_serializes_updates()
+    test_missing_file_returns_callers_default()
+    test_permissions_default_regardless_of_call_order()
+    test_permissions_written_through_store()
+    print("✓ 所有检查通过")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# test_message_codec.py
+# 测试消息段编解码：CQ码与消息段数组互转、转义，以及纯文本/@/回复/图片等字段
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.message_codec import ParsedMessage, escape, parse_cq, strip_cq, to_cq, unescape
+
+
+def test_cq_round_trip():
+    """CQ码解析为消息段后再编码得到原字符串，参数中的逗号和方括号被转义"""
+    text = "你好&#91;1&#93; [CQ:at,qq=123] [CQ:image,file=a&#44;b.jpg,url=http://x/y?a=1&amp;b=2]"
+    segments = parse_cq(text)
+    assert segments == [
+        {'type': 'text', 'data': {'text': '你好[1] '}},
+        {'type': 'at', 'data': {'qq': '123'}},
+        {'type': 'text', 'data': {'text': ' '}},
+        {'type': 'image', 'data': {'file': 'a,b.jpg', 'url': 'http://x/y?a=1&b=2'}},
+    ]
+    assert to_cq(segments) == text
+    assert unescape(escape("a,[b]&c", in_param=True)) == "a,[b]&c"
+    assert strip_cq("前[CQ:face,id=1]后") == "前后"
+
+
+def test_segment_fields():
+    """消息段数组的命令文本保留@，纯文本只含文本段"""
+    parsed = ParsedMessage([
+        {'type': 'reply', 'data': {'id': '42'}},
+        {'type': 'at', 'data': {'qq': '10001'}},
+        {'type': 'text', 'data': {'text': ' /help  '}},
+        {'type': 'image', 'data': {'file': 'f.jpg', 'url': 'http://img/1'}},
+        {'type': 'image', 'data': {'file': 'g.jpg'}},
+        {'type': 'at', 'data': {'qq': 'all'}},
+    ])
+    assert parsed.text == "[CQ:at,qq=10001]  /help   [CQ:at,qq=all]"
+    assert parsed.plain_text == "/help"
+    assert parsed.mentions == ['10001', 'all']
+    assert parsed.reply_id == '42'
+    assert parsed.image_urls == ['http://img/1', 'g.jpg']
+    assert parsed.cq.startswith("[CQ:reply,id=42][CQ:at,qq=10001]")
+
+
+def test_string_message_fields():
+    """字符串消息的命令文本保留CQ码并合并空白，字段按需解析"""
+    parsed = ParsedMessage("[CQ:reply,id=7]  /bad   top ")
+    assert parsed.text == "[CQ:reply,id=7] /bad top"
+    assert parsed.plain_text == "/bad   top"
+    assert parsed.reply_id == '7' and parsed.mentions == []
+    assert parsed.cq == "[CQ:reply,id=7]  /bad   top "
+
+    empty = ParsedMessage(None)
+    assert empty.text == "" and empty.segments == [] and empty.reply_id is None
+
+
+if __name__ == '__main__':
+    test_cq_round_trip()
+    test_segment_fields()
+    test_string_message_fields()
+    print("✓ 所有检查通过")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# test_message_pipeline.py
+# 测试消息管道：声明有误的处理器在加入时被跳过，不影响之后的消息处理
+
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.message_pipeline.message_context import MessageContext
+from core.message_pipeline.message_pipeline import MessagePipeline, validate_processor
+from core.message_pipeline.pipeline_stage import StageType
+from core.message_pipeline.processor import MessageProcessor
+from core.message_pipeline.processors.group_filters import AccountContextProcessor
+from core.message_pipeline.stages.post_process_stage import PostProcessStage
+from core.message_pipeline.stages.pre_process_stage import PreProcessStage
+from harness.events import group_message
+
+
+class RecordingProcessor(MessageProcessor):
+    """记录收到的消息，不终止处理"""
+
+    def __init__(self, name, requires=(), message_types=()):
+        super().__init__(name, priority=10)
+        self.requires = requires
+        self.message_types = message_types
+        self.seen = 0
+
+    async def process(self, context):
+        self.seen += 1
+        return False
+
+
+class StubCoreContext:
+    """调用 should_handle_message 即视为重复判断"""
+
+    def should_handle_message(self, event, account_id):
+        raise AssertionError("是否由本账号处理已在 MessageRouter 中判断")
+
+
+def _pipeline():
+    pipeline = MessagePipeline()
+    pipeline.add_stage(PreProcessStage())
+    return pipeline
+
+
+def test_validate_processor():
+    """requires 必须是已知的按需字段，message_types 必须是 group/private 组成的元组"""
+    assert validate_processor(RecordingProcessor('ok', requires=('text',), message_types=('group',))) is None
+    assert 'requires' in validate_processor(RecordingProcessor('bad', requires=('unknown_field',)))
+    assert 'message_types' in validate_processor(RecordingProcessor('bad', message_types='group'))
+    assert 'message_types' in validate_processor(RecordingProcessor('bad', message_types=('channel',)))
+
+
+def test_invalid_processors_skipped():
+    """add_processor/add_stage 跳过声明有误的处理器，之后的消息照常处理"""
+    pipeline = _pipeline()
+    good = RecordingProcessor('good', requires=('text',))
+    assert pipeline.add_processor(StageType.PRE_PROCESS, good)
+    assert not pipeline.add_processor(StageType.PRE_PROCESS, RecordingProcessor('bad', requires=('unknown_field',)))
+
+    stage = PostProcessStage()
+    stage.add_processor(RecordingProcessor('bad_types', message_types='group'))
+    stage.add_processor(RecordingProcessor('post'))
+    pipeline.add_stage(stage)
+    assert [p.name for p in stage.processors] == ['post']
+
+    async def main():
+        for _ in range(2):
+            context = MessageContext(None, dict(group_message(100, 200, 'hello'), _account_id=1))
+            await pipeline.process_message(context)
+
+    asyncio.run(main())
+    assert good.seen == 2
+
+
+def test_account_context_does_not_recheck():
+    """AccountContextProcessor 只记录处理账号，不再重复 should_handle_message"""
+    from core.current_account import get_current_account_id
+
+    async def main():
+        context = MessageContext(StubCoreContext(), dict(group_message(100, 200, 'hello'), _account_id=2))
+        assert await AccountContextProcessor().process(context) is False
+        return get_current_account_id()
+
+    assert asyncio.run(main()) == 2
+
+
+if __name__ == '__main__':
+    test_validate_processor()
+    test_invalid_processors_skipped()
+    test_account_context_does_not_recheck()
+    print("✓ 所有检查通过")
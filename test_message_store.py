@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# test_message_store.py
+# 测试本地消息历史：多账号 message_id 重复时按账号区分
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import core.message_store as message_store_module
+from core.message_store import MessageStore, fetch_message
+
+
+def _event(self_id, message_id, user_id, text):
+    return {'post_type': 'message', 'message_type': 'group', 'self_id': self_id, 'message_id': message_id,
+            'group_id': 100, 'user_id': user_id, 'time': 1000, 'raw_message': text,
+            'message': [{'type': 'text', 'data': {'text': text}}], 'sender': {'user_id': user_id}}
+
+
+class StubContext:
+    """只提供账号查询的上下文"""
+
+    def get_account_by_id(self, account_id):
+        return {1: {'id': 1, 'bot_qq': 10001}, 2: {'id': 2, 'bot_qq': 10002}}.get(account_id)
+
+    def get_active_account(self):
+        return self.get_account_by_id(1)
+
+
+def test_cache_keyed_by_account():
+    """两个账号的消息ID相同时，各自查到自己收到的消息"""
+    store = MessageStore()
+    store.record_event(_event(10001, 5, 111, 'from account 1'))
+    store.record_event(_event(10002, 5, 222, 'from account 2'))
+
+    async def main():
+        first = await store.get(5, self_id=10001)
+        second = await store.get(5, self_id='10002')
+        missing = await store.get(5, self_id=10003)
+        return first, second, missing
+
+    first, second, missing = asyncio.run(main())
+    assert first['user_id'] == 111 and second['user_id'] == 222
+    assert missing is None
+
+
+def test_database_keyed_by_account():
+    """写入数据库后（缓存已淘汰）仍按账号区分"""
+    directory = tempfile.mkdtemp()
+
+    async def main():
+        store = MessageStore()
+        store.configure({'db_path': os.path.join(directory, 'history.db'), 'cache_size': 0})
+        await store.start()
+        try:
+            store.record_event(_event(10001, 7, 111, 'a'))
+            store.record_event(_event(10002, 7, 222, 'b'))
+            await store._flush()
+            return (await store.get(7, self_id=10001), await store.get(7, self_id=10002),
+                    await store.get(7, self_id=10003))
+        finally:
+            await store.close()
+
+    first, second, missing = asyncio.run(main())
+    assert first['raw_message'] == 'a' and second['raw_message'] == 'b'
+    assert missing is None
+
+
+def test_fetch_message_uses_account():
+    """fetch_message 按 account_id 对应的机器人QQ号查询本地历史"""
+    store = MessageStore()
+    store.record_event(_event(10001, 9, 111, 'one'))
+    store.record_event(_event(10002, 9, 222, 'two'))
+    original = message_store_module.message_store
+    message_store_module.message_store = store
+    try:
+        record = asyncio.run(fetch_message(StubContext(), 9, account_id=2))
+    finally:
+        message_store_module.message_store = original
+    assert record['user_id'] == 222
+
+
+def test_outgoing_payloads_compacted():
+    """出站消息中的 base64 图片替换为占位符，过长的文本截断到500字"""
+    store = MessageStore()
+    image = 'base64://' + 'A' * 4000
+    store.record_outgoing('send_group_msg', {'group_id': 100, 'message': [
+        {'type': 'image', 'data': {'file': image}},
+        {'type': 'text', 'data': {'text': '长' * 800}},
+    ]}, 7, self_id=10001)
+    store.record_outgoing('send_private_msg', {'user_id': 222, 'message': f"看图[CQ:image,file={image}]"}, 8,
+                          self_id=10001)
+
+    async def main():
+        return await store.get(7, self_id=10001), await store.get(8, self_id=10001)
+
+    group, private = asyncio.run(main())
+    assert group['message'][0]['data']['file'] == 'base64://<4000 bytes>'
+    assert len(group['message'][1]['data']['text']) == 500 and len(group['raw_message']) == 500
+    assert private['message'] == "看图[CQ:image,file=base64://<4000 bytes>]"
+    assert private['raw_message'] == private['message']
+
+
+if __name__ == '__main__':
+    test_cache_keyed_by_account()
+    test_database_keyed_by_account()
+    test_fetch_message_uses_account()
+    test_outgoing_payloads_compacted()
+    print("✓ 所有检查通过")
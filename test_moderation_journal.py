@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# test_moderation_journal.py
+# 测试管理事件日志：写入日期文件、按条件查询、clear_recent 之后仍能查到完整历史、统计只查询一次
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.moderation_journal import ModerationJournal
+
+
+def _journal(**settings):
+    journal = ModerationJournal()
+    journal.configure(dict({'dir': tempfile.mkdtemp(), 'flush_interval': 0.05}, **settings))
+    return journal
+
+
+def test_query_reads_files_and_pending():
+    """超出环形缓冲区的记录从日期文件查询，未写盘的记录也能查到"""
+    async def main():
+        journal = _journal(recent_size=2)
+        await journal.start()
+        try:
+            for i in range(4):
+                journal.record('sensitive', 100, 200 + i, word='坏词', message=f'm{i}', action='recall')
+            await journal._flush()
+            journal.record('spam', 100, 300, word='flood')
+            since = time.time() - 60
+            assert [e['user_id'] for e in await journal.query(kind='sensitive', since=since)] == \
+                ['203', '202', '201', '200']
+            assert [e['user_id'] for e in await journal.query(since=since, limit=2)] == ['300', '203']
+            assert [e['message'] for e in await journal.query(user_id=201, since=since)] == ['m1']
+            assert os.listdir(journal._dir())
+        finally:
+            await journal.close()
+
+    asyncio.run(main())
+
+
+def test_clear_recent_does_not_hide_history():
+    """clear_recent(kind) 之后，该类型（以及全部类型）的查询改为读取文件，其他类型仍从内存返回"""
+    async def main():
+        journal = _journal()
+        await journal.start()
+        try:
+            spam_since = journal.record('spam', 100, 300, word='flood')['timestamp']
+            since = journal.record('sensitive', 100, 200, word='坏词')['timestamp']
+            await journal._flush()
+            assert journal._covers('sensitive', since)
+            journal.clear_recent('sensitive')
+            # 缓冲区中最早的一条仍早于 since，但被清除的 sensitive 记录只在文件中
+            assert journal.recent(kind='sensitive') == []
+            assert len(await journal.query(kind='sensitive', since=since)) == 1
+            assert len(await journal.query(since=spam_since)) == 2
+            assert journal._covers('spam', spam_since)
+            assert not journal._covers('sensitive', since) and not journal._covers(None, spam_since)
+        finally:
+            await journal.close()
+
+    asyncio.run(main())
+
+
+def test_top_queries_once():
+    """top() 一次查询同时统计触发最多的词和用户"""
+    async def main():
+        journal = _journal()
+        await journal.start()
+        calls = []
+        query = journal.query
+
+        async def counting_query(**kwargs):
+            calls.append(kwargs)
+            return await query(**kwargs)
+
+        journal.query = counting_query
+        try:
+            for user_id, word in ((1, 'a'), (1, 'a'), (2, 'b')):
+                journal.record('sensitive', 100, user_id, word=word)
+            return await journal.top(1, kind='sensitive', since=0), calls
+        finally:
+            await journal.close()
+
+    (words, offenders), calls = asyncio.run(main())
+    assert words == [('a', 2)] and offenders == [(('100', '1'), 2)]
+    assert len(calls) == 1
+
+
+if __name__ == '__main__':
+    test_query_reads_files_and_pending()
+    test_clear_recent_does_not_hide_history()
+    test_top_queries_once()
+    print("✓ 所有检查通过")
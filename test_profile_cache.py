@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# test_profile_cache.py
+# 测试用户资料与群成员缓存：TTL与容量淘汰、并发查询合并、批量获取昵称、通知事件更新缓存
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.profile_cache import ProfileCache, TTLCache
+
+
+class StubApi:
+    """记录调用次数的 OneBot 接口，返回的昵称为 nick-<QQ号>"""
+
+    def __init__(self, members=()):
+        self.calls = []
+        self.members = list(members)
+
+    async def __call__(self, context, action, params, account_id=None):
+        self.calls.append((action, params.get('user_id', params.get('group_id'))))
+        await asyncio.sleep(0.01)
+        if action == 'get_stranger_info':
+            return {'user_id': params['user_id'], 'nickname': f"nick-{params['user_id']}"}
+        if action == 'get_group_member_list':
+            return [dict(member) for member in self.members]
+        return None
+
+
+def _cache(api):
+    cache = ProfileCache()
+    cache._call = api
+    return cache
+
+
+def test_ttl_cache_expiry_and_lru():
+    """过期条目读取时删除，超出容量时淘汰最久未使用的条目"""
+    cache = TTLCache(ttl=0.05, max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # a 变为最近使用
+    cache.set('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and len(cache) == 2
+    time.sleep(0.06)
+    assert cache.get('a') is None and cache.get('c') is None and len(cache) == 0
+
+    cache = TTLCache(ttl=60, max_size=10)
+    cache.set(('1', 'x'), 1)
+    cache.set(('2', 'y'), 2)
+    cache.pop_where(lambda key: key[0] == '1')
+    assert cache.get(('1', 'x')) is None and cache.get(('2', 'y')) == 2
+
+
+def test_concurrent_lookups_coalesced():
+    """同一用户的并发查询只请求一次，之后从缓存返回"""
+    api = StubApi()
+    cache = _cache(api)
+
+    async def main():
+        results = await asyncio.gather(*(cache.get_user(None, 10) for _ in range(5)))
+        assert all(result['nickname'] == 'nick-10' for result in results)
+        await cache.get_user(None, '10')
+
+    asyncio.run(main())
+    assert api.calls == [('get_stranger_info', 10)]
+
+
+def test_batch_nicknames():
+    """批量获取昵称时每个用户只请求一次，查询失败的用户使用QQ号"""
+    import utils.user_utils as user_utils
+    api = StubApi()
+    cache = _cache(api)
+
+    async def failing_or_api(context, action, params, account_id=None):
+        if params.get('user_id') == 3:
+            return None
+        return await api(context, action, params, account_id)
+
+    cache._call = failing_or_api
+    original = user_utils.profile_cache
+    user_utils.profile_cache = cache
+    try:
+        nicknames = asyncio.run(user_utils.get_user_nicknames(None, [1, '2', 1, 3]))
+    finally:
+        user_utils.profile_cache = original
+    assert nicknames == {'1': 'nick-1', '2': 'nick-2', '3': '3'}
+    assert sorted(api.calls) == [('get_stranger_info', 1), ('get_stranger_info', 2)]
+
+
+def test_notices_update_member_list():
+    """退群从缓存的成员列表中移除，改名片和设管理员就地更新，进群使成员列表失效"""
+    api = StubApi(members=[{'user_id': 1, 'card': 'a', 'role': 'member'},
+                           {'user_id': 2, 'card': 'b', 'role': 'member'}])
+    cache = _cache(api)
+
+    async def main():
+        await cache.get_member_list(None, 100)
+        cache.handle_notice({'notice_type': 'group_decrease', 'sub_type': 'leave', 'group_id': 100, 'user_id': 1})
+        cache.handle_notice({'notice_type': 'group_card', 'group_id': 100, 'user_id': 2, 'card_new': 'bb'})
+        cache.handle_notice({'notice_type': 'group_admin', 'sub_type': 'set', 'group_id': 100, 'user_id': 2})
+        members = await cache.get_member_list(None, 100)
+        assert members == [{'user_id': 2, 'card': 'bb', 'role': 'admin'}]
+        assert (await cache.get_member(None, 100, 2))['card'] == 'bb'
+        assert len(api.calls) == 1
+
+        cache.handle_notice({'notice_type': 'group_increase', 'group_id': 100, 'user_id': 3})
+        await cache.get_member_list(None, 100)
+        assert len(api.calls) == 2
+
+    asyncio.run(main())
+
+
+if __name__ == '__main__':
+    test_ttl_cache_expiry_and_lru()
+    test_concurrent_lookups_coalesced()
+    test_batch_nicknames()
+    test_notices_update_member_list()
+    print("✓ 所有检查通过")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# test_shutdown.py
+# 测试退出排空：等待处理中的事件和API调用，定时器任务直接取消，可提前唤醒的等待立即执行
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.shutdown import ShutdownManager
+from utils.task_utils import create_monitored_task, get_drain_tasks, get_timer_tasks
+
+
+def test_drain_cancels_timers():
+    """排空等待事件和普通后台任务，长时间的定时器任务被取消而不是拖到超时"""
+    log = []
+
+    async def main():
+        manager = ShutdownManager()
+        manager.bind(asyncio.get_running_loop())
+        manager.configure({'drain_timeout': 5})
+
+        async def handle_event():
+            async with manager.track():
+                await asyncio.sleep(0.2)
+                # 事件处理过程中创建的API调用也要等待
+                create_monitored_task(api_call(), name='api_call')
+
+        async def api_call():
+            await asyncio.sleep(0.1)
+            log.append('api')
+
+        async def timer():
+            try:
+                await asyncio.sleep(3600)
+                log.append('timer fired')
+            except asyncio.CancelledError:
+                log.append('timer cancelled')
+                raise
+
+        async def recall():
+            await manager.sleep(3600)
+            log.append('recall')
+
+        asyncio.create_task(handle_event())
+        create_monitored_task(timer(), name='timer', timer=True)
+        create_monitored_task(recall(), name='recall')
+        await asyncio.sleep(0.05)
+
+        manager.request(reason='test')
+        started = time.monotonic()
+        unfinished = await manager.drain(get_drain_tasks, get_timer_tasks)
+        return unfinished, time.monotonic() - started
+
+    unfinished, elapsed = asyncio.run(main())
+    assert unfinished == 0 and elapsed < 2
+    assert sorted(log) == ['api', 'recall', 'timer cancelled']
+
+
+if __name__ == '__main__':
+    test_drain_cancels_timers()
+    print("✓ 所有检查通过")
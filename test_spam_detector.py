@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# test_spam_detector.py
+# 测试刷屏检测：近似重复指纹、各规则的触发条件、窗口过期、处理冷却和配置合并
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.spam_detector import (SpamDetector, fingerprint, RULE_DUPLICATE, RULE_FLOOD, RULE_GROUP_DUPLICATE,
+                                RULE_GROUP_FLOOD, RULE_MENTIONS)
+
+
+def test_fingerprint_matches_variants():
+    """插入标点、改数字、改大小写的变体指纹相同，过短的消息不计算指纹"""
+    assert fingerprint("加群领红包 速来") == fingerprint("加群，领红包!!速来 123")
+    assert fingerprint("Free Gift Here") == fingerprint("free-gift_here 2")
+    assert fingerprint("加群领红包速来") != fingerprint("今天天气不错")
+    assert fingerprint("哈哈") is None and fingerprint("+1 !!") is None
+
+
+def test_user_rules():
+    """单个用户发送过快、重复内容、@人数过多分别命中对应规则"""
+    detector = SpamDetector()
+    detector.configure({'user_max_messages': 3, 'duplicate_max': 2})
+    texts = ["第一条消息内容", "换个新的话题", "再问一个问题", "完全无关的事"]
+    assert [detector.check(1, 10, text, now=i * 0.1) for i, text in enumerate(texts)] == [None, None, None, RULE_FLOOD]
+
+    detector.reset()
+    results = [detector.check(1, 10, "一模一样的内容", now=i * 5) for i in range(3)]
+    assert results == [None, None, RULE_DUPLICATE]
+
+    assert detector.check(1, 11, "看这里", mentions=list(range(6)), now=100) == RULE_MENTIONS
+
+
+def test_windows_expire():
+    """超出窗口时间的消息不再计数"""
+    detector = SpamDetector()
+    detector.configure({'user_max_messages': 2, 'user_window': 10, 'duplicate_max': 1, 'duplicate_window': 30})
+    assert detector.check(1, 10, "重复的一句话", now=0) is None
+    assert detector.check(1, 10, "另外一句话呀", now=11) is None
+    assert detector.check(1, 10, "第三句话来了", now=12) is None
+    assert detector.check(1, 10, "重复的一句话", now=31) is None
+    assert detector.check(1, 10, "重复的一句话", now=32) == RULE_DUPLICATE
+
+
+def test_group_rules():
+    """多人发送相同内容、群消息总量过大按群统计"""
+    detector = SpamDetector()
+    detector.configure({'group_duplicate_max': 3, 'group_max_messages': 5})
+    results = [detector.check(1, user_id, "统一的广告文案", now=user_id) for user_id in range(4)]
+    assert results == [None, None, None, RULE_GROUP_DUPLICATE]
+    assert detector.check(2, 1, "别的群的消息", now=0) is None
+
+    detector.reset(1)
+    texts = ["早上好呀各位", "今天吃什么呢", "有人打游戏吗", "作业写完了吗", "下午去哪里玩", "晚上一起看剧"]
+    results = [detector.check(1, user_id, text, now=user_id * 0.1) for user_id, text in enumerate(texts)]
+    assert results[-1] == RULE_GROUP_FLOOD and results[:-1] == [None] * 5
+
+
+def test_action_cooldown_and_config():
+    """warn/mute 冷却期内只处理一次；未知规则和无效动作被忽略"""
+    detector = SpamDetector()
+    detector.configure({'action_cooldown': 60, 'actions': {'flood': 'warn', 'duplicate': ['mute', 'explode'],
+                                                           'unknown': ['warn']}})
+    assert detector.actions_for(RULE_FLOOD) == ['warn']
+    assert detector.actions_for(RULE_DUPLICATE) == ['mute']
+    assert detector.actions_for(RULE_MENTIONS) == ['recall', 'warn']
+
+    detector.check(1, 10, "随便说点什么", now=0)
+    assert detector.claim_action(1, 10, now=1)
+    assert not detector.claim_action(1, 10, now=30)
+    assert detector.claim_action(1, 10, now=62)
+
+
+def test_tracked_users_bounded():
+    """跟踪的用户数超过上限时淘汰最久未发言的"""
+    detector = SpamDetector()
+    detector.configure({'max_tracked_users': 3})
+    for user_id in range(5):
+        detector.check(1, user_id, "你好你好呀", now=user_id)
+    assert detector.tracked_users == 3
+
+
+if __name__ == '__main__':
+    test_fingerprint_matches_variants()
+    test_user_rules()
+    test_windows_expire()
+    test_group_rules()
+    test_action_cooldown_and_config()
+    test_tracked_users_bounded()
+    print("✓ 所有检查通过")
@@ -2,9 +2,12 @@
 # 重构后的API调用工具，统一返回格式
 
 import asyncio
+import time
 import aiohttp
 from typing import Dict, Any, Optional
 from logger_config import get_logger, log_exception, log_api_request
+from core.metrics import API_CALL_SECONDS
+from core.tracing import tracer
 
 logger = get_logger("ApiUtils")
 
@@ -18,7 +21,7 @@ async def safe_api_request(url: str, method: str = 'get', params: dict = None, j
     :param headers: 请求头
     :param timeout: 超时时间(秒)，如果为None且提供了context，则从配置读取
     :param context: BotContext对象，用于获取配置中的默认超时设置
-    :return: 响应数据(字典)或None(失败)
+    :return: 响应数据(字典)或None(失败)；超时和网络错误时带有 transport_error=True，与接口返回的业务错误区分
     """
     try:
         # 如果未指定超时时间但提供了context，尝试从配置读取默认超时
@@ -49,10 +52,10 @@ async def safe_api_request(url: str, method: str = 'get', params: dict = None, j
                 return None
     except asyncio.TimeoutError:
         log_exception(logger, f"API请求超时", Exception(f"请求 {url} 超时 ({timeout}秒)"))
-        return {"success": False, "error": f"请求超时 ({timeout}秒)"}
+        return {"success": False, "error": f"请求超时 ({timeout}秒)", "transport_error": True}
     except aiohttp.ClientError as e:
         log_exception(logger, f"网络请求异常: {url}", e)
-        return {"success": False, "error": f"网络错误: {str(e)}"}
+        return {"success": False, "error": f"网络错误: {str(e)}", "transport_error": True}
     except Exception as e:
         log_exception(logger, f"API处理异常: {url}", e)
         return {"success": False, "error": f"未知错误: {str(e)}"}
@@ -173,7 +176,17 @@ async def call_onebot_api(context: Any, action, params=None, account_id: int = N
     logger.debug(f"onebot API原始请求负载: {redacted_payload}")
     
     # 发送请求
-    response = await safe_api_request(**request_payload, context=context)
+    started = time.perf_counter()
+    async with tracer.span(f'api.{action}'):
+        response = await safe_api_request(**request_payload, context=context)
+    succeeded = bool(response and response.get('success'))
+    API_CALL_SECONDS.labels(action, 'ok' if succeeded else 'error').observe(time.perf_counter() - started)
+    
+    # 把调用结果计入对应连接的错误率，用于健康状态判断；只有超时和网络错误算作失败，
+    # 接口返回的业务错误（无权限、参数错误等）说明连接本身可用
+    ws_manager = getattr(context, 'multi_ws_manager', None)
+    if ws_manager is not None and hasattr(ws_manager, 'record_api_result'):
+        ws_manager.record_api_result(account_id, not (response and response.get('transport_error')))
     
     # 添加Debug级别日志，记录响应详情
     if response:
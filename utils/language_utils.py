@@ -1,6 +1,9 @@
 import aiohttp
+import asyncio
 import logging
+import time
 from logger_config import get_logger
+from core.metrics import LLM_REQUEST_SECONDS
 
 logger = get_logger("LanguageUtils")
 
@@ -41,6 +44,8 @@ class AILanguageClient:
         """
         # 注意：这个方法没有context参数，无法直接检查全局开关
         # 需要在调用此方法前检查开关状态
+        started = time.perf_counter()
+        status = 'error'
         try:
             payload = {
                 "model": self.model,
@@ -67,7 +72,12 @@ class AILanguageClient:
                         logger.error(f"AI响应缺少message/content: {choice}")
                         raise ValueError("Invalid AI response: missing 'message.content'")
                     
+                    status = 'ok'
                     return choice["message"]["content"].strip()
+        except asyncio.TimeoutError:
+            status = 'timeout'
+            logger.error("AI语言模型API调用超时")
+            raise
         except aiohttp.ClientError as e:
             logger.error(f"AI语言模型API调用失败 (网络/HTTP): {str(e)}")
             raise
@@ -77,6 +87,8 @@ class AILanguageClient:
         except Exception as e:
             logger.error(f"AI语言模型处理失败 (未知错误): {str(e)}")
             raise
+        finally:
+            LLM_REQUEST_SECONDS.labels(self.model, status).observe(time.perf_counter() - started)
 
     async def select_relevant_items(self, question: str, items: list, item_type: str = "答案") -> list:
         """
@@ -0,0 +1,166 @@
+# utils/message_codec.py
+# 消息段编解码：CQ码字符串与OneBot消息段数组互相转换，并提供纯文本、@、回复、图片等常用字段
+#
+# 每个事件只解析一次（MessageEvent.parsed），命令匹配、敏感词检测、日志和图片识别共用同一个 ParsedMessage
+
+import re
+from typing import Any, List, Optional, Union
+
+# [CQ:类型,键=值,...]，值中的 , [ ] & 已转义
+CQ_CODE_PATTERN = re.compile(r'\[CQ:([^,\]]+)((?:,[^,\]]*)*)\]')
+AT_PATTERN = re.compile(r'\[CQ:at,qq=(\d+)\]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def escape(text: str, in_param: bool = False) -> str:
+    """转义CQ码中的特殊字符，in_param 为 True 时同时转义逗号"""
+    text = text.replace('&', '&amp;').replace('[', '&#91;').replace(']', '&#93;')
+    if in_param:
+        text = text.replace(',', '&#44;')
+    return text
+
+def unescape(text: str) -> str:
+    """还原CQ码中转义的字符"""
+    if '&' not in text:
+        return text
+    return text.replace('&#44;', ',').replace('&#91;', '[').replace('&#93;', ']').replace('&amp;', '&')
+
+def parse_cq(text: str) -> List[dict]:
+    """把CQ码字符串解析为消息段数组"""
+    segments = []
+    position = 0
+    for match in CQ_CODE_PATTERN.finditer(text):
+        if match.start() > position:
+            segments.append({'type': 'text', 'data': {'text': unescape(text[position:match.start()])}})
+        data = {}
+        for param in match.group(2).split(',')[1:]:
+            key, _, value = param.partition('=')
+            data[key] = unescape(value)
+        segments.append({'type': match.group(1), 'data': data})
+        position = match.end()
+    if position < len(text):
+        segments.append({'type': 'text', 'data': {'text': unescape(text[position:])}})
+    return segments
+
+def to_cq(segments: List[dict]) -> str:
+    """把消息段数组编码为CQ码字符串"""
+    parts = []
+    for segment in segments:
+        seg_type = segment.get('type')
+        data = segment.get('data') or {}
+        if seg_type == 'text':
+            parts.append(escape(str(data.get('text', ''))))
+        else:
+            params = ''.join(f",{key}={escape(str(value), True)}" for key, value in data.items())
+            parts.append(f"[CQ:{seg_type}{params}]")
+    return ''.join(parts)
+
+def normalize(message: Union[str, List[dict], None]) -> List[dict]:
+    """统一为消息段数组"""
+    if isinstance(message, list):
+        return message
+    if isinstance(message, str) and message:
+        return parse_cq(message)
+    return []
+
+def strip_cq(text: str) -> str:
+    """移除所有CQ码"""
+    return CQ_CODE_PATTERN.sub('', text)
+
+class ParsedMessage:
+    """一条消息的解析结果，各字段在第一次访问时计算并缓存"""
+
+    __slots__ = ('message', '_segments', '_text', '_plain_text', '_mentions', '_reply_id', '_image_urls')
+
+    _UNSET = object()
+
+    def __init__(self, message: Union[str, List[dict], None]):
+        self.message = message if message is not None else ''
+        self._segments = None
+        self._text = None
+        self._plain_text = None
+        self._mentions = None
+        self._reply_id = self._UNSET
+        self._image_urls = None
+
+    @property
+    def segments(self) -> List[dict]:
+        if self._segments is None:
+            self._segments = normalize(self.message)
+        return self._segments
+
+    @property
+    def text(self) -> str:
+        """用于命令匹配的文本：文本段和@（保留为CQ码）以空格连接；字符串消息保留CQ码并合并空白"""
+        if self._text is None:
+            message = self.message
+            if isinstance(message, str):
+                self._text = WHITESPACE_PATTERN.sub(' ', message.strip())
+            else:
+                parts = []
+                for segment in self.segments:
+                    if not isinstance(segment, dict):
+                        continue
+                    seg_type = segment.get('type')
+                    if seg_type == 'text':
+                        parts.append(str(segment.get('data', {}).get('text', '')))
+                    elif seg_type == 'at':
+                        parts.append(f"[CQ:at,qq={segment.get('data', {}).get('qq', '')}]")
+                self._text = ' '.join(parts).strip()
+        return self._text
+
+    @property
+    def plain_text(self) -> str:
+        """只包含文本段的纯文本（不含任何CQ码）"""
+        if self._plain_text is None:
+            parts = [str(segment.get('data', {}).get('text', '')) for segment in self.segments
+                     if isinstance(segment, dict) and segment.get('type') == 'text']
+            self._plain_text = ''.join(parts).strip()
+        return self._plain_text
+
+    @property
+    def mentions(self) -> List[str]:
+        """被@的QQ号（包括 all）"""
+        if self._mentions is None:
+            self._mentions = [str(segment.get('data', {}).get('qq', '')) for segment in self.segments
+                              if isinstance(segment, dict) and segment.get('type') == 'at']
+        return self._mentions
+
+    @property
+    def reply_id(self) -> Optional[Any]:
+        """引用的消息ID，没有引用时为None"""
+        if self._reply_id is self._UNSET:
+            self._reply_id = None
+            for segment in self.segments:
+                if isinstance(segment, dict) and segment.get('type') == 'reply':
+                    self._reply_id = segment.get('data', {}).get('id')
+                    break
+        return self._reply_id
+
+    @property
+    def image_urls(self) -> List[str]:
+        """图片URL（OneBot不同实现的字段可能是url或file）"""
+        if self._image_urls is None:
+            urls = []
+            for segment in self.segments:
+                if isinstance(segment, dict) and segment.get('type') == 'image':
+                    data = segment.get('data') or {}
+                    url = data.get('url') or data.get('file')
+                    if url:
+                        urls.append(url)
+            self._image_urls = urls
+        return self._image_urls
+
+    @property
+    def cq(self) -> str:
+        """CQ码字符串形式"""
+        if isinstance(self.message, str):
+            return self.message
+        return to_cq(self.segments)
+
+def parse(message: Union[str, List[dict], None]) -> ParsedMessage:
+    """解析消息（CQ码字符串或消息段数组）"""
+    return ParsedMessage(message)
+
+def reply_id(message: Union[str, List[dict], None]) -> Optional[Any]:
+    """引用的消息ID，没有引用时为None"""
+    return ParsedMessage(message).reply_id
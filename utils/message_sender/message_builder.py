@@ -2,12 +2,13 @@
 # 消息构建器类
 
 import json
-import asyncio
 from typing import Optional, Dict, Any, Callable, List
 from logger_config import get_logger
 from core.bot_context import BotContext
 from core.current_account import get_current_account_id
 from utils.api_utils import call_onebot_api
+from utils.task_utils import create_monitored_task
+from core.shutdown import shutdown_manager
 
 logger = get_logger("MessageBuilder")
 
@@ -136,10 +137,10 @@ class MessageBuilder:
             if self.auto_recall_seconds:
                 logger.info(f"消息 {message_id} 将在 {self.auto_recall_seconds} 秒后自动撤回")
                 
-                # 创建后台任务执行撤回
+                # 创建后台任务执行撤回；退出排空时不再等满时间，立即撤回
                 async def recall_task():
                     try:
-                        await asyncio.sleep(self.auto_recall_seconds)
+                        await shutdown_manager.sleep(self.auto_recall_seconds)
                         recall_result = await call_onebot_api(
                             context=self.context,
                             action="delete_msg",
@@ -153,8 +154,8 @@ class MessageBuilder:
                     except Exception as e:
                         logger.error(f"执行自动撤回时发生错误: {e}")
                 
-                # 创建并启动后台任务
-                asyncio.create_task(recall_task())
+                # 创建并启动受监控的后台任务，退出时会等待其完成
+                create_monitored_task(recall_task(), name=f"AutoRecall_{message_id}")
         
         # 使用BotContext的send_group_message方法发送消息
         # 这样可以获取真实的消息ID
@@ -3,6 +3,7 @@
 
 import os
 import time
+import asyncio
 import json
 from datetime import datetime
 from logger_config import get_logger
@@ -99,7 +100,6 @@ class SensitiveWordReporter:
         try:
             # 确定日志文件路径
             log_dir = os.path.join(os.path.dirname(__file__), '..', 'lg')
-            os.makedirs(log_dir, exist_ok=True)
             log_file = os.path.join(log_dir, 'bad-word.log')
             
             # 构建报告数据
@@ -119,9 +119,10 @@ class SensitiveWordReporter:
             if additional_info:
                 report_data.update(additional_info)
             
-            # 写入日志文件
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(report_data, ensure_ascii=False) + '\n')
+            # 在线程池中写入日志文件，避免阻塞事件循环
+            line = json.dumps(report_data, ensure_ascii=False) + '\n'
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, SensitiveWordReporter._append_line, log_dir, log_file, line)
             
             logger.info(f"已写入敏感词报告到文件: {log_file}")
             return True
@@ -130,6 +131,12 @@ class SensitiveWordReporter:
             logger.error(f"写入敏感词报告到文件失败: {str(e)}")
             return False
 
+    @staticmethod
+    def _append_line(log_dir: str, log_file: str, line: str):
+        os.makedirs(log_dir, exist_ok=True)
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write(line)
+
 # 保持向后兼容的函数接口
 async def send_sensitive_report(context: BotContext, group_id: str, user_id: str,
                                message: str, sensitive_word: str, recalled: bool = False) -> bool:
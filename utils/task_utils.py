@@ -9,23 +9,29 @@ logger = get_logger("TaskUtils")
 
 # 存储所有创建的任务引用，防止被垃圾回收
 _background_tasks = set()
+# 其中的定时器任务（长时间等待后才执行，状态另有保存），退出时直接取消，不等待
+_timer_tasks = set()
 
-def create_monitored_task(coro, name: str = "Unnamed Task"):
+def create_monitored_task(coro, name: str = "Unnamed Task", timer: bool = False):
     """
     创建一个受监控的后台任务
     
     :param coro: 协程对象
     :param name: 任务名称
+    :param timer: 是否为定时器任务；退出排空时只等待普通任务，定时器任务被取消
     :return: Task对象
     """
     task = asyncio.create_task(coro, name=name)
     
     # 添加到集合中防止被垃圾回收
     _background_tasks.add(task)
+    if timer:
+        _timer_tasks.add(task)
     
     # 添加回调以在任务完成时从集合中移除
     def task_done_callback(task):
         _background_tasks.discard(task)
+        _timer_tasks.discard(task)
         try:
             if task.exception():
                 logger.error(f"后台任务 '{name}' 发生未处理异常: {task.exception()}")
@@ -39,6 +45,21 @@ def create_monitored_task(coro, name: str = "Unnamed Task"):
     return task
 
 
+def get_background_tasks():
+    """返回当前所有受监控后台任务的快照"""
+    return set(_background_tasks)
+
+
+def get_drain_tasks():
+    """退出排空时需要等待的后台任务快照（处理中的API调用等，不含定时器任务）"""
+    return _background_tasks - _timer_tasks
+
+
+def get_timer_tasks():
+    """退出时直接取消的定时器任务快照"""
+    return set(_timer_tasks)
+
+
 
 # 初始化时启动后台任务
 def start_background_tasks():
@@ -1,28 +1,36 @@
 # utils/user_utils.py
 # 提供获取用户昵称等与用户相关的工具函数
 
+from typing import Dict, Iterable
 from logger_config import get_logger
 from core.bot_context import BotContext
+from core.profile_cache import profile_cache
 
 logger = get_logger("UserUtils")
 
 async def get_user_nickname(context: BotContext, user_id: str, account_id: int = None) -> str:
-    """获取用户昵称
-    
+    """获取用户昵称（经资料缓存，相同用户在缓存有效期内不会重复请求）
+
     Args:
         context: BotContext 对象
         user_id: 用户 QQ 号
         account_id: 指定账号 ID（parallel-pro 模式下使用），None 则使用当前活跃账号
     """
     try:
-        from utils.api_utils import call_onebot_api
-        info_data = await call_onebot_api(
-            context, 'get_stranger_info',
-            {'user_id': int(user_id), 'no_cache': True},
-            account_id=account_id
-        )
-        if info_data and info_data.get("success") and info_data["data"].get('status') == 'ok':
-            return info_data["data"].get('data', {}).get('nickname', str(user_id))
+        info = await profile_cache.get_user(context, user_id, account_id=account_id)
+        if info:
+            return info.get('nickname') or info.get('nick') or str(user_id)
     except Exception as e:
         logger.error(f"获取用户 {user_id} 昵称失败：{e}")
-    return str(user_id)
\ No newline at end of file
+    return str(user_id)
+
+async def get_user_nicknames(context: BotContext, user_ids: Iterable, account_id: int = None) -> Dict[str, str]:
+    """批量获取用户昵称，返回 {user_id: 昵称}，获取失败的用户使用QQ号"""
+    user_ids = [str(user_id) for user_id in user_ids]
+    try:
+        infos = await profile_cache.get_users(context, user_ids, account_id=account_id)
+    except Exception as e:
+        logger.error(f"批量获取用户昵称失败：{e}")
+        infos = {}
+    return {user_id: (infos.get(user_id, {}).get('nickname') or infos.get(user_id, {}).get('nick') or user_id)
+            for user_id in user_ids}
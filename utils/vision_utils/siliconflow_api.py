@@ -4,7 +4,9 @@
 import asyncio
 import aiohttp
 import json
+import time
 from logger_config import get_logger, log_exception
+from core.metrics import LLM_REQUEST_SECONDS
 from core.bot_context import BotContext
 from typing import Optional
 
@@ -72,6 +74,8 @@ async def call_siliconflow_api_async(
         timeout = aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout)
         
         # 不再重试，只调用一次
+        started = time.perf_counter()
+        status = 'error'
         try:
             async with aiohttp.ClientSession(timeout=timeout) as session:
                 async with session.post(base_url, headers=headers, json=payload) as response:
@@ -102,14 +106,18 @@ async def call_siliconflow_api_async(
                                     continue
                     
                     # 返回完整响应
+                    status = 'ok' if full_response else 'empty'
                     return full_response.strip() if full_response else None
                     
         except asyncio.TimeoutError:
+            status = 'timeout'
             logger.error("硅基流动API调用超时，不再重试")
             return None
         except aiohttp.ClientError as e:
             log_exception(logger, "硅基流动API请求失败，不再重试", e)
             return None
+        finally:
+            LLM_REQUEST_SECONDS.labels(model, status).observe(time.perf_counter() - started)
 
     except Exception as e:
         log_exception(logger, "硅基流动API处理异常", e)